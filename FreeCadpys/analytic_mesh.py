@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+长方体 / 带贯通孔长方体的解析网格生成（不需要 FreeCAD）
+
+create_cube.py 最常见的零件是轴对齐长方体，可选沿 X/Y/Z 轴穿过中心的圆柱孔。
+这类形状的三角网格可以直接写出，不必经过 Part.makeCylinder、Part::Cut、recompute
+和 MeshPart.meshFromShape：
+
+- 孔的圆周按弦高误差（tolerance，毫米）分段，段数取 4 的倍数
+- 上下两个带孔端面：从孔中心向外的射线与矩形边界的交点 + 矩形四个角组成外圈，
+  与孔的圆周逐段连成扇形三角形；四个侧面使用同样的外圈点，保证网格封闭
+- 顶点在长方体局部坐标系（角点在原点）中生成，再按 pos/rot 变换，与 FreeCAD 的 Placement 一致
+
+用法:
+    python FreeCadpys/analytic_mesh.py --length=20 --holeRadius=3 --stl=stls/a.stl
+    python FreeCadpys/analytic_mesh.py --length=20 --holeRadius=3 --validate   # 与 FreeCAD 的结果对比
+"""
+
+import os
+import sys
+import math
+import time
+
+import numpy as np
+
+import stl_io
+import stage_trace
+
+# 默认弦高误差（毫米）
+DEFAULT_TOLERANCE = 0.01
+
+# 圆周最少分段数
+MIN_SEGMENTS = 8
+
+AXES = {"X": 0, "Y": 1, "Z": 2}
+
+
+def _hole_axis(params):
+    # 与 create_cube.build_cube 一致：X、Y 以外都按 Z 轴处理
+    axis = str(params["holeAxis"]).upper()
+    return axis if axis in AXES else "Z"
+
+
+def _hole_depth(params):
+    return {"X": params["length"], "Y": params["width"], "Z": params["height"]}[_hole_axis(params)]
+
+
+def segments_for_tolerance(radius, tolerance):
+    """满足弦高误差的圆周分段数（4 的倍数）"""
+    if tolerance >= radius:
+        return MIN_SEGMENTS
+    count = math.ceil(math.pi / math.acos(1 - tolerance / radius))
+    return max(MIN_SEGMENTS, -(-count // 4) * 4)
+
+
+def rotation_matrix(rot):
+    """与 FreeCAD Rotation(yaw, pitch, roll) 相同：依次绕 Z、Y、X 轴旋转（度）"""
+    yaw, pitch, roll = (math.radians(value) for value in rot)
+    cz, sz = math.cos(yaw), math.sin(yaw)
+    cy, sy = math.cos(pitch), math.sin(pitch)
+    cx, sx = math.cos(roll), math.sin(roll)
+    rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    return rz @ ry @ rx
+
+
+def box_mesh(length, width, height):
+    """长方体网格，返回 (顶点 (8, 3), 三角形 (12, 3))，三角形逆时针朝外"""
+    corners = np.array([[dx, dy, dz] for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)], dtype=float)
+    vertices = corners * np.array([length, width, height], dtype=float)
+    faces = np.array([(0, 2, 3, 1), (4, 5, 7, 6), (0, 1, 5, 4),
+                      (2, 6, 7, 3), (0, 4, 6, 2), (1, 3, 7, 5)])
+    triangles = np.concatenate([faces[:, [0, 1, 2]], faces[:, [0, 2, 3]]])
+    return vertices, triangles
+
+
+def _outer_ring(angles, half_a, half_b):
+    """孔圆周各点方向的射线与矩形边界的交点，并按角度插入矩形的四个角
+
+    返回 (外圈点 (m, 2), 每个圆周点在外圈中的下标)
+    """
+    cos, sin = np.cos(angles), np.sin(angles)
+    with np.errstate(divide="ignore"):
+        scale = np.minimum(np.abs(half_a / cos), np.abs(half_b / sin))
+    projections = np.stack([cos * scale, sin * scale], axis=1)
+
+    corner_points = np.array([[half_a, half_b], [-half_a, half_b], [-half_a, -half_b], [half_a, -half_b]])
+    corner_angles = np.mod(np.arctan2(corner_points[:, 1], corner_points[:, 0]), 2 * np.pi)
+    # 与圆周点方向重合的角不需要重复插入
+    keep = np.min(np.abs(corner_angles[:, None] - angles[None, :]), axis=1) > 1e-12
+    all_angles = np.concatenate([angles, corner_angles[keep]])
+    all_points = np.concatenate([projections, corner_points[keep]])
+    order = np.argsort(all_angles, kind="stable")
+    position = np.empty(len(order), dtype=int)
+    position[order] = np.arange(len(order))
+    return all_points[order], position[:len(angles)]
+
+
+def box_with_hole_mesh(length, width, height, radius, axis="Z", tolerance=DEFAULT_TOLERANCE):
+    """沿 axis 穿过中心、半径为 radius 的贯通孔长方体网格，返回 (顶点, 三角形)"""
+    size = np.array([length, width, height], dtype=float)
+    k = AXES[axis.upper()]
+    # 在"孔沿 Z 轴"的标准坐标系中生成，u、v、k 构成右手系
+    u, v = (k + 1) % 3, (k + 2) % 3
+    a, b, depth = size[u], size[v], size[k]
+    if radius <= 0 or 2 * radius >= min(a, b):
+        raise ValueError(f"孔半径 {radius} 必须大于0且小于截面 {a}x{b} 较短边的一半")
+
+    n = segments_for_tolerance(radius, tolerance)
+    angles = 2 * np.pi * np.arange(n) / n
+    inner = radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    outer, attach = _outer_ring(angles, a / 2, b / 2)
+    m = len(outer)
+
+    # 顶点：下端面外圈、上端面外圈、下端面内圈、上端面内圈
+    ring2d = np.concatenate([outer, outer, inner, inner]) + np.array([a / 2, b / 2])
+    heights = np.concatenate([np.zeros(m), np.full(m, depth), np.zeros(n), np.full(n, depth)])
+    bottom_outer, top_outer = 0, m
+    bottom_inner, top_inner = 2 * m, 2 * m + n
+
+    i = np.arange(n)
+    i_next = (i + 1) % n
+    j = np.arange(m)
+    j_next = (j + 1) % m
+
+    # 端面：每段圆弧对应外圈从 attach[i] 到 attach[i+1] 的若干点，以内圈点 i 为扇心，
+    # 三角形为 (内圈点, 外圈点, 下一个外圈点)，每段最后一个为 (内圈点, 外圈点, 下一个内圈点)
+    fan_outer = []
+    fan_inner = []
+    for index in range(n):
+        start, end = attach[index], attach[(index + 1) % n]
+        outer_ids = (start + np.arange((end - start) % m + 1)) % m
+        fan_outer += [(index, p, q) for p, q in zip(outer_ids[:-1], outer_ids[1:])]
+        fan_inner.append((index, outer_ids[-1], (index + 1) % n))
+    fan_outer = np.array(fan_outer, dtype=int).reshape(-1, 3)
+    fan_inner = np.array(fan_inner, dtype=int)
+
+    def cap(inner_base, outer_base):
+        return np.concatenate([fan_outer + [inner_base, outer_base, outer_base],
+                               fan_inner + [inner_base, outer_base, inner_base]])
+
+    top = cap(top_inner, top_outer)
+    # 下端面朝向相反
+    bottom = cap(bottom_inner, bottom_outer)[:, ::-1]
+
+    sides = np.concatenate([
+        np.stack([bottom_outer + j, bottom_outer + j_next, top_outer + j_next], axis=1),
+        np.stack([bottom_outer + j, top_outer + j_next, top_outer + j], axis=1),
+    ])
+    wall = np.concatenate([
+        np.stack([bottom_inner + i, top_inner + i, top_inner + i_next], axis=1),
+        np.stack([bottom_inner + i, top_inner + i_next, bottom_inner + i_next], axis=1),
+    ])
+
+    local = np.empty((len(ring2d), 3))
+    local[:, u] = ring2d[:, 0]
+    local[:, v] = ring2d[:, 1]
+    local[:, k] = heights
+    return local, np.concatenate([top, bottom, sides, wall])
+
+
+def supports(params):
+    """解析网格能否处理这组参数（create_cube.normalize_params 的结果）"""
+    radius = params["holeRadius"]
+    if radius <= 0:
+        return True
+    size = {"X": (params["width"], params["height"]), "Y": (params["height"], params["length"]),
+            "Z": (params["length"], params["width"])}[_hole_axis(params)]
+    return 2 * radius < min(size)
+
+
+def cube_mesh(params, tolerance=DEFAULT_TOLERANCE):
+    """按 create_cube.py 的参数生成世界坐标系中的网格，返回 (顶点, 三角形)"""
+    if params["holeRadius"] > 0:
+        vertices, faces = box_with_hole_mesh(params["length"], params["width"], params["height"],
+                                             params["holeRadius"], _hole_axis(params), tolerance)
+    else:
+        vertices, faces = box_mesh(params["length"], params["width"], params["height"])
+    vertices = vertices @ rotation_matrix(params["rot"]).T + np.asarray(params["pos"], dtype=float)
+    return vertices, faces
+
+
+def mesh_volume(vertices, faces):
+    """封闭网格的体积（有向四面体体积之和）"""
+    a, b, c = (vertices[faces[:, i]] for i in range(3))
+    return float(np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6.0)
+
+
+def is_watertight(faces):
+    """每条有向边恰好出现一次且其反向边也恰好出现一次：网格封闭、流形且朝向一致"""
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    keys = edges[:, 0].astype(np.int64) * (int(faces.max()) + 1) + edges[:, 1]
+    reverse = edges[:, 1].astype(np.int64) * (int(faces.max()) + 1) + edges[:, 0]
+    unique, counts = np.unique(keys, return_counts=True)
+    if np.any(counts != 1):
+        return False
+    return bool(np.all(np.isin(reverse, unique)))
+
+
+def expected_volume(params, segments=None):
+    """解析体积；给出 segments 时按内接多边形孔计算（与网格的精确体积对应）"""
+    volume = params["length"] * params["width"] * params["height"]
+    radius = params["holeRadius"]
+    if radius > 0:
+        depth = _hole_depth(params)
+        if segments:
+            area = segments / 2 * radius ** 2 * math.sin(2 * math.pi / segments)
+        else:
+            area = math.pi * radius ** 2
+        volume -= area * depth
+    return volume
+
+
+def export_stl(params, stl_path, tolerance=DEFAULT_TOLERANCE, binary=True):
+    """生成网格并写出 STL（默认二进制），返回三角形数量"""
+    with stage_trace.span("analytic_mesh") as span:
+        vertices, faces = cube_mesh(params, tolerance)
+        span.set(facets=len(faces))
+    with stage_trace.span("write_stl"):
+        return stl_io.write_stl(stl_path, vertices, faces, binary=binary, name=params["name"])
+
+
+def validate(params, tolerance=DEFAULT_TOLERANCE):
+    """检查解析网格是否封闭、体积是否正确，能导入 FreeCAD 时与 FreeCAD 的结果对比
+
+    返回检查结果字典，"ok" 表示全部通过。
+    """
+    vertices, faces = cube_mesh(params, tolerance)
+    segments = segments_for_tolerance(params["holeRadius"], tolerance) if params["holeRadius"] > 0 else None
+    volume = mesh_volume(vertices, faces)
+    report = {
+        "triangles": len(faces),
+        "watertight": is_watertight(faces),
+        "volume": volume,
+        # 内接多边形孔的精确体积，与网格体积应只差浮点误差
+        "polygon_volume": expected_volume(params, segments),
+        "exact_volume": expected_volume(params),
+    }
+    # 弦高误差造成的体积偏差上限：孔周长 x 弦高误差 x 孔深
+    allowed = 2 * math.pi * params["holeRadius"] * tolerance * _hole_depth(params) + 1e-9 * abs(report["exact_volume"])
+    checks = [report["watertight"],
+              abs(volume - report["polygon_volume"]) <= 1e-9 * max(1.0, abs(volume)),
+              abs(volume - report["exact_volume"]) <= allowed]
+
+    import create_cube
+    FreeCAD = create_cube.FreeCAD
+    if FreeCAD is not None:
+        doc = FreeCAD.newDocument("AnalyticMeshCheck")
+        try:
+            body = create_cube.build_cube(doc, params)
+            doc.recompute()
+            report["freecad_volume"] = body.Shape.Volume
+            checks.append(abs(volume - report["freecad_volume"]) <= allowed + 1e-6 * abs(volume))
+            bound = body.Shape.BoundBox
+            low, high = vertices.min(axis=0), vertices.max(axis=0)
+            report["bounds_match"] = bool(np.allclose(
+                [bound.XMin, bound.YMin, bound.ZMin, bound.XMax, bound.YMax, bound.ZMax],
+                np.concatenate([low, high]), atol=1e-6))
+            checks.append(report["bounds_match"])
+        finally:
+            FreeCAD.closeDocument(doc.Name)
+    report["ok"] = all(checks)
+    return report
+
+
+def main():
+    # 复用 create_cube.py 的参数解析（没有安装 FreeCAD 时它不会导入 FreeCAD）
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import create_cube
+    import mesh_quality
+    params = create_cube.normalize_params(create_cube.read_params(), strict=True)
+    # 精度由 --meshQuality / --tolerance 决定，--maxTriangles 时搜索满足预算的 tolerance
+    tolerance, report = mesh_quality.analytic_tolerance(params, mesh_quality.resolve(params))
+
+    if "--validate" in sys.argv:
+        report = validate(params, tolerance)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        return 0 if report["ok"] else 1
+
+    stl_path = params["stl"] or os.path.join("stls", f"{params['name']}.stl")
+    started = time.perf_counter()
+    export_stl(params, stl_path, tolerance)
+    print(f"✓ STL文件已导出到: {stl_path}（{mesh_quality.format_report(report)}，{time.perf_counter() - started:.4f} 秒）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
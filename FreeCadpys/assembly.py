@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+装配模式：把清单中的所有立方体和直线放进同一个 FreeCAD 文档
+
+create_cube.py 每个零件都要新建文档、重算、保存、关闭，500 个零件的排布就是 500 个 .FCStd 和
+500 次文档开关。装配模式：
+
+- 所有对象建在一个文档中，最后只调用一次 doc.recompute()，保存为一个 .FCStd
+- 排布方式（--layout）：
+    manifest  使用清单中的位置（pos / 直线端点）
+    grid      按统一的单元格大小排成网格（--columns 列，默认接近正方形）
+    packed    按占地矩形（旋转后的包围盒）从深到浅逐行排列（货架式装箱），比网格更紧凑
+  grid / packed 只改变 XY 位置，每个对象包围盒的最低点放在 Z=0
+- STL 一遍导出：每个立方体网格化一次，同时写入合并的 STL（--stl）和每个对象一个的 STL（--stl-dir）；
+  能用解析网格的零件不经过 FreeCAD 网格化，网格精度参数（meshQuality、maxTriangles 等）按行生效
+
+清单格式与 fc_pool.py 相同（JSON-lines 或 CSV）：{"kind": "cube" | "line", "params": {...}}，
+或者直接写参数（默认 cube）。行中的 fcstd / stl 输出路径在装配模式下不使用。
+
+用法:
+    python FreeCadpys/assembly.py parts.jsonl --layout=grid --gap=5 --fcstd=FCStds/layout.FCStd --stl=stls/layout.stl
+    python FreeCadpys/assembly.py parts.jsonl --layout=packed --stl-dir=stls/layout
+    FC_STUB=1 python FreeCadpys/assembly.py parts.jsonl     # 使用替身模块测试
+"""
+
+import os
+import io
+import sys
+import math
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stage_trace
+import create_cube
+import mesh_quality
+from fc_worker import job_params, JOB_KINDS, LINE_PARAMS
+
+FreeCAD = create_cube.FreeCAD
+
+LAYOUTS = ("manifest", "grid", "packed")
+
+# 默认对象间距（毫米）
+DEFAULT_GAP = 5.0
+
+
+class Item:
+    """清单中的一个对象：kind 为 cube 或 line，params 为规范化后的参数"""
+
+    def __init__(self, row, kind, params):
+        self.row = row
+        self.kind = kind
+        self.params = params
+        self.obj = None
+
+    def bounds(self):
+        """当前参数下的包围盒 ((xmin, ymin, zmin), (xmax, ymax, zmax))"""
+        if self.kind == "line":
+            points = [(self.params["x1"], self.params["y1"], self.params["z1"]),
+                      (self.params["x2"], self.params["y2"], self.params["z2"])]
+        else:
+            p = self.params
+            rotation = create_cube.Base.Rotation(*p["rot"])
+            points = []
+            for corner in ((x, y, z) for x in (0, p["length"]) for y in (0, p["width"]) for z in (0, p["height"])):
+                point = rotation.multVec(create_cube.Base.Vector(*corner))
+                points.append((point.x + p["pos"][0], point.y + p["pos"][1], point.z + p["pos"][2]))
+        return tuple(min(values) for values in zip(*points)), tuple(max(values) for values in zip(*points))
+
+    def move(self, dx, dy, dz):
+        if self.kind == "line":
+            for axis, delta in (("x", dx), ("y", dy), ("z", dz)):
+                self.params[f"{axis}1"] += delta
+                self.params[f"{axis}2"] += delta
+        else:
+            x, y, z = self.params["pos"]
+            self.params["pos"] = (x + dx, y + dy, z + dz)
+
+    def place(self, x, y):
+        """把包围盒的最低角放到 (x, y, 0)"""
+        low, _ = self.bounds()
+        self.move(x - low[0], y - low[1], -low[2])
+
+
+def line_params(params):
+    unknown = sorted(set(params) - set(LINE_PARAMS))
+    if unknown:
+        raise ValueError(f"未知参数: {', '.join(unknown)}")
+    values = dict(LINE_PARAMS)
+    values.update({key: value for key, value in params.items() if value is not None})
+    for key in ("x1", "y1", "z1", "x2", "y2", "z2"):
+        values[key] = float(values[key])
+    return values
+
+
+def load_items(manifest):
+    """读取清单，返回 (对象列表, [(行号, 错误)])"""
+    items, errors = [], []
+    for row, job in create_cube.iter_manifest(manifest):
+        try:
+            if isinstance(job, Exception):
+                raise ValueError(f"无法解析: {job}")
+            kind = job.get("kind", "cube")
+            if kind not in JOB_KINDS:
+                raise ValueError(f"未知任务类型: {kind}")
+            params = job_params(job)
+            if kind == "line":
+                items.append(Item(row, kind, line_params(params)))
+            else:
+                items.append(Item(row, kind, create_cube.normalize_params(params, strict=True)))
+        except ValueError as e:
+            errors.append((row, str(e)))
+    return items, errors
+
+
+def layout_grid(items, gap=DEFAULT_GAP, columns=None):
+    """统一单元格的网格排布"""
+    if not items:
+        return
+    sizes = [tuple(high - low for low, high in zip(*item.bounds())) for item in items]
+    cell_x = max(size[0] for size in sizes) + gap
+    cell_y = max(size[1] for size in sizes) + gap
+    columns = columns or math.ceil(math.sqrt(len(items)))
+    for index, item in enumerate(items):
+        row, column = divmod(index, columns)
+        item.place(column * cell_x, row * cell_y)
+
+
+def layout_packed(items, gap=DEFAULT_GAP, max_width=None):
+    """货架式装箱：按占地深度从大到小，逐行从左到右排列，一行放不下时换行"""
+    if not items:
+        return
+    footprints = []
+    for item in items:
+        low, high = item.bounds()
+        footprints.append((high[1] - low[1], high[0] - low[0], item))
+    if max_width is None:
+        # 总占地面积的平方根，使整体接近正方形
+        area = sum((width + gap) * (depth + gap) for depth, width, _ in footprints)
+        max_width = max(max(width for _, width, _ in footprints), math.sqrt(area))
+    footprints.sort(key=lambda footprint: -footprint[0])
+    x = y = shelf_depth = 0.0
+    for depth, width, item in footprints:
+        if x > 0 and x + width > max_width:
+            x, y = 0.0, y + shelf_depth + gap
+            shelf_depth = 0.0
+        item.place(x, y)
+        x += width + gap
+        shelf_depth = max(shelf_depth, depth)
+
+
+def build_items(doc, items):
+    """在文档中创建所有对象（不重算），立方体的建模输出不打印"""
+    draft_line = None
+    for item in items:
+        if item.kind == "cube":
+            with contextlib.redirect_stdout(io.StringIO()):
+                item.obj = create_cube.build_cube(doc, item.params)
+            continue
+        p = item.params
+        p1 = FreeCAD.Vector(p["x1"], p["y1"], p["z1"])
+        p2 = FreeCAD.Vector(p["x2"], p["y2"], p["z2"])
+        if draft_line is None:
+            import draft_line_example
+            draft_line = draft_line_example
+        try:
+            item.obj = draft_line.create_line(doc, p1, p2, name=p["name"])
+        except RuntimeError:
+            # 没有 Draft 工作台时用 Part 直线代替
+            item.obj = doc.addObject("Part::Feature", p["name"])
+            item.obj.Shape = create_cube.Part.makeLine(p1, p2)
+            item.obj.Label = p["name"]
+
+
+def _cube_mesh(item):
+    """一个立方体的 (顶点, 三角形, 网格报告)：能用解析网格时不经过 FreeCAD 网格化"""
+    params = item.params
+    quality = mesh_quality.resolve(params)
+    if create_cube.use_analytic_mesher(params):
+        tolerance, report = mesh_quality.analytic_tolerance(params, quality)
+        with stage_trace.span("analytic_mesh"):
+            vertices, faces = create_cube.analytic_mesh.cube_mesh(params, tolerance)
+        return vertices, faces, report
+    _, vertices, faces, report = mesh_quality.mesh_shape(item.obj.Shape, quality, params)
+    return vertices, faces, report
+
+
+def export_stls(items, merged_path=None, stl_dir=None, binary=True):
+    """一遍导出：每个立方体网格化一次，同时写入合并 STL 和各对象的 STL，返回 (三角形总数, 各对象报告)"""
+    stl_io = create_cube.stl_io
+    if stl_io is None:
+        raise RuntimeError("装配模式导出 STL 需要 NumPy")
+    reports = {}
+
+    def chunks():
+        for item in items:
+            if item.kind != "cube":
+                continue
+            with stage_trace.span("stl_object", part=item.obj.Name):
+                vertices, faces, report = _cube_mesh(item)
+                reports[item.obj.Name] = report
+                if stl_dir:
+                    stl_io.write_stl(os.path.join(stl_dir, f"{item.obj.Name}.stl"), vertices, faces,
+                                     binary=binary, name=item.obj.Label)
+            yield vertices[faces]
+
+    if stl_dir:
+        os.makedirs(stl_dir, exist_ok=True)
+    if merged_path:
+        name = os.path.splitext(os.path.basename(merged_path))[0]
+        count = stl_io.write_stl_stream(merged_path, chunks(), binary=binary, name=name)
+    else:
+        count = sum(len(triangles) for triangles in chunks())
+    return count, reports
+
+
+def build_assembly(items, fcstd_path=None, stl_path=None, stl_dir=None, binary=True,
+                   doc_name="Assembly", close_document=None):
+    """建模、一次重算、保存、导出 STL，返回 {"objects", "triangles", "meshes", "timings"}"""
+    if FreeCAD is None:
+        raise RuntimeError("无法导入FreeCAD模块：装配模式需要在FreeCAD环境中运行")
+    timings = {}
+    doc = FreeCAD.newDocument(doc_name)
+    try:
+        with stage_trace.span("build", objects=len(items)) as span:
+            build_items(doc, items)
+        timings["build"] = span.seconds
+
+        # 所有对象创建完后只重算一次
+        with stage_trace.span("recompute", objects=len(doc.Objects)) as span:
+            doc.recompute()
+        timings["recompute"] = span.seconds
+
+        if fcstd_path:
+            directory = os.path.dirname(fcstd_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with stage_trace.span("save") as span:
+                doc.saveAs(fcstd_path)
+            timings["save"] = span.seconds
+
+        triangles, meshes = 0, {}
+        if stl_path or stl_dir:
+            with stage_trace.span("stl") as span:
+                triangles, meshes = export_stls(items, stl_path, stl_dir, binary)
+            timings["stl"] = span.seconds
+        return {"objects": len(doc.Objects), "triangles": triangles, "meshes": meshes, "timings": timings}
+    finally:
+        if close_document is None:
+            gui = create_cube.FreeCADGui
+            close_document = not hasattr(gui, 'ActiveDocument') or not gui.ActiveDocument
+        if close_document:
+            FreeCAD.closeDocument(doc.Name)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把清单中的立方体和直线放进同一个 FreeCAD 文档")
+    parser.add_argument("manifest", help="任务清单（JSON-lines 或 CSV）")
+    parser.add_argument("--layout", choices=LAYOUTS, default="manifest", help="排布方式 (默认 manifest)")
+    parser.add_argument("--gap", type=float, default=DEFAULT_GAP, help=f"对象间距，毫米 (默认 {DEFAULT_GAP:g})")
+    parser.add_argument("--columns", type=int, default=None, help="grid 排布的列数 (默认接近正方形)")
+    parser.add_argument("--max-width", type=float, default=None, help="packed 排布的最大行宽，毫米")
+    parser.add_argument("--name", default="Assembly", help="文档名称 (默认 Assembly)")
+    parser.add_argument("--fcstd", default=None,
+                        help="输出 .FCStd (默认 FCStds/<清单名>.FCStd，none 表示不保存)")
+    parser.add_argument("--stl", default=None, help="合并的 STL 输出路径")
+    parser.add_argument("--stl-dir", default=None, help="每个对象一个 STL 的输出目录")
+    parser.add_argument("--stl-format", choices=create_cube.STL_FORMATS, default="binary",
+                        help="STL 格式 (默认 binary)")
+    args = parser.parse_args(argv)
+    if args.columns is not None and args.columns < 1:
+        parser.error("--columns 必须为正整数")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stage_trace.from_env()
+    if FreeCAD is None:
+        print("错误: 无法导入FreeCAD模块，装配模式需要在FreeCAD环境中运行（或设置 FC_STUB=1）")
+        return 1
+
+    items, errors = load_items(args.manifest)
+    for row, message in errors:
+        print(f"✗ 第 {row} 行无效，已跳过: {message}")
+    if not items:
+        print("错误: 清单中没有可用的对象")
+        return 1
+
+    if args.layout == "grid":
+        layout_grid(items, args.gap, args.columns)
+    elif args.layout == "packed":
+        layout_packed(items, args.gap, args.max_width)
+
+    if args.fcstd is None:
+        fcstd_path = os.path.join("FCStds", os.path.splitext(os.path.basename(args.manifest))[0] + ".FCStd")
+    elif args.fcstd.lower() in create_cube.NO_OUTPUT:
+        fcstd_path = None
+    else:
+        fcstd_path = args.fcstd
+
+    started = time.perf_counter()
+    try:
+        result = build_assembly(items, fcstd_path, args.stl, args.stl_dir,
+                                binary=args.stl_format == "binary", doc_name=args.name)
+    except (RuntimeError, ValueError) as e:
+        print(f"✗ {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    cubes = sum(item.kind == "cube" for item in items)
+    print(f"装配完成: {cubes} 个立方体，{len(items) - cubes} 条直线，文档中共 {result['objects']} 个对象，"
+          f"耗时 {elapsed:.2f} 秒")
+    print("- 各阶段: " + "，".join(f"{stage} {seconds:.3f} 秒" for stage, seconds in result["timings"].items()))
+    if fcstd_path:
+        print(f"- FCStd文件: {fcstd_path}")
+    if args.stl:
+        print(f"- 合并 STL: {args.stl}（{result['triangles']} 个三角形）")
+    if args.stl_dir:
+        print(f"- 各对象 STL: {args.stl_dir}（{len(result['meshes'])} 个文件）")
+    stage_trace.get_tracer().print_summary()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+零件生成、网格化与导出的性能基准
+
+对每个用例按不同批量大小连续生成零件，统计吞吐量（零件/秒）和单个零件的延迟分布（p50/p90/p99），
+结果写成 JSON，可以保存为基准线，之后的运行与基准线比较，吞吐量下降且 p50 延迟上升都超过阈值才报告回退。
+样本（批量大小 × 重复次数）少于 --min-samples 的批量计时噪声太大，只输出不比较。
+
+用例:
+    box_fcstd              长方体，只保存 .FCStd
+    hole_{x,y,z}_fcstd     带贯通孔的长方体（三个轴向），只保存 .FCStd（包含布尔运算）
+    box_stl_freecad        长方体，FreeCAD 网格化导出 STL
+    hole_z_stl_freecad     带孔长方体，FreeCAD 网格化导出 STL
+    hole_z_stl_analytic    带孔长方体，解析网格导出 STL（需要 NumPy）
+    hole_z_stl_{draft,fine} FreeCAD 网格化，draft / fine 网格精度预设
+    hole_z_stl_budget      FreeCAD 网格化，按三角形预算搜索网格参数
+    hole_z_full            保存 .FCStd 并导出 STL
+
+后端:
+    --backend=auto    能导入 FreeCAD 时用 FreeCAD，否则用 fcstub 替身（默认）
+    --backend=stub    总是用 fcstub 替身，没有 FreeCAD 的 Linux CI 上也能运行
+    --backend=freecad 必须用真实的 FreeCAD（在 freecadcmd 中运行）
+不同后端的结果不可比较，与后端不同的基准线比较时只给出提示。
+
+用法:
+    python FreeCadpys/bench.py --backend=stub --sizes=1,10,100 --json=bench.json
+    python FreeCadpys/bench.py --backend=stub --baseline=bench_baseline.json --update-baseline
+    python FreeCadpys/bench.py --backend=stub --baseline=bench_baseline.json --threshold=0.25
+    python FreeCadpys/bench.py --cases='hole_*' --sizes=50
+回退时退出码为 1，可直接用于 CI。
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stage_trace
+
+# 结果文件格式版本
+BENCH_VERSION = 1
+
+DEFAULT_SIZES = (1, 10, 100)
+
+# 每个用例、每个批量大小重复的次数，吞吐量取最好的一次
+DEFAULT_REPEAT = 3
+
+# 吞吐量下降且 p50 延迟上升都超过该比例视为回退
+DEFAULT_THRESHOLD = 0.25
+
+# 批量大小 × 重复次数少于该值时不与基准线比较（单件、少量零件的计时主要是噪声）
+DEFAULT_MIN_SAMPLES = 20
+
+# 延迟低于该值（秒）时不比较延迟，计时噪声比差异还大
+MIN_COMPARABLE_SECONDS = 1e-4
+
+HOLE = {"holeRadius": 3.0}
+
+# 用例：参数、输出（fcstd / stl）、是否需要 NumPy
+CASES = [
+    {"name": "box_fcstd", "params": {}, "outputs": ("fcstd",)},
+    {"name": "hole_x_fcstd", "params": dict(HOLE, holeAxis="X"), "outputs": ("fcstd",)},
+    {"name": "hole_y_fcstd", "params": dict(HOLE, holeAxis="Y"), "outputs": ("fcstd",)},
+    {"name": "hole_z_fcstd", "params": dict(HOLE, holeAxis="Z"), "outputs": ("fcstd",)},
+    {"name": "box_stl_freecad", "params": {"mesher": "freecad"}, "outputs": ("stl",)},
+    {"name": "hole_z_stl_freecad", "params": dict(HOLE, mesher="freecad"), "outputs": ("stl",)},
+    {"name": "hole_z_stl_analytic", "params": dict(HOLE, mesher="analytic"), "outputs": ("stl",),
+     "numpy": True},
+    {"name": "hole_z_stl_draft", "params": dict(HOLE, mesher="freecad", meshQuality="draft"),
+     "outputs": ("stl",)},
+    {"name": "hole_z_stl_fine", "params": dict(HOLE, mesher="freecad", meshQuality="fine"),
+     "outputs": ("stl",)},
+    {"name": "hole_z_stl_budget", "params": dict(HOLE, mesher="freecad", maxTriangles=200),
+     "outputs": ("stl",)},
+    {"name": "hole_z_full", "params": HOLE, "outputs": ("fcstd", "stl")},
+]
+
+
+def load_create_cube(backend):
+    """按后端导入 create_cube（FC_STUB 必须在导入前设置），返回 (模块, 实际后端)"""
+    if backend == "auto":
+        try:
+            import FreeCAD  # noqa: F401
+            backend = "freecad"
+        except ImportError:
+            backend = "stub"
+    if backend == "stub":
+        os.environ["FC_STUB"] = "1"
+    import create_cube
+    if create_cube.FreeCAD is None:
+        raise RuntimeError("无法导入FreeCAD模块：--backend=freecad 需要在FreeCAD环境中运行")
+    return create_cube, backend
+
+
+def select_cases(patterns, create_cube):
+    """按通配符选择用例，跳过当前环境不支持的用例"""
+    selected = []
+    for case in CASES:
+        if patterns and not any(fnmatch.fnmatch(case["name"], p) for p in patterns):
+            continue
+        if case.get("numpy") and create_cube.analytic_mesh is None:
+            print(f"跳过 {case['name']}: NumPy 不可用")
+            continue
+        selected.append(case)
+    return selected
+
+
+def case_params(create_cube, case, workdir, index):
+    params = dict(create_cube.DEFAULT_PARAMS, name=f"Bench{index}", **case["params"])
+    params = create_cube.normalize_params(params, strict=True)
+    params["fcstd"] = (os.path.join(workdir, f"{index}.FCStd") if "fcstd" in case["outputs"]
+                       else "none")
+    params["stl"] = os.path.join(workdir, f"{index}.stl") if "stl" in case["outputs"] else None
+    return params
+
+
+def run_batch(create_cube, case, size, workdir):
+    """连续生成 size 个零件，返回 (总耗时, [单个零件耗时])；不使用零件缓存，输出不打印"""
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for index in range(size):
+            params = case_params(create_cube, case, workdir, index)
+            part_started = time.perf_counter()
+            result = create_cube.create_cube(params, close_document=True, cache=None)
+            latencies.append(time.perf_counter() - part_started)
+            if result["stl_error"]:
+                raise RuntimeError(f"{case['name']}: STL导出失败: {result['stl_error']}")
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies
+
+
+def summarize(size, runs):
+    """一个用例、一个批量大小的统计：runs 为每次重复的 (总耗时, [单件耗时])；
+    吞吐量取最快的一次，延迟分布汇总所有重复，best 为最快的单件耗时"""
+    best = min(elapsed for elapsed, _ in runs)
+    latencies = sorted(latency for _, samples in runs for latency in samples)
+    stats = {"size": size, "repeat": len(runs), "samples": len(latencies),
+             "parts_per_sec": size / best if best > 0 else None,
+             "mean": sum(latencies) / len(latencies), "best": latencies[0], "max": latencies[-1]}
+    for q in stage_trace.PERCENTILES:
+        stats[f"p{q}"] = stage_trace.percentile(latencies, q)
+    return stats
+
+
+def environment(create_cube, backend):
+    return {
+        "backend": backend,
+        "freecad": ".".join(create_cube.FreeCAD.Version()[:4]),
+        "numpy": create_cube.analytic_mesh is not None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_suite(create_cube, cases, sizes, repeat, backend, on_result=None):
+    """运行所有用例，返回结果字典 {"version", "created", "environment", "results": {"用例@批量": 统计}}
+
+    重复是一轮一轮进行的（每轮把所有用例和批量各跑一次），机器偶尔整体变慢几秒时只影响
+    各用例的一次重复，而不是把某个用例的所有重复都拖慢；最后一轮跑完一个用例就输出它的统计。
+    """
+    results = {}
+    runs = {}
+    workdir = tempfile.mkdtemp(prefix="fc_bench_")
+    try:
+        for case in cases:
+            os.makedirs(os.path.join(workdir, case["name"]))
+            run_batch(create_cube, case, 1, os.path.join(workdir, case["name"]))  # 预热（首次导入 Mesh 等模块）
+        for round_index in range(repeat):
+            for case in cases:
+                case_dir = os.path.join(workdir, case["name"])
+                for size in sizes:
+                    key = f"{case['name']}@{size}"
+                    runs.setdefault(key, []).append(run_batch(create_cube, case, size, case_dir))
+                    if round_index == repeat - 1:
+                        results[key] = summarize(size, runs.pop(key))
+                        if on_result:
+                            on_result(key, results[key])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"version": BENCH_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": environment(create_cube, backend), "results": results}
+
+
+def sample_count(stats):
+    """统计中的单件样本数（旧的结果文件没有 samples 字段，按批量大小 × 重复次数计算）"""
+    return stats.get("samples") or stats.get("size", 0) * stats.get("repeat", 1)
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_samples=DEFAULT_MIN_SAMPLES):
+    """与基准线比较，返回 (回退列表, 样本不足未比较的键)
+
+    回退为 [(键, 指标, 基准值, 当前值, 变化比例)]。吞吐量（多次重复中最快的一次）下降且
+    p50 延迟上升都超过阈值才算回退，两项都列出：真正变慢两者会一起变化，而一次偶然停顿
+    只会拉高单个样本（最快单件、p90）或某一次重复的总耗时。
+    """
+    regressions = []
+    skipped = []
+    for key, stats in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        if min(sample_count(stats), sample_count(base)) < min_samples:
+            skipped.append(key)
+            continue
+        if not (base.get("parts_per_sec") and stats.get("parts_per_sec")):
+            continue
+        if not (base.get("p50") and stats.get("p50")) or base["p50"] < MIN_COMPARABLE_SECONDS:
+            continue
+        throughput = stats["parts_per_sec"] / base["parts_per_sec"] - 1
+        latency = stats["p50"] / base["p50"] - 1
+        if throughput < -threshold and latency > threshold:
+            regressions.append((key, "parts_per_sec", base["parts_per_sec"],
+                                stats["parts_per_sec"], throughput))
+            regressions.append((key, "p50", base["p50"], stats["p50"], latency))
+    return regressions, skipped
+
+
+def format_row(key, stats):
+    return (f"{key:<28} {stats['parts_per_sec']:>10.1f} {stats['best'] * 1000:>9.2f} "
+            f"{stats['p50'] * 1000:>9.2f} {stats['p90'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} "
+            f"{stats['max'] * 1000:>9.2f}")
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="零件生成、网格化与导出的性能基准")
+    parser.add_argument("--backend", choices=("auto", "stub", "freecad"), default="auto",
+                        help="FreeCAD 后端 (默认 auto：没有 FreeCAD 时使用替身)")
+    parser.add_argument("--cases", default=None, help="逗号分隔的用例名通配符，如 'hole_*,box_fcstd'")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help=f"逗号分隔的批量大小 (默认 {','.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"每个批量重复次数 (默认 {DEFAULT_REPEAT})")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="基准线 JSON 文件，与之比较")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入 --baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"回退阈值，吞吐量下降且 p50 延迟上升都超过该比例才算回退 (默认 {DEFAULT_THRESHOLD:g})")
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES,
+                        help=f"批量大小 × 重复次数少于该值时不与基准线比较 (默认 {DEFAULT_MIN_SAMPLES})")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    args = parser.parse_args(argv)
+    try:
+        args.sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        parser.error(f"--sizes 必须是逗号分隔的整数: {args.sizes}")
+    if not args.sizes or min(args.sizes) < 1 or args.repeat < 1:
+        parser.error("--sizes 和 --repeat 必须为正整数")
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline 需要同时指定 --baseline")
+    args.cases = [p.strip() for p in args.cases.split(",") if p.strip()] if args.cases else None
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        for case in CASES:
+            print(case["name"])
+        return 0
+
+    try:
+        create_cube, backend = load_create_cube(args.backend)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        return 2
+    cases = select_cases(args.cases, create_cube)
+    if not cases:
+        print("错误: 没有匹配的用例（--list 查看所有用例）")
+        return 2
+
+    print(f"后端: {backend}，批量大小: {args.sizes}，重复 {args.repeat} 次")
+    print("-" * 90)
+    print(f"{'用例@批量':<24} {'零件/秒':>9} {'最快(ms)':>8} {'p50(ms)':>9} {'p90(ms)':>9} "
+          f"{'p99(ms)':>9} {'最大(ms)':>8}")
+    print("-" * 90)
+    report = run_suite(create_cube, cases, args.sizes, args.repeat, backend,
+                       on_result=lambda key, stats: print(format_row(key, stats), flush=True))
+    print("-" * 90)
+
+    if args.json:
+        write_json(args.json, report)
+        print(f"结果已写入 {args.json}")
+
+    status = 0
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        baseline = load_json(args.baseline)
+        if baseline.get("environment", {}).get("backend") != backend:
+            print(f"注意: 基准线使用的后端是 {baseline.get('environment', {}).get('backend')}，"
+                  f"与本次 ({backend}) 不同，结果不可比较")
+        else:
+            regressions, skipped = compare(report, baseline, args.threshold, args.min_samples)
+            missing = sorted(set(report["results"]) - set(baseline.get("results", {})))
+            if missing:
+                print(f"基准线中没有的用例: {', '.join(missing)}")
+            if skipped:
+                print(f"样本少于 {args.min_samples} 个，未比较: {', '.join(skipped)}")
+            if regressions:
+                status = 1
+                print(f"✗ {len(regressions)} 项回退（阈值 {args.threshold:.0%}）:")
+                for key, metric, before, after, change in regressions:
+                    unit = "" if metric == "parts_per_sec" else "s"
+                    print(f"  {key:<28} {metric:<14} {before:.4g}{unit} -> {after:.4g}{unit} ({change:+.1%})")
+            else:
+                print(f"✓ 与基准线 {args.baseline} 相比没有超过 {args.threshold:.0%} 的回退")
+    elif args.baseline and not args.update_baseline:
+        print(f"基准线 {args.baseline} 不存在，使用 --update-baseline 创建")
+
+    if args.update_baseline:
+        write_json(args.baseline, report)
+        print(f"基准线已更新: {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+增量构建状态：记录每个输出文件由哪组参数、哪个版本的生成脚本产生
+
+create_cube.py --batch 加 --incremental 时，每个任务先与状态文件比较：
+输出文件都存在、参数哈希（create_cube.cache_keys，包含几何、网格精度、STL 格式、FreeCAD 版本）
+和工具版本都没变、文件也没有被外部修改（大小和修改时间一致）时跳过，否则重新生成。
+加 --gc 时删除状态中记录过、但本次清单不再产生的输出文件（从未被记录的文件不会被删除）。
+输出路径变了（例如按序号命名时清单中插入或删除了行）但别处有同样参数、同样工具版本的记录时，
+把那个文件链接到新路径（relocate），不重新生成。
+
+- 工具版本是生成脚本（create_cube / analytic_mesh / mesh_quality / stl_io）源码的哈希，
+  脚本改动后所有输出都视为过期
+- 先比较文件大小和修改时间，修改时间不同时再比较内容哈希（零件缓存的硬链接被其他任务取用时
+  修改时间会变，内容不变）
+- 重新生成时覆盖旧的 .FCStd 会留下 .FCBak 备份，这些备份记录在状态中，--gc 时一起删除
+- 状态文件是 JSON，路径相对于状态文件所在目录保存；先写临时文件再改名，中断时不会损坏
+
+用法:
+    python FreeCadpys/create_cube.py --batch parts.jsonl --incremental          # 状态文件默认 parts.state.json
+    python FreeCadpys/create_cube.py --batch parts.jsonl --incremental --gc     # 同时清理孤立输出
+    python FreeCadpys/build_state.py parts.state.json                          # 查看状态：过期、缺失的输出
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+
+STATE_VERSION = 1
+
+# 参与工具版本计算的生成脚本
+TOOL_SOURCES = ("create_cube.py", "analytic_mesh.py", "mesh_quality.py", "stl_io.py")
+
+_tool_version = None
+
+
+def tool_version():
+    """生成脚本源码的 SHA-256（前 16 位），同一进程中只计算一次"""
+    global _tool_version
+    if _tool_version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in TOOL_SOURCES:
+            digest.update(name.encode("utf-8"))
+            try:
+                with open(os.path.join(directory, name), "rb") as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                digest.update(b"-")
+        _tool_version = digest.hexdigest()[:16]
+    return _tool_version
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_state_path(manifest):
+    return os.path.splitext(manifest)[0] + ".state.json"
+
+
+class BuildState:
+    def __init__(self, path, tool=None):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.tool = tool or tool_version()
+        # {相对路径: {"key", "tool", "size", "mtime_ns", "sha256", "source", "built"}}
+        self.outputs = {}
+        # 本次运行中产生或确认为最新的输出
+        self.touched = set()
+        # 重新生成输出时留下的 .FCBak（相对路径），--gc 时删除
+        self.backups = set()
+
+    @classmethod
+    def load(cls, path, tool=None):
+        state = cls(path, tool)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return state
+        if data.get("version") == STATE_VERSION:
+            state.outputs = dict(data.get("outputs", {}))
+            state.backups = set(data.get("backups", []))
+        return state
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def resolve(self, relative):
+        return os.path.normpath(os.path.join(self.root, relative))
+
+    def unchanged(self, path, entry):
+        """文件是否仍是记录时的内容（大小、修改时间一致，或修改时间变了但内容哈希一致）"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        if file_digest(path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def is_current(self, outputs):
+        """outputs 为 {输出路径: 参数哈希}，全部存在且与记录一致时返回 True"""
+        if not outputs:
+            return False
+        for path, key in outputs.items():
+            entry = self.outputs.get(self._relative(path))
+            if not entry or entry["key"] != key or entry["tool"] != self.tool:
+                return False
+            if not self.unchanged(path, entry):
+                return False
+        self.touched.update(self._relative(path) for path in outputs)
+        return True
+
+    def _donor(self, key, exclude):
+        """参数哈希和工具版本都相同、内容未被修改的其他已记录输出（绝对路径），没有时返回 None"""
+        for relative, entry in self.outputs.items():
+            if relative == exclude or entry["key"] != key or entry["tool"] != self.tool:
+                continue
+            path = self.resolve(relative)
+            if self.unchanged(path, entry):
+                return path
+        return None
+
+    def relocate(self, outputs, **source):
+        """输出不是最新、但每个都能在别的路径找到相同的记录时，把那些文件链接（或复制）到新路径并记录
+
+        返回 [(原路径, 新路径)]；有任何一个找不到时不做改动，返回 None。原路径仍保留在状态中，
+        本次清单不再产生时由 --gc 删除。
+        """
+        if not outputs:
+            return None
+        moves = []
+        for path, key in outputs.items():
+            relative = self._relative(path)
+            entry = self.outputs.get(relative)
+            if entry and entry["key"] == key and entry["tool"] == self.tool \
+                    and self.unchanged(path, entry):
+                continue
+            donor = self._donor(key, relative)
+            if donor is None:
+                return None
+            moves.append((donor, path))
+        for donor, path in moves:
+            _link_or_copy(donor, path)
+        self.record(outputs, **source)
+        return moves
+
+    def add_backups(self, paths):
+        self.backups.update(self._relative(path) for path in paths)
+
+    def record(self, outputs, **source):
+        """记录新生成的输出，source 为来源信息（清单、行号、id 等）"""
+        built = datetime.now().isoformat(timespec="seconds")
+        for path, key in outputs.items():
+            stat = os.stat(path)
+            relative = self._relative(path)
+            self.outputs[relative] = {"key": key, "tool": self.tool, "size": stat.st_size,
+                                      "mtime_ns": stat.st_mtime_ns, "sha256": file_digest(path),
+                                      "source": source, "built": built}
+            self.touched.add(relative)
+
+    def forget(self, path):
+        self.outputs.pop(self._relative(path), None)
+
+    def orphans(self):
+        """记录过但本次运行没有产生或确认的输出（相对路径）"""
+        return sorted(set(self.outputs) - self.touched)
+
+    def collect(self, dry_run=False):
+        """删除孤立输出和记录的 .FCBak 备份，返回删除的路径列表；记录之后被修改过的输出不删除"""
+        removed = []
+        for relative in sorted(self.backups):
+            path = self.resolve(relative)
+            if os.path.exists(path):
+                if not dry_run:
+                    os.remove(path)
+                removed.append(path)
+            if not dry_run:
+                self.backups.discard(relative)
+        for relative in self.orphans():
+            entry = self.outputs[relative]
+            path = self.resolve(relative)
+            if not os.path.exists(path):
+                if not dry_run:
+                    del self.outputs[relative]
+                continue
+            if not self.unchanged(path, entry):
+                print(f"警告: {path} 在生成后被修改过，不删除")
+                continue
+            if not dry_run:
+                os.remove(path)
+                del self.outputs[relative]
+                _remove_empty_parents(os.path.dirname(path), self.root)
+            removed.append(path)
+        return removed
+
+    def save(self):
+        data = {"version": STATE_VERSION, "tool": self.tool,
+                "outputs": dict(sorted(self.outputs.items())), "backups": sorted(self.backups)}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+                f.write("\n")
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def _link_or_copy(source, target):
+    """把 source 硬链接到 target（替换已有文件），不支持硬链接时复制"""
+    directory = os.path.dirname(os.path.abspath(target))
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".{os.path.basename(target)}.{os.getpid()}.tmp")
+    try:
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copy2(source, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _remove_empty_parents(directory, stop):
+    """删除输出后清理空目录，不超出 stop"""
+    stop = os.path.abspath(stop)
+    directory = os.path.abspath(directory)
+    while directory.startswith(stop + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python build_state.py <状态文件.state.json>")
+        return 1
+    state = BuildState.load(sys.argv[1])
+    counts = {"current": 0, "stale": 0, "missing": 0, "modified": 0}
+    for relative, entry in state.outputs.items():
+        path = state.resolve(relative)
+        if not os.path.exists(path):
+            status = "missing"
+        elif entry["tool"] != state.tool:
+            status = "stale"
+        else:
+            status = "current" if state.unchanged(path, entry) else "modified"
+        counts[status] += 1
+        if status != "current":
+            print(f"{status:<9} {path}")
+    print(f"状态文件: {sys.argv[1]}（工具版本 {state.tool}）")
+    print(f"- 输出: {len(state.outputs)} 个，最新 {counts['current']}，工具版本过期 {counts['stale']}，"
+          f"缺失 {counts['missing']}，被修改 {counts['modified']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,171 @@
 
 import os
 import sys
+import csv
+import json
 import time
 from datetime import datetime
 
-# 导入FreeCAD相关模块
-import FreeCAD
-import FreeCADGui
-import Part
-from FreeCAD import Base
-print(f"FreeCAD版本: {FreeCAD.Version()}")
+# 同目录下的模块（fcstub、analytic_mesh）在 freecadcmd 中也能导入
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# --profile-startup（FC_PROFILE_STARTUP=1）：退出时报告各模块的导入耗时，必须在其他导入之前启用
+import startup_profile
+startup_profile.install_from_argv()
+
+# 设置 FC_STUB=1 时使用 fcstub 中的 FreeCAD 替身模块（没有安装 FreeCAD 时用于测试）
+if os.environ.get("FC_STUB") == "1":
+    import fcstub
+    fcstub.enable()
+
+import fc_log
+import stage_trace
+
+import mesh_quality
+
+# FreeCAD 相关模块和 NumPy 解析网格在第一次用到时才导入（load_freecad / load_part / load_analytic_mesher），
+# 没有 FreeCAD 时仍可用解析网格导出 STL（--fcstd=none），只有需要 .FCStd 时才必须有 FreeCAD。
+# 零件缓存、增量构建状态和 .FCStd 重写（load_part_cache / load_build_state / load_fcstd_repack）
+# 连带导入 zipfile、hashlib、tempfile 等，同样只在用到缓存、--incremental、--repack 等选项时导入。
+# 导入之前这些名字不在模块中，其他脚本访问 create_cube.FreeCAD 等属性时由模块级 __getattr__ 触发导入
+LAZY_MODULES = {"FreeCAD": "load_freecad", "FreeCADGui": "load_freecad", "Part": "load_part",
+                "Base": "load_part", "analytic_mesh": "load_analytic_mesher", "stl_io": "load_analytic_mesher",
+                "part_cache": "load_part_cache", "build_state": "load_build_state",
+                "fcstd_repack": "load_fcstd_repack"}
+
+
+def load_freecad():
+    """导入 FreeCAD，返回 FreeCAD 模块，没有 FreeCAD 时返回 None
+
+    只有 FreeCAD.GuiUp（在图形界面中运行）时才导入 FreeCADGui，freecadcmd 中 FreeCADGui 为 None。
+    """
+    global FreeCAD, FreeCADGui
+    if "FreeCAD" not in globals():
+        with stage_trace.span("import_freecad") as span:
+            try:
+                import FreeCAD
+            except ImportError:
+                FreeCAD = None
+            FreeCADGui = None
+            if FreeCAD is not None and getattr(FreeCAD, "GuiUp", False):
+                import FreeCADGui
+            span.set(found=FreeCAD is not None, gui=FreeCADGui is not None)
+    return FreeCAD
+
+
+def load_part():
+    """导入 Part 和 FreeCAD.Base（建模时才需要），返回 Part 模块，没有 FreeCAD 时返回 None"""
+    global Part, Base
+    if "Part" not in globals():
+        Part = Base = None
+        if load_freecad() is not None:
+            with stage_trace.span("import_part"):
+                import Part
+                from FreeCAD import Base
+    return Part
+
+
+def load_analytic_mesher():
+    """导入解析网格和 STL 写出模块，返回 analytic_mesh 模块
+
+    需要 NumPy，不可用时返回 None，STL 由 FreeCAD 网格化并用 mesh.write 写出。
+    """
+    global analytic_mesh, stl_io
+    if "analytic_mesh" not in globals():
+        try:
+            import analytic_mesh
+            import stl_io
+        except ImportError:
+            analytic_mesh = stl_io = None
+    return analytic_mesh
+
+
+def load_part_cache():
+    """导入零件缓存模块（缓存、缓存键和输出路径模板的 key 字段要用），返回 part_cache 模块"""
+    global part_cache
+    if "part_cache" not in globals():
+        import part_cache
+    return part_cache
+
+
+def load_build_state():
+    """导入增量构建状态模块（--incremental / --state），返回 build_state 模块"""
+    global build_state
+    if "build_state" not in globals():
+        import build_state
+    return build_state
+
+
+def load_fcstd_repack():
+    """导入 .FCStd 重写模块（--repack、--brepStore、--keepBackups 和增量构建的 .FCBak 清理），返回 fcstd_repack 模块"""
+    global fcstd_repack
+    if "fcstd_repack" not in globals():
+        import fcstd_repack
+    return fcstd_repack
+
+
+def __getattr__(name):
+    if name not in LAZY_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[LAZY_MODULES[name]]()
+    return globals()[name]
+
+
+# 参数名、默认值和类型（参数名同时用于环境变量 FC_<NAME> 和命令行 --name=value）
+DEFAULT_PARAMS = {
+    "length": 10.0,
+    "width": 10.0,
+    "height": 10.0,
+    "name": "MyCube",
+    "pos": "0,0,0",
+    "rot": "0,0,0",
+    "holeRadius": 0.0,
+    "holeAxis": "Z",
+    "fcstd": None,
+    "stl": None,
+    "mesher": "auto",
+    "stlFormat": "binary",
+    "meshQuality": mesh_quality.DEFAULT_QUALITY,
+    "tolerance": None,
+    "linearDeflection": None,
+    "angularDeflection": None,
+    "maxTriangles": None,
+    "maxErrorUm": None,
+}
+PARAM_TYPES = {
+    "length": float,
+    "width": float,
+    "height": float,
+    "holeRadius": float,
+    "tolerance": float,
+    "linearDeflection": float,
+    "angularDeflection": float,
+    "maxTriangles": int,
+    "maxErrorUm": float,
+}
+
+# 默认值为 None 的数值参数不设置时取决于网格精度预设或表示不限制
+OPTIONAL_PARAMS = ("tolerance", "linearDeflection", "angularDeflection", "maxTriangles", "maxErrorUm")
+
+# STL 网格化方式：auto 能用解析网格时用解析网格，否则用 FreeCAD；analytic / freecad 强制指定
+MESHERS = ("auto", "analytic", "freecad")
+
+# STL 文件格式
+STL_FORMATS = ("binary", "ascii")
+
+# 网格精度预设（见 mesh_quality.PRESETS），tolerance / linearDeflection / angularDeflection 覆盖预设中的值
+MESH_QUALITIES = tuple(mesh_quality.PRESETS)
+
+# fcstd 参数取这些值时不保存 .FCStd
+NO_OUTPUT = ("none", "-")
+
+# 批量模式的默认输出路径模板，可用字段：所有参数名、index（从1开始的任务序号）、
+# row（清单中的行号）、id（清单中的 id 字段）、manifest（清单文件名，不含扩展名）、
+# key（由几何参数和名称计算的短哈希，见 part_key）
+DEFAULT_FCSTD_TEMPLATE = os.path.join("FCStds", "{manifest}", "{index:05d}_{name}.FCStd")
+
+# 增量构建（--incremental）的默认模板：按参数命名，清单中插入或删除行时其他零件的输出路径不变
+INCREMENTAL_FCSTD_TEMPLATE = os.path.join("FCStds", "{manifest}", "{key}_{name}.FCStd")
 
 # 获取参数（优先从环境变量，然后是命令行参数）
 def get_param(name, default, param_type=str):
@@ -22,176 +178,637 @@ def get_param(name, default, param_type=str):
             return param_type(env_value)
         except ValueError:
             print(f"警告: 环境变量FC_{name.upper()}值 '{env_value}' 转换为{param_type.__name__}失败，使用默认值 {default}")
-    
+
     # 从命令行参数获取（简单实现，实际项目可能需要更复杂的解析）
+    # 支持 --name=value 和 --name value 两种写法
     for i, arg in enumerate(sys.argv[1:], 1):
-        if arg.startswith(f"--{name}="):
+        if arg.startswith(f"--{name}=") or (arg == f"--{name}" and i + 1 < len(sys.argv)):
+            value = arg.split("=", 1)[1] if "=" in arg else sys.argv[i + 1]
             try:
-                return param_type(arg.split("=", 1)[1])
+                return param_type(value)
             except ValueError:
                 print(f"警告: 参数--{name}值无效，使用默认值 {default}")
-    
+
     return default
 
-# 设置默认参数
-length = get_param("length", 10.0, float)
-width = get_param("width", 10.0, float)
-height = get_param("height", 10.0, float)
-cube_name = get_param("name", "MyCube", str)
-
-# 获取位置参数
-pos_str = get_param("pos", "0,0,0", str)
-try:
-    pos = tuple(map(float, pos_str.split(",")))
-    if len(pos) != 3:
-        raise ValueError
-    print(f"立方体位置: {pos}")
-except ValueError:
-    print(f"警告: 位置参数格式无效 '{pos_str}'，使用默认位置 (0,0,0)")
-    pos = (0, 0, 0)
-
-# 获取旋转参数
-rot_str = get_param("rot", "0,0,0", str)
-try:
-    rot = tuple(map(float, rot_str.split(",")))
-    if len(rot) != 3:
-        raise ValueError
-    print(f"立方体旋转: {rot}")
-except ValueError:
-    print(f"警告: 旋转参数格式无效 '{rot_str}'，使用默认旋转 (0,0,0)")
-    rot = (0, 0, 0)
-
-# 获取孔洞参数
-hole_radius = get_param("holeRadius", 0.0, float)
-hole_axis = get_param("holeAxis", "Z", str).upper()
-
-# 生成默认文件名
-fcstd_path = get_param("fcstd", None, str)
-if fcstd_path is None:
+# 从环境变量和命令行读取全部参数
+def read_params():
+    return {name: get_param(name, default, PARAM_TYPES.get(name, str))
+            for name, default in DEFAULT_PARAMS.items()}
+
+# 解析 "x,y,z" 形式的三元组（也接受 JSON 任务中的 [x, y, z] 列表）
+def parse_triplet(value):
+    parts = value.split(",") if isinstance(value, str) else list(value)
+    triplet = tuple(float(part) for part in parts)
+    if len(triplet) != 3:
+        raise ValueError(f"需要3个数值: {value!r}")
+    return triplet
+
+# 补全并校验参数
+# strict=False 时与命令行行为一致：无效值打印警告并使用默认值；
+# strict=True 时（批量任务、工作进程）遇到无效值直接抛出 ValueError
+def normalize_params(params, strict=False):
+    unknown = sorted(set(params) - set(DEFAULT_PARAMS))
+    if unknown and strict:
+        raise ValueError(f"未知参数: {', '.join(unknown)}")
+    merged = dict(DEFAULT_PARAMS)
+    merged.update({name: value for name, value in params.items()
+                   if name in DEFAULT_PARAMS and value is not None})
+
+    result = {}
+    for name, param_type in PARAM_TYPES.items():
+        if name in OPTIONAL_PARAMS and merged[name] is None:
+            result[name] = None
+            continue
+        try:
+            result[name] = param_type(float(merged[name])) if param_type is int else float(merged[name])
+        except (TypeError, ValueError):
+            if strict:
+                raise ValueError(f"参数 {name} 不是数值: {merged[name]!r}")
+            print(f"警告: 参数{name}值无效 '{merged[name]}'，使用默认值 {DEFAULT_PARAMS[name]}")
+            result[name] = DEFAULT_PARAMS[name]
+    if strict:
+        for name in ("length", "width", "height"):
+            if result[name] <= 0:
+                raise ValueError(f"参数 {name} 必须大于0: {result[name]}")
+        if result["holeRadius"] < 0:
+            raise ValueError(f"参数 holeRadius 不能小于0: {result['holeRadius']}")
+        for name in OPTIONAL_PARAMS:
+            if result[name] is not None and result[name] <= 0:
+                raise ValueError(f"参数 {name} 必须大于0: {result[name]}")
+
+    for name, label in (("pos", "位置"), ("rot", "旋转")):
+        try:
+            result[name] = parse_triplet(merged[name])
+        except (TypeError, ValueError):
+            if strict:
+                raise ValueError(f"{label}参数格式无效: {merged[name]!r}")
+            print(f"警告: {label}参数格式无效 '{merged[name]}'，使用默认{label} (0,0,0)")
+            result[name] = (0.0, 0.0, 0.0)
+
+    result["holeAxis"] = str(merged["holeAxis"]).upper()
+    if strict and result["holeAxis"] not in ("X", "Y", "Z"):
+        raise ValueError(f"参数 holeAxis 必须是 X/Y/Z: {merged['holeAxis']!r}")
+    result["mesher"] = str(merged["mesher"]).lower()
+    if result["mesher"] not in MESHERS:
+        if strict:
+            raise ValueError(f"参数 mesher 必须是 {'/'.join(MESHERS)}: {merged['mesher']!r}")
+        print(f"警告: 参数mesher值无效 '{merged['mesher']}'，使用默认值 auto")
+        result["mesher"] = "auto"
+    result["stlFormat"] = str(merged["stlFormat"]).lower()
+    if result["stlFormat"] not in STL_FORMATS:
+        if strict:
+            raise ValueError(f"参数 stlFormat 必须是 {'/'.join(STL_FORMATS)}: {merged['stlFormat']!r}")
+        print(f"警告: 参数stlFormat值无效 '{merged['stlFormat']}'，使用默认值 binary")
+        result["stlFormat"] = "binary"
+    result["meshQuality"] = str(merged["meshQuality"]).lower()
+    if result["meshQuality"] not in MESH_QUALITIES:
+        if strict:
+            raise ValueError(f"参数 meshQuality 必须是 {'/'.join(MESH_QUALITIES)}: {merged['meshQuality']!r}")
+        print(f"警告: 参数meshQuality值无效 '{merged['meshQuality']}'，使用默认值 {mesh_quality.DEFAULT_QUALITY}")
+        result["meshQuality"] = mesh_quality.DEFAULT_QUALITY
+    if not strict:
+        for name in OPTIONAL_PARAMS:
+            if result[name] is not None and result[name] <= 0:
+                print(f"警告: 参数{name}必须大于0，已忽略 '{result[name]}'")
+                result[name] = None
+    if result["maxTriangles"] is not None and result["maxErrorUm"] is not None:
+        if strict:
+            raise ValueError("参数 maxTriangles 和 maxErrorUm 只能指定一个")
+        print("警告: 参数maxTriangles和maxErrorUm只能指定一个，忽略maxErrorUm")
+        result["maxErrorUm"] = None
+    result["name"] = str(merged["name"])
+    result["fcstd"] = merged["fcstd"]
+    result["stl"] = merged["stl"]
+    return result
+
+# 生成默认文件名，默认保存到FCStds文件夹
+# 时间戳精确到秒，同一进程中连续生成多个零件时（fc_worker）用 tag 区分
+def default_fcstd_path(tag=None):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # 默认保存到FCStds文件夹
-    fcstd_path = os.path.join("FCStds", f"cube_{timestamp}.FCStd")
     # 确保文件夹存在
     os.makedirs("FCStds", exist_ok=True)
+    name = f"cube_{timestamp}_{tag}" if tag else f"cube_{timestamp}"
+    return os.path.join("FCStds", f"{name}.FCStd")
 
-# 获取STL导出路径
-stl_path = get_param("stl", None, str)
-# 确保stls文件夹存在
-os.makedirs("stls", exist_ok=True)
+# 在文档中创建立方体（需要时打贯通孔），返回最终的形状对象
+def build_cube(doc, params):
+    # assembly.py 等脚本直接调用 build_cube，这里确保 Part 已导入
+    load_part()
+    length, width, height = params["length"], params["width"], params["height"]
+    pos, rot = params["pos"], params["rot"]
+    hole_radius, hole_axis = params["holeRadius"], params["holeAxis"]
 
-# 创建文档
-doc_name = "CubeDocument"
-doc = FreeCAD.newDocument(doc_name)
+    # 创建立方体
+    print(f"创建 {length}x{width}x{height} mm 的立方体...")
+    with stage_trace.span("makeBox"):
+        cube = Part.makeBox(length, width, height)
 
-# 创建立方体
-print(f"创建 {length}x{width}x{height} mm 的立方体...")
-cube = Part.makeBox(length, width, height)
+    # 应用位置偏移
+    if pos != (0, 0, 0):
+        print(f"移动立方体到位置 {pos}...")
+        cube.Placement.Base = Base.Vector(pos[0], pos[1], pos[2])
 
-# 应用位置偏移
-if pos != (0, 0, 0):
-    print(f"移动立方体到位置 {pos}...")
-    cube.Placement.Base = Base.Vector(pos[0], pos[1], pos[2])
+    # 应用旋转
+    if rot != (0, 0, 0):
+        print(f"旋转立方体 {rot} 度...")
+        # 依次绕X、Y、Z轴旋转
+        cube.Placement.Rotation = Base.Rotation(rot[0], rot[1], rot[2])
 
-# 应用旋转
-if rot != (0, 0, 0):
-    print(f"旋转立方体 {rot} 度...")
-    # 依次绕X、Y、Z轴旋转
-    cube.Placement.Rotation = Base.Rotation(rot[0], rot[1], rot[2])
+    # 创建Part.Shape对象并添加到文档
+    obj = doc.addObject("Part::Feature", params["name"])
+    obj.Shape = cube
 
-# 创建Part.Shape对象并添加到文档
-obj = doc.addObject("Part::Feature", cube_name)
-obj.Shape = cube
+    if hole_radius <= 0:
+        return obj
 
-# 如果需要打洞
-if hole_radius > 0:
+    # 需要打洞
     print(f"在立方体中心沿{hole_axis}轴打半径为{hole_radius}mm的贯通孔...")
-    
+
     # 计算圆柱体的长度和位置，确保它贯穿整个立方体
-    if hole_axis == "X":
-        cyl_length = length + 2  # 稍微长一点，确保贯通
-        cyl_center = Base.Vector(pos[0], pos[1], pos[2])
-        cylinder = Part.makeCylinder(hole_radius, cyl_length, 
-                                   Base.Vector(cyl_center.x - cyl_length/2, cyl_center.y, cyl_center.z),
-                                   Base.Vector(1, 0, 0))
-    elif hole_axis == "Y":
-        cyl_length = width + 2
-        cyl_center = Base.Vector(pos[0], pos[1], pos[2])
-        cylinder = Part.makeCylinder(hole_radius, cyl_length, 
-                                   Base.Vector(cyl_center.x, cyl_center.y - cyl_length/2, cyl_center.z),
-                                   Base.Vector(0, 1, 0))
-    else:  # Z轴
-        cyl_length = height + 2
-        cyl_center = Base.Vector(pos[0], pos[1], pos[2])
-        cylinder = Part.makeCylinder(hole_radius, cyl_length, 
-                                   Base.Vector(cyl_center.x, cyl_center.y, cyl_center.z - cyl_length/2),
-                                   Base.Vector(0, 0, 1))
-    
+    # 圆柱在立方体的局部坐标系中穿过中心，再使用与立方体相同的 Placement，随立方体一起移动和旋转
+    cyl_center = Base.Vector(length / 2, width / 2, height / 2)
+    with stage_trace.span("makeCylinder", axis=hole_axis):
+        if hole_axis == "X":
+            cyl_length = length + 2  # 稍微长一点，确保贯通
+            cylinder = Part.makeCylinder(hole_radius, cyl_length,
+                                       Base.Vector(cyl_center.x - cyl_length/2, cyl_center.y, cyl_center.z),
+                                       Base.Vector(1, 0, 0))
+        elif hole_axis == "Y":
+            cyl_length = width + 2
+            cylinder = Part.makeCylinder(hole_radius, cyl_length,
+                                       Base.Vector(cyl_center.x, cyl_center.y - cyl_length/2, cyl_center.z),
+                                       Base.Vector(0, 1, 0))
+        else:  # Z轴
+            cyl_length = height + 2
+            cylinder = Part.makeCylinder(hole_radius, cyl_length,
+                                       Base.Vector(cyl_center.x, cyl_center.y, cyl_center.z - cyl_length/2),
+                                       Base.Vector(0, 0, 1))
+
+    cylinder.Placement = cube.Placement
+
     # 创建圆柱体对象
     hole_obj = doc.addObject("Part::Feature", "Hole")
     hole_obj.Shape = cylinder
-    
+
     # 执行布尔运算（差集）
     result = doc.addObject("Part::Cut", "Body")
     result.Base = obj
     result.Tool = hole_obj
-    
+
     # 隐藏原始对象
     obj.Visibility = False
     hole_obj.Visibility = False
+    return result
 
-# 更新文档
-doc.recompute()
-
-# 保存文件
-print(f"保存文件到 {fcstd_path}...")
-doc.saveAs(fcstd_path)
-
-# 导出STL
-if stl_path:
+# 网格化形状并导出STL（binary 为 False 时写 ASCII，name 为 ASCII STL 的 solid 名称）
+# quality 为 mesh_quality.resolve 的结果（默认 normal 预设），有目标时搜索网格参数；
+# params 为零件参数时报告中包含实测弦高误差。返回网格报告（三角形数量、弦高误差等）
+def export_stl(shape, stl_path, binary=True, name=None, quality=None, params=None):
     # 确保STL文件的目录存在
     stl_dir = os.path.dirname(stl_path)
     if stl_dir and not os.path.exists(stl_dir):
         os.makedirs(stl_dir, exist_ok=True)
         print(f"创建STL输出目录: {stl_dir}")
-    try:
-        # 导出为STL文件
-        # 使用FreeCAD的Mesh和MeshPart模块
-        import Mesh
-        import MeshPart
-        
-        # 创建网格
-        if hole_radius > 0:
-            mesh = MeshPart.meshFromShape(
-                Shape=result.Shape,
-                LinearDeflection=0.1,
-                AngularDeflection=0.05,
-                Relative=True
-            )
+    # 创建网格（mesh_quality 导入 MeshPart，不可用时抛出 ImportError）
+    mesh, vertices, faces, report = mesh_quality.mesh_shape(shape, quality or mesh_quality.resolve({}), params)
+    # 导出STL文件：能用 stl_io 时由它写出，格式和法向可控；否则交给 FreeCAD
+    load_analytic_mesher()
+    with stage_trace.span("write_stl"):
+        if stl_io is not None:
+            stl_io.write_stl(stl_path, vertices, faces, binary=binary, name=name)
         else:
-            mesh = MeshPart.meshFromShape(
-                Shape=obj.Shape,
-                LinearDeflection=0.1,
-                AngularDeflection=0.05,
-                Relative=True
-            )
-        
-        # 导出STL文件
-        mesh.write(stl_path)
-        print(f"✓ STL文件已导出到: {stl_path}")
-    except ImportError:
-        print("错误: 无法导入Mesh或MeshPart模块，无法导出STL文件")
-    except Exception as e:
-        print(f"✗ STL导出失败: {str(e)}")
-
-# 完成
-print(f"\n立方体创建完成！")
-print(f"- FCStd文件: {fcstd_path}")
-if stl_path:
-    print(f"- STL文件: {stl_path}")
-print("\n您可以使用FreeCAD打开.FCStd文件查看模型")
-
-# 如果在非交互模式下，关闭文档
-if not hasattr(FreeCADGui, 'ActiveDocument') or not FreeCADGui.ActiveDocument:
-    FreeCAD.closeDocument(doc.Name)
-
-print("脚本执行完毕")
\ No newline at end of file
+            mesh.write(stl_path) if binary else mesh.write(stl_path, "AST")
+    return report
+
+# 是否使用解析网格导出STL
+def use_analytic_mesher(params):
+    if params["mesher"] == "freecad":
+        return False
+    if load_analytic_mesher() is not None and analytic_mesh.supports(params):
+        return True
+    if params["mesher"] == "analytic":
+        reason = "NumPy 不可用" if analytic_mesh is None else "孔半径超出截面，不是简单贯通孔"
+        raise ValueError(f"无法使用解析网格: {reason}")
+    return False
+
+# 决定零件几何形状的参数（没有孔时孔的轴向无关，不计入）
+def geometry_fields(params):
+    hole = params["holeRadius"] > 0
+    axis = str(params["holeAxis"]).upper()
+    return {
+        "length": params["length"],
+        "width": params["width"],
+        "height": params["height"],
+        "pos": list(params["pos"]),
+        "rot": list(params["rot"]),
+        "holeRadius": params["holeRadius"] if hole else 0.0,
+        "holeAxis": (axis if axis in ("X", "Y") else "Z") if hole else None,
+    }
+
+# 零件缓存的键：{".FCStd": 键, ".stl": 键}，suffixes 指定只计算其中一部分
+# 键包含决定输出内容的全部参数：几何参数、网格化方式和精度（含目标）、STL格式、FreeCAD版本；
+# 文档中的对象名和 ASCII STL 的 solid 名称也会写进文件，所以 name 也计入。
+# 只有解析网格 STL 时不需要 FreeCAD 版本，也就不导入 FreeCAD
+def cache_keys(params, analytic, quality=None, suffixes=(".FCStd", ".stl")):
+    geometry = geometry_fields(params)
+    quality = quality or mesh_quality.resolve(params)
+    freecad_version = None
+    if ".FCStd" in suffixes or not analytic:
+        freecad_version = ".".join(FreeCAD.Version()[:4]) if load_freecad() is not None else None
+    if analytic:
+        mesh = {"mesher": "analytic", "tolerance": quality["tolerance"]}
+    else:
+        mesh = {"mesher": "freecad", "deflection": quality["deflection"], "freecad": freecad_version}
+    # 没有目标时不写入，与之前生成的缓存条目保持相同的键
+    for name in ("maxTriangles", "maxError"):
+        if quality[name] is not None:
+            mesh[name] = quality[name]
+    ascii_name = params["name"] if params["stlFormat"] == "ascii" else None
+    keys = {}
+    if ".FCStd" in suffixes:
+        keys[".FCStd"] = load_part_cache().canonical_key({"kind": "fcstd", **geometry, "name": params["name"],
+                                                          "freecad": freecad_version})
+    if ".stl" in suffixes:
+        keys[".stl"] = load_part_cache().canonical_key({"kind": "stl", **geometry, **mesh,
+                                                        "stlFormat": params["stlFormat"], "name": ascii_name})
+    return keys
+
+# 输出路径模板中的 key 字段：几何参数和名称的哈希（前 12 位），同一个零件在清单中的位置变了也不变
+def part_key(params):
+    return load_part_cache().canonical_key({**geometry_fields(params), "name": params["name"]})[:12]
+
+# 任务的输出文件及其参数哈希 {路径: 键}（增量构建用），不保存 .FCStd 时只有 STL
+# repacker 会重写 .FCStd 时，压缩模式和形状存储也计入 .FCStd 的键
+def output_keys(params, repacker=None):
+    fcstd_path = params["fcstd"]
+    if not fcstd_path or str(fcstd_path).lower() in NO_OUTPUT:
+        fcstd_path = None
+    stl_path = params["stl"]
+    paths = {suffix: path for suffix, path in ((".FCStd", fcstd_path), (".stl", stl_path)) if path}
+    keys = cache_keys(params, bool(stl_path) and use_analytic_mesher(params), suffixes=tuple(paths))
+    if repacker is not None and repacker.mode and fcstd_path:
+        keys[".FCStd"] = load_part_cache().canonical_key({"fcstd": keys[".FCStd"], **repacker.key()})
+    return {path: keys[suffix] for suffix, path in paths.items()}
+
+# 按参数创建一个立方体零件：新建文档、建模、重算、保存FCStd、导出STL
+# STL 优先使用解析网格（不经过 FreeCAD 的布尔运算和网格化）；fcstd 为 none 且使用解析网格时完全不需要 FreeCAD
+# close_document 为 None 时与脚本行为一致（非交互模式下关闭文档），为 True 时总是关闭
+# cache 为 part_cache.PartCache 时，所有输出都在缓存中则直接链接缓存文件，否则生成后写入缓存
+# repacker 为 fcstd_repack.Repacker 时，保存（或从缓存链接）.FCStd 之后重写压缩、共享形状、清理备份；
+# 缓存中保存的是重写前的文件，不同压缩模式共用缓存条目
+# 返回 {"name", "fcstd", "stl", "stl_error", "mesher", "mesh", "cached", "repack", "timings"}，
+# mesh 为网格报告（三角形数量、弦高误差，缓存命中时为 None），repack 为重写报告，timings 为各阶段耗时（秒）
+def create_cube(params, close_document=None, cache=None, repacker=None):
+    with stage_trace.span("part", part=params["name"]):
+        result = _create_cube(params, close_document, cache)
+        if repacker is not None and repacker.enabled and result["fcstd"] and os.path.exists(result["fcstd"]):
+            started = time.perf_counter()
+            result["repack"] = repacker.process(result["fcstd"])
+            result["timings"]["repack"] = time.perf_counter() - started
+        fc_log.info("part", name=result["name"], fcstd=result["fcstd"], stl=result["stl"], cached=result["cached"],
+                    mesher=result["mesher"], stl_error=result["stl_error"], timings=result["timings"])
+        return result
+
+def _create_cube(params, close_document, cache):
+    stl_path = params["stl"]
+    analytic = bool(stl_path) and use_analytic_mesher(params)
+    quality = mesh_quality.resolve(params)
+    if params["fcstd"] and str(params["fcstd"]).lower() in NO_OUTPUT:
+        fcstd_path = None
+    else:
+        fcstd_path = params["fcstd"] or default_fcstd_path()
+    timings = {}
+    result = {"name": params["name"], "fcstd": fcstd_path, "stl": None, "stl_error": None,
+              "mesher": ("analytic" if analytic else "freecad") if stl_path else None,
+              "mesh": None, "cached": False, "repack": None, "timings": timings}
+
+    outputs = {suffix: path for suffix, path in ((".FCStd", fcstd_path), (".stl", stl_path)) if path}
+    if cache is not None and outputs:
+        with stage_trace.span("cache_lookup") as span:
+            keys = cache_keys(params, analytic, quality, suffixes=tuple(outputs))
+            hit = (all(cache.contains(keys[suffix], suffix) for suffix in outputs)
+                   and all(cache.fetch(keys[suffix], suffix, path) for suffix, path in outputs.items()))
+            span.set(hit=hit)
+        timings["cache"] = span.seconds
+        if hit:
+            result.update(stl=stl_path, cached=True)
+            print(f"✓ 缓存命中，已链接: {', '.join(outputs.values())}")
+            fc_log.debug("cache_hit", name=params["name"], outputs=list(outputs.values()))
+            return result
+    # 已有的输出文件可能是之前链接的缓存文件（即使这次不用缓存），覆盖写入前断开
+    for path in outputs.values():
+        if os.path.exists(path):
+            load_part_cache().detach(path)
+
+    if fcstd_path or (stl_path and not analytic):
+        if load_part() is None:
+            raise RuntimeError("无法导入FreeCAD模块：保存.FCStd或用FreeCAD网格化需要在FreeCAD环境中运行")
+        _build_with_freecad(params, fcstd_path, None if analytic else stl_path, result, close_document,
+                            quality)
+
+    if analytic:
+        with stage_trace.span("stl", mesher="analytic") as span:
+            try:
+                tolerance, result["mesh"] = mesh_quality.analytic_tolerance(params, quality)
+                analytic_mesh.export_stl(params, stl_path, tolerance,
+                                         binary=params["stlFormat"] == "binary")
+                result["stl"] = stl_path
+                print(f"✓ STL文件已导出到: {stl_path}（解析网格，{mesh_quality.format_report(result['mesh'])}）")
+            except Exception as e:
+                result["stl_error"] = str(e)
+                print(f"✗ STL导出失败: {str(e)}")
+        timings["stl"] = span.seconds
+
+    if cache is not None and outputs and not result["stl_error"]:
+        with stage_trace.span("cache_store") as span:
+            for suffix, path in outputs.items():
+                cache.store(keys[suffix], suffix, path)
+        timings["cache"] += span.seconds
+    return result
+
+# 用 FreeCAD 建模，保存 FCStd（fcstd_path 不为 None 时）并用 FreeCAD 网格化导出 STL（stl_path 不为 None 时）
+def _build_with_freecad(params, fcstd_path, stl_path, result, close_document, quality=None):
+    timings = result["timings"]
+    # 创建文档
+    doc_name = "CubeDocument"
+    doc = FreeCAD.newDocument(doc_name)
+    try:
+        with stage_trace.span("build") as span:
+            body = build_cube(doc, params)
+        timings["build"] = span.seconds
+
+        # 更新文档；带孔时先单独重算差集对象，把布尔运算的耗时分出来
+        with stage_trace.span("recompute") as span:
+            if body.TypeId == "Part::Cut":
+                with stage_trace.span("cut"):
+                    body.recompute()
+            doc.recompute()
+        timings["recompute"] = span.seconds
+
+        # 保存文件
+        if fcstd_path:
+            print(f"保存文件到 {fcstd_path}...")
+            fcstd_dir = os.path.dirname(fcstd_path)
+            if fcstd_dir:
+                os.makedirs(fcstd_dir, exist_ok=True)
+            with stage_trace.span("save") as span:
+                doc.saveAs(fcstd_path)
+            timings["save"] = span.seconds
+
+        # 导出STL
+        if stl_path:
+            with stage_trace.span("stl", mesher="freecad") as span:
+                try:
+                    result["mesh"] = export_stl(body.Shape, stl_path, binary=params["stlFormat"] == "binary",
+                                                name=params["name"], quality=quality, params=params)
+                    result["stl"] = stl_path
+                    print(f"✓ STL文件已导出到: {stl_path}（{mesh_quality.format_report(result['mesh'])}）")
+                except ImportError:
+                    result["stl_error"] = "无法导入Mesh或MeshPart模块"
+                    print("错误: 无法导入Mesh或MeshPart模块，无法导出STL文件")
+                except Exception as e:
+                    result["stl_error"] = str(e)
+                    print(f"✗ STL导出失败: {str(e)}")
+            timings["stl"] = span.seconds
+    finally:
+        # 如果在非交互模式下，关闭文档
+        if close_document is None:
+            close_document = not hasattr(FreeCADGui, 'ActiveDocument') or not FreeCADGui.ActiveDocument
+        if close_document:
+            FreeCAD.closeDocument(doc.Name)
+
+# 逐行读取任务清单（.csv 按表头解析，其他按 JSON-lines 解析），产出 (行号, 参数字典或异常)
+# 空行和 # 开头的注释行会被跳过；CSV 中的空单元格视为未设置
+def iter_manifest(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, ValueError(f"列数多于表头: {row[None]}")
+                    continue
+                yield reader.line_num, {key.strip(): value.strip() for key, value in row.items()
+                                        if key and value is not None and value.strip() != ""}
+            return
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("每行必须是一个 JSON 对象")
+            except ValueError as e:
+                yield number, e
+                continue
+            yield number, row
+
+# 按模板生成输出路径
+def format_output_path(template, params, **fields):
+    values = dict(params)
+    values.update(fields)
+    return template.format(**values)
+
+# 输出中的 .FCStd 已有的 .FCBak 备份（重新生成前后比较，找出本次覆盖时留下的备份）
+def _existing_backups(outputs):
+    backups = []
+    for path in outputs or ():
+        if path.lower().endswith(".fcstd") and os.path.exists(path):
+            backups.extend(load_fcstd_repack().find_backups(path))
+    return backups
+
+# 批量模式：逐个生成清单中的零件，每个任务的结果（含各阶段耗时）写入 JSON-lines 结果文件
+# 格式错误或参数无效的行会被记录并跳过，不影响其他任务
+# state 为 build_state.BuildState 时增量构建：输出与上次记录一致的任务跳过（status 为 up_to_date），
+# 只是输出路径变了的任务把上次的文件链接到新路径（status 为 relocated），默认模板按参数命名（INCREMENTAL_FCSTD_TEMPLATE）；
+# gc 为 True 时删除状态中记录过但本次清单不再产生的输出和重新生成时留下的 .FCBak（有任务失败时不清理）
+# repacker 为 fcstd_repack.Repacker 时，每个 .FCStd 保存后重写，结束时按压缩模式输出统计
+def run_batch(manifest, results_path=None, fcstd_template=None, stl_template=None, defaults=None,
+              cache=None, state=None, gc=False, repacker=None):
+    manifest_stem = os.path.splitext(os.path.basename(manifest))[0]
+    results_path = results_path or os.path.splitext(manifest)[0] + ".results.jsonl"
+    fcstd_template = fcstd_template or (INCREMENTAL_FCSTD_TEMPLATE if state is not None
+                                        else DEFAULT_FCSTD_TEMPLATE)
+    # 清单中没有给出的参数使用 defaults（环境变量/命令行参数），输出路径除外
+    defaults = {name: value for name, value in (defaults or {}).items()
+                if name not in ("fcstd", "stl")}
+
+    succeeded = failed = up_to_date = relocated = 0
+    # 各阶段耗时，批量结束后汇总百分位
+    durations = {}
+    started_batch = time.perf_counter()
+    with open(results_path, "w", encoding="utf-8") as results:
+        for index, (row_number, row) in enumerate(iter_manifest(manifest), 1):
+            record = {"index": index, "row": row_number, "id": None, "status": "success"}
+            started = time.perf_counter()
+            with stage_trace.span("task", index=index, row=row_number):
+                try:
+                    if isinstance(row, Exception):
+                        raise ValueError(f"无法解析: {row}")
+                    row = dict(row)
+                    record["id"] = row.pop("id", None)
+                    params = normalize_params({**defaults, **row}, strict=True)
+                    fields = {"index": index, "row": row_number, "id": record["id"], "manifest": manifest_stem,
+                              "key": part_key(params)}
+                    if not params["fcstd"]:
+                        params["fcstd"] = format_output_path(fcstd_template, params, **fields)
+                    if not params["stl"] and stl_template:
+                        params["stl"] = format_output_path(stl_template, params, **fields)
+                    record["name"] = params["name"]
+
+                    outputs = output_keys(params, repacker) if state is not None else None
+                    source = {"manifest": manifest_stem, "row": row_number, "id": record["id"]}
+                    current = outputs is not None and state.is_current(outputs)
+                    moves = None
+                    if outputs is not None and not current:
+                        moves = state.relocate(outputs, **source)
+                    if current:
+                        record.update(status="up_to_date", fcstd=params["fcstd"], stl=params["stl"])
+                        up_to_date += 1
+                    elif moves:
+                        record.update(status="relocated", fcstd=params["fcstd"], stl=params["stl"],
+                                      relocated_from=[donor for donor, _ in moves])
+                        relocated += 1
+                    else:
+                        backups = _existing_backups(outputs)
+                        result = create_cube(params, close_document=True, cache=cache, repacker=repacker)
+                        record.update(fcstd=result["fcstd"], stl=result["stl"], cached=result["cached"],
+                                      mesh=result["mesh"], timings=result["timings"])
+                        if result["repack"]:
+                            record["repack"] = {name: result["repack"].get(name) for name in
+                                                ("mode", "bytes_in", "bytes_out", "payloads", "pruned")}
+                        if params["stl"] and result["stl_error"]:
+                            raise RuntimeError(f"STL导出失败: {result['stl_error']}")
+                        if outputs is not None:
+                            state.record(outputs, **source)
+                            state.add_backups(set(_existing_backups(outputs)) - set(backups))
+                        succeeded += 1
+                except Exception as e:
+                    # KeyError 来自模板中不存在的字段
+                    message = f"模板字段不存在: {e}" if isinstance(e, KeyError) else str(e)
+                    record.update(status="error", error=message)
+                    failed += 1
+                    print(f"✗ 第 {row_number} 行任务失败，已跳过: {message}")
+                    fc_log.error("task_failed", manifest=manifest, index=index, row=row_number,
+                                 id=record["id"], error=message)
+            record.setdefault("timings", {})["total"] = time.perf_counter() - started
+            for stage, seconds in record["timings"].items():
+                durations.setdefault(stage, []).append(seconds)
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results.flush()
+
+    elapsed = time.perf_counter() - started_batch
+    total = succeeded + failed + up_to_date + relocated
+    print(f"\n批量任务完成: 共 {total} 个，成功 {succeeded} 个，失败 {failed} 个，"
+          f"耗时 {elapsed:.2f} 秒（{total / elapsed if elapsed > 0 else 0:.1f} 个/秒）")
+    print(f"- 结果文件: {results_path}")
+    fc_log.info("batch_done", manifest=manifest, total=total, succeeded=succeeded, failed=failed,
+                up_to_date=up_to_date, seconds=round(elapsed, 6), results=results_path)
+    if repacker is not None and repacker.totals:
+        print("- .FCStd 重写:")
+        print(repacker.format_summary())
+    if state is not None:
+        print(f"- 增量构建: {up_to_date} 个已是最新，{relocated} 个改用新路径，重新生成 {succeeded} 个")
+        if gc and failed:
+            print("- 有任务失败，跳过孤立输出清理")
+        elif gc:
+            removed = state.collect()
+            print(f"- 已删除 {len(removed)} 个孤立输出和 .FCBak 备份")
+            for path in removed:
+                print(f"  {path}")
+        state.save()
+        print(f"- 状态文件: {state.path}")
+    # 启用追踪时输出包含子阶段和峰值内存的统计，否则按结果中的 timings 汇总
+    tracer = stage_trace.get_tracer()
+    if tracer.enabled:
+        tracer.print_summary("批量任务各阶段耗时")
+    elif durations:
+        print(stage_trace.format_summary(stage_trace.summarize(durations), "批量任务各阶段耗时"))
+    return succeeded, failed
+
+def main():
+    # 分阶段追踪：--trace=阶段记录.jsonl（FC_TRACE）、--traceChrome=trace.json（FC_TRACE_CHROME）
+    trace_path = get_param("trace", None, str)
+    chrome_path = get_param("traceChrome", os.environ.get("FC_TRACE_CHROME"), str)
+    if trace_path or chrome_path:
+        stage_trace.configure(trace_path, chrome_path)
+
+    # 结构化日志：--log=日志.jsonl（FC_LOG）、--logLevel=debug|info|warning|error（FC_LOG_LEVEL，默认 info）
+    fc_log.from_env(get_param("log", None, str), get_param("logLevel", "info", str), component="create_cube")
+
+    # 零件缓存，--no-cache 或 FC_NO_CACHE=1 时禁用（禁用时不导入 part_cache）
+    if "--no-cache" in sys.argv or os.environ.get("FC_NO_CACHE") == "1":
+        cache = None
+    else:
+        cache = load_part_cache().PartCache.from_env()
+
+    # 保存后重写 .FCStd：--repack=stored|fast|best、--brepStore=目录、--keepBackups=N、--backupMaxAgeDays=D
+    repack_options = (get_param("repack", None, str), get_param("brepStore", None, str),
+                      get_param("keepBackups", None, int), get_param("backupMaxAgeDays", None, float))
+    repacker = None
+    if any(option is not None for option in repack_options):
+        try:
+            repacker = load_fcstd_repack().Repacker(*repack_options)
+        except ValueError as e:
+            print(f"✗ {e}")
+            fc_log.error("invalid_repack", error=str(e))
+            return 1
+
+    # 批量模式：--batch manifest.jsonl（或 .csv）
+    manifest = get_param("batch", None, str)
+    if manifest:
+        # 增量构建：--incremental（状态文件默认 <清单名>.state.json，--state 指定）
+        state = None
+        if "--incremental" in sys.argv or get_param("state", None, str):
+            build_state = load_build_state()
+            state = build_state.BuildState.load(get_param("state", None, str)
+                                                or build_state.default_state_path(manifest))
+        _, failed = run_batch(
+            manifest,
+            results_path=get_param("results", None, str),
+            fcstd_template=get_param("fcstdTemplate", None, str),
+            stl_template=get_param("stlTemplate", None, str),
+            defaults=normalize_params(read_params()),
+            cache=cache,
+            state=state,
+            gc="--gc" in sys.argv,
+            repacker=repacker,
+        )
+        return 1 if failed else 0
+    params = normalize_params(read_params())
+    if params["pos"] != (0, 0, 0):
+        print(f"立方体位置: {params['pos']}")
+    if params["rot"] != (0, 0, 0):
+        print(f"立方体旋转: {params['rot']}")
+    # 确保stls文件夹存在
+    os.makedirs("stls", exist_ok=True)
+
+    try:
+        result = create_cube(params, cache=cache, repacker=repacker)
+    except (RuntimeError, ValueError) as e:
+        print(f"✗ {e}")
+        fc_log.error("part_failed", name=params["name"], error=str(e))
+        return 1
+
+    # 完成
+    print(f"\n立方体创建完成！")
+    if result["fcstd"]:
+        print(f"- FCStd文件: {result['fcstd']}")
+    if result["repack"]:
+        print(repacker.format_summary())
+    if result["stl"]:
+        print(f"- STL文件: {result['stl']}")
+    # FreeCAD 只在需要时导入，只用解析网格时不会加载
+    if globals().get("FreeCAD") is not None:
+        print(f"- FreeCAD版本: {'.'.join(FreeCAD.Version()[:4])}")
+    stage_trace.get_tracer().print_summary()
+    print("\n您可以使用FreeCAD打开.FCStd文件查看模型")
+    print("脚本执行完毕")
+    return 0
+
+if __name__ == "__main__":
+    # 只在失败时调用 sys.exit，避免在 FreeCAD 中以宏方式运行时退出程序
+    status = main()
+    if status:
+        sys.exit(status)
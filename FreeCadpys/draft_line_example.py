@@ -17,29 +17,65 @@
 from __future__ import annotations
 import sys
 import os
+import time
 import argparse
 
-# 早期调试：记录启动与 argv 到工作区日志，便于在 freecadcmd 环境下排查启动错误
-try:
-    dbg_path = os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt')
-    with open(dbg_path, 'w', encoding='utf-8') as _dbg:
-        _dbg.write('script started\n')
-        _dbg.write('argv: ' + ' '.join(sys.argv) + '\n')
-except Exception:
-    # 忽略任何日志写入错误，继续执行
-    pass
+# 同目录下的模块：结构化日志（fc_log）、分阶段计时（stage_trace）；保存后重写 .FCStd（fcstd_repack）、批量导入（line_import）用到时才导入
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# --profile-startup（FC_PROFILE_STARTUP=1）：退出时报告各模块的导入耗时，必须在其他导入之前启用
+import startup_profile
+startup_profile.install_from_argv()
+import fc_log
+import stage_trace
+
+# 早期调试：记录启动与 argv 到工作区日志（缓冲的 JSON-lines），便于在 freecadcmd 环境下排查启动错误；
+# FC_LOG / FC_LOG_LEVEL 可改变日志路径和级别。作为模块导入时（例如 fc_worker）沿用调用方的日志设置
+if __name__ == '__main__':
+    fc_log.from_env(default_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'draft_line_debug.jsonl'),
+                    default_level='debug', component='draft_line')
+fc_log.debug('script_started', argv=sys.argv)
 
+# 记录 FreeCAD 的导入耗时，启用追踪后补记为 import_freecad 阶段
+_freecad_import_started = time.perf_counter()
 try:
     import FreeCAD
     from FreeCAD import Vector
 except Exception as e:
+    fc_log.error('import_freecad_failed', error=str(e))
     raise SystemExit("这个脚本需要在 FreeCAD 的 Python 环境中运行（例如 freecadcmd）。错误: {}".format(e))
+_freecad_import_seconds = time.perf_counter() - _freecad_import_started
 
-try:
-    # Draft 可能在某些 FreeCAD 安装中位于 Draft 或者 FreeCADGui 环境下
-    import Draft
-except Exception:
-    Draft = None
+
+def load_draft():
+    """导入 Draft 工作台，返回 Draft 模块，不可用时返回 None
+
+    Draft 会连带导入大量模块，只在第一次创建 Draft 对象时导入；批量导入（--bulk 不加 --draft）用不到它。
+    """
+    global Draft
+    if 'Draft' not in globals():
+        with stage_trace.span('import_draft'):
+            try:
+                # Draft 可能在某些 FreeCAD 安装中位于 Draft 或者 FreeCADGui 环境下
+                import Draft
+            except Exception:
+                Draft = None
+    return Draft
+
+
+def load_fcstd_repack():
+    """导入 .FCStd 重写模块（连带 zipfile、hashlib、tempfile），只有 --repack / --brep-store / --keep-backups 时才用到"""
+    global fcstd_repack
+    if 'fcstd_repack' not in globals():
+        import fcstd_repack
+    return fcstd_repack
+
+
+def load_line_import():
+    """导入批量导入模块，只有 --bulk 时才用到"""
+    global line_import
+    if 'line_import' not in globals():
+        import line_import
+    return line_import
 
 
 def create_line(doc, p1, p2, name: str = "DraftLine"):
@@ -53,10 +89,11 @@ def create_line(doc, p1, p2, name: str = "DraftLine"):
     Returns:
         新创建的对象
     """
-    if Draft is None:
+    if load_draft() is None:
         raise RuntimeError("Draft 模块不可用 — 请确保在包含 Draft 工作台的 FreeCAD 环境中运行")
 
-    line_obj = Draft.makeLine(p1, p2)
+    with stage_trace.span("makeLine"):
+        line_obj = Draft.makeLine(p1, p2)
     # 设置更友好的标签
     try:
         line_obj.Label = name
@@ -75,13 +112,26 @@ def parse_args(argv):
     p.add_argument('--z2', type=float, default=0.0, help='终点 Z')
     p.add_argument('--name', type=str, default='DraftLine', help='对象标签名')
     p.add_argument('--fcstd', type=str, default=None, help='如果指定则保存为 .FCStd 路径')
+    p.add_argument('--trace', type=str, default=None, help='分阶段计时记录（JSON-lines）输出路径')
+    p.add_argument('--trace-chrome', type=str, default=None, help='Chrome trace_event 文件输出路径')
+    p.add_argument('--bulk', type=str, default=None,
+                   help='从 CSV / .npy 批量导入线段或折线（见 line_import.py），建成一个边复合体对象')
+    p.add_argument('--draft', action='store_true', help='批量导入时逐条创建 Draft 对象（慢，便于编辑）')
+    p.add_argument('--repack', type=str, default=None,
+                   help='保存后按压缩模式重写 .FCStd（stored/fast/best）')
+    p.add_argument('--brep-store', type=str, default=None, help='把 BRep 形状移到该共享存储目录')
+    p.add_argument('--keep-backups', type=int, default=None, help='保存后每个文档只保留最新的 N 个 .FCBak')
+    p.add_argument('--profile-startup', action='store_true',
+                   help='退出时把各模块的导入耗时写到 stderr（见 startup_profile.py）')
     # 使用 parse_known_args 避免因 freecadcmd 转发带来的未知参数导致 SystemExit
     known, unknown = p.parse_known_args(argv)
-    try:
-        with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-            _dbg.write('unknown argv: ' + str(unknown) + '\n')
-    except Exception:
-        pass
+    if unknown:
+        fc_log.debug('unknown_argv', argv=unknown)
+    # 压缩模式在 fcstd_repack 中定义，指定了 --repack 才导入它来检查
+    if known.repack is not None:
+        modes = load_fcstd_repack().MODES
+        if known.repack not in modes:
+            p.error(f"--repack 必须是 {'/'.join(modes)} 之一: {known.repack}")
     return known
 
 
@@ -123,12 +173,8 @@ def robust_override_from_raw(argv, args):
 def main(argv=None):
     args = parse_args(argv or sys.argv[1:])
 
-    # 记录解析到的参数到调试文件
-    try:
-        with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-            _dbg.write('parsed args: ' + str(args) + '\n')
-    except Exception:
-        pass
+    # 记录解析到的参数
+    fc_log.debug('parsed_args', args=vars(args))
 
     # 如果解析后的参数仍然是默认值（可能因为 freecadcmd 转发问题），尝试从原始 sys.argv 字符串用正则提取
     try:
@@ -136,11 +182,7 @@ def main(argv=None):
         no_user_params = (('--x1' not in ' '.join(sys.argv)) and ('--x2' not in ' '.join(sys.argv)))
         if no_user_params:
             args = robust_override_from_raw(sys.argv, args)
-            try:
-                with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-                    _dbg.write('after raw-override args: ' + str(args) + '\n')
-            except Exception:
-                pass
+            fc_log.debug('raw_override', args=vars(args))
     except Exception:
         pass
 
@@ -173,14 +215,18 @@ def main(argv=None):
         if fcstd_env and args.fcstd is None:
             args.fcstd = fcstd_env
         # 记录可能的环境覆盖
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-                _dbg.write('after env override args: ' + str(args) + '\n')
-        except Exception:
-            pass
+        fc_log.debug('env_override', args=vars(args))
     except Exception:
         pass
 
+    # 分阶段追踪：--trace / --trace-chrome，或环境变量 FC_TRACE / FC_TRACE_CHROME
+    if args.trace or args.trace_chrome:
+        tracer = stage_trace.configure(args.trace, args.trace_chrome)
+    else:
+        tracer = stage_trace.from_env()
+    if tracer:
+        stage_trace.record('import_freecad', _freecad_import_started, _freecad_import_seconds)
+
     # 新建或使用已有文档
     doc = None
     if FreeCAD.ActiveDocument is None:
@@ -188,24 +234,29 @@ def main(argv=None):
     else:
         doc = FreeCAD.ActiveDocument
 
-    p1 = Vector(args.x1, args.y1, args.z1)
-    p2 = Vector(args.x2, args.y2, args.z2)
+    if args.bulk:
+        # 批量模式：所有线段放进一个对象，import_lines 内部只重算一次
+        line_import = load_line_import()
+        objects, report = line_import.import_lines(doc, args.bulk, name=args.name, use_draft=args.draft)
+        fc_log.info('bulk_import', path=args.bulk, segments=report['segments'], polylines=report['polylines'],
+                    skipped=report['skipped'], objects=len(objects), seconds=round(report['seconds'], 6))
+        print(line_import.format_report(report))
+    else:
+        p1 = Vector(args.x1, args.y1, args.z1)
+        p2 = Vector(args.x2, args.y2, args.z2)
 
-    line = create_line(doc, p1, p2, name=args.name)
+        line = create_line(doc, p1, p2, name=args.name)
 
-    try:
-        with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-            _dbg.write(f'created: {getattr(line, "Label", None)}\n')
-    except Exception:
-        pass
+        fc_log.info('created', label=getattr(line, 'Label', None), start=[p1.x, p1.y, p1.z], end=[p2.x, p2.y, p2.z])
 
-    # 有些 FreeCAD 环境需要显式 recompute
-    try:
-        doc.recompute()
-    except Exception:
-        pass
+        # 有些 FreeCAD 环境需要显式 recompute
+        try:
+            with stage_trace.span('recompute'):
+                doc.recompute()
+        except Exception:
+            pass
 
-    print(f"Created line '{line.Label}' from {p1} to {p2}")
+        print(f"Created line '{line.Label}' from {p1} to {p2}")
 
     if args.fcstd:
         outdir = os.path.dirname(args.fcstd)
@@ -216,21 +267,24 @@ def main(argv=None):
                 print(f"无法创建目录 {outdir}: {e}")
         try:
             # 保存文档
-            doc.saveAs(args.fcstd)
-            try:
-                with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-                    _dbg.write(f'saved to: {args.fcstd}\n')
-            except Exception:
-                pass
+            with stage_trace.span('save'):
+                doc.saveAs(args.fcstd)
+            repacker = None
+            if args.repack or args.brep_store or args.keep_backups is not None:
+                repacker = load_fcstd_repack().Repacker(args.repack, args.brep_store, args.keep_backups)
+            if repacker is not None and repacker.enabled:
+                repacker.process(args.fcstd)
+                summary = repacker.format_summary()
+                if summary:
+                    print(summary)
+            fc_log.info('saved', fcstd=args.fcstd, repack=args.repack)
             print(f"Saved document to {args.fcstd}")
         except Exception as e:
-            try:
-                with open(os.path.join(os.path.dirname(__file__), 'draft_line_debug.txt'), 'a', encoding='utf-8') as _dbg:
-                    _dbg.write('save error: ' + str(e) + '\n')
-            except Exception:
-                pass
+            fc_log.error('save_failed', fcstd=args.fcstd, error=str(e))
             print(f"保存 FCStd 失败: {e}")
 
+    stage_trace.get_tracer().print_summary()
+
 
 if __name__ == '__main__':
     try:
@@ -238,5 +292,6 @@ if __name__ == '__main__':
     except Exception:
         # 在 freecadcmd 下有时堆栈不会完整显示，显式打印 traceback 以便调试
         import traceback
+        fc_log.error('unhandled_exception', traceback=traceback.format_exc())
         traceback.print_exc()
         sys.exit(1)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FreeCAD 脚本共用的结构化日志：缓冲的 JSON-lines 输出、级别过滤、按大小轮转、可选的后台写入线程
+
+以前 draft_line_example.py 每记录一条调试信息就打开、追加、关闭一次 draft_line_debug.txt，
+放进工作进程或批量循环里就是成千上万次同步的文件打开。本模块：
+
+- 每条日志是一行 JSON：{"ts", "level", "event", "pid", "component", ...字段}
+- 低于级别的日志在格式化之前就丢弃，debug 调用在 info 级别下几乎没有开销
+- 日志文件只打开一次，记录先放在内存缓冲中，满 buffer_records 条、距上次写入超过 flush_seconds 秒、
+  出现 error 级别日志或进程退出时一次写出
+- 文件超过 max_bytes 时轮转为 <文件>.1 … <文件>.<backups>
+- background=True 时由后台线程定时写出，记录日志的线程不做任何文件 I/O（error 仍然同步写出）
+- 日志文件无法打开或写入时只在 stderr 警告一次，之后不再写文件，记录计入 dropped；
+  记录日志的代码永远不会因为日志 I/O 出错而中断
+
+启用方式：configure(...)，或环境变量
+    FC_LOG=日志.jsonl       路径中的 {pid} 会替换为进程号
+    FC_LOG_LEVEL=debug      debug / info / warning / error（默认 info）
+    FC_LOG_MAX_MB=10        轮转大小
+    FC_LOG_BACKUPS=3        保留的轮转文件数
+    FC_LOG_ASYNC=1          使用后台写入线程
+
+用法:
+    python FreeCadpys/fc_log.py draft_line_debug.jsonl --level=warning    # 查看日志（按级别过滤）
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+DEFAULT_LEVEL = "info"
+DEFAULT_MAX_BYTES = 10 << 20
+DEFAULT_BACKUPS = 3
+DEFAULT_BUFFER_RECORDS = 256
+DEFAULT_FLUSH_SECONDS = 1.0
+
+
+def level_number(level):
+    if isinstance(level, int):
+        return level
+    try:
+        return LEVELS[str(level).lower()]
+    except KeyError:
+        raise ValueError(f"未知的日志级别: {level}（可选 {', '.join(LEVELS)}）")
+
+
+class Logger:
+    def __init__(self, path=None, level=DEFAULT_LEVEL, component=None, max_bytes=DEFAULT_MAX_BYTES,
+                 backups=DEFAULT_BACKUPS, buffer_records=DEFAULT_BUFFER_RECORDS,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS, background=False):
+        self.pid = os.getpid()
+        self.path = path.replace("{pid}", str(self.pid)) if path else None
+        # 没有输出文件时丢弃所有日志
+        self.level = level_number(level) if self.path else LEVELS["error"] + 1
+        self.component = component
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_records = buffer_records
+        self.flush_seconds = flush_seconds
+        # lock 保护缓冲，write_lock 保护文件；写文件时不持有 lock，记录日志的线程不会等待 I/O
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.buffer = []
+        self.file = None
+        self.size = 0
+        self.last_flush = time.monotonic()
+        self.written = 0
+        self.dropped = 0
+        self.failed = False
+        self.closed = False
+        self.thread = None
+        self.wakeup = threading.Condition(self.lock)
+        if self.path and background:
+            self.thread = threading.Thread(target=self._writer, name="fc_log", daemon=True)
+            self.thread.start()
+
+    def enabled_for(self, level):
+        return level_number(level) >= self.level
+
+    def log(self, level, event, **fields):
+        number = LEVELS.get(level, 0)
+        if number < self.level:
+            return
+        record = {"ts": round(time.time(), 6), "level": level, "event": event, "pid": self.pid}
+        if self.component:
+            record["component"] = self.component
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.closed:
+                self.dropped += 1
+                return
+            self.buffer.append(line)
+            if number >= LEVELS["error"]:
+                # 出错时立即写出，进程随后崩溃也不会丢失之前的记录
+                lines = self._take_locked()
+            elif self.thread is not None:
+                if len(self.buffer) >= self.buffer_records:
+                    self.wakeup.notify()
+                return
+            elif (len(self.buffer) >= self.buffer_records
+                  or time.monotonic() - self.last_flush >= self.flush_seconds):
+                lines = self._take_locked()
+            else:
+                return
+        self._write(lines)
+
+    def debug(self, event, **fields):
+        self.log("debug", event, **fields)
+
+    def info(self, event, **fields):
+        self.log("info", event, **fields)
+
+    def warning(self, event, **fields):
+        self.log("warning", event, **fields)
+
+    def error(self, event, **fields):
+        self.log("error", event, **fields)
+
+    def flush(self):
+        with self.lock:
+            lines = self._take_locked()
+        self._write(lines)
+
+    def _take_locked(self):
+        """取出缓冲中的记录；在释放 lock 之前取得 write_lock，保证各批记录按顺序写出"""
+        lines, self.buffer = self.buffer, []
+        self.last_flush = time.monotonic()
+        self.write_lock.acquire()
+        return lines
+
+    def _write(self, lines):
+        """写出 _take_locked 取出的记录并释放 write_lock；写入失败时停止写文件，不抛出异常"""
+        try:
+            if not lines:
+                return
+            if self.failed:
+                self.dropped += len(lines)
+                return
+            data = "".join(lines).encode("utf-8")
+            try:
+                if self.file is None:
+                    self._open()
+                elif self.size + len(data) > self.max_bytes and self.size > 0:
+                    self._rotate()
+                self.file.write(data)
+                self.file.flush()
+            except OSError as e:
+                self._fail(e, len(lines))
+                return
+            self.size += len(data)
+            self.written += len(lines)
+        finally:
+            self.write_lock.release()
+
+    def _fail(self, error, count):
+        """日志 I/O 出错：警告一次，关闭文件并丢弃之后的所有日志"""
+        self.failed = True
+        self.dropped += count
+        # 之后的日志在格式化之前就丢弃
+        self.level = LEVELS["error"] + 1
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+        print(f"警告: 写入日志 {self.path} 失败，不再记录日志: {error}", file=sys.stderr)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+
+    def _rotate(self):
+        self.file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _writer(self):
+        while True:
+            with self.lock:
+                if not self.closed:
+                    self.wakeup.wait(self.flush_seconds)
+                if self.closed:
+                    return
+                lines = self._take_locked()
+            self._write(lines)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.wakeup.notify()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            lines = self._take_locked()
+        try:
+            self._write(lines)
+        finally:
+            with self.write_lock:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+
+
+# 当前进程使用的日志，默认不输出
+_logger = Logger()
+
+
+def get_logger():
+    return _logger
+
+
+def configure(path=None, level=DEFAULT_LEVEL, component=None, max_bytes=DEFAULT_MAX_BYTES,
+              backups=DEFAULT_BACKUPS, buffer_records=DEFAULT_BUFFER_RECORDS,
+              flush_seconds=DEFAULT_FLUSH_SECONDS, background=False):
+    """启用日志（替换当前日志），进程退出时自动写出缓冲并关闭文件"""
+    global _logger
+    _logger.close()
+    _logger = Logger(path, level, component, max_bytes, backups, buffer_records, flush_seconds, background)
+    atexit.register(_logger.close)
+    return _logger
+
+
+def from_env(default_path=None, default_level=DEFAULT_LEVEL, component=None):
+    """按 FC_LOG* 环境变量启用日志；没有设置 FC_LOG 时使用 default_path，两者都没有时返回 None"""
+    path = os.environ.get("FC_LOG") or default_path
+    if not path:
+        return None
+    try:
+        return configure(path, os.environ.get("FC_LOG_LEVEL") or default_level, component,
+                         int(float(os.environ.get("FC_LOG_MAX_MB") or DEFAULT_MAX_BYTES / (1 << 20)) * (1 << 20)),
+                         int(os.environ.get("FC_LOG_BACKUPS") or DEFAULT_BACKUPS),
+                         background=os.environ.get("FC_LOG_ASYNC") == "1")
+    except ValueError as e:
+        print(f"警告: 日志环境变量无效，不记录日志: {e}", file=sys.stderr)
+        return None
+
+
+def debug(event, **fields):
+    _logger.log("debug", event, **fields)
+
+
+def info(event, **fields):
+    _logger.log("info", event, **fields)
+
+
+def warning(event, **fields):
+    _logger.log("warning", event, **fields)
+
+
+def error(event, **fields):
+    _logger.log("error", event, **fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看 JSON-lines 日志")
+    parser.add_argument("paths", nargs="+", help="日志文件（可以包括轮转文件 .1 .2 …）")
+    parser.add_argument("--level", default="debug", help="最低级别 (默认 debug)")
+    parser.add_argument("--event", default=None, help="只显示该事件")
+    args = parser.parse_args()
+
+    minimum = level_number(args.level)
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if LEVELS.get(record.get("level"), 0) < minimum:
+                    continue
+                if args.event and record.get("event") != args.event:
+                    continue
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.pop("ts", 0)))
+                level, event = record.pop("level", "-"), record.pop("event", "-")
+                record.pop("pid", None)
+                fields = " ".join(f"{key}={json.dumps(value, ensure_ascii=False)}" for key, value in record.items())
+                print(f"{stamp} {level:<7} {event} {fields}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FreeCAD 进程池：把任务清单分发给多个常驻工作进程并行生成零件
+
+1. 启动 N 个 `fc_worker.py serve --stdin` 工作进程（默认与 CPU 核数相同），每个只启动一次 FreeCAD
+2. 按估算耗时从大到小派发任务（带孔且导出 STL 的零件网格化最慢），空闲的工作进程取下一个任务
+3. 工作进程崩溃或任务超时时重启该工作进程，并把任务重新排队（最多重试 --retries 次）
+4. 统计每个工作进程完成的任务数、忙碌时间和吞吐量
+
+清单为 JSON-lines，每行格式与 fc_worker.py 的任务相同（{"kind": ..., "params": {...}}），
+也可以直接写参数（与 create_cube.py --batch 的清单相同）。
+
+用法:
+    python FreeCadpys/fc_pool.py parts.jsonl -j 8 --freecadcmd 'C:/.../freecadcmd.exe'
+    python FreeCadpys/fc_pool.py parts.jsonl -j 4 --stub       # 使用替身模块测试
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+import threading
+import subprocess
+
+from fc_worker import job_params
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fc_worker.py")
+
+# 默认重试次数（工作进程崩溃或超时后任务重新排队的次数）
+DEFAULT_RETRIES = 2
+
+# 估算任务耗时的相对权重
+COST_CUBE = 1.0
+COST_LINE = 0.3
+COST_STL = 2.0
+# 带孔零件的网格化比普通长方体慢得多
+COST_HOLE_STL_FACTOR = 4.0
+
+# 批量模式的默认输出路径模板（与 create_cube.py 的 DEFAULT_FCSTD_TEMPLATE 一致）
+DEFAULT_FCSTD_TEMPLATE = os.path.join("FCStds", "{manifest}", "{index:05d}_{name}.FCStd")
+
+# 各类任务的默认对象名，用于路径模板
+DEFAULT_NAMES = {"cube": "MyCube", "line": "DraftLine"}
+
+
+def _is_positive(value):
+    try:
+        return float(value) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def estimate_cost(job):
+    """按任务类型、是否带孔、是否导出 STL 估算相对耗时"""
+    params = job_params(job)
+    if job.get("kind", "cube") == "line":
+        return COST_LINE
+    cost = COST_CUBE
+    if params.get("stl"):
+        cost += COST_STL * (COST_HOLE_STL_FACTOR if _is_positive(params.get("holeRadius")) else 1.0)
+    return cost
+
+
+def load_tasks(path, fcstd_template=None, stl_template=None):
+    """读取清单，返回 (任务列表, 无法解析的行的错误记录列表)
+
+    没有指定输出路径的任务按模板补全，保证并行的工作进程不会写同一个文件。
+    """
+    manifest = os.path.splitext(os.path.basename(path))[0]
+    fcstd_template = fcstd_template or DEFAULT_FCSTD_TEMPLATE
+    tasks = []
+    errors = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        index = 0
+        for row, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            index += 1
+            record = {"index": index, "row": row, "id": None}
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("每行必须是一个 JSON 对象")
+                record["id"] = job.get("id")
+                kind = job.get("kind", "cube")
+                params = job_params(job)
+                fields = {"name": DEFAULT_NAMES.get(kind, kind), **params,
+                          "index": index, "row": row, "id": record["id"], "manifest": manifest}
+                if not params.get("fcstd"):
+                    params["fcstd"] = fcstd_template.format(**fields)
+                if kind == "cube" and stl_template and not params.get("stl"):
+                    params["stl"] = stl_template.format(**fields)
+            except (ValueError, KeyError) as e:
+                message = f"模板字段不存在: {e}" if isinstance(e, KeyError) else f"无法解析: {e}"
+                errors.append({**record, "status": "error", "error": message, "attempts": 0})
+                continue
+            job = {"id": record["id"], "kind": kind, "params": params}
+            tasks.append({**record, "job": job, "cost": estimate_cost(job), "attempts": 0})
+    return tasks, errors
+
+
+def worker_command(freecadcmd=None, stub=False):
+    """启动工作进程的命令行"""
+    if freecadcmd:
+        return [freecadcmd, WORKER_SCRIPT, "serve", "--stdin"]
+    command = [sys.executable, WORKER_SCRIPT, "serve", "--stdin"]
+    if stub:
+        command.append("--stub")
+    return command
+
+
+class WorkerProcess:
+    """一个 fc_worker.py serve --stdin 子进程"""
+
+    def __init__(self, worker_id, command, env=None, stderr=subprocess.DEVNULL):
+        self.worker_id = worker_id
+        self.command = command
+        self.env = env
+        self.stderr = stderr
+        self.process = None
+        self.pids = []
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.crashes = 0
+        self.busy_seconds = 0.0
+        self.startup_seconds = 0.0
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """启动子进程并等待 ready 行，失败时抛出 RuntimeError"""
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.stderr,
+            env=self.env, text=True, encoding="utf-8", bufsize=1)
+        self.pids.append(self.process.pid)
+        # ready 之前的输出（例如 freecadcmd 的启动信息）不是 JSON，跳过
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("status") == "ready":
+                self.startup_seconds += time.perf_counter() - started
+                return message.get("result")
+        self.process.wait()
+        raise RuntimeError(f"工作进程启动失败（退出码 {self.process.returncode}）: {' '.join(self.command)}")
+
+    def run(self, job, timeout=None):
+        """执行一个任务，返回结果字典；工作进程崩溃或超时返回 None"""
+        watchdog = None
+        if timeout:
+            watchdog = threading.Timer(timeout, self.process.kill)
+            watchdog.start()
+        started = time.perf_counter()
+        try:
+            self.process.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except OSError:
+            line = ""
+        finally:
+            if watchdog:
+                watchdog.cancel()
+        self.busy_seconds += time.perf_counter() - started
+        if not line:
+            self.crashes += 1
+            self.process.kill()
+            self.process.wait()
+            return None
+        return json.loads(line)
+
+    def stop(self):
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+            self.process.stdin.flush()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+
+
+class ProcessPool:
+    def __init__(self, command, workers=None, retries=DEFAULT_RETRIES, job_timeout=None,
+                 env=None, stderr=subprocess.DEVNULL):
+        count = workers or os.cpu_count() or 1
+        self.workers = [WorkerProcess(i + 1, command, env, stderr) for i in range(count)]
+        self.retries = retries
+        self.job_timeout = job_timeout
+        self.lock = threading.Lock()
+        self.queue = []
+        self.results = []
+        self.on_result = None
+
+    def _push(self, task):
+        # 估算耗时大的任务先派发（最长处理时间优先），相同耗时按清单顺序
+        heapq.heappush(self.queue, (-task["cost"], task["index"], task))
+
+    def _pop(self):
+        with self.lock:
+            if not self.queue:
+                return None
+            return heapq.heappop(self.queue)[2]
+
+    def _finish(self, task, worker, response):
+        record = {"index": task["index"], "row": task["row"], "id": task["id"],
+                  "worker": worker.worker_id if worker else None, "attempts": task["attempts"]}
+        record.update({key: value for key, value in response.items() if key != "id"})
+        with self.lock:
+            self.results.append(record)
+            if self.on_result:
+                self.on_result(record)
+
+    def _worker_loop(self, worker):
+        while True:
+            task = self._pop()
+            if task is None:
+                break
+            if not worker.alive:
+                try:
+                    worker.start()
+                except (OSError, RuntimeError) as e:
+                    # 无法启动工作进程：任务放回队列，由其他工作进程处理
+                    with self.lock:
+                        self._push(task)
+                    print(f"✗ 工作进程 {worker.worker_id} 无法启动: {e}")
+                    return
+            task["attempts"] += 1
+            response = worker.run(task["job"], self.job_timeout)
+            if response is None:
+                if task["attempts"] <= self.retries:
+                    print(f"! 工作进程 {worker.worker_id} 在执行第 {task['row']} 行任务时崩溃或超时，重新排队")
+                    with self.lock:
+                        self._push(task)
+                else:
+                    worker.jobs_failed += 1
+                    self._finish(task, worker, {"status": "error",
+                                                "error": f"工作进程崩溃或超时 {task['attempts']} 次"})
+                continue
+            if response.get("status") == "success":
+                worker.jobs_done += 1
+            else:
+                worker.jobs_failed += 1
+            self._finish(task, worker, response)
+
+    def run(self, tasks, on_result=None):
+        """执行所有任务，返回结果记录列表（按完成顺序）"""
+        self.on_result = on_result
+        for task in tasks:
+            self._push(task)
+        threads = [threading.Thread(target=self._worker_loop, args=(worker,), daemon=True)
+                   for worker in self.workers]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for worker in self.workers:
+                worker.stop()
+        # 所有工作进程都无法启动时，剩余任务记为失败
+        while self.queue:
+            task = heapq.heappop(self.queue)[2]
+            self._finish(task, None, {"status": "error", "error": "没有可用的工作进程"})
+        return self.results
+
+
+def print_worker_stats(pool, elapsed):
+    print("\n工作进程统计:")
+    print("-" * 92)
+    print(f"{'编号':<6} {'进程ID':<16} {'完成':<6} {'失败':<6} {'崩溃':<6} {'启动(秒)':<10} "
+          f"{'忙碌(秒)':<10} {'吞吐(个/秒)':<12} {'利用率':<8}")
+    print("-" * 92)
+    for worker in pool.workers:
+        jobs = worker.jobs_done + worker.jobs_failed
+        throughput = jobs / worker.busy_seconds if worker.busy_seconds > 0 else 0.0
+        utilization = worker.busy_seconds / elapsed if elapsed > 0 else 0.0
+        pids = ",".join(str(pid) for pid in worker.pids) or "-"
+        print(f"{worker.worker_id:<6} {pids:<16} {worker.jobs_done:<6} {worker.jobs_failed:<6} "
+              f"{worker.crashes:<6} {worker.startup_seconds:<10.2f} {worker.busy_seconds:<10.2f} "
+              f"{throughput:<12.1f} {utilization:<8.0%}")
+    print("-" * 92)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用多个常驻 FreeCAD 工作进程并行生成零件")
+    parser.add_argument("manifest", help="JSON-lines 任务清单")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="工作进程数量 (默认 CPU 核数)")
+    parser.add_argument("--freecadcmd", help="freecadcmd 可执行文件路径（不指定时用当前 Python 运行工作进程）")
+    parser.add_argument("--stub", action="store_true", help="工作进程使用 fcstub 替身模块（测试用）")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"工作进程崩溃后任务的重试次数 (默认 {DEFAULT_RETRIES})")
+    parser.add_argument("--job-timeout", type=float, default=None, help="单个任务的超时时间（秒）")
+    parser.add_argument("--fcstd-template", help="FCStd 输出路径模板（字段同 create_cube.py --batch）")
+    parser.add_argument("--stl-template", help="STL 输出路径模板")
+    parser.add_argument("--results", help="结果文件路径 (默认 <清单名>.results.jsonl)")
+    parser.add_argument("--verbose", action="store_true", help="显示工作进程的输出")
+    parser.add_argument("--no-cache", action="store_true", help="不使用零件缓存（part_cache.py）")
+    args = parser.parse_args()
+
+    tasks, errors = load_tasks(args.manifest, args.fcstd_template, args.stl_template)
+    results_path = args.results or os.path.splitext(args.manifest)[0] + ".results.jsonl"
+
+    env = dict(os.environ)
+    env["PYTHONIOENCODING"] = "utf-8"
+    if args.no_cache:
+        env["FC_NO_CACHE"] = "1"
+    if args.freecadcmd:
+        # freecadcmd 转发参数不可靠，同时用环境变量指定工作模式
+        env["FC_WORKER_SERVE"] = "stdin"
+    pool = ProcessPool(worker_command(args.freecadcmd, args.stub), args.workers, args.retries,
+                       args.job_timeout, env, None if args.verbose else subprocess.DEVNULL)
+
+    print(f"共 {len(tasks)} 个任务（{len(errors)} 行无法解析），使用 {len(pool.workers)} 个工作进程")
+    started = time.perf_counter()
+    with open(results_path, "w", encoding="utf-8") as results:
+        def on_result(record):
+            mark = "✓" if record["status"] == "success" else "✗"
+            detail = record.get("error") or (record.get("result") or {}).get("fcstd")
+            print(f"{mark} [{record['row']}] 工作进程 {record['worker']}: {detail}")
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results.flush()
+
+        for record in errors:
+            print(f"✗ 第 {record['row']} 行任务已跳过: {record['error']}")
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+        records = pool.run(tasks, on_result)
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for record in records if record["status"] == "success")
+    failed = len(records) - succeeded + len(errors)
+    retried = sum(1 for record in records if record["attempts"] > 1)
+    print_worker_stats(pool, elapsed)
+    print(f"完成: 成功 {succeeded} 个，失败 {failed} 个，重试过 {retried} 个，耗时 {elapsed:.2f} 秒"
+          f"（{succeeded / elapsed if elapsed > 0 else 0:.1f} 个/秒）")
+    print(f"- 结果文件: {results_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
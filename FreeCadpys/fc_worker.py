@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+常驻 FreeCAD 工作进程
+
+每次用 freecadcmd 运行 create_cube.py 都要重新启动 FreeCAD 并导入 FreeCAD / Part / Mesh 等模块，
+单个零件的耗时主要花在启动上。工作进程只导入一次 FreeCAD，之后从本地 TCP 端口或 stdin
+接收 JSON-lines 任务：每个任务在新文档中建模、保存输出、关闭文档并返回结果。
+
+任务（每行一个 JSON）:
+    {"id": 1, "kind": "cube", "params": {"length": 20, "holeRadius": 3, "fcstd": "FCStds/a.FCStd", "stl": "stls/a.stl"}}
+    {"id": 2, "kind": "line", "params": {"x1": 0, "x2": 50, "name": "MyLine", "fcstd": "FCStds/line.FCStd"}}
+    {"op": "ping"}        检查工作进程状态
+    {"op": "shutdown"}    退出工作进程
+参数名与 create_cube.py / draft_line_example.py 的命令行参数相同。
+
+结果（每行一个 JSON）:
+    {"id": 1, "status": "success", "result": {...}, "seconds": 0.12}
+    {"id": 2, "status": "error", "error": "...", "traceback": "..."}
+
+用法:
+    freecadcmd FreeCadpys/fc_worker.py serve                  # 监听 127.0.0.1:5556
+    freecadcmd FreeCadpys/fc_worker.py serve --stdin          # 从 stdin 读取任务，结果写到 stdout
+    python FreeCadpys/fc_worker.py serve --stub               # 使用 fcstub 替身模块（测试用）
+    python FreeCadpys/fc_worker.py submit -f jobs.jsonl       # 客户端：提交任务文件（- 表示 stdin）
+    python FreeCadpys/fc_worker.py submit length=20 holeRadius=3 fcstd=FCStds/a.FCStd
+    python FreeCadpys/fc_worker.py ping / shutdown
+
+freecadcmd 转发参数不可靠时，可以设置环境变量 FC_WORKER_SERVE=stdin（或 socket）代替 serve 子命令。
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import traceback
+import socketserver
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fc_log
+import stage_trace
+
+DEFAULT_HOST = "127.0.0.1"
+# 与 README 中远程命令服务器的 5555 端口区分
+DEFAULT_PORT = 5556
+
+JOB_KINDS = ("cube", "line")
+
+# line 任务的参数及默认值（与 draft_line_example.py 一致）
+LINE_PARAMS = {"x1": 0.0, "y1": 0.0, "z1": 0.0, "x2": 10.0, "y2": 0.0, "z2": 0.0,
+               "name": "DraftLine", "fcstd": None}
+
+
+# 从 freecadcmd 传来的 sys.argv 中取出属于本脚本的参数
+def _script_argv():
+    script = os.path.basename(__file__)
+    for i, arg in enumerate(sys.argv):
+        if os.path.basename(arg) == script:
+            return sys.argv[i + 1:]
+    return sys.argv[1:]
+
+
+def job_params(job):
+    """任务参数：优先取 "params"，否则把除 id/kind/op 以外的字段都当作参数"""
+    if "params" in job:
+        return dict(job["params"] or {})
+    return {key: value for key, value in job.items() if key not in ("id", "kind", "op")}
+
+
+class CadWorker:
+    """加载 FreeCAD 模块并执行任务，同一时间只执行一个任务（FreeCAD 不是线程安全的）"""
+
+    def __init__(self, stub=False):
+        started = time.perf_counter()
+        if stub:
+            os.environ["FC_STUB"] = "1"
+        import fcstub
+        fcstub.enabled_by_env()
+        # FC_TRACE / FC_TRACE_CHROME 启用分阶段追踪（路径中的 {pid} 区分各个工作进程）
+        stage_trace.from_env()
+        # FC_LOG / FC_LOG_LEVEL 启用结构化日志（同样支持 {pid}），记录每个任务的结果
+        fc_log.from_env(component="fc_worker")
+        with stage_trace.span("import_freecad"):
+            import FreeCAD
+            import create_cube
+            # create_cube 按需导入 FreeCAD 和 Part，常驻进程在启动时就加载好，第一个任务不用再等
+            create_cube.load_part()
+        import part_cache
+        self.FreeCAD = FreeCAD
+        self.create_cube = create_cube
+        # 零件缓存，FC_NO_CACHE=1 时禁用
+        self.cache = part_cache.PartCache.from_env()
+        self.draft_line = None
+        self.stub = getattr(FreeCAD, "IS_STUB", False)
+        self.startup = time.perf_counter() - started
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        # 已接收的立方体任务数，用于生成不重复的默认 .FCStd 路径
+        self.cube_jobs = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def info(self):
+        return {
+            "pid": os.getpid(),
+            "freecad": ".".join(self.FreeCAD.Version()[:3]),
+            "stub": self.stub,
+            "startup": self.startup,
+            "jobs_done": self.jobs_done,
+            "jobs_failed": self.jobs_failed,
+            "busy_seconds": self.busy_seconds,
+        }
+
+    def run_cube(self, params):
+        params = self.create_cube.normalize_params(params, strict=True)
+        self.cube_jobs += 1
+        if not params["fcstd"]:
+            # 默认路径的时间戳只精确到秒，加上进程号和任务序号，同一秒完成的任务不会互相覆盖
+            params["fcstd"] = self.create_cube.default_fcstd_path(f"{os.getpid()}_{self.cube_jobs}")
+        result = self.create_cube.create_cube(params, close_document=True, cache=self.cache)
+        if params["stl"] and result["stl_error"]:
+            raise RuntimeError(f"STL导出失败: {result['stl_error']}")
+        return result
+
+    def run_line(self, params):
+        unknown = sorted(set(params) - set(LINE_PARAMS))
+        if unknown:
+            raise ValueError(f"未知参数: {', '.join(unknown)}")
+        values = dict(LINE_PARAMS)
+        values.update({key: value for key, value in params.items() if value is not None})
+        for key in ("x1", "y1", "z1", "x2", "y2", "z2"):
+            values[key] = float(values[key])
+
+        if self.draft_line is None:
+            import draft_line_example
+            self.draft_line = draft_line_example
+        Vector = self.FreeCAD.Vector
+        timings = {}
+        doc = self.FreeCAD.newDocument('DraftLineDoc')
+        try:
+            with stage_trace.span("line", part=values["name"]):
+                with stage_trace.span("build") as span:
+                    p1 = Vector(values["x1"], values["y1"], values["z1"])
+                    p2 = Vector(values["x2"], values["y2"], values["z2"])
+                    line = self.draft_line.create_line(doc, p1, p2, name=values["name"])
+                timings["build"] = span.seconds
+                with stage_trace.span("recompute") as span:
+                    doc.recompute()
+                timings["recompute"] = span.seconds
+                if values["fcstd"]:
+                    outdir = os.path.dirname(values["fcstd"])
+                    if outdir:
+                        os.makedirs(outdir, exist_ok=True)
+                    with stage_trace.span("save") as span:
+                        doc.saveAs(values["fcstd"])
+                    timings["save"] = span.seconds
+            return {"name": line.Label, "fcstd": values["fcstd"], "timings": timings}
+        finally:
+            self.FreeCAD.closeDocument(doc.Name)
+
+    def handle(self, job):
+        """执行一个任务，返回结果字典"""
+        response = {"id": job.get("id")}
+        op = job.get("op")
+        if op == "ping":
+            response.update(status="success", op=op, result=self.info())
+            return response
+        if op == "shutdown":
+            response.update(status="success", op=op, result=self.info())
+            return response
+        if op is not None:
+            response.update(status="error", error=f"未知操作: {op}")
+            return response
+
+        kind = job.get("kind", "cube")
+        started = time.perf_counter()
+        with self.lock:
+            try:
+                if kind == "cube":
+                    result = self.run_cube(job_params(job))
+                elif kind == "line":
+                    result = self.run_line(job_params(job))
+                else:
+                    raise ValueError(f"未知任务类型: {kind}（可选: {', '.join(JOB_KINDS)}）")
+                response.update(status="success", result=result)
+                self.jobs_done += 1
+            except Exception as e:
+                response.update(status="error", error=str(e), traceback=traceback.format_exc())
+                self.jobs_failed += 1
+            elapsed = time.perf_counter() - started
+            self.busy_seconds += elapsed
+        response["seconds"] = elapsed
+        if response["status"] == "success":
+            fc_log.debug("job", id=response["id"], kind=kind, seconds=round(elapsed, 6))
+        else:
+            fc_log.error("job_failed", id=response["id"], kind=kind, error=response["error"],
+                         seconds=round(elapsed, 6))
+        return response
+
+    def handle_line(self, line):
+        """解析一行 JSON 并执行"""
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("任务必须是 JSON 对象")
+        except ValueError as e:
+            return {"id": None, "status": "error", "error": f"无效的任务: {e}"}
+        return self.handle(job)
+
+
+def _encode(response):
+    return json.dumps(response, ensure_ascii=False) + "\n"
+
+
+def protocol_stdout():
+    """复制一份 stdout 专门用于传输结果，原 stdout 重定向到 stderr
+
+    必须在导入 FreeCAD 之前调用，这样 FreeCAD（包括 C++ 部分）和建模过程中的输出都不会混进结果。
+    """
+    sys.stdout.flush()
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return out
+
+
+def serve_stdin(worker, out):
+    """从 stdin 读取任务，结果写到 out（protocol_stdout() 的返回值）"""
+    out.write(_encode({"status": "ready", "result": worker.info()}))
+    out.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        response = worker.handle_line(line)
+        sys.stdout.flush()
+        out.write(_encode(response))
+        out.flush()
+        if response.get("op") == "shutdown":
+            break
+
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8", errors="replace")
+            if not line.strip():
+                continue
+            response = self.server.worker.handle_line(line)
+            self.wfile.write(_encode(response).encode("utf-8"))
+            self.wfile.flush()
+            if response.get("op") == "shutdown":
+                # shutdown() 会等待 serve_forever 退出，不能在处理请求的线程里直接调用
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, worker):
+        super().__init__(address, WorkerRequestHandler)
+        self.worker = worker
+
+
+def serve_socket(worker, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = WorkerServer((host, port), worker)
+    info = worker.info()
+    print(f"FreeCAD 工作进程已启动: {host}:{server.server_address[1]} "
+          f"(FreeCAD {info['freecad']}{'，替身模块' if info['stub'] else ''}，启动耗时 {info['startup']:.2f} 秒)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"工作进程已退出，共完成 {worker.jobs_done} 个任务，失败 {worker.jobs_failed} 个")
+
+
+# ---- 客户端 ----
+
+def submit_jobs(jobs, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    """把任务逐个发送给工作进程，依次产出结果"""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        stream = sock.makefile("rw", encoding="utf-8", newline="\n")
+        for job in jobs:
+            stream.write(json.dumps(job, ensure_ascii=False) + "\n")
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                raise ConnectionError("工作进程关闭了连接")
+            yield json.loads(line)
+
+
+def read_jobs(path):
+    """从 JSON-lines 文件读取任务（- 表示 stdin），跳过空行和 # 注释"""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job = json.loads(line)
+            job.setdefault("id", number)
+            yield job
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def parse_assignments(items):
+    """把 key=value 形式的参数转换为字典，值优先按 JSON 解析"""
+    params = {}
+    for item in items:
+        if "=" not in item:
+            raise ValueError(f"参数格式应为 key=value: {item}")
+        key, value = item.split("=", 1)
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def print_response(response):
+    if response.get("status") == "success":
+        result = response.get("result") or {}
+        outputs = ", ".join(str(result[key]) for key in ("fcstd", "stl") if result.get(key))
+        print(f"✓ [{response.get('id')}] {result.get('name', '')} {outputs} ({response.get('seconds', 0):.3f}秒)")
+    else:
+        print(f"✗ [{response.get('id')}] {response.get('error')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻 FreeCAD 工作进程及客户端")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="启动工作进程")
+    serve_parser.add_argument("--stdin", action="store_true", help="从 stdin 读取任务，结果写到 stdout")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址 (默认 {DEFAULT_HOST})")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口 (默认 {DEFAULT_PORT})")
+    serve_parser.add_argument("--stub", action="store_true", help="使用 fcstub 替身模块代替 FreeCAD（测试用）")
+    serve_parser.add_argument("--no-cache", action="store_true", help="不使用零件缓存（part_cache.py）")
+
+    for name, help_text in (("submit", "提交任务"), ("ping", "查看工作进程状态"), ("shutdown", "关闭工作进程")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--host", default=DEFAULT_HOST, help="工作进程地址")
+        sub.add_argument("--port", type=int, default=DEFAULT_PORT, help="工作进程端口")
+        sub.add_argument("--timeout", type=float, default=None, help="等待结果的超时时间（秒）")
+        if name == "submit":
+            sub.add_argument("-f", "--file", help="JSON-lines 任务文件（- 表示 stdin）")
+            sub.add_argument("--kind", choices=JOB_KINDS, default="cube", help="单个任务的类型")
+            sub.add_argument("params", nargs="*", help="单个任务的参数，格式 key=value")
+
+    # 使用 parse_known_args 避免 freecadcmd 转发的额外参数导致退出
+    args, _ = parser.parse_known_args(_script_argv())
+    if args.command is None and os.environ.get("FC_WORKER_SERVE"):
+        args, _ = parser.parse_known_args(["serve"])
+        args.stdin = os.environ["FC_WORKER_SERVE"] == "stdin"
+
+    if args.command == "serve":
+        if args.no_cache:
+            os.environ["FC_NO_CACHE"] = "1"
+        if args.stdin:
+            out = protocol_stdout()
+            serve_stdin(CadWorker(stub=args.stub), out)
+        else:
+            serve_socket(CadWorker(stub=args.stub), args.host, args.port)
+        return 0
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    if args.command == "submit":
+        jobs = read_jobs(args.file) if args.file else [
+            {"id": 1, "kind": args.kind, "params": parse_assignments(args.params)}]
+    else:
+        jobs = [{"op": args.command}]
+
+    failed = 0
+    total = 0
+    started = time.perf_counter()
+    try:
+        for response in submit_jobs(jobs, args.host, args.port, args.timeout):
+            total += 1
+            if args.command == "submit":
+                print_response(response)
+            else:
+                print(json.dumps(response.get("result"), ensure_ascii=False, indent=2))
+            if response.get("status") != "success":
+                failed += 1
+    except OSError as e:
+        print(f"无法连接到工作进程 {args.host}:{args.port}: {e}")
+        return 1
+    if args.command == "submit":
+        elapsed = time.perf_counter() - started
+        print(f"\n共 {total} 个任务，成功 {total - failed} 个，失败 {failed} 个，耗时 {elapsed:.2f} 秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,535 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+不依赖 FreeCAD 的 .FCStd 索引：把大量文档的对象元数据写入可查询的 SQLite 目录
+
+.FCStd 是 zip 包，里面是 Document.xml 和各对象的 BRep 形状文件。本模块只读取 zip 的中央目录，
+用增量 XML 解析（iterparse）流式读取 Document.xml，提取对象类型、标签、Placement、
+数值属性（Part::Box 的 Length、Part::Cylinder 的 Radius、Draft 直线的 Start/End 等）和形状文件，
+不需要启动 FreeCAD。
+
+- 形状尺寸：create_cube.py 生成的零件是 Part::Feature，尺寸只在 BRep 中。默认顺序扫描文本 BRep 的
+  顶点记录（Ve）得到包围盒和 dx/dy/dz；贯通孔的轴向由 Part::Cut 的刀具（圆柱只有接缝上的两个顶点，
+  包围盒只沿轴向展开）推断。--no-brep 时只读 Document.xml
+- 包围盒取 BRep 中记录的顶点坐标，不应用 BRep 的 Location；FreeCAD 保存的形状坐标在零件自身的坐标系中，
+  旋转过的零件 dx/dy/dz 仍是长宽高
+- 增量刷新：文件大小和修改时间都没变的跳过，已删除的文件从目录中移除；
+  损坏的文件记为 status='error' 并记录原因，不中断扫描
+- 多进程解析，主进程在一个事务中批量写入
+- fcstd_repack.py 把形状移到共享存储的文件，从存储中读取形状
+
+用法:
+    python FreeCadpys/fcstd_index.py scan FCStds                              # 建立 / 刷新 fcstd_index.sqlite
+    python FreeCadpys/fcstd_index.py query --hole-axis=Z --where "dz > 10"    # Z 向贯通孔且高度大于 10 的零件
+    python FreeCadpys/fcstd_index.py query --type=Part::Cut --json
+    python FreeCadpys/fcstd_index.py stats                                    # 文件数、对象类型统计、损坏的文件
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import zipfile
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree.ElementTree import iterparse, ParseError
+
+import fcstd_repack
+
+INDEX_VERSION = 1
+
+DEFAULT_DB = "fcstd_index.sqlite"
+EXTENSIONS = (".fcstd",)
+BACKUP_EXTENSIONS = (".fcbak",)
+
+# 少于这么多文件时不启动进程池
+MIN_PARALLEL_FILES = 64
+CHUNK_SIZE = 32
+
+# 包围盒某个方向的跨度不超过它（毫米）时视为 0
+FLAT_TOLERANCE = 1e-6
+
+# 作为数值记录的属性值元素
+NUMERIC_TAGS = {"Float": float, "Integer": int, "Bool": lambda value: value == "true"}
+PLACEMENT_FIELDS = (("Px", "px"), ("Py", "py"), ("Pz", "pz"),
+                    ("Q0", "q0"), ("Q1", "q1"), ("Q2", "q2"), ("Q3", "q3"), ("A", "angle"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    status TEXT,
+    error TEXT,
+    label TEXT,
+    program_version TEXT,
+    created TEXT,
+    modified TEXT,
+    members INTEGER,
+    objects INTEGER,
+    brep INTEGER,
+    indexed TEXT
+);
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    name TEXT,
+    type TEXT,
+    label TEXT,
+    visible INTEGER,
+    px REAL, py REAL, pz REAL,
+    q0 REAL, q1 REAL, q2 REAL, q3 REAL, angle REAL,
+    shape_file TEXT,
+    shape_bytes INTEGER,
+    vertices INTEGER,
+    xmin REAL, ymin REAL, zmin REAL, xmax REAL, ymax REAL, zmax REAL,
+    dx REAL, dy REAL, dz REAL,
+    base TEXT,
+    tool TEXT,
+    hole_axis TEXT
+);
+CREATE TABLE IF NOT EXISTS properties (
+    object_id INTEGER NOT NULL REFERENCES objects(id),
+    name TEXT,
+    type TEXT,
+    value REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS objects_file ON objects(file_id);
+CREATE INDEX IF NOT EXISTS objects_type ON objects(type);
+CREATE INDEX IF NOT EXISTS objects_label ON objects(label);
+CREATE INDEX IF NOT EXISTS objects_hole ON objects(hole_axis, dz);
+CREATE INDEX IF NOT EXISTS objects_size ON objects(dx, dy, dz);
+CREATE INDEX IF NOT EXISTS properties_object ON properties(object_id);
+CREATE INDEX IF NOT EXISTS properties_value ON properties(name, value);
+CREATE VIEW IF NOT EXISTS parts AS
+    SELECT files.path, objects.* FROM objects JOIN files ON files.id = objects.file_id;
+"""
+
+OBJECT_COLUMNS = ("name", "type", "label", "visible", "px", "py", "pz", "q0", "q1", "q2", "q3", "angle",
+                  "shape_file", "shape_bytes", "vertices", "xmin", "ymin", "zmin", "xmax", "ymax", "zmax",
+                  "dx", "dy", "dz", "base", "tool", "hole_axis")
+
+
+# ---------- 解析单个文件（在工作进程中运行） ----------
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_document(stream):
+    """流式解析 Document.xml，返回 (文档信息, 按出现顺序排列的对象列表)"""
+    document = {}
+    objects = {}
+    current = None       # ObjectData 中正在读取的对象
+    prop = None          # 正在读取的属性 (名称, 类型)
+    section = None       # Objects / ObjectData
+    depth = 0
+    prop_depth = None
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "end":
+            depth -= 1
+            if prop_depth is not None and depth < prop_depth:
+                prop = prop_depth = None
+            if tag == "Object" and section == "ObjectData":
+                current = None
+            if tag in ("Objects", "ObjectData"):
+                section = None
+            # 读过的元素立即释放，大文档也只占少量内存
+            if prop is None:
+                elem.clear()
+            continue
+
+        depth += 1
+        attrib = elem.attrib
+        if tag == "Document":
+            document["program_version"] = attrib.get("ProgramVersion")
+        elif tag in ("Objects", "ObjectData"):
+            section = tag
+        elif tag == "Object":
+            name = attrib.get("name")
+            if section == "Objects":
+                objects[name] = {"name": name, "type": attrib.get("type"), "properties": []}
+            elif section == "ObjectData":
+                current = objects.setdefault(name, {"name": name, "type": None, "properties": []})
+        elif tag == "Property":
+            prop = (attrib.get("name"), attrib.get("type"))
+            prop_depth = depth
+        elif prop is not None and depth == prop_depth + 1:
+            _read_value(document if current is None else current, prop, tag, attrib)
+    return document, list(objects.values())
+
+
+def _read_value(target, prop, tag, attrib):
+    name, type_name = prop
+    value = attrib.get("value")
+    if target.get("properties") is None:
+        # 文档级属性只保留几个常用的字符串
+        if tag == "String" and name in ("Label", "CreationDate", "LastModifiedDate"):
+            target[name] = value
+        return
+    if name == "Label" and tag == "String":
+        target["label"] = value
+    elif name == "Visibility" and tag == "Bool":
+        target["visible"] = value == "true"
+    elif tag == "PropertyPlacement":
+        for field, column in PLACEMENT_FIELDS:
+            target[column] = _float(attrib.get(field))
+    elif tag == "Part" and "file" in attrib:
+        target["shape_file"] = attrib["file"]
+    elif tag == "Link" and name in ("Base", "Tool"):
+        target[name.lower()] = value
+    elif tag == "PropertyVector":
+        for axis in "xyz":
+            target["properties"].append((f"{name}.{axis}", type_name,
+                                         _float(attrib.get("value" + axis.upper())), None))
+    elif tag in NUMERIC_TAGS and value is not None:
+        try:
+            number = NUMERIC_TAGS[tag](value)
+        except ValueError:
+            return
+        target["properties"].append((name, type_name, float(number), None))
+    elif tag == "String" and value:
+        target["properties"].append((name, type_name, None, value))
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def brep_bounds(stream):
+    """扫描文本 BRep 的顶点记录，返回 (顶点数, [xmin, ymin, zmin, xmax, ymax, zmax])，没有顶点时包围盒为 None"""
+    lines = io.TextIOWrapper(stream, encoding="ascii", errors="replace")
+    in_shapes = False
+    count = 0
+    low = [float("inf")] * 3
+    high = [float("-inf")] * 3
+    for line in lines:
+        if not in_shapes:
+            in_shapes = line.startswith("TShapes")
+            continue
+        if line.strip() != "Ve":
+            continue
+        next(lines, None)  # 容差
+        values = next(lines, "").split()
+        if len(values) < 3:
+            continue
+        count += 1
+        for i in range(3):
+            coordinate = float(values[i])
+            low[i] = min(low[i], coordinate)
+            high[i] = max(high[i], coordinate)
+    return count, (low + high if count else None)
+
+
+def hole_axis(tool):
+    """刀具（圆柱）包围盒只沿一个坐标轴展开时返回该轴，否则 None"""
+    spans = [tool.get(key) for key in ("dx", "dy", "dz")]
+    if None in spans:
+        return None
+    extended = [axis for axis, span in zip("XYZ", spans) if span > FLAT_TOLERANCE]
+    return extended[0] if len(extended) == 1 else None
+
+
+def index_file(path, brep=True):
+    """读取一个 .FCStd，返回 files 表的一行和对象列表；文件损坏时 status 为 error"""
+    record = {"path": path, "status": "ok", "error": None, "objects": []}
+    try:
+        stat = os.stat(path)
+        record.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        with zipfile.ZipFile(path) as archive:
+            members = {info.filename: info for info in archive.infolist()}
+            record["members"] = len(members)
+            if "Document.xml" not in members:
+                raise ValueError("缺少 Document.xml")
+            with archive.open("Document.xml") as stream:
+                document, objects = read_document(stream)
+            record.update(label=document.get("Label"), program_version=document.get("program_version"),
+                          created=document.get("CreationDate"), modified=document.get("LastModifiedDate"))
+            # fcstd_repack.py 把形状移到共享存储时，从存储中读取
+            manifest = fcstd_repack.read_manifest(archive) if fcstd_repack.STORE_MANIFEST in members else None
+            for obj in objects:
+                shape_file = obj.get("shape_file")
+                info = members.get(shape_file)
+                if info is not None:
+                    obj["shape_bytes"] = info.file_size
+                    opener = lambda: archive.open(info)
+                elif manifest and shape_file in manifest["members"]:
+                    obj["shape_bytes"] = manifest["members"][shape_file]["size"]
+                    opener = lambda: fcstd_repack.open_payload(manifest, shape_file)
+                else:
+                    continue
+                if brep and not shape_file.endswith(".bin"):
+                    with opener() as stream:
+                        obj["vertices"], bounds = brep_bounds(stream)
+                    if bounds:
+                        obj.update(zip(("xmin", "ymin", "zmin", "xmax", "ymax", "zmax"), bounds))
+                        obj.update(dx=bounds[3] - bounds[0], dy=bounds[4] - bounds[1], dz=bounds[5] - bounds[2])
+        by_name = {obj["name"]: obj for obj in objects}
+        for obj in objects:
+            if obj.get("tool") in by_name:
+                obj["hole_axis"] = hole_axis(by_name[obj["tool"]])
+        record["objects"] = objects
+    except (OSError, zipfile.BadZipFile, ParseError, ValueError, KeyError, EOFError) as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", objects=[])
+    record["brep"] = bool(brep)
+    return record
+
+
+def _index_chunk(args):
+    paths, brep = args
+    return [index_file(path, brep) for path in paths]
+
+
+# ---------- 目录（SQLite） ----------
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+    conn.commit()
+    return conn
+
+
+def find_files(directories, backups=False):
+    """递归列出目录下的 .FCStd（backups 为 True 时包括 .FCBak），返回 {绝对路径: stat}"""
+    extensions = EXTENSIONS + (BACKUP_EXTENSIONS if backups else ())
+    found = {}
+    stack = [os.path.abspath(directory) for directory in directories]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            print(f"警告: 无法读取目录 {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in extensions:
+                    found[entry.path] = entry.stat()
+    return found
+
+
+class Catalog:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.root = os.path.dirname(os.path.abspath(db_path))
+        self.conn = connect(db_path)
+
+    def close(self):
+        self.conn.close()
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.root)
+
+    def _absolute(self, relative):
+        return os.path.normpath(os.path.join(self.root, relative))
+
+    def scan(self, directories, jobs=None, brep=True, backups=False, full=False):
+        """刷新目录，返回统计 {"files", "indexed", "unchanged", "removed", "errors", "seconds"}"""
+        started = time.perf_counter()
+        found = find_files(directories, backups)
+        roots = [os.path.abspath(directory) + os.sep for directory in directories]
+        known = {}
+        for file_id, relative, size, mtime_ns, has_brep in self.conn.execute(
+                "SELECT id, path, size, mtime_ns, brep FROM files"):
+            known[self._absolute(relative)] = (file_id, size, mtime_ns, has_brep)
+
+        changed = []
+        for path, stat in found.items():
+            entry = known.get(path)
+            if (full or entry is None or entry[1] != stat.st_size or entry[2] != stat.st_mtime_ns
+                    or (brep and not entry[3])):
+                changed.append(path)
+        # 只移除本次扫描目录下已不存在的文件，其他目录的记录保留
+        removed = [path for path in known
+                   if path not in found and any((path + os.sep).startswith(root) for root in roots)]
+
+        errors = 0
+        with self.conn:
+            for path in removed:
+                self._delete(known[path][0])
+            for record in self._index(changed, jobs, brep):
+                if record["path"] in known:
+                    self._delete(known[record["path"]][0])
+                self._insert(record)
+                errors += record["status"] != "ok"
+        return {"files": len(found), "indexed": len(changed), "unchanged": len(found) - len(changed),
+                "removed": len(removed), "errors": errors, "seconds": time.perf_counter() - started}
+
+    def _index(self, paths, jobs, brep):
+        if not paths:
+            return
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1 or len(paths) < MIN_PARALLEL_FILES:
+            for path in paths:
+                yield index_file(path, brep)
+            return
+        chunks = [(paths[i:i + CHUNK_SIZE], brep) for i in range(0, len(paths), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for records in pool.map(_index_chunk, chunks):
+                yield from records
+
+    def _delete(self, file_id):
+        self.conn.execute("DELETE FROM properties WHERE object_id IN (SELECT id FROM objects WHERE file_id = ?)",
+                          (file_id,))
+        self.conn.execute("DELETE FROM objects WHERE file_id = ?", (file_id,))
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _insert(self, record):
+        cursor = self.conn.execute(
+            "INSERT INTO files (path, size, mtime_ns, status, error, label, program_version, created, modified,"
+            " members, objects, brep, indexed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._relative(record["path"]), record.get("size"), record.get("mtime_ns"), record["status"],
+             record["error"], record.get("label"), record.get("program_version"), record.get("created"),
+             record.get("modified"), record.get("members"), len(record["objects"]), int(record["brep"]),
+             datetime.now().isoformat(timespec="seconds")))
+        file_id = cursor.lastrowid
+        placeholders = ", ".join("?" * (len(OBJECT_COLUMNS) + 1))
+        for obj in record["objects"]:
+            cursor = self.conn.execute(
+                f"INSERT INTO objects (file_id, {', '.join(OBJECT_COLUMNS)}) VALUES ({placeholders})",
+                (file_id,) + tuple(obj.get(column) for column in OBJECT_COLUMNS))
+            if obj["properties"]:
+                object_id = cursor.lastrowid
+                self.conn.executemany("INSERT INTO properties VALUES (?, ?, ?, ?, ?)",
+                                      [(object_id,) + prop for prop in obj["properties"]])
+
+    def query(self, where=None, params=(), limit=None):
+        """按条件查询 parts 视图（对象 + 文件路径），返回字典列表"""
+        sql = "SELECT * FROM parts"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY path, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        cursor = self.conn.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def stats(self):
+        files = dict(self.conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+        types = self.conn.execute(
+            "SELECT type, COUNT(*) FROM objects GROUP BY type ORDER BY COUNT(*) DESC").fetchall()
+        errors = self.conn.execute("SELECT path, error FROM files WHERE status != 'ok' ORDER BY path").fetchall()
+        return {"files": files, "types": types, "errors": errors}
+
+
+# ---------- 命令行 ----------
+
+def build_filter(args):
+    """命令行条件 -> (WHERE 子句, 参数)"""
+    clauses, params = [], []
+    if args.type:
+        clauses.append("type = ?")
+        params.append(args.type)
+    if args.label:
+        clauses.append("label GLOB ?")
+        params.append(args.label)
+    if args.hole_axis:
+        clauses.append("hole_axis = ?")
+        params.append(args.hole_axis.upper())
+    if args.visible:
+        clauses.append("visible = 1")
+    if args.prop:
+        # name=值 或 name>值 等，按 properties 表过滤
+        for condition in args.prop:
+            for operator in (">=", "<=", "!=", "=", ">", "<"):
+                if operator in condition:
+                    name, value = condition.split(operator, 1)
+                    clauses.append("id IN (SELECT object_id FROM properties WHERE name = ? AND "
+                                   f"(value {operator} ? OR text {operator} ?))")
+                    params += [name.strip(), _float(value) if _float(value) is not None else value.strip(),
+                               value.strip()]
+                    break
+            else:
+                raise ValueError(f"无法解析属性条件: {condition}")
+    if args.where:
+        clauses.append(f"({args.where})")
+    return " AND ".join(clauses), params
+
+
+def _format_row(row):
+    size = "-" if row["dx"] is None else f"{row['dx']:g}x{row['dy']:g}x{row['dz']:g}"
+    hole = f" 孔轴 {row['hole_axis']}" if row["hole_axis"] else ""
+    return f"{row['path']}  {row['name']} ({row['type']}) 标签={row['label']} 尺寸={size}{hole}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="不依赖 FreeCAD 的 .FCStd 元数据索引")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite 目录文件 (默认 {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest="command")
+
+    scan_parser = subparsers.add_parser("scan", help="扫描目录，建立或刷新索引")
+    scan_parser.add_argument("directories", nargs="+", help="包含 .FCStd 的目录（递归）")
+    scan_parser.add_argument("-j", "--jobs", type=int, default=None, help="解析进程数（默认 CPU 核数）")
+    scan_parser.add_argument("--no-brep", action="store_true", help="只读 Document.xml，不扫描 BRep 包围盒")
+    scan_parser.add_argument("--backups", action="store_true", help="同时索引 .FCBak 备份文件")
+    scan_parser.add_argument("--full", action="store_true", help="忽略大小和修改时间，重新索引所有文件")
+
+    query_parser = subparsers.add_parser("query", help="查询对象")
+    query_parser.add_argument("--type", help="对象类型，例如 Part::Cut")
+    query_parser.add_argument("--label", help="标签通配符，例如 'MyCube*'")
+    query_parser.add_argument("--hole-axis", choices=["X", "Y", "Z", "x", "y", "z"], help="贯通孔轴向")
+    query_parser.add_argument("--visible", action="store_true", help="只列出可见对象")
+    query_parser.add_argument("--prop", action="append", help="属性条件，例如 'Length>10'（可重复）")
+    query_parser.add_argument("--where", help="附加 SQL 条件，列见 parts 视图，例如 'dz > 10'")
+    query_parser.add_argument("--limit", type=int, default=None, help="最多返回的行数")
+    query_parser.add_argument("--json", action="store_true", help="以 JSON-lines 输出")
+
+    subparsers.add_parser("stats", help="索引统计")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    catalog = Catalog(args.db)
+    try:
+        if args.command == "scan":
+            stats = catalog.scan(args.directories, args.jobs, brep=not args.no_brep,
+                                 backups=args.backups, full=args.full)
+            rate = stats["indexed"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+            print(f"索引: {args.db}")
+            print(f"- 文件: {stats['files']}，重新索引 {stats['indexed']}，未变 {stats['unchanged']}，"
+                  f"移除 {stats['removed']}，损坏 {stats['errors']}")
+            print(f"- 耗时: {stats['seconds']:.2f} 秒（{rate:.0f} 文件/秒）")
+        elif args.command == "query":
+            try:
+                where, params = build_filter(args)
+                rows = catalog.query(where, params, args.limit)
+            except (ValueError, sqlite3.Error) as e:
+                print(f"查询失败: {e}")
+                return 1
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False) if args.json else _format_row(row))
+            if not args.json:
+                print(f"共 {len(rows)} 个对象")
+        else:
+            stats = catalog.stats()
+            print(f"索引: {args.db}")
+            print(f"- 文件: 正常 {stats['files'].get('ok', 0)}，损坏 {stats['files'].get('error', 0)}")
+            for type_name, count in stats["types"]:
+                print(f"- {type_name}: {count}")
+            for path, error in stats["errors"]:
+                print(f"✗ {path}: {error}")
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
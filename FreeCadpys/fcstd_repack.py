@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+保存后处理：按指定压缩级别重写 .FCStd、把 BRep 形状放进按内容寻址的共享存储、清理 .FCBak 备份
+
+doc.saveAs 总是以 FreeCAD 的默认压缩级别写整个 zip，覆盖已有文件时还会留下 <名称>.<时间>.FCBak。
+批量生成时这两部分都占 I/O 和磁盘。本模块在保存之后：
+
+- 压缩模式 stored（不压缩，写入最快）/ fast（deflate 1）/ best（deflate 9），成员顺序和时间不变
+- --store 指定共享存储时，.brp 形状按 SHA-256 写入 <存储>/<前两位>/<哈希>.brp（同一内容只写一次），
+  从 .FCStd 中移除并记录在 BRepStore.json 中。这样的文件 FreeCAD 不能直接打开，
+  需要先用 hydrate 把形状放回去；fcstd_index.py 会从存储中读取形状
+- 备份清理：每个文档只保留最新的 N 个 .FCBak，和 / 或删除超过 D 天的备份
+- 每种模式统计文件数、处理前后的大小、耗时和吞吐量
+
+create_cube.py 的 --repack / --brepStore / --keepBackups 和 draft_line_example.py 的同名选项在保存后调用本模块。
+
+用法:
+    python FreeCadpys/fcstd_repack.py repack FCStds --mode=stored --store=.brep_store --keep-backups=1
+    python FreeCadpys/fcstd_repack.py hydrate FCStds/part.FCStd --mode=fast      # 放回形状，可以用 FreeCAD 打开
+    python FreeCadpys/fcstd_repack.py prune FCStds --keep-backups=0 --max-age-days=7
+    python FreeCadpys/fcstd_repack.py compare FCStds                              # 比较各模式的吞吐量和大小
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+import tempfile
+
+import stage_trace
+
+# 压缩模式 -> (压缩方式, 压缩级别)
+MODES = {
+    "stored": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "best": (zipfile.ZIP_DEFLATED, 9),
+}
+
+# 记录移到共享存储中的形状
+STORE_MANIFEST = "BRepStore.json"
+BREP_SUFFIXES = (".brp", ".brep")
+
+# FreeCAD 的备份文件名：<名称>.<年月日-时分秒>.FCBak，旧版本为 <名称>.FCBak
+BACKUP_PATTERN = re.compile(r"^(?P<stem>.+?)(\.\d{8}-\d{6})?\.FCBak$", re.IGNORECASE)
+
+
+def payload_path(store, digest):
+    return os.path.join(store, digest[:2], digest + ".brp")
+
+
+def put_payload(store, data):
+    """把形状写入共享存储，返回 (哈希, 是否新写入)"""
+    digest = hashlib.sha256(data).hexdigest()
+    target = payload_path(store, digest)
+    if os.path.exists(target):
+        return digest, False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return digest, True
+
+
+def read_manifest(archive):
+    """读取 BRepStore.json，没有时返回 None"""
+    try:
+        return json.loads(archive.read(STORE_MANIFEST).decode("utf-8"))
+    except KeyError:
+        return None
+
+
+def open_payload(manifest, member, store=None):
+    """打开移到共享存储中的形状（二进制流），store 为 None 时使用记录中的存储目录"""
+    entry = manifest["members"][member]
+    return open(payload_path(store or manifest["store"], entry["sha256"]), "rb")
+
+
+def _write_archive(path, members, mode):
+    """把 [(ZipInfo, 数据)] 按模式写入临时文件再替换 path，返回新文件大小"""
+    compress_type, level = MODES[mode]
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".repack")
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp, "w", compress_type, compresslevel=level) as archive:
+            for source, data in members:
+                info = zipfile.ZipInfo(source.filename, date_time=source.date_time)
+                info.external_attr = source.external_attr
+                info.compress_type = compress_type
+                archive.writestr(info, data, compress_type, level)
+        # mkstemp 创建的文件权限为 0600，改成与原文件相同
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return os.path.getsize(path)
+
+
+def repack(path, mode="fast", store=None):
+    """按模式重写一个 .FCStd；store 不为 None 时把形状移到共享存储
+
+    返回 {"path", "mode", "bytes_in", "bytes_out", "raw_bytes", "payloads", "new_payloads",
+    "shared_bytes", "seconds"}，shared_bytes 为已在存储中、没有重复写入的形状字节数。
+    """
+    started = time.perf_counter()
+    bytes_in = os.path.getsize(path)
+    with zipfile.ZipFile(path) as archive:
+        manifest = read_manifest(archive)
+        members = [(info, archive.read(info)) for info in archive.infolist()
+                   if info.filename != STORE_MANIFEST]
+    report = {"path": path, "mode": mode, "bytes_in": bytes_in, "raw_bytes": sum(len(data) for _, data in members),
+              "payloads": 0, "new_payloads": 0, "shared_bytes": 0}
+
+    if store is not None:
+        store = os.path.abspath(store)
+        previous = manifest
+        manifest = {"version": 1, "store": store, "members": {}}
+        # 之前已移到另一个存储中的形状复制到新存储
+        for member, entry in (previous or {"members": {}})["members"].items():
+            if previous["store"] != store:
+                with open_payload(previous, member) as f:
+                    put_payload(store, f.read())
+            manifest["members"][member] = entry
+        kept = []
+        for info, data in members:
+            if not info.filename.lower().endswith(BREP_SUFFIXES):
+                kept.append((info, data))
+                continue
+            digest, new = put_payload(store, data)
+            manifest["members"][info.filename] = {"sha256": digest, "size": len(data)}
+            report["payloads"] += 1
+            report["new_payloads"] += new
+            report["shared_bytes"] += 0 if new else len(data)
+        members = kept
+    if manifest is not None:
+        data = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+        members.append((zipfile.ZipInfo(STORE_MANIFEST, date_time=time.localtime()[:6]), data))
+
+    report["bytes_out"] = _write_archive(path, members, mode)
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def hydrate(path, mode="fast", store=None):
+    """把共享存储中的形状放回 .FCStd（校验哈希），返回放回的形状数；不是精简过的文件时返回 0"""
+    with zipfile.ZipFile(path) as archive:
+        manifest = read_manifest(archive)
+        if manifest is None:
+            return 0
+        members = [(info, archive.read(info)) for info in archive.infolist()
+                   if info.filename != STORE_MANIFEST]
+        date_time = archive.getinfo(STORE_MANIFEST).date_time
+    for member, entry in manifest["members"].items():
+        with open_payload(manifest, member, store) as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            raise ValueError(f"共享存储中的形状已损坏: {member} ({entry['sha256']})")
+        members.append((zipfile.ZipInfo(member, date_time=date_time), data))
+    _write_archive(path, members, mode)
+    return len(manifest["members"])
+
+
+def find_backups(fcstd_path):
+    """同目录下属于该文档的 .FCBak，按修改时间从新到旧排列"""
+    directory = os.path.dirname(os.path.abspath(fcstd_path))
+    stem = os.path.splitext(os.path.basename(fcstd_path))[0]
+    backups = []
+    for entry in os.scandir(directory):
+        match = BACKUP_PATTERN.match(entry.name)
+        if match and match.group("stem") == stem and entry.is_file():
+            backups.append((entry.stat().st_mtime, entry.path))
+    return [path for _, path in sorted(backups, reverse=True)]
+
+
+def prune_backups(fcstd_path, keep=None, max_age_days=None, dry_run=False):
+    """按保留策略删除文档的 .FCBak：只保留最新的 keep 个，并删除超过 max_age_days 天的，返回删除的路径"""
+    if keep is None and max_age_days is None:
+        return []
+    now = time.time()
+    removed = []
+    for index, path in enumerate(find_backups(fcstd_path)):
+        expired = max_age_days is not None and now - os.path.getmtime(path) > max_age_days * 86400
+        if (keep is not None and index >= keep) or expired:
+            if not dry_run:
+                os.remove(path)
+            removed.append(path)
+    return removed
+
+
+class Repacker:
+    """保存后处理步骤：重写压缩、共享形状、清理备份，并按模式累计统计
+
+    mode 为 None 时不重写（除非指定了 store），keep_backups / max_age_days 都为 None 时不清理备份。
+    """
+
+    def __init__(self, mode=None, store=None, keep_backups=None, max_age_days=None):
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"未知的压缩模式: {mode}（可选 {', '.join(MODES)}）")
+        self.mode = mode or ("fast" if store else None)
+        self.store = os.path.abspath(store) if store else None
+        self.keep_backups = keep_backups
+        self.max_age_days = max_age_days
+        self.totals = {}
+
+    @property
+    def enabled(self):
+        return bool(self.mode or self.keep_backups is not None or self.max_age_days is not None)
+
+    def key(self):
+        """影响输出内容的设置（增量构建的参数哈希用）"""
+        return {"repack": self.mode, "brepStore": self.store}
+
+    def process(self, path):
+        """处理一个刚保存的 .FCStd，返回报告（见 repack()，另有 "pruned"）"""
+        report = {"path": path, "mode": None, "pruned": []}
+        if self.mode:
+            with stage_trace.span("repack", mode=self.mode) as span:
+                report.update(repack(path, self.mode, self.store))
+                span.set(bytes_in=report["bytes_in"], bytes_out=report["bytes_out"])
+            self._add(report)
+        if self.keep_backups is not None or self.max_age_days is not None:
+            with stage_trace.span("prune_backups"):
+                report["pruned"] = prune_backups(path, self.keep_backups, self.max_age_days)
+            self.totals.setdefault("pruned", 0)
+            self.totals["pruned"] += len(report["pruned"])
+        return report
+
+    def _add(self, report):
+        totals = self.totals.setdefault(report["mode"], dict.fromkeys(
+            ("files", "bytes_in", "bytes_out", "raw_bytes", "payloads", "new_payloads", "shared_bytes",
+             "seconds"), 0))
+        totals["files"] += 1
+        for name in totals:
+            if name != "files":
+                totals[name] += report[name]
+
+    def format_summary(self):
+        lines = []
+        for mode in MODES:
+            if mode in self.totals:
+                lines.append(format_totals(mode, self.totals[mode]))
+        if self.totals.get("pruned"):
+            lines.append(f"- 已删除 {self.totals['pruned']} 个 .FCBak 备份")
+        return "\n".join(lines)
+
+
+def format_totals(mode, totals):
+    seconds = totals["seconds"]
+    rate = totals["files"] / seconds if seconds > 0 else 0.0
+    throughput = totals["raw_bytes"] / seconds / (1 << 20) if seconds > 0 else 0.0
+    ratio = totals["bytes_out"] / totals["bytes_in"] if totals["bytes_in"] else 0.0
+    text = (f"- {mode:<6} {totals['files']} 个文件，{totals['bytes_in'] / 1024:.1f} KB -> "
+            f"{totals['bytes_out'] / 1024:.1f} KB（{ratio:.0%}），{seconds:.3f} 秒"
+            f"（{rate:.0f} 文件/秒，{throughput:.1f} MB/秒）")
+    if totals["payloads"]:
+        text += (f"，形状 {totals['payloads']} 个，新写入存储 {totals['new_payloads']} 个，"
+                 f"共享 {totals['shared_bytes'] / 1024:.1f} KB")
+    return text
+
+
+def find_documents(paths):
+    """命令行参数中的文件和目录（递归）-> .FCStd 路径列表"""
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                documents += [os.path.join(directory, name) for name in sorted(names)
+                              if name.lower().endswith(".fcstd")]
+        else:
+            documents.append(path)
+    return documents
+
+
+def backup_documents(paths):
+    """命令行参数中的备份所属的文档路径（原文档已删除的备份也包括在内）"""
+    documents = set()
+    for path in paths:
+        if os.path.isdir(path):
+            names = [os.path.join(directory, name) for directory, _, files in os.walk(path) for name in files]
+        else:
+            names = [path]
+        for name in names:
+            match = BACKUP_PATTERN.match(os.path.basename(name))
+            if match:
+                documents.add(os.path.join(os.path.dirname(name), match.group("stem") + ".FCStd"))
+            elif name.lower().endswith(".fcstd"):
+                documents.add(name)
+    return sorted(documents)
+
+
+def compare(documents, store=False):
+    """在临时目录中对同一批文件分别执行各模式，返回 {模式: 统计}"""
+    results = {}
+    readable = []
+    for path in documents:
+        try:
+            with zipfile.ZipFile(path):
+                readable.append(path)
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"✗ 跳过 {path}: {e}")
+    documents = readable
+    with tempfile.TemporaryDirectory(prefix="fcstd_repack_") as workdir:
+        for mode in MODES:
+            repacker = Repacker(mode, os.path.join(workdir, f"store-{mode}") if store else None)
+            copies = []
+            for index, path in enumerate(documents):
+                copy = os.path.join(workdir, mode, f"{index}.FCStd")
+                os.makedirs(os.path.dirname(copy), exist_ok=True)
+                shutil.copyfile(path, copy)
+                copies.append(copy)
+            for copy in copies:
+                repacker.process(copy)
+            results[mode] = repacker.totals.get(mode)
+            shutil.rmtree(os.path.join(workdir, mode))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重写 .FCStd 压缩、共享 BRep 形状、清理 .FCBak 备份")
+    subparsers = parser.add_subparsers(dest="command")
+
+    repack_parser = subparsers.add_parser("repack", help="按压缩模式重写文件")
+    hydrate_parser = subparsers.add_parser("hydrate", help="把共享存储中的形状放回文件")
+    prune_parser = subparsers.add_parser("prune", help="按保留策略清理 .FCBak")
+    compare_parser = subparsers.add_parser("compare", help="比较各压缩模式的吞吐量和大小（不修改原文件）")
+    for sub in (repack_parser, hydrate_parser, prune_parser, compare_parser):
+        sub.add_argument("paths", nargs="+", help=".FCStd 文件或目录（递归）")
+    for sub in (repack_parser, hydrate_parser):
+        sub.add_argument("--mode", choices=list(MODES), default="fast", help="压缩模式 (默认 fast)")
+        sub.add_argument("--store", default=None, help="BRep 共享存储目录")
+    for sub in (repack_parser, prune_parser):
+        sub.add_argument("--keep-backups", type=int, default=None, help="每个文档保留的 .FCBak 个数")
+        sub.add_argument("--max-age-days", type=float, default=None, help="删除超过这么多天的 .FCBak")
+    prune_parser.add_argument("--dry-run", action="store_true", help="只列出要删除的备份")
+    compare_parser.add_argument("--store", action="store_true", help="同时测量共享形状存储")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    documents = find_documents(args.paths)
+    failed = 0
+    if args.command == "repack":
+        repacker = Repacker(args.mode, args.store, args.keep_backups, args.max_age_days)
+        for path in documents:
+            try:
+                repacker.process(path)
+            except (OSError, zipfile.BadZipFile, ValueError) as e:
+                failed += 1
+                print(f"✗ {path}: {e}")
+        print(f"重写完成: {len(documents)} 个文件，失败 {failed} 个")
+        print(repacker.format_summary())
+    elif args.command == "hydrate":
+        restored = 0
+        for path in documents:
+            try:
+                restored += hydrate(path, args.mode, args.store)
+            except (OSError, zipfile.BadZipFile, ValueError) as e:
+                failed += 1
+                print(f"✗ {path}: {e}")
+        print(f"已放回 {restored} 个形状（{len(documents)} 个文件，失败 {failed} 个）")
+    elif args.command == "prune":
+        if args.keep_backups is None and args.max_age_days is None:
+            print("请指定 --keep-backups 或 --max-age-days")
+            return 1
+        removed = []
+        for document in backup_documents(args.paths):
+            removed += prune_backups(document, args.keep_backups, args.max_age_days, args.dry_run)
+        for path in removed:
+            print(f"{'将删除' if args.dry_run else '已删除'} {path}")
+        print(f"共 {len(removed)} 个 .FCBak")
+    else:
+        results = compare(documents, args.store)
+        print("压缩模式比较（处理前 -> 处理后）:")
+        for mode, totals in results.items():
+            print(format_totals(mode, totals) if totals else f"- {mode:<6} 没有可处理的文件")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
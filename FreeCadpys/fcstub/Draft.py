@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Draft 模块替身：直线与折线
+"""
+
+import FreeCAD
+from FreeCAD import Vector
+import Part
+
+
+def _active_document():
+    if FreeCAD.ActiveDocument is None:
+        raise RuntimeError("没有活动文档")
+    return FreeCAD.ActiveDocument
+
+
+def makeLine(p1, p2=None):
+    if p2 is None:
+        # makeLine(edge) 形式
+        p1, p2 = p1.params["start"], p1.params["end"]
+    obj = _active_document().addObject("Part::Part2DObjectPython", "Line")
+    obj.Start = Vector(p1)
+    obj.End = Vector(p2)
+    obj.Shape = Part.makeLine(p1, p2)
+    return obj
+
+
+def makeWire(points, closed=False, face=None, support=None):
+    points = [Vector(point) for point in points]
+    if closed:
+        points.append(points[0])
+    obj = _active_document().addObject("Part::Part2DObjectPython", "Wire")
+    obj.Points = points
+    obj.Closed = closed
+    obj.Shape = Part.makeCompound([Part.makeLine(a, b) for a, b in zip(points, points[1:])])
+    return obj
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+"""
+FreeCAD 模块替身：文档、文档对象、Vector / Rotation / Placement
+
+只实现 FreeCadpys 脚本用到的接口，几何计算放在 Part 替身中。
+保存的 .FCStd 与 FreeCAD 1.0 的布局一致：Document.xml + 每个形状一个 <对象名>.Shape.brp。
+设置环境变量 FC_STUB_STARTUP=<秒> 可以模拟 FreeCAD 的启动耗时，
+FC_STUB_CRASH_RATE=<0~1> 可以让保存文档时按该概率直接退出进程，模拟 FreeCAD 崩溃。
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import types
+import uuid
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+IS_STUB = True
+GuiUp = False
+
+_VERSION = ['1', '0', '2', 'stub']
+
+# .FCStd 中 zip 的压缩级别（FreeCAD 默认值为 3）
+COMPRESSION_LEVEL = 3
+
+if os.environ.get("FC_STUB_STARTUP"):
+    time.sleep(float(os.environ["FC_STUB_STARTUP"]))
+
+
+def Version():
+    return list(_VERSION)
+
+
+class Vector:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        if isinstance(x, (Vector, tuple, list)):
+            x, y, z = x
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z)[index]
+
+    def __add__(self, other):
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __neg__(self):
+        return Vector(-self.x, -self.y, -self.z)
+
+    def __mul__(self, other):
+        # 与 FreeCAD 一致：Vector * Vector 为点积，Vector * 数 为缩放
+        if isinstance(other, Vector):
+            return self.dot(other)
+        return Vector(self.x * other, self.y * other, self.z * other)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Vector) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"Vector ({self.x}, {self.y}, {self.z})"
+
+    @property
+    def Length(self):
+        return math.sqrt(self.dot(self))
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def cross(self, other):
+        return Vector(self.y * other.z - self.z * other.y,
+                      self.z * other.x - self.x * other.z,
+                      self.x * other.y - self.y * other.x)
+
+    def normalize(self):
+        length = self.Length
+        if length > 0:
+            self.x, self.y, self.z = self.x / length, self.y / length, self.z / length
+        return self
+
+    def distanceToPoint(self, other):
+        return (self - other).Length
+
+
+def _quat_multiply(a, b):
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+    return (aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+            aw * bw - ax * bx - ay * by - az * bz)
+
+
+def _quat_from_axis(axis, angle):
+    axis = Vector(axis).normalize()
+    s = math.sin(angle / 2)
+    return (axis.x * s, axis.y * s, axis.z * s, math.cos(angle / 2))
+
+
+class Rotation:
+    """四元数旋转，构造方式与 FreeCAD 相同：
+
+    Rotation()                    单位旋转
+    Rotation(yaw, pitch, roll)    欧拉角（度），依次绕 Z、Y、X 轴
+    Rotation(axis, angle)         绕轴旋转 angle 度
+    Rotation(x, y, z, w)          四元数
+    """
+
+    def __init__(self, *args):
+        if not args:
+            self.Q = (0.0, 0.0, 0.0, 1.0)
+        elif len(args) == 1 and isinstance(args[0], Rotation):
+            self.Q = args[0].Q
+        elif len(args) == 2:
+            self.Q = _quat_from_axis(args[0], math.radians(args[1]))
+        elif len(args) == 3:
+            yaw, pitch, roll = (math.radians(float(value)) for value in args)
+            q = _quat_multiply(_quat_from_axis((0, 0, 1), yaw), _quat_from_axis((0, 1, 0), pitch))
+            self.Q = _quat_multiply(q, _quat_from_axis((1, 0, 0), roll))
+        elif len(args) == 4:
+            norm = math.sqrt(sum(float(value) ** 2 for value in args))
+            self.Q = tuple(float(value) / norm for value in args)
+        else:
+            raise TypeError("Rotation() 参数无效")
+
+    @property
+    def Angle(self):
+        w = max(-1.0, min(1.0, self.Q[3]))
+        return 2 * math.acos(abs(w))
+
+    @property
+    def Axis(self):
+        x, y, z, w = self.Q
+        s = math.sqrt(max(0.0, 1 - w * w))
+        if s < 1e-12:
+            return Vector(0, 0, 1)
+        sign = 1 if w >= 0 else -1
+        return Vector(sign * x / s, sign * y / s, sign * z / s)
+
+    def isIdentity(self):
+        return self.Angle < 1e-12
+
+    def matrix(self):
+        x, y, z, w = self.Q
+        return ((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)),
+                (2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)),
+                (2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)))
+
+    def multVec(self, vector):
+        m = self.matrix()
+        return Vector(*(row[0] * vector[0] + row[1] * vector[1] + row[2] * vector[2] for row in m))
+
+    def multiply(self, other):
+        return Rotation(*_quat_multiply(self.Q, other.Q))
+
+    __mul__ = multiply
+
+    def inverted(self):
+        x, y, z, w = self.Q
+        return Rotation(-x, -y, -z, w)
+
+    def getYawPitchRoll(self):
+        x, y, z, w = self.Q
+        yaw = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+        pitch = math.asin(max(-1.0, min(1.0, 2 * (w * y - z * x))))
+        roll = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+        return tuple(math.degrees(value) for value in (yaw, pitch, roll))
+
+    def __repr__(self):
+        return "Rotation ({}, {}, {}, {})".format(*self.Q)
+
+
+class Placement:
+    def __init__(self, base=None, rotation=None):
+        if isinstance(base, Placement):
+            base, rotation = base.Base, base.Rotation
+        self.Base = Vector(base) if base is not None else Vector()
+        self.Rotation = Rotation(rotation) if rotation is not None else Rotation()
+
+    def copy(self):
+        return Placement(self.Base, self.Rotation)
+
+    def isIdentity(self):
+        return self.Base.Length < 1e-12 and self.Rotation.isIdentity()
+
+    def isSame(self, other, tol=1e-12):
+        # q 与 -q 表示同一个旋转
+        dot = abs(sum(a * b for a, b in zip(self.Rotation.Q, other.Rotation.Q)))
+        return (self.Base - other.Base).Length <= tol and 1 - dot <= max(tol, 1e-15)
+
+    def multVec(self, vector):
+        return self.Rotation.multVec(vector) + self.Base
+
+    def multiply(self, other):
+        return Placement(self.multVec(other.Base), self.Rotation.multiply(other.Rotation))
+
+    def inverse(self):
+        inverted = self.Rotation.inverted()
+        return Placement(-inverted.multVec(self.Base), inverted)
+
+    def __repr__(self):
+        return f"Placement [Pos={tuple(self.Base)}, Rot={self.Rotation.Q}]"
+
+
+# from FreeCAD import Base
+Base = types.ModuleType("FreeCAD.Base")
+Base.Vector = Vector
+Base.Rotation = Rotation
+Base.Placement = Placement
+sys.modules["FreeCAD.Base"] = Base
+
+
+class _Console:
+    @staticmethod
+    def PrintMessage(text):
+        sys.stdout.write(text)
+
+    @staticmethod
+    def PrintLog(text):
+        pass
+
+    @staticmethod
+    def PrintWarning(text):
+        sys.stderr.write(text)
+
+    @staticmethod
+    def PrintError(text):
+        sys.stderr.write(text)
+
+
+Console = _Console()
+
+
+def _fmt(value):
+    return f"{value:.16f}"
+
+
+class DocumentObject:
+    """文档对象：Part::Feature / Part::Cut / Draft 对象等共用"""
+
+    def __init__(self, document, type_id, name, object_id):
+        self.Document = document
+        self.TypeId = type_id
+        self.Name = name
+        self.Label = name
+        self.Visibility = True
+        self.ID = object_id
+        self._shape = None
+        self._placement = Placement()
+
+    @property
+    def Shape(self):
+        return self._shape
+
+    @Shape.setter
+    def Shape(self, shape):
+        self._shape = shape.copy()
+        self._placement = self._shape.Placement
+
+    @property
+    def Placement(self):
+        return self._placement
+
+    @Placement.setter
+    def Placement(self, placement):
+        self._placement = placement.copy()
+        if self._shape is not None:
+            self._shape.Placement = self._placement
+
+    def dependencies(self):
+        return [link for link in (getattr(self, "Base", None), getattr(self, "Tool", None))
+                if isinstance(link, DocumentObject)]
+
+    def execute(self):
+        if self.TypeId == "Part::Cut" and self.Base is not None and self.Tool is not None:
+            self.Shape = self.Base.Shape.cut(self.Tool.Shape)
+
+    def recompute(self, recursive=False):
+        self.execute()
+        return True
+
+    def _properties_xml(self, indent):
+        pad = " " * indent
+        props = [
+            ("Label", "App::PropertyString", f'<String value={quoteattr(self.Label)}/>'),
+        ]
+        for name in ("Base", "Tool"):
+            link = getattr(self, name, None)
+            if isinstance(link, DocumentObject):
+                props.append((name, "App::PropertyLink", f'<Link value="{link.Name}"/>'))
+        for name in ("Start", "End"):
+            value = getattr(self, name, None)
+            if isinstance(value, Vector):
+                props.append((name, "App::PropertyVectorDistance",
+                              f'<PropertyVector valueX="{_fmt(value.x)}" valueY="{_fmt(value.y)}" '
+                              f'valueZ="{_fmt(value.z)}"/>'))
+        placement = self.Placement
+        q = placement.Rotation.Q
+        axis = placement.Rotation.Axis
+        props.append(("Placement", "App::PropertyPlacement",
+                      f'<PropertyPlacement Px="{_fmt(placement.Base.x)}" Py="{_fmt(placement.Base.y)}" '
+                      f'Pz="{_fmt(placement.Base.z)}" Q0="{_fmt(q[0])}" Q1="{_fmt(q[1])}" '
+                      f'Q2="{_fmt(q[2])}" Q3="{_fmt(q[3])}" A="{_fmt(placement.Rotation.Angle)}" '
+                      f'Ox="{_fmt(axis.x)}" Oy="{_fmt(axis.y)}" Oz="{_fmt(axis.z)}"/>'))
+        if self._shape is not None:
+            props.append(("Shape", "Part::PropertyPartShape",
+                          f'<Part ElementMap="0.4" file="{self.Name}.Shape.brp"/>'))
+        props.append(("Visibility", "App::PropertyBool",
+                      f'<Bool value="{"true" if self.Visibility else "false"}"/>'))
+
+        lines = [f'{pad}<Object name="{self.Name}">',
+                 f'{pad}    <Properties Count="{len(props)}" TransientCount="0">']
+        for name, type_name, body in props:
+            lines.append(f'{pad}        <Property name="{name}" type="{type_name}">')
+            lines.append(f'{pad}            {body}')
+            lines.append(f'{pad}        </Property>')
+        lines.append(f'{pad}    </Properties>')
+        lines.append(f'{pad}</Object>')
+        return "\n".join(lines)
+
+
+class Document:
+    _next_id = 1
+
+    def __init__(self, name, label=None):
+        self.Name = name
+        self.Label = label or name
+        self.FileName = ""
+        self.Objects = []
+        self.Uid = str(uuid.uuid4())
+        self.CreationDate = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def _unique_name(self, name):
+        name = "".join(ch if ch.isalnum() or ch == "_" else "_" for ch in name) or "Unnamed"
+        if name[0].isdigit():
+            name = "_" + name
+        existing = {obj.Name for obj in self.Objects}
+        if name not in existing:
+            return name
+        counter = 1
+        while f"{name}{counter:03d}" in existing:
+            counter += 1
+        return f"{name}{counter:03d}"
+
+    def addObject(self, type_id, name=None):
+        obj = DocumentObject(self, type_id, self._unique_name(name or type_id.split("::")[-1]),
+                             Document._next_id)
+        Document._next_id += 1
+        if type_id == "Part::Cut":
+            obj.Base = None
+            obj.Tool = None
+        self.Objects.append(obj)
+        return obj
+
+    def getObject(self, name):
+        for obj in self.Objects:
+            if obj.Name == name:
+                return obj
+        return None
+
+    def getObjectsByLabel(self, label):
+        return [obj for obj in self.Objects if obj.Label == label]
+
+    def removeObject(self, name):
+        self.Objects = [obj for obj in self.Objects if obj.Name != name]
+
+    def recompute(self):
+        # 对象按创建顺序排列，依赖的对象总是先创建
+        for obj in self.Objects:
+            obj.execute()
+        return len(self.Objects)
+
+    def _document_xml(self):
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        doc_props = [
+            ("Comment", "App::PropertyString", '<String value=""/>'),
+            ("CreatedBy", "App::PropertyString", '<String value=""/>'),
+            ("CreationDate", "App::PropertyString", f'<String value="{self.CreationDate}"/>'),
+            ("Label", "App::PropertyString", f'<String value={quoteattr(self.Label)}/>'),
+            ("LastModifiedDate", "App::PropertyString", f'<String value="{now}"/>'),
+            ("Uid", "App::PropertyUUID", f'<Uuid value="{self.Uid}"/>'),
+        ]
+        lines = [
+            "<?xml version='1.0' encoding='utf-8'?>",
+            "<!--",
+            " FreeCAD Document, see https://www.freecad.org for more information...",
+            "-->",
+            f'<Document SchemaVersion="4" ProgramVersion="{".".join(_VERSION[:3])}R0 (stub)" '
+            f'FileVersion="1" StringHasher="1">',
+            f'    <Properties Count="{len(doc_props)}" TransientCount="0">',
+        ]
+        for name, type_name, body in doc_props:
+            lines.append(f'        <Property name="{name}" type="{type_name}">')
+            lines.append(f'            {body}')
+            lines.append('        </Property>')
+        lines.append('    </Properties>')
+        lines.append(f'    <Objects Count="{len(self.Objects)}" Dependencies="1">')
+        for obj in self.Objects:
+            deps = obj.dependencies()
+            if deps:
+                lines.append(f'        <ObjectDeps Name="{obj.Name}" Count="{len(deps)}">')
+                for dep in deps:
+                    lines.append(f'            <Dep Name="{dep.Name}"/>')
+                lines.append('        </ObjectDeps>')
+            else:
+                lines.append(f'        <ObjectDeps Name="{obj.Name}" Count="0"/>')
+        for obj in self.Objects:
+            lines.append(f'        <Object type="{obj.TypeId}" name="{obj.Name}" id="{obj.ID}" />')
+        lines.append('    </Objects>')
+        lines.append(f'    <ObjectData Count="{len(self.Objects)}">')
+        for obj in self.Objects:
+            lines.append(obj._properties_xml(8))
+        lines.append('    </ObjectData>')
+        lines.append('</Document>')
+        return "\n".join(lines) + "\n"
+
+    def save(self):
+        if not self.FileName:
+            raise ValueError("文档尚未指定文件名，请使用 saveAs()")
+        path = self.FileName
+        if random.random() < float(os.environ.get("FC_STUB_CRASH_RATE") or 0):
+            os._exit(139)
+        # 与 FreeCAD 一样，覆盖已有文件前把旧文件改名为 <名称>.<时间>.FCBak
+        if os.path.exists(path):
+            stem = os.path.splitext(path)[0]
+            os.replace(path, f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}.FCBak")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESSION_LEVEL) as archive:
+            archive.writestr("Document.xml", self._document_xml())
+            for obj in self.Objects:
+                if obj.Shape is not None:
+                    archive.writestr(f"{obj.Name}.Shape.brp", obj.Shape.exportBrepToString())
+        return True
+
+    def saveAs(self, path):
+        self.FileName = os.path.abspath(path)
+        self.Label = os.path.splitext(os.path.basename(path))[0]
+        return self.save()
+
+
+ActiveDocument = None
+_documents = {}
+
+
+def newDocument(name=None, label=None):
+    global ActiveDocument
+    base = name or "Unnamed"
+    unique = base
+    counter = 1
+    while unique in _documents:
+        unique = f"{base}{counter}"
+        counter += 1
+    doc = Document(unique, label)
+    _documents[unique] = doc
+    ActiveDocument = doc
+    return doc
+
+
+def closeDocument(name):
+    global ActiveDocument
+    doc = _documents.pop(name, None)
+    if doc is None:
+        raise NameError(f"未知文档 '{name}'")
+    if ActiveDocument is doc:
+        ActiveDocument = next(iter(_documents.values()), None)
+
+
+def listDocuments():
+    return dict(_documents)
+
+
+def getDocument(name):
+    return _documents[name]
+
+
+def setActiveDocument(name):
+    global ActiveDocument
+    ActiveDocument = _documents[name]
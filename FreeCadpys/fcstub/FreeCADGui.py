@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+FreeCADGui 模块替身：始终表现为没有图形界面（freecadcmd）的状态
+"""
+
+IS_STUB = True
+
+ActiveDocument = None
+
+
+def showMainWindow():
+    raise RuntimeError("FreeCAD 替身模块不支持图形界面")
+
+
+def getMainWindow():
+    return None
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Mesh 模块替身：三角网格，可读写二进制 / ASCII STL，计算体积并检查是否封闭
+"""
+
+import os
+import struct
+from collections import Counter
+
+from FreeCAD import Vector
+
+
+def _normal(a, b, c):
+    return (b - a).cross(c - a).normalize()
+
+
+class Facet:
+    def __init__(self, points):
+        self.Points = [tuple(point) for point in points]
+        a, b, c = (Vector(point) for point in points)
+        self.Normal = _normal(a, b, c)
+
+
+class Mesh:
+    def __init__(self, source=None):
+        self._triangles = []
+        if isinstance(source, str):
+            self.read(source)
+        elif source is not None:
+            self.addFacets(source)
+
+    def addFacets(self, triangles):
+        for triangle in triangles:
+            self._triangles.append(tuple(Vector(point) for point in triangle))
+
+    @property
+    def Facets(self):
+        return [Facet(triangle) for triangle in self._triangles]
+
+    @property
+    def CountFacets(self):
+        return len(self._triangles)
+
+    @property
+    def Topology(self):
+        index = {}
+        faces = []
+        for triangle in self._triangles:
+            faces.append(tuple(index.setdefault(tuple(point), len(index)) for point in triangle))
+        return [Vector(point) for point in index], faces
+
+    @property
+    def CountPoints(self):
+        return len(self.Topology[0])
+
+    @property
+    def Volume(self):
+        return sum(a.dot(b.cross(c)) for a, b, c in self._triangles) / 6.0
+
+    @property
+    def Area(self):
+        return sum((b - a).cross(c - a).Length for a, b, c in self._triangles) / 2.0
+
+    def isSolid(self):
+        """每条有向边都恰好对应一条反向边时网格封闭且朝向一致"""
+        _, faces = self.Topology
+        edges = Counter()
+        for a, b, c in faces:
+            for edge in ((a, b), (b, c), (c, a)):
+                edges[edge] += 1
+        return all(count == 1 and edges[(edge[1], edge[0])] == 1 for edge, count in edges.items())
+
+    def write(self, path, format=""):
+        # 与 FreeCAD 一致：.stl 写二进制，.ast 或 format="AST" 写 ASCII
+        if format.upper() == "AST" or os.path.splitext(path)[1].lower() == ".ast":
+            with open(path, "w", encoding="ascii") as f:
+                f.write("solid Mesh\n")
+                for a, b, c in self._triangles:
+                    n = _normal(a, b, c)
+                    f.write(f"  facet normal {n.x:.6e} {n.y:.6e} {n.z:.6e}\n    outer loop\n")
+                    for point in (a, b, c):
+                        f.write(f"      vertex {point.x:.6e} {point.y:.6e} {point.z:.6e}\n")
+                    f.write("    endloop\n  endfacet\n")
+                f.write("endsolid Mesh\n")
+            return
+        with open(path, "wb") as f:
+            f.write(b"MESH-MESH-MESH-MESH-MESH-MESH-MESH-MESH".ljust(80, b" "))
+            f.write(struct.pack("<I", len(self._triangles)))
+            for a, b, c in self._triangles:
+                f.write(struct.pack("<12fH", *_normal(a, b, c), *a, *b, *c, 0))
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) >= 84:
+            count = struct.unpack_from("<I", data, 80)[0]
+            if 84 + count * 50 == len(data):
+                for i in range(count):
+                    values = struct.unpack_from("<12f", data, 84 + i * 50)
+                    self._triangles.append((Vector(*values[3:6]), Vector(*values[6:9]),
+                                            Vector(*values[9:12])))
+                return
+        points = [Vector(*map(float, line.split()[1:4]))
+                  for line in data.decode("ascii", "replace").splitlines()
+                  if line.strip().startswith("vertex")]
+        self._triangles.extend(zip(points[0::3], points[1::3], points[2::3]))
+
+
+def read(path):
+    return Mesh(path)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+MeshPart 模块替身：把 Part 替身的形状网格化
+
+长方体输出 12 个三角形；圆柱按弦高误差（LinearDeflection）和角度误差（AngularDeflection）决定分段数；
+差集网格化基体，再加上刀具圆柱在基体内的侧面（朝内，端面不挖孔，网格不封闭，
+只用于让三角形数量和弦高误差随网格参数变化）；复合体逐个子形状网格化，直线没有面。
+设置环境变量 FC_STUB_MESH_DELAY=<秒> 可以模拟网格化耗时（差集按 4 倍计）。
+"""
+
+import os
+import math
+import time
+
+from FreeCAD import Vector
+import Mesh
+
+# 长方体 6 个面（顶点编号见 Part.Shape._local_points，z、y、x 依次变化），逆时针朝外
+BOX_FACES = ((0, 2, 3, 1), (4, 5, 7, 6), (0, 1, 5, 4), (2, 6, 7, 3), (0, 4, 6, 2), (1, 3, 7, 5))
+
+
+def _box_triangles(shape):
+    points = shape.world_points()
+    triangles = []
+    for a, b, c, d in BOX_FACES:
+        triangles.append((points[a], points[b], points[c]))
+        triangles.append((points[a], points[c], points[d]))
+    return triangles
+
+
+def _segments(radius, deflection, angular):
+    by_chord = math.ceil(math.pi / math.acos(max(-1.0, 1 - min(deflection, radius) / radius)))
+    by_angle = math.ceil(2 * math.pi / angular) if angular > 0 else 3
+    return max(3, by_chord, by_angle)
+
+
+def _cylinder_triangles(shape, deflection, angular, span=None, wall_only=False):
+    """span 为轴向的 (起点, 终点) 时只生成这一段；wall_only 时只生成朝内的侧面（差集的孔壁）"""
+    p = shape.params
+    radius, height = p["radius"], p["height"]
+    segments = _segments(radius, deflection, angular)
+    axis = Vector(p["dir"]).normalize()
+    u = axis.cross(Vector(1, 0, 0) if abs(axis.x) < 0.9 else Vector(0, 1, 0)).normalize()
+    v = axis.cross(u)
+    t0, t1 = span or (0.0, height)
+    bottom, top = p["pnt"] + axis * t0, p["pnt"] + axis * t1
+    ring = [u * (radius * math.cos(2 * math.pi * i / segments)) +
+            v * (radius * math.sin(2 * math.pi * i / segments)) for i in range(segments)]
+    triangles = []
+    for i in range(segments):
+        a, b = ring[i], ring[(i + 1) % segments]
+        if wall_only:
+            triangles.append((bottom + a, top + b, bottom + b))
+            triangles.append((bottom + a, top + a, top + b))
+            continue
+        triangles.append((bottom, bottom + b, bottom + a))
+        triangles.append((top, top + a, top + b))
+        triangles.append((bottom + a, bottom + b, top + b))
+        triangles.append((bottom + a, top + b, top + a))
+    return [tuple(shape.Placement.multVec(point) for point in triangle) for triangle in triangles]
+
+
+def _wall_span(base, tool):
+    """刀具圆柱轴向与长方体的坐标轴平行时，返回圆柱在长方体内的轴向范围，否则返回 None（整段）"""
+    if base.kind != "box" or tool.kind != "cylinder":
+        return None
+    axis = Vector(tool.params["dir"]).normalize()
+    p = base.params
+    lo = Vector(p["pnt"])
+    hi = lo + Vector(p["length"], p["width"], p["height"])
+    for k in range(3):
+        if abs(abs(axis[k]) - 1) < 1e-9:
+            ends = sorted(((lo[k] - tool.params["pnt"][k]) / axis[k], (hi[k] - tool.params["pnt"][k]) / axis[k]))
+            return max(0.0, ends[0]), min(tool.params["height"], ends[1])
+    return None
+
+
+def _triangles(shape, deflection, angular):
+    if shape.kind == "box":
+        return _box_triangles(shape)
+    if shape.kind == "cylinder":
+        return _cylinder_triangles(shape, deflection, angular)
+    if shape.kind == "cut":
+        base, tool = (child.copy() for child in shape.children)
+        triangles = []
+        if tool.kind == "cylinder":
+            # 与基体使用相同 Placement 时（create_cube.py 的贯通孔）只取基体内的一段
+            span = _wall_span(base, tool) if base.Placement.isSame(tool.Placement) else None
+            tool.Placement = shape.Placement.multiply(tool.Placement)
+            triangles = _cylinder_triangles(tool, deflection, angular, span, wall_only=True)
+        base.Placement = shape.Placement.multiply(base.Placement)
+        return _triangles(base, deflection, angular) + triangles
+    if shape.kind == "compound":
+        triangles = []
+        for child in shape.children:
+            child = child.copy()
+            child.Placement = shape.Placement.multiply(child.Placement)
+            triangles.extend(_triangles(child, deflection, angular))
+        return triangles
+    return []
+
+
+def meshFromShape(Shape=None, LinearDeflection=0.1, AngularDeflection=0.5236, Relative=False, **kwargs):
+    deflection = LinearDeflection
+    if Relative:
+        # 相对误差：以包围盒对角线长度为基准
+        deflection *= Shape.BoundBox.DiagonalLength
+    if os.environ.get("FC_STUB_MESH_DELAY"):
+        delay = float(os.environ["FC_STUB_MESH_DELAY"])
+        time.sleep(delay * (4 if Shape.kind == "cut" else 1))
+    return Mesh.Mesh(_triangles(Shape, deflection, AngularDeflection))
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Part 模块替身：长方体、圆柱体、直线、折线、复合体和布尔差集
+
+形状只保存生成参数和 Placement，体积、顶点、包围盒按解析公式计算；
+长方体减轴向圆柱（create_cube.py 的贯通孔）的体积按截面积精确积分，其他情况用网格采样估算。
+"""
+
+import math
+
+import FreeCAD
+from FreeCAD import Vector, Placement
+
+# 差集体积无法解析计算时，每个方向的采样点数
+OVERLAP_SAMPLES = 32
+
+
+class BoundBox:
+    def __init__(self, points):
+        points = list(points)
+        if not points:
+            points = [Vector()]
+        self.XMin = min(p.x for p in points)
+        self.YMin = min(p.y for p in points)
+        self.ZMin = min(p.z for p in points)
+        self.XMax = max(p.x for p in points)
+        self.YMax = max(p.y for p in points)
+        self.ZMax = max(p.z for p in points)
+
+    @property
+    def XLength(self):
+        return self.XMax - self.XMin
+
+    @property
+    def YLength(self):
+        return self.YMax - self.YMin
+
+    @property
+    def ZLength(self):
+        return self.ZMax - self.ZMin
+
+    @property
+    def DiagonalLength(self):
+        return math.sqrt(self.XLength ** 2 + self.YLength ** 2 + self.ZLength ** 2)
+
+
+class Vertex:
+    def __init__(self, point):
+        self.Point = point
+        self.X, self.Y, self.Z = point
+
+
+class Shape:
+    """kind 为 box / cylinder / cut / line / wire / compound"""
+
+    SHAPE_TYPES = {"box": "Solid", "cylinder": "Solid", "cut": "Solid",
+                   "line": "Edge", "wire": "Wire", "compound": "Compound"}
+
+    def __init__(self, kind, params, children=(), placement=None):
+        self.kind = kind
+        self.params = params
+        self.children = list(children)
+        self.Placement = placement.copy() if placement is not None else Placement()
+
+    @property
+    def ShapeType(self):
+        return self.SHAPE_TYPES[self.kind]
+
+    def copy(self):
+        return Shape(self.kind, dict(self.params), [child.copy() for child in self.children],
+                     self.Placement)
+
+    def isNull(self):
+        return False
+
+    def isValid(self):
+        return True
+
+    # ---- 几何 ----
+
+    def _local_points(self):
+        p = self.params
+        if self.kind == "box":
+            x0, y0, z0 = p["pnt"]
+            return [Vector(x0 + dx * p["length"], y0 + dy * p["width"], z0 + dz * p["height"])
+                    for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)]
+        if self.kind == "cylinder":
+            axis = Vector(p["dir"]).normalize()
+            seam = _perpendicular(axis) * p["radius"]
+            return [p["pnt"] + seam, p["pnt"] + axis * p["height"] + seam]
+        if self.kind == "line":
+            return [Vector(p["start"]), Vector(p["end"])]
+        if self.kind == "cut":
+            # 差集不会超出基体，刀具伸出的部分不计入
+            return self.children[0].world_points()
+        return [point for child in self.children for point in child.world_points()]
+
+    def world_points(self):
+        return [self.Placement.multVec(point) for point in self._local_points()]
+
+    @property
+    def Vertexes(self):
+        return [Vertex(point) for point in self.world_points()]
+
+    @property
+    def Edges(self):
+        if self.kind == "line":
+            return [self]
+        return [edge for child in self.children for edge in child.Edges]
+
+    @property
+    def BoundBox(self):
+        return BoundBox(self.world_points())
+
+    @property
+    def Length(self):
+        if self.kind == "line":
+            return (Vector(self.params["end"]) - Vector(self.params["start"])).Length
+        return sum(child.Length for child in self.children)
+
+    @property
+    def Volume(self):
+        p = self.params
+        if self.kind == "box":
+            return p["length"] * p["width"] * p["height"]
+        if self.kind == "cylinder":
+            return math.pi * p["radius"] ** 2 * p["height"]
+        if self.kind == "cut":
+            base, tool = self.children
+            return max(0.0, base.Volume - _overlap_volume(base, tool))
+        if self.kind == "compound":
+            return sum(child.Volume for child in self.children)
+        return 0.0
+
+    def contains(self, point):
+        """点（世界坐标）是否在实体内部"""
+        local = self.Placement.inverse().multVec(point)
+        p = self.params
+        if self.kind == "box":
+            x0, y0, z0 = p["pnt"]
+            return (x0 <= local.x <= x0 + p["length"] and y0 <= local.y <= y0 + p["width"]
+                    and z0 <= local.z <= z0 + p["height"])
+        if self.kind == "cylinder":
+            axis = Vector(p["dir"]).normalize()
+            offset = local - p["pnt"]
+            t = offset.dot(axis)
+            return 0 <= t <= p["height"] and (offset - axis * t).Length <= p["radius"]
+        if self.kind == "cut":
+            base, tool = self.children
+            return base.contains(local) and not tool.contains(local)
+        return any(child.contains(local) for child in self.children)
+
+    def cut(self, tool):
+        return Shape("cut", {}, [self.copy(), tool.copy()])
+
+    # ---- 导出 ----
+
+    def exportBrepToString(self):
+        points = self.world_points()
+        lines = ["", "CASCADE Topology V1, (c) Matra-Datavision", "Locations 0", "Curve2ds 0",
+                 "Curves 0", "Polygon3D 0", "PolygonOnTriangulations 0", "Surfaces 0",
+                 "Triangulations 0", "", f"TShapes {len(points)}"]
+        for point in points:
+            lines += ["Ve", "1e-07", f"{point.x:.17g} {point.y:.17g} {point.z:.17g}", "0 0", "",
+                      "0101101", "*"]
+        lines += ["", f"+{len(points)} 0 ", ""]
+        return "\n".join(lines)
+
+    def exportBrep(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.exportBrepToString())
+
+
+def _perpendicular(axis):
+    helper = Vector(1, 0, 0) if abs(axis.x) < 0.9 else Vector(0, 1, 0)
+    return axis.cross(helper).normalize()
+
+
+def _circle_rect_area(cx, cy, radius, x0, x1, y0, y1, steps=4000):
+    """圆与轴对齐矩形的相交面积（中点法积分）"""
+    lo, hi = max(x0, cx - radius), min(x1, cx + radius)
+    if hi <= lo:
+        return 0.0
+    dx = (hi - lo) / steps
+    area = 0.0
+    for i in range(steps):
+        x = lo + (i + 0.5) * dx
+        half = math.sqrt(max(0.0, radius * radius - (x - cx) ** 2))
+        area += max(0.0, min(y1, cy + half) - max(y0, cy - half)) * dx
+    return area
+
+
+def _overlap_volume(base, tool):
+    if base.kind == "box" and tool.kind == "cylinder":
+        # 把圆柱变换到长方体的局部坐标系，轴向与坐标轴平行时按截面积精确计算
+        to_local = base.Placement.inverse().multiply(tool.Placement)
+        axis = to_local.Rotation.multVec(Vector(tool.params["dir"]).normalize())
+        start = to_local.multVec(tool.params["pnt"])
+        p = base.params
+        lo = Vector(p["pnt"])
+        hi = lo + Vector(p["length"], p["width"], p["height"])
+        for k in range(3):
+            if abs(abs(axis[k]) - 1) < 1e-9:
+                u, v = [i for i in range(3) if i != k]
+                t0 = start[k]
+                t1 = start[k] + axis[k] * tool.params["height"]
+                along = max(0.0, min(max(t0, t1), hi[k]) - max(min(t0, t1), lo[k]))
+                return along * _circle_rect_area(start[u], start[v], tool.params["radius"],
+                                                 lo[u], hi[u], lo[v], hi[v])
+    if base.kind != "box":
+        return 0.0
+    # 一般情况：在长方体内均匀采样
+    n = OVERLAP_SAMPLES
+    p = base.params
+    x0, y0, z0 = p["pnt"]
+    inside = 0
+    for i in range(n):
+        for j in range(n):
+            for k in range(n):
+                local = Vector(x0 + (i + 0.5) / n * p["length"], y0 + (j + 0.5) / n * p["width"],
+                               z0 + (k + 0.5) / n * p["height"])
+                if tool.contains(base.Placement.multVec(local)):
+                    inside += 1
+    return base.Volume * inside / n ** 3
+
+
+def makeBox(length, width, height, pnt=None, dir=None):
+    return Shape("box", {"length": float(length), "width": float(width), "height": float(height),
+                         "pnt": Vector(pnt) if pnt is not None else Vector()})
+
+
+def makeCylinder(radius, height, pnt=None, dir=None, angle=360):
+    return Shape("cylinder", {"radius": float(radius), "height": float(height),
+                              "pnt": Vector(pnt) if pnt is not None else Vector(),
+                              "dir": Vector(dir) if dir is not None else Vector(0, 0, 1)})
+
+
+def makeLine(start, end):
+    return Shape("line", {"start": Vector(start), "end": Vector(end)})
+
+
+def makePolygon(points, closed=False):
+    points = [Vector(point) for point in points]
+    if closed and points:
+        points.append(points[0])
+    if len(points) < 2:
+        raise ValueError("折线至少需要两个点")
+    return Shape("wire", {}, [makeLine(a, b) for a, b in zip(points, points[1:])])
+
+
+class LineSegment:
+    def __init__(self, start, end):
+        self.StartPoint = Vector(start)
+        self.EndPoint = Vector(end)
+
+    def toShape(self):
+        return makeLine(self.StartPoint, self.EndPoint)
+
+
+def makeCompound(shapes):
+    return Shape("compound", {}, [shape.copy() for shape in shapes])
+
+
+Compound = makeCompound
+
+
+def show(shape, name="Shape"):
+    obj = FreeCAD.ActiveDocument.addObject("Part::Feature", name)
+    obj.Shape = shape
+    return obj
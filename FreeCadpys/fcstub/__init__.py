@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FreeCAD 替身模块（仅用于测试）
+
+在没有安装 FreeCAD 的机器（例如只有 CPU 的 Linux 构建机）上运行 FreeCadpys 中的脚本。
+本目录下的 FreeCAD / FreeCADGui / Part / Mesh / MeshPart / Draft 模块实现了脚本用到的
+那部分接口：文档与对象、Placement/Rotation、长方体/圆柱体/直线/布尔差集、网格化与 STL 导出，
+保存的 .FCStd 与 FreeCAD 的格式一致（zip 中包含 Document.xml 和每个形状的 .brp 文件）。
+
+使用方法：
+    import fcstub
+    fcstub.enable()   # 之后 import FreeCAD 等模块得到的就是替身
+    import FreeCAD
+
+或者设置环境变量 FC_STUB=1 后运行 create_cube.py / fc_worker.py。
+"""
+
+import os
+import sys
+
+STUB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def enable():
+    """把替身模块目录插入到 sys.path 最前面"""
+    if STUB_DIR not in sys.path:
+        sys.path.insert(0, STUB_DIR)
+
+
+def enabled_by_env():
+    """环境变量 FC_STUB=1 时启用替身模块，返回是否启用"""
+    if os.environ.get("FC_STUB") == "1":
+        enable()
+        return True
+    return False
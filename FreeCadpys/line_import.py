@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量导入直线 / 折线：从 CSV 或 NumPy 数组流式读取线段，建成一个 Part::Feature 中的边复合体
+
+每个 Draft 对象都带有 Python 特征代理和视图提供者，测绘、刀路数据动辄上万条线段，
+逐条 Draft.makeLine 太慢。批量模式：
+
+- 线段用 Part.makeLine、折线用 Part.makePolygon 直接生成边 / 线框，全部放进一个复合体，
+  只创建一个 Part::Feature，最后只调用一次 doc.recompute()
+- --draft 时才逐条创建 Draft 对象（Draft.makeLine / Draft.makeWire），便于之后在 Draft 工作台中编辑
+- 长度为 0 的线段（起点终点相同）、折线中连续重复的点和只有一个点的折线跳过并计数
+- 报告各阶段耗时和线段/秒
+
+输入格式:
+    CSV 线段   表头 x1,y1,z1,x2,y2,z2（或没有表头的 6 列）
+    CSV 折线   表头 x,y,z（或没有表头的 3 列），可选 path 列（或没有表头时 4 列的第一列）：
+               path 值变化时开始一条新折线，没有 path 列时所有点连成一条折线
+    NPY        形状 (N, 6) 或 (N, 2, 3) 为线段，(N, 3) 为一条折线；用内存映射分块读取，需要 NumPy
+
+用法（通过 draft_line_example.py）:
+    freecadcmd FreeCadpys/draft_line_example.py --bulk survey.csv --name Survey --fcstd FCStds/survey.FCStd
+    freecadcmd FreeCadpys/draft_line_example.py --bulk toolpath.npy --draft     # 逐条创建 Draft 对象
+"""
+
+import os
+import csv
+import time
+import itertools
+
+import stage_trace
+
+# 每次读取的行数
+CHUNK_ROWS = 10000
+
+SEGMENT_COLUMNS = ("x1", "y1", "z1", "x2", "y2", "z2")
+POINT_COLUMNS = ("x", "y", "z")
+
+
+def _segments_from_rows(rows, columns):
+    """CSV 行 -> [(x1, y1, z1, x2, y2, z2)]"""
+    return [tuple(float(row[i]) for i in columns) for row in rows]
+
+
+def _read_csv(path, chunk_rows):
+    """产出 ("segments", [(x1, y1, z1, x2, y2, z2), ...]) 或 ("polyline", [(x, y, z), ...])"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(row for row in f if row.strip() and not row.lstrip().startswith("#"))
+        first = next(reader, None)
+        if first is None:
+            return
+        header = [cell.strip().lower() for cell in first]
+        path_column = None
+        pending = []
+        if all(name in header for name in SEGMENT_COLUMNS):
+            kind, columns = "segments", [header.index(name) for name in SEGMENT_COLUMNS]
+        elif all(name in header for name in POINT_COLUMNS):
+            kind, columns = "polyline", [header.index(name) for name in POINT_COLUMNS]
+            if "path" in header:
+                path_column = header.index("path")
+        else:
+            # 没有表头：按列数判断，第一行也是数据
+            pending = [first]
+            if len(first) == 6:
+                kind, columns = "segments", list(range(6))
+            elif len(first) in (3, 4):
+                kind, columns = "polyline", list(range(len(first) - 3, len(first)))
+                if len(first) == 4:
+                    path_column = 0
+            else:
+                raise ValueError(f"{path}: 无法识别的列数 {len(first)}（线段 6 列，折线 3 或 4 列）")
+
+        if kind == "segments":
+            rows = pending
+            for row in reader:
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    yield kind, _segments_from_rows(rows, columns)
+                    rows = []
+            if rows:
+                yield kind, _segments_from_rows(rows, columns)
+            return
+
+        points, current = [], None
+        for row in itertools.chain(pending, reader):
+            key = row[path_column] if path_column is not None else None
+            if points and key != current:
+                yield kind, points
+                points = []
+            current = key
+            points.append(tuple(float(row[i]) for i in columns))
+        if points:
+            yield kind, points
+
+
+def _read_npy(path, chunk_rows):
+    # 只有读取 .npy 时才导入 NumPy，CSV 导入不加载
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("读取 .npy 需要 NumPy")
+    array = np.load(path, mmap_mode="r")
+    if array.ndim == 3 and array.shape[1:] == (2, 3):
+        array = array.reshape(len(array), 6)
+    if array.ndim == 2 and array.shape[1] == 6:
+        for start in range(0, len(array), chunk_rows):
+            yield "segments", [tuple(row) for row in np.asarray(array[start:start + chunk_rows], dtype=float).tolist()]
+    elif array.ndim == 2 and array.shape[1] == 3:
+        yield "polyline", [tuple(row) for row in np.asarray(array, dtype=float).tolist()]
+    else:
+        raise ValueError(f"{path}: 不支持的数组形状 {array.shape}（线段 (N, 6) 或 (N, 2, 3)，折线 (N, 3)）")
+
+
+def read_lines(path, chunk_rows=CHUNK_ROWS):
+    """按扩展名流式读取线段或折线，产出 ("segments", 线段列表) 或 ("polyline", 点列表)"""
+    if os.path.splitext(path)[1].lower() == ".npy":
+        return _read_npy(path, chunk_rows)
+    return _read_csv(path, chunk_rows)
+
+
+def _is_degenerate(a, b):
+    return a[0] == b[0] and a[1] == b[1] and a[2] == b[2]
+
+
+def import_lines(doc, path, name="Lines", use_draft=False, chunk_rows=CHUNK_ROWS):
+    """把文件中的线段 / 折线导入文档，返回 (对象列表, 报告)
+
+    默认生成一个 Part::Feature（边复合体）；use_draft 为 True 时每条线段 / 折线一个 Draft 对象。
+    报告: {"segments", "polylines", "skipped", "objects", "timings", "seconds", "segments_per_sec"}。
+    """
+    import FreeCAD
+    import Part
+    if use_draft:
+        import Draft
+
+    report = {"segments": 0, "polylines": 0, "skipped": 0, "objects": 0}
+    timings = dict.fromkeys(("read", "build"), 0.0)
+    shapes = []
+    objects = []
+    started = time.perf_counter()
+
+    def add_draft(obj):
+        obj.Label = f"{name}{len(objects) + 1:06d}"
+        objects.append(obj)
+
+    with stage_trace.span("bulk_lines", file=os.path.basename(path), draft=use_draft) as total_span:
+        chunks = read_lines(path, chunk_rows)
+        while True:
+            with stage_trace.span("read") as span:
+                chunk = next(chunks, None)
+            timings["read"] += span.seconds
+            if chunk is None:
+                break
+            kind, data = chunk
+            with stage_trace.span("build_edges", kind=kind, count=len(data)) as span:
+                if kind == "segments":
+                    skipped = 0
+                    for x1, y1, z1, x2, y2, z2 in data:
+                        a, b = (x1, y1, z1), (x2, y2, z2)
+                        if _is_degenerate(a, b):
+                            skipped += 1
+                        elif use_draft:
+                            add_draft(Draft.makeLine(FreeCAD.Vector(a), FreeCAD.Vector(b)))
+                        else:
+                            shapes.append(Part.makeLine(a, b))
+                    report["segments"] += len(data) - skipped
+                    report["skipped"] += skipped
+                else:
+                    # 去掉连续重复的点，剩下不到两个点时跳过整条折线
+                    points = [point for i, point in enumerate(data) if i == 0 or not _is_degenerate(point, data[i - 1])]
+                    report["skipped"] += len(data) - len(points)
+                    if len(points) >= 2:
+                        vectors = [FreeCAD.Vector(point) for point in points]
+                        if use_draft:
+                            add_draft(Draft.makeWire(vectors))
+                        else:
+                            shapes.append(Part.makePolygon(vectors))
+                        report["polylines"] += 1
+                        report["segments"] += len(points) - 1
+                    else:
+                        report["skipped"] += len(points)
+            timings["build"] += span.seconds
+
+        if not use_draft and shapes:
+            with stage_trace.span("compound", shapes=len(shapes)) as span:
+                obj = doc.addObject("Part::Feature", name)
+                obj.Shape = Part.makeCompound(shapes)
+                obj.Label = name
+                objects.append(obj)
+            timings["compound"] = span.seconds
+
+        with stage_trace.span("recompute") as span:
+            doc.recompute()
+        timings["recompute"] = span.seconds
+        total_span.set(segments=report["segments"], objects=len(objects))
+
+    seconds = time.perf_counter() - started
+    report.update(objects=len(objects), timings=timings, seconds=seconds,
+                  segments_per_sec=report["segments"] / seconds if seconds > 0 else 0.0)
+    return objects, report
+
+
+def format_report(report):
+    timings = "，".join(f"{stage} {seconds:.3f}秒" for stage, seconds in report["timings"].items())
+    text = (f"导入 {report['segments']} 条线段（折线 {report['polylines']} 条），{report['objects']} 个对象，"
+            f"耗时 {report['seconds']:.3f} 秒（{report['segments_per_sec']:.0f} 条/秒；{timings}）")
+    if report["skipped"]:
+        text += f"，跳过 {report['skipped']} 个长度为 0 的线段或重复点"
+    return text
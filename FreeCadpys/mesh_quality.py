@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+网格精度控制：预设、显式参数和按三角形预算 / 弦高误差目标搜索
+
+固定的 LinearDeflection / AngularDeflection 对小孔分段过密、对大孔又不够，而三角形数量直接决定
+STL 大小和切片软件的耗时。本模块把网格精度整理为：
+
+- 预设 meshQuality=draft / normal / fine，normal 与原来的固定设置相同
+- 显式参数 linearDeflection、angularDeflection（FreeCAD 网格化）、tolerance（解析网格，毫米）覆盖预设
+- 目标模式（两者只能选一个）：
+    maxTriangles=N    三角形不超过 N 个，取满足预算的最细网格
+    maxErrorUm=X      弦高误差不超过 X 微米，取满足误差的最粗网格
+  搜索时把预设的误差参数整体乘以一个比例：先按 4 倍步长找到满足与不满足的边界，再在对数尺度上二分
+- 每个零件报告实际的三角形数量和弦高误差；弦高误差按零件的解析几何测量
+  （孔壁上每条弦的中点到孔轴的距离与半径之差的最大值），平面零件的误差为 0
+"""
+
+import math
+
+import stage_trace
+
+# NumPy、analytic_mesh、stl_io 在第一次测量误差或搜索解析网格精度时才导入（_load_numpy），
+# 只用 FreeCAD 网格化且不测量误差时不加载 NumPy
+np = analytic_mesh = stl_io = None
+_numpy_loaded = False
+
+
+def _load_numpy():
+    """导入 NumPy 和解析网格模块，返回是否可用"""
+    global np, analytic_mesh, stl_io, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy as np
+            import analytic_mesh
+            import stl_io
+        except ImportError:
+            np = analytic_mesh = stl_io = None
+    return np is not None
+
+# 预设：FreeCAD 网格化参数（MeshPart.meshFromShape）和解析网格的弦高误差（毫米）
+PRESETS = {
+    "draft": {"deflection": {"LinearDeflection": 0.5, "AngularDeflection": 0.5, "Relative": True},
+              "tolerance": 0.1},
+    "normal": {"deflection": {"LinearDeflection": 0.1, "AngularDeflection": 0.05, "Relative": True},
+               "tolerance": 0.01},
+    "fine": {"deflection": {"LinearDeflection": 0.02, "AngularDeflection": 0.02, "Relative": True},
+             "tolerance": 0.001},
+}
+
+DEFAULT_QUALITY = "normal"
+
+# 目标搜索：初始步长（倍）、二分次数、比例范围
+SEARCH_STEP = 4.0
+SEARCH_ITERATIONS = 6
+MIN_SCALE = 1e-3
+MAX_SCALE = 1e3
+
+# 角度误差上限（弧度），比例再大也不超过它
+MAX_ANGULAR_DEFLECTION = 1.0
+
+
+def resolve(params):
+    """按 create_cube.normalize_params 的结果确定网格精度设置
+
+    返回 {"quality", "deflection", "tolerance", "maxTriangles", "maxError"}，maxError 单位为毫米。
+    """
+    preset = PRESETS[params.get("meshQuality") or DEFAULT_QUALITY]
+    deflection = dict(preset["deflection"])
+    if params.get("linearDeflection") is not None:
+        deflection["LinearDeflection"] = params["linearDeflection"]
+    if params.get("angularDeflection") is not None:
+        deflection["AngularDeflection"] = params["angularDeflection"]
+    max_error = params.get("maxErrorUm")
+    max_triangles = params.get("maxTriangles")
+    return {
+        "quality": params.get("meshQuality") or DEFAULT_QUALITY,
+        "deflection": deflection,
+        "tolerance": params.get("tolerance") or preset["tolerance"],
+        "maxTriangles": int(max_triangles) if max_triangles is not None else None,
+        "maxError": max_error / 1000.0 if max_error is not None else None,
+    }
+
+
+def target_of(settings):
+    """("triangles", N)、("error", 毫米) 或 None"""
+    if settings["maxTriangles"] is not None:
+        return "triangles", settings["maxTriangles"]
+    if settings["maxError"] is not None:
+        return "error", settings["maxError"]
+    return None
+
+
+def scaled_deflection(deflection, scale):
+    return dict(deflection,
+                LinearDeflection=deflection["LinearDeflection"] * scale,
+                AngularDeflection=min(MAX_ANGULAR_DEFLECTION, deflection["AngularDeflection"] * scale))
+
+
+def chordal_error(vertices, faces, params):
+    """网格相对 create_cube 零件（长方体 + 可选贯通孔）的最大弦高误差（毫米）
+
+    把顶点变换回长方体局部坐标系，两端都在孔壁上的边视为一条弦，弦中点到孔轴的距离与半径之差即误差。
+    NumPy 不可用时返回 None。
+    """
+    if not _load_numpy():
+        return None
+    radius = params["holeRadius"]
+    if radius <= 0 or len(faces) == 0:
+        return 0.0
+    rotation = analytic_mesh.rotation_matrix(params["rot"])
+    local = (np.asarray(vertices, dtype=np.float64) - np.asarray(params["pos"], dtype=float)) @ rotation
+    k = analytic_mesh.AXES[analytic_mesh._hole_axis(params)]
+    u, v = (k + 1) % 3, (k + 2) % 3
+    size = np.array([params["length"], params["width"], params["height"]], dtype=float)
+    offset = local[:, [u, v]] - size[[u, v]] / 2
+    on_wall = np.abs(np.hypot(offset[:, 0], offset[:, 1]) - radius) <= 1e-6 * max(1.0, radius)
+
+    faces = np.asarray(faces)
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges = edges[on_wall[edges[:, 0]] & on_wall[edges[:, 1]]]
+    if len(edges) == 0:
+        return 0.0
+    middle = (offset[edges[:, 0]] + offset[edges[:, 1]]) / 2
+    return float(max(0.0, (radius - np.hypot(middle[:, 0], middle[:, 1])).max()))
+
+
+def search_scale(evaluate, accept, ok_above, step=SEARCH_STEP, iterations=SEARCH_ITERATIONS):
+    """在比例上搜索满足 accept 的边界
+
+    evaluate(比例) -> 候选；accept(候选) -> 是否满足目标。
+    ok_above 为 True 时比例越大越容易满足（三角形预算，取满足条件的最小比例），
+    否则比例越小越容易满足（误差目标，取满足条件的最大比例）。
+    返回 (最佳候选, 是否满足, 评估次数)；无法满足时返回最接近的候选。
+    """
+    evaluations = 1
+    candidate = evaluate(1.0)
+    if accept(candidate):
+        best, good, bad = candidate, 1.0, None
+    else:
+        best, good, bad = candidate, None, 1.0
+
+    # 按固定步长向外扩展，直到同时有满足和不满足的比例
+    while good is None or bad is None:
+        if good is None:
+            scale = bad * step if ok_above else bad / step
+        else:
+            scale = good / step if ok_above else good * step
+        if not MIN_SCALE <= scale <= MAX_SCALE:
+            break
+        evaluations += 1
+        candidate = evaluate(scale)
+        if accept(candidate):
+            best, good = candidate, scale
+        else:
+            bad = scale
+            if good is None:
+                best = candidate
+
+    if good is None:
+        return best, False, evaluations
+    if bad is not None:
+        for _ in range(iterations):
+            scale = math.sqrt(good * bad)
+            evaluations += 1
+            candidate = evaluate(scale)
+            if accept(candidate):
+                best, good = candidate, scale
+            else:
+                bad = scale
+    return best, True, evaluations
+
+
+def _report(settings, mesher, triangles, error, met, evaluations, **extra):
+    target = target_of(settings)
+    report = {"quality": settings["quality"], "mesher": mesher, "triangles": triangles,
+              "error": error, "target": None, "met": met, "evaluations": evaluations}
+    if target:
+        report["target"] = {"maxTriangles": target[1]} if target[0] == "triangles" else {
+            "maxErrorUm": target[1] * 1000.0}
+    report.update(extra)
+    return report
+
+
+def mesh_shape(shape, settings, params=None):
+    """用 FreeCAD 网格化形状，按目标搜索网格参数，返回 (mesh, 顶点, 三角形, 报告)
+
+    params 为 create_cube 的参数时测量弦高误差；顶点和三角形数组在 NumPy 不可用时为 None。
+    """
+    import MeshPart
+
+    def measure(candidate):
+        # 只在需要时把网格转成数组并测量误差（三角形预算模式只测量最终结果）
+        if candidate["arrays"] is None and stl_io is not None:
+            candidate["arrays"] = stl_io.mesh_arrays(candidate["mesh"])
+            if params is not None:
+                candidate["error"] = chordal_error(*candidate["arrays"], params)
+        return candidate
+
+    def evaluate(scale):
+        deflection = scaled_deflection(settings["deflection"], scale)
+        with stage_trace.span("meshFromShape", scale=scale) as span:
+            mesh = MeshPart.meshFromShape(Shape=shape, **deflection)
+            span.set(facets=mesh.CountFacets)
+        candidate = {"scale": scale, "deflection": deflection, "mesh": mesh,
+                     "triangles": mesh.CountFacets, "arrays": None, "error": None}
+        return measure(candidate) if target and target[0] == "error" else candidate
+
+    target = target_of(settings)
+    _load_numpy()
+    if target and target[0] == "error" and (stl_io is None or params is None):
+        raise ValueError("弦高误差目标需要 NumPy 和零件参数")
+    # 没有曲面的零件网格与精度无关，不需要搜索
+    if target is None or (params is not None and params["holeRadius"] <= 0):
+        best, evaluations = evaluate(1.0), 1
+        met = None if target is None else _meets(best, target)
+    elif target[0] == "triangles":
+        best, met, evaluations = search_scale(evaluate, lambda c: c["triangles"] <= target[1], ok_above=True)
+    else:
+        best, met, evaluations = search_scale(evaluate, lambda c: c["error"] <= target[1], ok_above=False)
+
+    vertices, faces = measure(best)["arrays"] or (None, None)
+    report = _report(settings, "freecad", best["triangles"], best["error"], met, evaluations,
+                     deflection=best["deflection"])
+    return best["mesh"], vertices, faces, report
+
+
+def _meets(candidate, target):
+    if target[0] == "triangles":
+        return candidate["triangles"] <= target[1]
+    return candidate["error"] is not None and candidate["error"] <= target[1]
+
+
+def analytic_tolerance(params, settings):
+    """解析网格的弦高误差参数：误差目标直接作为 tolerance，三角形预算时搜索，返回 (tolerance, 报告)"""
+    if not _load_numpy():
+        raise RuntimeError("解析网格需要 NumPy")
+    def evaluate(scale):
+        tolerance = settings["tolerance"] * scale
+        _, faces = analytic_mesh.cube_mesh(params, tolerance)
+        error = 0.0
+        if params["holeRadius"] > 0:
+            segments = analytic_mesh.segments_for_tolerance(params["holeRadius"], tolerance)
+            error = params["holeRadius"] * (1 - math.cos(math.pi / segments))
+        return {"scale": scale, "tolerance": tolerance, "triangles": len(faces), "error": error}
+
+    target = target_of(settings)
+    if target is not None and target[0] == "error":
+        settings = dict(settings, tolerance=target[1])
+    if target is None or target[0] == "error" or params["holeRadius"] <= 0:
+        best, evaluations = evaluate(1.0), 1
+        met = None if target is None else _meets(best, target)
+    else:
+        best, met, evaluations = search_scale(evaluate, lambda c: c["triangles"] <= target[1], ok_above=True)
+    report = _report(settings, "analytic", best["triangles"], best["error"], met, evaluations,
+                     tolerance=best["tolerance"])
+    return best["tolerance"], report
+
+
+def format_report(report):
+    error = "-" if report["error"] is None else f"{report['error'] * 1000:.3g} µm"
+    text = f"{report['triangles']} 个三角形，弦高误差 {error}"
+    if report["target"]:
+        goal = (f"≤ {report['target']['maxTriangles']} 个三角形" if "maxTriangles" in report["target"]
+                else f"≤ {report['target']['maxErrorUm']:g} µm")
+        text += f"（目标 {goal}，{'已满足' if report['met'] else '无法满足'}，网格化 {report['evaluations']} 次）"
+    return text
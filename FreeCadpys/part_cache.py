@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按内容哈希缓存生成的零件（.FCStd / .stl）
+
+流水线经常重复生成参数完全相同的立方体。缓存以规范化参数（尺寸、位置、旋转、孔、网格化设置、
+FreeCAD 版本等，由 create_cube.cache_keys 组装）的 SHA-256 为键，命中时直接把缓存文件
+硬链接（不支持硬链接时复制）到输出路径，不需要启动 CAD 内核。
+
+- 缓存目录结构: <root>/<键前两位>/<键>.<扩展名>
+- 文件的修改时间即最近使用时间，总大小超过上限时删除最久未使用的文件（LRU）
+- 输出文件与缓存共用同一个 inode，重新生成前用 detach() 断开，避免覆盖写入时改坏缓存
+
+环境变量:
+    FC_CACHE_DIR      缓存目录（默认 .part_cache）
+    FC_CACHE_MAX_MB   缓存大小上限，单位 MB（默认 1024）
+    FC_NO_CACHE=1     禁用缓存（与 create_cube.py 的 --no-cache 相同）
+
+用法:
+    python FreeCadpys/part_cache.py stats    # 条目数和总大小
+    python FreeCadpys/part_cache.py evict    # 按大小上限清理
+    python FreeCadpys/part_cache.py clear    # 清空缓存
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+# 缓存格式版本：生成逻辑改变导致输出不同时加一，旧条目自然失效
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = ".part_cache"
+DEFAULT_MAX_MB = 1024
+
+
+def canonical_key(fields):
+    """字段字典 -> SHA-256 十六进制键（键排序、紧凑 JSON，-0.0 与 0.0 视为相同）"""
+    def normalize(value):
+        if isinstance(value, float):
+            return value + 0.0
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        return value
+
+    payload = {"cache_version": CACHE_VERSION, **normalize(dict(fields))}
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def detach(path):
+    """path 是与其他文件共用 inode 的硬链接时，把它换成独立的副本"""
+    try:
+        if os.stat(path).st_nlink <= 1:
+            return
+    except FileNotFoundError:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".detach")
+    os.close(fd)
+    try:
+        shutil.copy2(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class PartCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB << 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        # 当前缓存总大小（进程内估计值，首次写入时扫描一次）
+        self._size = None
+
+    @classmethod
+    def from_env(cls):
+        """按环境变量创建缓存；FC_NO_CACHE=1 时返回 None"""
+        if os.environ.get("FC_NO_CACHE") == "1":
+            return None
+        max_mb = float(os.environ.get("FC_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        return cls(os.environ.get("FC_CACHE_DIR", DEFAULT_CACHE_DIR), int(max_mb * (1 << 20)))
+
+    def path(self, key, suffix):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def contains(self, key, suffix):
+        return os.path.isfile(self.path(key, suffix))
+
+    def fetch(self, key, suffix, dest):
+        """把缓存条目放到 dest（硬链接，失败时复制），返回是否命中"""
+        source = self.path(key, suffix)
+        try:
+            os.utime(source)  # 记录最近使用时间
+        except FileNotFoundError:
+            return False
+        directory = os.path.dirname(dest)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            os.link(source, dest)
+        except OSError:
+            # 跨文件系统或文件系统不支持硬链接
+            shutil.copy2(source, dest)
+        return True
+
+    def store(self, key, suffix, source):
+        """复制 source 到缓存（先写临时文件再改名，多进程同时写入也不会得到半个文件）"""
+        target = self.path(key, suffix)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp)
+            # mkstemp 创建的文件权限为 0600，链接出去的输出文件应与直接生成的文件权限相同
+            shutil.copymode(source, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self._size is None:
+            self._size = self.stats()["bytes"]
+        else:
+            self._size += os.path.getsize(target)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """[(最近使用时间, 大小, 路径)]"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def stats(self):
+        entries = self._entries()
+        return {"root": self.root, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+    def evict(self, max_bytes=None):
+        """删除最久未使用的条目直到总大小不超过上限，返回 (删除个数, 释放字节数)"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+        self._size = total
+        return removed, freed
+
+    def clear(self):
+        return self.evict(max_bytes=0)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = PartCache.from_env() or PartCache()
+    if command == "stats":
+        stats = cache.stats()
+        print(f"缓存目录: {stats['root']}")
+        print(f"- 条目: {stats['entries']}")
+        print(f"- 大小: {stats['bytes'] / (1 << 20):.2f} MB / {stats['max_bytes'] / (1 << 20):.0f} MB")
+    elif command in ("evict", "clear"):
+        removed, freed = cache.evict() if command == "evict" else cache.clear()
+        print(f"已删除 {removed} 个条目，释放 {freed / (1 << 20):.2f} MB")
+    else:
+        print("用法: python part_cache.py [stats|evict|clear]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分阶段计时与追踪导出
+
+零件生成慢的时候需要知道时间花在哪一步（导入 FreeCAD、Part.makeBox、Part::Cut 布尔运算、
+doc.recompute()、doc.saveAs、MeshPart.meshFromShape ……）。本模块提供：
+
+- span(name, **attrs)：用 with 包住一个阶段，记录高精度耗时，可嵌套（子阶段记录父阶段名）
+- record(name, start, seconds, **attrs)：记录已经测好的时间段（如镜像探测的连接/TLS/首字节耗时）
+- 内存：每个阶段记录结束时的 RSS 和阶段内的峰值 RSS。Linux 上通过重置 /proc/self/clear_refs
+  得到精确的阶段峰值；其他平台取开始/结束 RSS 与进程峰值增长中的较大值
+  （FreeCAD 的 C++ 代码执行期间持有 GIL，采样线程无法运行，所以不用采样线程）
+- 输出：JSON-lines 阶段记录（每行一个阶段）、Chrome trace_event 文件（chrome://tracing 或
+  https://ui.perfetto.dev 打开），以及按阶段名汇总的百分位统计
+
+未启用时 span() 仍然计时（调用方可读取 span.seconds），但不记录内存、不写文件、不汇总。
+
+启用方式：configure(...)，或环境变量 FC_TRACE=阶段记录.jsonl、FC_TRACE_CHROME=trace.json
+（路径中的 {pid} 会替换为进程号，多个工作进程可以各写各的文件）。
+
+用法:
+    python FreeCadpys/stage_trace.py spans.jsonl        # 汇总已有的阶段记录文件
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+# 汇总时输出的百分位
+PERCENTILES = (50, 90, 99)
+
+
+def _read_status():
+    """Linux: (当前 RSS, 峰值 RSS)，单位字节"""
+    rss = peak = None
+    with open("/proc/self/status", "rb") as f:
+        for line in f:
+            if line.startswith(b"VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+            elif line.startswith(b"VmHWM:"):
+                peak = int(line.split()[1]) * 1024
+    return rss, peak
+
+
+def _windows_memory():
+    import ctypes
+    from ctypes import wintypes
+
+    class PMC(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PMC()
+    counters.cb = ctypes.sizeof(PMC)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                             ctypes.byref(counters), counters.cb)
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+
+def memory_snapshot():
+    """(当前 RSS, 进程峰值 RSS)，单位字节；无法获取的项为 None"""
+    try:
+        return _read_status()
+    except OSError:
+        pass
+    if sys.platform == "win32":
+        try:
+            return _windows_memory()
+        except (OSError, AttributeError):
+            return None, None
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, usage if sys.platform == "darwin" else usage * 1024
+
+
+def _reset_peak():
+    """把 Linux 的 VmHWM 重置为当前 RSS，成功返回 True"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def percentile(sorted_values, q):
+    """线性插值百分位，sorted_values 已排序，q 为 0~100"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize(durations, peaks=None):
+    """{阶段名: [耗时]} -> {阶段名: {count, total, mean, p50, p90, p99, max, peak_rss}}"""
+    summary = {}
+    for name, values in durations.items():
+        values = sorted(values)
+        stats = {"count": len(values), "total": sum(values), "mean": sum(values) / len(values)}
+        for q in PERCENTILES:
+            stats[f"p{q}"] = percentile(values, q)
+        stats["max"] = values[-1]
+        stats["peak_rss"] = (peaks or {}).get(name)
+        summary[name] = stats
+    return summary
+
+
+def format_summary(summary, title="阶段耗时统计"):
+    def ms(value):
+        return f"{value * 1000:.2f}"
+
+    lines = [f"{title}（毫秒）:", "-" * 100,
+             f"{'阶段':<24} {'次数':>7} {'总计':>11} {'平均':>9} " +
+             " ".join(f"{'p' + str(q):>9}" for q in PERCENTILES) + f" {'最大':>9} {'峰值RSS(MB)':>12}",
+             "-" * 100]
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        peak = "-" if stats["peak_rss"] is None else f"{stats['peak_rss'] / (1 << 20):.1f}"
+        lines.append(f"{name:<24} {stats['count']:>7} {ms(stats['total']):>11} {ms(stats['mean']):>9} " +
+                     " ".join(f"{ms(stats[f'p{q}']):>9}" for q in PERCENTILES) +
+                     f" {ms(stats['max']):>9} {peak:>12}")
+    lines.append("-" * 100)
+    return "\n".join(lines)
+
+
+class Span:
+    """一个阶段；with 结束后 seconds 为耗时，set() 可在阶段内补充属性"""
+
+    __slots__ = ("name", "attrs", "start", "seconds", "parent", "depth",
+                 "rss_start", "peak_start", "child_peak")
+
+    def __init__(self, name, attrs, parent=None, depth=0):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.depth = depth
+        self.start = 0.0
+        self.seconds = None
+        self.rss_start = self.peak_start = None
+        # 子阶段开始时重置了 VmHWM，子阶段内的峰值要记到父阶段上
+        self.child_peak = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    def __init__(self, spans_path=None, chrome_path=None, memory=True, enabled=True):
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.durations = {}
+        self.peaks = {}
+        self.spans_file = self._open(spans_path)
+        self.chrome_file = self._open(chrome_path)
+        self._chrome_events = 0
+        if self.chrome_file:
+            self.chrome_file.write("[\n")
+        # 能否重置 VmHWM（只在 Linux 上可能成功）
+        self.exact_peak = self.memory and _reset_peak()
+
+    def _open(self, path):
+        if not path or not self.enabled:
+            return None
+        path = path.replace("{pid}", str(self.pid))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return open(path, "w", encoding="utf-8")
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = Span(name, attrs, parent.name if parent else None, len(stack))
+        if self.memory:
+            span.rss_start, span.peak_start = memory_snapshot()
+            if self.exact_peak:
+                # 父阶段到目前为止的峰值先保存下来，再把 VmHWM 重置为当前 RSS
+                if parent is not None:
+                    parent.child_peak = max(parent.child_peak or 0, span.peak_start or 0)
+                _reset_peak()
+        stack.append(span)
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - span.start
+            stack.pop()
+            if self.enabled:
+                self._finish(span, parent)
+
+    def _finish(self, span, parent):
+        rss = peak = None
+        if self.memory:
+            rss, process_peak = memory_snapshot()
+            candidates = [value for value in (span.rss_start, rss, span.child_peak) if value is not None]
+            if self.exact_peak:
+                candidates.append(process_peak or 0)
+            elif process_peak is not None and span.peak_start is not None and process_peak > span.peak_start:
+                # 进程峰值在阶段内增长了，说明阶段内达到过这个峰值
+                candidates.append(process_peak)
+            peak = max(candidates) if candidates else None
+            if parent is not None and peak is not None:
+                parent.child_peak = max(parent.child_peak or 0, peak)
+        self._emit(span.name, span.start, span.seconds, span.attrs, span.parent, span.depth,
+                   rss, None if rss is None or span.rss_start is None else rss - span.rss_start, peak)
+
+    def record(self, name, start, seconds, parent=None, **attrs):
+        """记录已测好的时间段；start 为 time.perf_counter() 的读数"""
+        if not self.enabled or seconds is None:
+            return
+        self._emit(name, start, seconds, attrs, parent, 0 if parent is None else 1, None, None, None)
+
+    def _emit(self, name, start, seconds, attrs, parent, depth, rss, rss_delta, peak):
+        tid = threading.get_ident()
+        with self.lock:
+            self.durations.setdefault(name, []).append(seconds)
+            if peak is not None:
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            if self.spans_file:
+                record = {"name": name, "parent": parent, "depth": depth,
+                          "start": start - self.origin, "seconds": seconds,
+                          "rss": rss, "rss_delta": rss_delta, "peak_rss": peak,
+                          "pid": self.pid, "tid": tid, **attrs}
+                self.spans_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            if self.chrome_file:
+                event = {"name": name, "cat": parent or name, "ph": "X", "pid": self.pid, "tid": tid,
+                         "ts": start * 1e6, "dur": seconds * 1e6, "args": attrs}
+                events = [event]
+                if peak is not None:
+                    events.append({"name": "memory", "ph": "C", "pid": self.pid, "tid": tid,
+                                   "ts": (start + seconds) * 1e6,
+                                   "args": {"rss_mb": (rss or 0) / (1 << 20), "peak_mb": peak / (1 << 20)}})
+                for item in events:
+                    prefix = ",\n" if self._chrome_events else ""
+                    self.chrome_file.write(prefix + json.dumps(item, ensure_ascii=False, default=str))
+                    self._chrome_events += 1
+
+    def summary(self):
+        with self.lock:
+            return summarize({name: list(values) for name, values in self.durations.items()},
+                             dict(self.peaks))
+
+    def print_summary(self, title="阶段耗时统计", file=None):
+        summary = self.summary()
+        if summary:
+            print(format_summary(summary, title), file=file or sys.stdout)
+
+    def reset_summary(self):
+        with self.lock:
+            self.durations.clear()
+            self.peaks.clear()
+
+    def close(self):
+        with self.lock:
+            if self.spans_file:
+                self.spans_file.close()
+                self.spans_file = None
+            if self.chrome_file:
+                self.chrome_file.write("\n]\n")
+                self.chrome_file.close()
+                self.chrome_file = None
+
+
+# 当前进程使用的追踪器，默认不启用
+_tracer = Tracer(enabled=False)
+
+
+def get_tracer():
+    return _tracer
+
+
+def configure(spans_path=None, chrome_path=None, memory=True, enabled=True):
+    """启用追踪（替换当前追踪器），进程退出时自动关闭输出文件"""
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(spans_path, chrome_path, memory, enabled)
+    atexit.register(_tracer.close)
+    return _tracer
+
+
+def from_env():
+    """设置了 FC_TRACE / FC_TRACE_CHROME 时启用追踪，返回追踪器或 None"""
+    spans_path = os.environ.get("FC_TRACE")
+    chrome_path = os.environ.get("FC_TRACE_CHROME")
+    if not spans_path and not chrome_path:
+        return None
+    return configure(spans_path, chrome_path)
+
+
+def span(name, **attrs):
+    return _tracer.span(name, **attrs)
+
+
+def record(name, start, seconds, parent=None, **attrs):
+    _tracer.record(name, start, seconds, parent, **attrs)
+
+
+def load_spans(path):
+    """读取阶段记录文件，返回 {阶段名: [耗时]} 和 {阶段名: 峰值RSS}"""
+    durations, peaks = {}, {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            durations.setdefault(item["name"], []).append(item["seconds"])
+            if item.get("peak_rss") is not None:
+                peaks[item["name"]] = max(peaks.get(item["name"], 0), item["peak_rss"])
+    return durations, peaks
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python stage_trace.py <阶段记录.jsonl> [...]")
+        return 1
+    durations, peaks = {}, {}
+    for path in sys.argv[1:]:
+        file_durations, file_peaks = load_spans(path)
+        for name, values in file_durations.items():
+            durations.setdefault(name, []).extend(values)
+        for name, value in file_peaks.items():
+            peaks[name] = max(peaks.get(name, 0), value)
+    print(format_summary(summarize(durations, peaks), f"阶段耗时统计: {', '.join(sys.argv[1:])}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
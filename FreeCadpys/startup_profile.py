@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析：记录脚本启动后每个模块的导入耗时（类似 python -X importtime，但只统计本目录脚本触发的导入）
+
+create_cube.py、draft_line_example.py 的可选模块都改为第一次用到时才导入，无界面时不导入 FreeCADGui；
+这个模块用来确认启动路径上到底导入了什么、各花了多少时间，防止重新引入重量级的导入。
+
+启用方式：命令行参数 --profile-startup，或环境变量 FC_PROFILE_STARTUP=1。
+脚本退出时把报告写到 stderr：每个模块的自身耗时、累计耗时（含它触发的导入）、导入它的模块，
+按导入顺序缩进显示层级，累计耗时低于阈值（FC_PROFILE_STARTUP_MIN_MS，默认 1 毫秒）的模块不显示。
+
+用法:
+    python FreeCadpys/create_cube.py --fcstd=none --stl=stls/a.stl --profile-startup
+    freecadcmd FreeCadpys/draft_line_example.py --profile-startup
+"""
+
+import os
+import sys
+import time
+import atexit
+import builtins
+import threading
+import importlib.util
+
+FLAG = "--profile-startup"
+DEFAULT_MIN_MS = 1.0
+
+
+class ImportProfiler:
+    """替换 builtins.__import__，记录每个新模块的导入耗时
+
+    records 中每一项为 (序号, 层级, 模块名, 导入者, 自身秒数, 累计秒数)，序号按开始导入的顺序。
+    已在 sys.modules 中的模块直接交给原来的 __import__，几乎没有额外开销。
+    """
+
+    def __init__(self):
+        self.records = []
+        self.started = None
+        self.original = None
+        self.local = threading.local()
+        self.sequence = 0
+
+    def install(self):
+        if self.original is None:
+            self.started = time.perf_counter()
+            self.original = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self.original is not None and builtins.__import__ is self._import:
+            builtins.__import__ = self.original
+        self.original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self.original
+        if level:
+            package = (globals or {}).get("__package__") or ""
+            try:
+                fullname = importlib.util.resolve_name("." * level + name, package)
+            except (ImportError, ValueError):
+                fullname = name
+        else:
+            fullname = name
+        if fullname in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        importer = (globals or {}).get("__name__") or "?"
+        self.sequence += 1
+        entry = [self.sequence, len(stack), fullname, importer, 0.0]
+        stack.append(entry)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                # 子模块的耗时从上一层的自身耗时中扣除
+                stack[-1][4] += elapsed
+            sequence, depth, fullname, importer, children = entry
+            self.records.append((sequence, depth, fullname, importer, elapsed - children, elapsed))
+
+    def total_seconds(self):
+        """顶层导入的累计耗时之和"""
+        return sum(record[5] for record in self.records if record[1] == 0)
+
+    def format_report(self, min_ms=DEFAULT_MIN_MS):
+        elapsed = time.perf_counter() - self.started if self.started is not None else 0.0
+        records = sorted(self.records)
+        total = self.total_seconds()
+        lines = [f"启动导入耗时: {len(records)} 个模块，导入共 {total * 1000:.1f} 毫秒"
+                 f"（开始分析到现在 {elapsed * 1000:.1f} 毫秒，占 {total / elapsed * 100 if elapsed > 0 else 0:.0f}%）",
+                 f"{'自身(ms)':>10} {'累计(ms)':>10}  模块（导入者）"]
+        hidden = 0
+        for _, depth, fullname, importer, own, cumulative in records:
+            if cumulative * 1000 < min_ms:
+                hidden += 1
+                continue
+            lines.append(f"{own * 1000:>10.1f} {cumulative * 1000:>10.1f}  {'  ' * depth}{fullname}"
+                         + (f"  ({importer})" if depth == 0 else ""))
+        if hidden:
+            lines.append(f"另有 {hidden} 个模块累计耗时低于 {min_ms:g} 毫秒，未显示")
+
+        # 最慢的顶层导入，便于一眼看出启动路径上的重量级模块
+        slowest = sorted((record for record in records if record[1] == 0), key=lambda r: -r[5])[:5]
+        if slowest:
+            lines.append("最慢的顶层导入: " + "，".join(f"{record[2]} {record[5] * 1000:.1f}ms" for record in slowest))
+        return "\n".join(lines)
+
+
+_profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+def install(report=True, min_ms=None):
+    """开始记录导入耗时；report 为 True 时在退出时把报告写到 stderr"""
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler().install()
+        if report:
+            if min_ms is None:
+                try:
+                    min_ms = float(os.environ.get("FC_PROFILE_STARTUP_MIN_MS") or DEFAULT_MIN_MS)
+                except ValueError:
+                    min_ms = DEFAULT_MIN_MS
+            atexit.register(_report, _profiler, min_ms)
+    return _profiler
+
+
+def _report(profiler, min_ms):
+    profiler.uninstall()
+    print(profiler.format_report(min_ms), file=sys.stderr)
+
+
+def install_from_argv(argv=None):
+    """命令行中有 --profile-startup 或 FC_PROFILE_STARTUP=1 时开始记录，返回 ImportProfiler 或 None"""
+    argv = sys.argv if argv is None else argv
+    if FLAG in argv or os.environ.get("FC_PROFILE_STARTUP") == "1":
+        return install()
+    return None
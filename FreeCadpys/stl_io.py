@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+STL 读写（顶点/面片数组 -> 二进制或 ASCII STL）
+
+mesh.write(stl_path) 无法控制格式、法向和缓冲，批量导出时 STL 文件又大又多。本模块：
+
+- 用 NumPy 一次性计算所有面片的法向
+- 二进制 STL 的 50 字节记录（法向 3 x float32、顶点 9 x float32、属性 uint16）
+  对应一个结构化数组 STL_DTYPE，整块通过 memoryview 写入文件，不逐条 struct.pack
+- 大网格按 CHUNK_TRIANGLES 个三角形一块写出，内存占用与块大小有关而与网格大小无关
+- write_stl_stream 接受生成器逐块产生的三角形，适合无法一次放进内存的网格，
+  写完后回填文件头中的三角形数量
+- 默认写二进制，ASCII 需要显式指定 binary=False
+
+用法:
+    python FreeCadpys/stl_io.py part.stl               # 查看 STL 的格式、三角形数量和包围盒
+    python FreeCadpys/stl_io.py part.stl --ascii=a.stl # 转换为 ASCII STL
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# 二进制 STL 单个三角形记录：法向、三个顶点、属性字节数，共 50 字节
+STL_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+
+HEADER_SIZE = 80
+
+# 每次写入的三角形数量（约 3.2 MB）
+CHUNK_TRIANGLES = 1 << 16
+
+DEFAULT_HEADER = b"binary STL written by stl_io"
+
+
+def facet_normals(triangles):
+    """triangles 为 (n, 3, 3) 数组，返回 (n, 3) 单位法向；退化三角形的法向为 0"""
+    triangles = np.asarray(triangles, dtype=np.float64)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def pack_triangles(triangles, out=None):
+    """把 (n, 3, 3) 三角形打包为 STL_DTYPE 记录数组；out 为预先分配的记录缓冲区时复用它"""
+    triangles = np.asarray(triangles)
+    count = len(triangles)
+    records = np.empty(count, dtype=STL_DTYPE) if out is None else out[:count]
+    records["normal"] = facet_normals(triangles)
+    records["vertices"] = triangles
+    records["attr"] = 0
+    return records
+
+
+def _header(header):
+    if isinstance(header, str):
+        header = header.encode("ascii", "replace")
+    # 二进制 STL 的文件头不能以 "solid" 开头，否则会被部分软件当作 ASCII
+    if header[:5].lower() == b"solid":
+        header = b"STL " + header
+    return header[:HEADER_SIZE].ljust(HEADER_SIZE, b" ")
+
+
+def _triangle_chunks(vertices, faces, chunk):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+    for start in range(0, len(faces), chunk):
+        yield vertices[faces[start:start + chunk]]
+
+
+def _ensure_directory(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _write_binary(f, chunks, chunk):
+    """逐块写出三角形记录，返回三角形总数"""
+    buffer = np.empty(chunk, dtype=STL_DTYPE)
+    count = 0
+    for triangles in chunks:
+        triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+        # 生成器给出的块可能比缓冲区大，按缓冲区大小再切分
+        for start in range(0, len(triangles), chunk):
+            records = pack_triangles(triangles[start:start + chunk], out=buffer)
+            f.write(memoryview(records).cast("B"))
+            count += len(records)
+    return count
+
+
+def _write_ascii(f, chunks, name):
+    count = 0
+    f.write(f"solid {name}\n".encode("ascii", "replace"))
+    facet = ("facet normal {:e} {:e} {:e}\n outer loop\n"
+             "  vertex {:e} {:e} {:e}\n  vertex {:e} {:e} {:e}\n  vertex {:e} {:e} {:e}\n"
+             " endloop\nendfacet\n")
+    for triangles in chunks:
+        triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+        rows = np.hstack([facet_normals(triangles), triangles.reshape(-1, 9)])
+        f.write("".join(facet.format(*row) for row in rows.tolist()).encode("ascii"))
+        count += len(triangles)
+    f.write(f"endsolid {name}\n".encode("ascii", "replace"))
+    return count
+
+
+def write_stl_stream(path, triangle_chunks, binary=True, header=DEFAULT_HEADER, name=None,
+                     chunk=CHUNK_TRIANGLES):
+    """写出生成器逐块产生的三角形（每块为 (n, 3, 3) 数组或单个 (3, 3) 三角形），返回三角形数量
+
+    二进制格式先写入数量为 0 的文件头，写完后回填实际数量；
+    ASCII 格式的 solid 名称为 name，默认取文件名。
+    """
+    _ensure_directory(path)
+    with open(path, "wb") as f:
+        if not binary:
+            name = name or os.path.splitext(os.path.basename(path))[0]
+            return _write_ascii(f, triangle_chunks, "_".join(str(name).split()) or "mesh")
+        f.write(_header(header))
+        f.write(np.uint32(0).tobytes())
+        count = _write_binary(f, triangle_chunks, chunk)
+        f.seek(HEADER_SIZE)
+        f.write(np.array(count, dtype="<u4").tobytes())
+    return count
+
+
+def write_stl(path, vertices, faces, binary=True, header=DEFAULT_HEADER, name=None,
+              chunk=CHUNK_TRIANGLES):
+    """写出顶点数组 (m, 3) 和面片索引数组 (n, 3) 组成的网格，返回三角形数量"""
+    return write_stl_stream(path, _triangle_chunks(vertices, faces, chunk),
+                            binary=binary, header=header, name=name, chunk=chunk)
+
+
+def mesh_arrays(mesh):
+    """FreeCAD Mesh 对象 -> (vertices, faces) 数组"""
+    points, facets = mesh.Topology
+    vertices = np.array([(p.x, p.y, p.z) for p in points], dtype=np.float64).reshape(-1, 3)
+    faces = np.array(facets, dtype=np.int64).reshape(-1, 3)
+    return vertices, faces
+
+
+def is_binary_stl(path):
+    """按文件长度判断是否为二进制 STL（ASCII STL 也可能以任意 80 字节开头）"""
+    size = os.path.getsize(path)
+    if size < HEADER_SIZE + 4:
+        return False
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    return size == HEADER_SIZE + 4 + count * STL_DTYPE.itemsize
+
+
+def read_stl(path):
+    """读取二进制或 ASCII STL，返回 (n, 3, 3) 三角形数组（float64）"""
+    if is_binary_stl(path):
+        records = np.fromfile(path, dtype=STL_DTYPE, offset=HEADER_SIZE + 4)
+        return records["vertices"].astype(np.float64)
+    values = []
+    with open(path, "r", encoding="ascii", errors="replace") as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "vertex":
+                values.append([float(v) for v in parts[1:4]])
+    return np.array(values, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        print("用法: python stl_io.py <文件.stl> [--ascii=输出.stl | --binary=输出.stl]")
+        return 1
+    path = sys.argv[1]
+    triangles = read_stl(path)
+    print(f"文件: {path}")
+    print(f"- 格式: {'二进制' if is_binary_stl(path) else 'ASCII'}")
+    print(f"- 三角形: {len(triangles)}")
+    if len(triangles):
+        points = triangles.reshape(-1, 3)
+        print(f"- 包围盒: {points.min(axis=0).tolist()} - {points.max(axis=0).tolist()}")
+    for arg in sys.argv[2:]:
+        for option, binary in (("--ascii=", False), ("--binary=", True)):
+            if arg.startswith(option):
+                out = arg[len(option):]
+                count = write_stl_stream(out, [triangles], binary=binary,
+                                         name=os.path.splitext(os.path.basename(path))[0])
+                print(f"✓ 已写出 {out}（{count} 个三角形）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+参数扫描 / 试验设计：按参数范围批量生成 create_cube.py 的任务
+
+每个扫描参数可以是：
+    10,20,30        取值列表（holeAxis 用 X,Y,Z；rot 的多个三元组用分号分隔，如 "0,0,0;0,0,90"）
+    10:50:10        等差数列（含终点）
+    10..50          连续区间：网格模式下取 --levels 个等分点，拉丁超立方模式下在区间内采样
+    15              固定值
+rot 的区间写成 "0,0,0..0,0,90"（两个三元组之间线性插值）。
+
+- --mode grid 展开笛卡尔积，--mode lhs 生成 --samples 个拉丁超立方样本；两种方式都是生成器，
+  任务逐个产生、逐个写出或执行，十万个点的扫描也不会一次全部放进内存
+- 孔的直径不小于垂直于孔轴的截面最小边长等几何上无效的组合在生成时直接跳过
+  （与解析网格使用同一个判断 analytic_mesh.supports，需要 NumPy，不可用时不做这项检查）
+- 同一几何形状只生成一次（按几何参数的哈希去重，没有孔时孔的轴向不影响形状）；
+  输出文件已存在的任务也跳过，扫描中断后重新运行会从未完成的部分继续
+- 默认把任务写成 JSON-lines 清单（可交给 fc_pool.py 并行执行，或 create_cube.py --batch），
+  --run 时先写出清单（默认 <扫描名称>.jsonl），再交给 create_cube.run_batch 在当前进程中逐个生成
+
+用法:
+    python FreeCadpys/sweep.py --length=10:50:10 --holeRadius=0,2,4 --holeAxis=X,Z --manifest=sweep.jsonl
+    python FreeCadpys/sweep.py --mode=lhs --samples=100000 --length=10..100 --width=10..100 \\
+        --height=5..50 --holeRadius=0..20 --manifest=sweep.jsonl
+    python FreeCadpys/fc_pool.py sweep.jsonl -j 8 --freecadcmd 'C:/.../freecadcmd.exe'
+    python FreeCadpys/sweep.py --length=10:30:5 --fcstd-template=none --stl-template='stls/{sweep}/{key}.stl' --run
+"""
+
+import os
+import sys
+import json
+import time
+import array
+import random
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import create_cube
+import part_cache
+
+# 可以扫描的参数
+SWEEP_PARAMS = ("length", "width", "height", "holeRadius", "holeAxis", "rot")
+
+# 网格模式下连续区间的默认取点数
+DEFAULT_LEVELS = 5
+
+DEFAULT_FCSTD_TEMPLATE = os.path.join("FCStds", "{sweep}", "{key}.FCStd")
+
+# 输出文件名中的几何哈希长度
+KEY_LENGTH = 16
+
+
+class Axis:
+    """一个扫描参数：取值列表 values，或连续区间 [low, high]（数值或三元组）"""
+
+    def __init__(self, name, values=None, low=None, high=None):
+        self.name = name
+        self.values = values
+        self.low = low
+        self.high = high
+
+    @property
+    def is_interval(self):
+        return self.values is None
+
+    def _lerp(self, u):
+        if isinstance(self.low, tuple):
+            return tuple(a + u * (b - a) for a, b in zip(self.low, self.high))
+        return self.low + u * (self.high - self.low)
+
+    def grid(self, levels):
+        if not self.is_interval:
+            return list(self.values)
+        if levels == 1:
+            return [self._lerp(0.5)]
+        return [self._lerp(i / (levels - 1)) for i in range(levels)]
+
+    def sample(self, u):
+        """u 在 [0, 1) 内，区间取对应位置的值，列表取对应分层的元素"""
+        if self.is_interval:
+            return self._lerp(u)
+        return self.values[min(int(u * len(self.values)), len(self.values) - 1)]
+
+
+def _number_list(text):
+    if ":" in text:
+        parts = [float(part) for part in text.split(":")]
+        if len(parts) != 3 or parts[2] <= 0 or parts[1] < parts[0]:
+            raise ValueError(f"等差数列格式为 起点:终点:步长（步长大于0）: {text!r}")
+        start, stop, step = parts
+        count = int((stop - start) / step + 1e-9) + 1
+        return [round(start + i * step, 12) for i in range(count)]
+    return [float(part) for part in text.split(",")]
+
+
+def parse_axis(name, spec):
+    """命令行或规格文件中的一个扫描参数 -> Axis"""
+    if isinstance(spec, dict):
+        # 规格文件: {"min": 10, "max": 50} 或 {"min": 10, "max": 50, "step": 10}
+        if "step" in spec:
+            spec = f"{spec['min']}:{spec['max']}:{spec['step']}"
+        else:
+            low, high = spec["min"], spec["max"]
+            if name == "rot":
+                return Axis(name, low=create_cube.parse_triplet(low), high=create_cube.parse_triplet(high))
+            return Axis(name, low=float(low), high=float(high))
+    if isinstance(spec, list):
+        if name == "rot":
+            return Axis(name, values=[create_cube.parse_triplet(value) for value in spec])
+        if name == "holeAxis":
+            return Axis(name, values=[str(value).upper() for value in spec])
+        return Axis(name, values=[float(value) for value in spec])
+
+    text = str(spec).strip()
+    if name == "holeAxis":
+        return Axis(name, values=[part.strip().upper() for part in text.split(",")])
+    if ".." in text:
+        low, high = text.split("..", 1)
+        if name == "rot":
+            return Axis(name, low=create_cube.parse_triplet(low), high=create_cube.parse_triplet(high))
+        return Axis(name, low=float(low), high=float(high))
+    if name == "rot":
+        return Axis(name, values=[create_cube.parse_triplet(part) for part in text.split(";")])
+    return Axis(name, values=_number_list(text))
+
+
+def grid_points(axes, levels=DEFAULT_LEVELS):
+    """笛卡尔积，逐个产生 {参数名: 值}"""
+    names = [axis.name for axis in axes]
+    for values in itertools.product(*[axis.grid(levels) for axis in axes]):
+        yield dict(zip(names, values))
+
+
+def _permutation(n, rng):
+    """0..n-1 的随机排列（紧凑的整数数组，十万个点约 400 KB）"""
+    perm = array.array("L", range(n))
+    for i in range(n - 1, 0, -1):
+        j = rng.randrange(i + 1)
+        perm[i], perm[j] = perm[j], perm[i]
+    return perm
+
+
+def latin_hypercube_points(axes, samples, seed=None):
+    """拉丁超立方采样：每个参数的 [0, 1) 被分成 samples 层，每层恰好取一次，逐个产生 {参数名: 值}"""
+    rng = random.Random(seed)
+    perms = [_permutation(samples, rng) for _ in axes]
+    for i in range(samples):
+        yield {axis.name: axis.sample((perm[i] + rng.random()) / samples)
+               for axis, perm in zip(axes, perms)}
+
+
+class SweepStats:
+    def __init__(self):
+        self.points = 0
+        self.invalid = 0
+        self.duplicate = 0
+        self.existing = 0
+        self.jobs = 0
+
+    def summary(self):
+        return (f"采样点 {self.points} 个：生成任务 {self.jobs} 个，跳过无效 {self.invalid} 个、"
+                f"重复 {self.duplicate} 个、输出已存在 {self.existing} 个")
+
+
+def _is_output(path):
+    return bool(path) and str(path).lower() not in create_cube.NO_OUTPUT
+
+
+def sweep_jobs(points, fixed=None, sweep="sweep", fcstd_template=DEFAULT_FCSTD_TEMPLATE,
+               stl_template=None, stats=None):
+    """把采样点变成任务参数（逐个产生）：补全固定参数、校验、去重、填写输出路径
+
+    fcstd_template 为 none 时不保存 .FCStd；模板字段：所有参数名、key（几何哈希）、index、sweep。
+    """
+    stats = stats if stats is not None else SweepStats()
+    fixed = dict(fixed or {})
+    analytic_mesh = create_cube.load_analytic_mesher()
+    seen = set()
+    for point in points:
+        stats.points += 1
+        raw = {**fixed, **point}
+        for name in ("pos", "rot"):
+            if isinstance(raw.get(name), tuple):
+                raw[name] = list(raw[name])
+        try:
+            params = create_cube.normalize_params(raw, strict=True)
+        except ValueError:
+            stats.invalid += 1
+            continue
+        if analytic_mesh is not None and not analytic_mesh.supports(params):
+            stats.invalid += 1
+            continue
+
+        key = part_cache.canonical_key(create_cube.geometry_fields(params))[:KEY_LENGTH]
+        # 只保存哈希的整数值，去重集合的内存开销很小
+        digest = int(key, 16)
+        if digest in seen:
+            stats.duplicate += 1
+            continue
+        seen.add(digest)
+
+        fields = {**params, "key": key, "index": stats.jobs + 1, "sweep": sweep}
+        params["fcstd"] = (fcstd_template.format(**fields) if _is_output(fcstd_template)
+                           else "none")
+        params["stl"] = stl_template.format(**fields) if _is_output(stl_template) else None
+        outputs = [path for path in (params["fcstd"], params["stl"]) if _is_output(path)]
+        if outputs and all(os.path.exists(path) for path in outputs):
+            stats.existing += 1
+            continue
+        stats.jobs += 1
+        yield key, params
+
+
+def job_record(key, params, fixed_names):
+    """任务 -> 清单中的一行（参数直接写在行内，fc_pool.py 和 create_cube.py --batch 都能读取）"""
+    record = {"id": key}
+    for name in SWEEP_PARAMS + tuple(fixed_names) + ("fcstd", "stl"):
+        value = params.get(name)
+        if value is None:
+            continue
+        record[name] = list(value) if isinstance(value, tuple) else value
+    return record
+
+
+def load_spec(path):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if not isinstance(spec, dict):
+        raise ValueError("规格文件必须是 JSON 对象")
+    return spec
+
+
+def main():
+    parser = argparse.ArgumentParser(description="create_cube.py 参数扫描 / 试验设计")
+    parser.add_argument("--spec", help="JSON 规格文件：{参数名: 取值列表 | {min, max[, step]} | 字符串}")
+    for name in SWEEP_PARAMS:
+        parser.add_argument(f"--{name}", help="取值列表、起点:终点:步长 或 区间 低..高")
+    parser.add_argument("--mode", choices=("grid", "lhs"), default="grid", help="网格（笛卡尔积）或拉丁超立方")
+    parser.add_argument("--levels", type=int, default=DEFAULT_LEVELS,
+                        help=f"网格模式下连续区间的取点数 (默认 {DEFAULT_LEVELS})")
+    parser.add_argument("--samples", type=int, default=100, help="拉丁超立方的样本数 (默认 100)")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="所有任务共用的参数，如 --set name=Part --set pos=0,0,0")
+    parser.add_argument("--sweep", default="sweep", help="扫描名称，用于输出路径模板 (默认 sweep)")
+    parser.add_argument("--fcstd-template", default=DEFAULT_FCSTD_TEMPLATE,
+                        help="FCStd 输出路径模板，none 表示不保存 (默认 FCStds/{sweep}/{key}.FCStd)")
+    parser.add_argument("--stl-template", help="STL 输出路径模板，如 stls/{sweep}/{key}.stl")
+    parser.add_argument("--manifest", help="写出的 JSON-lines 清单 (默认 - 表示 stdout，--run 时默认 <扫描名称>.jsonl)")
+    parser.add_argument("--run", action="store_true", help="写出清单后在当前进程中逐个生成")
+    parser.add_argument("--results", help="--run 时的结果文件 (默认 <扫描名称>.results.jsonl)")
+    parser.add_argument("--limit", type=int, default=None, help="最多生成的任务数")
+    parser.add_argument("--no-cache", action="store_true", help="--run 时不使用零件缓存")
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec) if args.spec else {}
+    unknown = sorted(set(spec) - set(SWEEP_PARAMS))
+    if unknown:
+        parser.error(f"规格文件中不能扫描的参数: {', '.join(unknown)}")
+    for name in SWEEP_PARAMS:
+        if getattr(args, name) is not None:
+            spec[name] = getattr(args, name)
+    if not spec:
+        parser.error("至少需要指定一个扫描参数")
+    try:
+        axes = [parse_axis(name, spec[name]) for name in SWEEP_PARAMS if name in spec]
+    except (ValueError, KeyError) as e:
+        parser.error(f"扫描参数格式错误: {e}")
+    fixed = dict(item.split("=", 1) for item in args.set if "=" in item)
+
+    if args.mode == "lhs":
+        points = latin_hypercube_points(axes, args.samples, args.seed)
+        planned = args.samples
+    else:
+        points = grid_points(axes, args.levels)
+        planned = 1
+        for axis in axes:
+            planned *= len(axis.grid(args.levels))
+    stats = SweepStats()
+    jobs = sweep_jobs(points, fixed, args.sweep, args.fcstd_template, args.stl_template, stats)
+    if args.limit is not None:
+        jobs = itertools.islice(jobs, args.limit)
+
+    manifest = args.manifest or (f"{args.sweep}.jsonl" if args.run else "-")
+    if args.run and manifest == "-":
+        parser.error("--run 需要把清单写到文件")
+    # 清单写到 stdout 时，提示信息写到 stderr
+    log = sys.stderr if manifest == "-" else sys.stdout
+    print(f"扫描 {args.sweep}: {args.mode} 模式，计划 {planned} 个采样点", file=log)
+    started = time.perf_counter()
+    out = sys.stdout if manifest == "-" else open(manifest, "w", encoding="utf-8")
+    try:
+        for key, params in jobs:
+            out.write(json.dumps(job_record(key, params, fixed), ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+            print(f"- 任务清单: {manifest}", file=log)
+
+    failed = 0
+    if args.run:
+        # 每行都带有 fcstd/stl 输出路径，run_batch 不需要再套用模板
+        cache = None if args.no_cache else part_cache.PartCache.from_env()
+        results_path = args.results or f"{args.sweep}.results.jsonl"
+        _, failed = create_cube.run_batch(manifest, results_path, cache=cache)
+
+    elapsed = time.perf_counter() - started
+    print(f"{stats.summary()}，失败 {failed} 个，耗时 {elapsed:.2f} 秒", file=log)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
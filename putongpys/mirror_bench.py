@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基于 asyncio 的镜像源并发测速调度器
+
+特点：
+1. 每个镜像源采样 N 次，按 p50/p95 延迟和吞吐量排名，而不是只看一次耗时
+2. 通过信号量限制同时进行的探测数量
+3. 全局截止时间：到点后取消所有未完成的探测，慢镜像/黑洞镜像不会拖住整体结果
+4. 每完成一次采样立即回调，便于边测边输出
+"""
+
+import time
+import asyncio
+
+import mirror_trace
+from mirror_probe import probe_mirror_async, PROBE_PACKAGE, PROBE_TIMEOUT
+
+# 默认每个镜像源采样次数
+DEFAULT_SAMPLES = 3
+
+# 默认同时进行的探测数量
+DEFAULT_CONCURRENCY = 6
+
+# 默认全局截止时间（秒）
+DEFAULT_DEADLINE = 15.0
+
+# 失败率超过该值的镜像源排在稳定镜像源之后
+MAX_FAILURE_RATE = 0.5
+
+
+def percentile(values, q):
+    """未排序数据的百分位数（线性插值），values 为空时返回 inf，排名时排在最后"""
+    value = mirror_trace.percentile(sorted(values), q)
+    return float('inf') if value is None else value
+
+
+def summarize(name, url, samples, failures, errors):
+    """把某个镜像源的所有采样汇总为统计字典"""
+    latencies = [s["total"] for s in samples]
+    throughputs = [s["throughput"] for s in samples if s.get("throughput")]
+    attempts = len(samples) + failures
+    return {
+        "name": name,
+        "url": url,
+        "samples": len(samples),
+        "failures": failures,
+        "failure_rate": failures / attempts if attempts else 1.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "throughput": percentile(throughputs, 50) if throughputs else 0.0,
+        "success": bool(samples),
+        "last_error": errors[-1] if errors else None,
+    }
+
+
+def rank_key(stats):
+    """排名规则：可用优先，其次失败率不过高，再按 p50、p95 升序、吞吐量降序"""
+    return (not stats["success"],
+            stats["failure_rate"] > MAX_FAILURE_RATE,
+            stats["p50"],
+            stats["p95"],
+            -stats["throughput"])
+
+
+async def benchmark_mirrors(mirrors, samples=DEFAULT_SAMPLES,
+                            concurrency=DEFAULT_CONCURRENCY,
+                            deadline=DEFAULT_DEADLINE, timeout=PROBE_TIMEOUT,
+                            package=PROBE_PACKAGE, probe=None, on_result=None):
+    """并发测试所有镜像源，返回按排名排序的统计列表
+
+    Args:
+        mirrors: {名称: URL} 字典
+        samples: 每个镜像源的采样次数
+        concurrency: 同时进行的探测数量上限
+        deadline: 全局截止时间（秒），到点后未完成的采样记为失败
+        timeout: 单次探测的超时时间（秒）
+        probe: 可选的异步探测函数 probe(url) -> 结果字典，默认使用HTTP探测
+        on_result: 每完成一次采样时的回调 on_result(名称, 结果字典)
+    """
+    if probe is None:
+        async def probe(url):
+            return await probe_mirror_async(url, package, timeout)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    collected = {name: ([], 0, []) for name in mirrors}
+
+    async def run_one(name, url):
+        async with semaphore:
+            return name, await probe(url)
+
+    # 轮流排列采样顺序，让每个镜像源的第一次采样最先执行
+    tasks = {}
+    for _ in range(samples):
+        for name, url in mirrors.items():
+            task = asyncio.create_task(run_one(name, url))
+            tasks[task] = name
+
+    end_time = time.monotonic() + deadline
+    pending = set(tasks)
+    while pending:
+        remaining = end_time - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = await asyncio.wait(pending, timeout=remaining,
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name, result = task.result()
+            ok, failures, errors = collected[name]
+            if result["success"]:
+                ok.append(result)
+            else:
+                errors.append(result["error"])
+                collected[name] = (ok, failures + 1, errors)
+            if on_result:
+                on_result(name, result)
+
+    # 截止时间已到，取消剩余的探测
+    for task in pending:
+        task.cancel()
+        name = tasks[task]
+        ok, failures, errors = collected[name]
+        collected[name] = (ok, failures + 1, errors + [f"超过全局截止时间({deadline:g}秒)"])
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    stats = [summarize(name, mirrors[name], *collected[name]) for name in mirrors]
+    stats.sort(key=rank_key)
+    return stats
+
+
+def run_benchmark(mirrors, **kwargs):
+    """benchmark_mirrors 的同步入口"""
+    return asyncio.run(benchmark_mirrors(mirrors, **kwargs))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+镜像源测速排名缓存
+
+把最近一次测速的排名结果（p50/p95 延迟、吞吐量、失败次数、时间戳）保存在
+配置文件旁边的 ~/.pypi_mirror_ranking.json 中：
+1. 缓存未过期时直接复用，不再重新测速
+2. 缓存过期时先用旧排名，同时在后台启动一个进程刷新缓存
+3. 缓存中最快的镜像源安装失败时，记录失败次数并立即重新测速
+4. 记录真实安装时各镜像源的下载吞吐量，排名时按"预计下载耗时"综合考虑
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+# 排名缓存文件，与 CONFIG_FILE 放在同一目录
+RANKING_FILE = os.path.join(os.path.expanduser("~"), ".pypi_mirror_ranking.json")
+
+# 后台刷新时使用的锁文件，避免同时启动多个刷新进程
+REFRESH_LOCK_FILE = RANKING_FILE + ".lock"
+
+# 默认缓存有效期（秒）
+DEFAULT_MAX_AGE = 6 * 3600
+
+# 锁文件超过该时间（秒）视为刷新进程已异常退出
+REFRESH_LOCK_TIMEOUT = 300
+
+# 估算"预计下载耗时"时假设的典型包大小（字节）
+TYPICAL_PAYLOAD_BYTES = 1024 * 1024
+
+# 下载吞吐量指数滑动平均的权重（新样本所占比例）
+PAYLOAD_EWMA_ALPHA = 0.3
+
+# 重新测速时需要保留的、从真实安装中学到的字段
+LEARNED_KEYS = ("install_failures", "payload_throughput", "payload_bytes",
+                "payload_samples")
+
+
+def _encode_number(value):
+    # JSON 不支持 inf，保存为 None
+    if isinstance(value, float) and value == float('inf'):
+        return None
+    return value
+
+
+def _decode_number(value):
+    return float('inf') if value is None else value
+
+
+def load_ranking():
+    """加载排名缓存，不存在或损坏时返回 None"""
+    if not os.path.exists(RANKING_FILE):
+        return None
+    try:
+        with open(RANKING_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except Exception as e:
+        print(f"加载排名缓存失败: {e}")
+        return None
+    for item in cache.get("mirrors", []):
+        for key in ("p50", "p95"):
+            item[key] = _decode_number(item.get(key))
+    return cache
+
+
+def _write_ranking(cache):
+    data = dict(cache)
+    data["mirrors"] = [{key: _encode_number(value) for key, value in item.items()}
+                       for item in cache["mirrors"]]
+    try:
+        # 先写临时文件再替换，避免后台刷新与前台读取冲突时读到半个文件
+        tmp_path = RANKING_FILE + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, RANKING_FILE)
+    except Exception as e:
+        print(f"保存排名缓存失败: {e}")
+
+
+def save_ranking(stats, probe="http"):
+    """保存排名结果，stats 为 mirror_bench.benchmark_mirrors 返回的列表"""
+    old = load_ranking() or {}
+    learned = {item["name"]: {key: item[key] for key in LEARNED_KEYS if key in item}
+               for item in old.get("mirrors", [])}
+    mirrors = []
+    for item in stats:
+        entry = dict(item)
+        entry["install_failures"] = 0
+        entry.update(learned.get(item["name"], {}))
+        mirrors.append(entry)
+    _write_ranking({"timestamp": time.time(), "probe": probe, "mirrors": mirrors})
+
+
+def clear_ranking():
+    """删除排名缓存，返回是否删除了文件"""
+    if os.path.exists(RANKING_FILE):
+        os.remove(RANKING_FILE)
+        return True
+    return False
+
+
+def cache_age(cache):
+    """缓存已存在的时间（秒）"""
+    return time.time() - cache.get("timestamp", 0)
+
+
+def is_fresh(cache, max_age=DEFAULT_MAX_AGE):
+    """缓存是否在有效期内"""
+    return cache is not None and cache_age(cache) <= max_age
+
+
+def expected_fetch_time(item, default_throughput=None):
+    """预计下载一个典型大小的包所需时间：索引延迟 + 包大小 / 真实下载吞吐量
+
+    没有真实下载记录的镜像源使用 default_throughput（其他镜像源的中位数），
+    都没有记录时只看索引延迟 p50。
+    """
+    throughput = item.get("payload_throughput") or default_throughput
+    if not throughput:
+        return item["p50"]
+    return item["p50"] + TYPICAL_PAYLOAD_BYTES / throughput
+
+
+def ranked_mirrors(cache):
+    """从缓存中取出可用镜像源列表 [(名称, URL), ...]，按预计下载耗时排序"""
+    if not cache:
+        return []
+    available = [item for item in cache.get("mirrors", []) if item.get("success")]
+    learned = sorted(item["payload_throughput"] for item in available
+                     if item.get("payload_throughput"))
+    default_throughput = learned[len(learned) // 2] if learned else None
+    # sorted 是稳定排序，没有下载记录时保持测速排名
+    available.sort(key=lambda item: expected_fetch_time(item, default_throughput))
+    return [(item["name"], item["url"]) for item in available]
+
+
+def record_downloads(summary):
+    """记录真实安装中各镜像源的下载情况
+
+    summary 为 {名称: (总字节数, 总耗时秒数)}，吞吐量用指数滑动平均累积。
+    """
+    cache = load_ranking()
+    if not cache or not summary:
+        return
+    for item in cache["mirrors"]:
+        if item["name"] not in summary:
+            continue
+        total_bytes, total_seconds = summary[item["name"]]
+        throughput = total_bytes / total_seconds
+        old = item.get("payload_throughput")
+        item["payload_throughput"] = (throughput if not old else
+                                      old + PAYLOAD_EWMA_ALPHA * (throughput - old))
+        item["payload_bytes"] = item.get("payload_bytes", 0) + total_bytes
+        item["payload_samples"] = item.get("payload_samples", 0) + 1
+    _write_ranking(cache)
+
+
+def record_install_failure(mirror_name):
+    """记录某个镜像源的一次安装失败，并把它从缓存的可用列表中降级"""
+    cache = load_ranking()
+    if not cache:
+        return
+    for item in cache["mirrors"]:
+        if item["name"] == mirror_name:
+            item["install_failures"] = item.get("install_failures", 0) + 1
+            item["success"] = False
+    # 失败的镜像源排到最后，其余保持原顺序
+    cache["mirrors"].sort(key=lambda item: not item.get("success"))
+    _write_ranking(cache)
+
+
+def _acquire_refresh_lock():
+    try:
+        if time.time() - os.path.getmtime(REFRESH_LOCK_FILE) > REFRESH_LOCK_TIMEOUT:
+            os.remove(REFRESH_LOCK_FILE)
+    except OSError:
+        pass
+    try:
+        fd = os.open(REFRESH_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def release_refresh_lock():
+    """刷新进程结束时释放锁"""
+    try:
+        os.remove(REFRESH_LOCK_FILE)
+    except OSError:
+        pass
+
+
+def refresh_in_background(script_path, extra_args=()):
+    """启动一个脱离当前进程的子进程刷新排名缓存
+
+    子进程执行 `python <script_path> cache refresh`，输出被丢弃。
+    已有刷新进程在运行时不会重复启动，返回是否启动了新进程。
+    """
+    if not _acquire_refresh_lock():
+        return False
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs["creationflags"] = (subprocess.DETACHED_PROCESS |
+                                   subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        subprocess.Popen(
+            [sys.executable, script_path, 'cache', 'refresh', *extra_args],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **kwargs
+        )
+    except OSError as e:
+        release_refresh_lock()
+        print(f"启动后台刷新失败: {e}")
+        return False
+    return True
+
+
+def show_ranking(cache, max_age=DEFAULT_MAX_AGE):
+    """打印排名缓存内容"""
+    if not cache:
+        print("没有镜像源排名缓存")
+        return
+    age = cache_age(cache)
+    state = "有效" if age <= max_age else "已过期"
+    print(f"排名缓存: {RANKING_FILE}")
+    measured = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cache['timestamp']))
+    print(f"测速时间: {measured}（{age:.0f} 秒前，{state}，有效期 {max_age} 秒，"
+          f"测速方式 {cache.get('probe')}）")
+    print("-" * 100)
+    print(f"{'排名':<5} {'镜像源':<10} {'p50(秒)':<10} {'p95(秒)':<10} {'吞吐(KB/s)':<12} "
+          f"{'下载(KB/s)':<12} {'测速失败':<8} {'安装失败':<8} {'状态':<6}")
+    print("-" * 100)
+    for rank, item in enumerate(cache["mirrors"], 1):
+        success = item.get("success")
+        p50_str = f"{item['p50']:.3f}" if item["p50"] != float('inf') else "N/A"
+        p95_str = f"{item['p95']:.3f}" if item["p95"] != float('inf') else "N/A"
+        throughput_str = (f"{item['throughput'] / 1024:.1f}"
+                          if item.get("throughput") else "N/A")
+        payload_str = (f"{item['payload_throughput'] / 1024:.1f}"
+                       if item.get("payload_throughput") else "N/A")
+        print(f"{rank:<5} {item['name']:<10} {p50_str:<10} {p95_str:<10} "
+              f"{throughput_str:<12} {payload_str:<12} {item.get('failures', 0):<8} "
+              f"{item.get('install_failures', 0):<8} {'可用' if success else '不可用':<6}")
+    print("-" * 100)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+带故障转移的 pip install 执行器
+
+1. 构建 pip install 命令：主镜像源 + 若干 --extra-index-url 备用镜像源
+2. 实时转发 pip 输出，同时记录每个包的下载耗时和大小，用于学习真实下载速度
+3. 根据输出判断失败是否由网络问题引起，网络问题才值得换镜像源重试
+"""
+
+import re
+import sys
+import time
+import subprocess
+from urllib.parse import urlsplit
+
+# 故障转移模式
+FAILOVER_OFF = "off"                  # 只使用一个镜像源
+FAILOVER_EXTRA_INDEX = "extra-index"  # 主镜像源 + --extra-index-url 备用镜像源，一次 pip 调用
+FAILOVER_RETRY = "retry"              # 网络失败时按排名依次换镜像源重试
+FAILOVER_MODES = (FAILOVER_OFF, FAILOVER_EXTRA_INDEX, FAILOVER_RETRY)
+
+# 默认备用镜像源数量
+DEFAULT_FALLBACKS = 2
+
+# pip 输出中表示网络问题的特征
+NETWORK_ERROR_PATTERNS = (
+    "ConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ProtocolError",
+    "IncompleteRead",
+    "Max retries exceeded",
+    "Connection reset",
+    "Connection refused",
+    "Temporary failure in name resolution",
+    "Name or service not known",
+    "getaddrinfo failed",
+    "SSLError",
+    "Could not fetch URL",
+    "HTTP error 5",
+    "THESE PACKAGES DO NOT MATCH THE HASHES",
+)
+
+# 形如 "Downloading numpy-2.3.4-cp313-cp313-win_amd64.whl (12.8 MB)"
+DOWNLOAD_LINE = re.compile(r"Downloading\s+(\S+)\s+\(([\d.]+)\s*(B|kB|KB|MB|GB)\)")
+
+SIZE_UNITS = {"B": 1, "kB": 1000, "KB": 1024, "MB": 1000 ** 2, "GB": 1000 ** 3}
+
+
+def mirror_host(mirror_url):
+    """镜像源的主机名，用于 --trusted-host"""
+    return urlsplit(mirror_url).netloc
+
+
+def build_install_command(packages, mirrors, upgrade=False):
+    """构建 pip install 命令
+
+    mirrors 为按优先级排列的 [(名称, URL), ...]，第一个作为 --index-url，
+    其余作为 --extra-index-url。
+    """
+    cmd = [sys.executable, '-m', 'pip', 'install', '--progress-bar', 'off']
+    if upgrade:
+        cmd.append('--upgrade')
+    primary_url = mirrors[0][1]
+    cmd.extend(['--index-url', primary_url])
+    for _, url in mirrors[1:]:
+        cmd.extend(['--extra-index-url', url])
+    # 添加trusted-host参数（处理可能的SSL问题）
+    for _, url in mirrors:
+        cmd.extend(['--trusted-host', mirror_host(url)])
+    cmd.extend(packages)
+    return cmd
+
+
+def is_network_failure(output):
+    """pip 的失败输出是否由网络问题导致"""
+    return any(pattern in output for pattern in NETWORK_ERROR_PATTERNS)
+
+
+def _attribute(target, mirrors):
+    """判断是哪个镜像源提供的文件，无法判断时返回 None
+
+    pip 23 起 Downloading 行只有文件名、没有地址：只用了一个镜像源时（off 模式、retry 的每次尝试）
+    就是它；extra-index 模式下无法知道文件来自哪个镜像源，不能算到主镜像源头上。
+    """
+    if target.startswith("http"):
+        host = urlsplit(target).netloc
+        for name, url in mirrors:
+            if mirror_host(url) == host:
+                return name
+        return None
+    return mirrors[0][0] if len(mirrors) == 1 else None
+
+
+def run_pip_install(cmd, mirrors):
+    """运行 pip install，实时输出并记录下载耗时
+
+    返回 (是否成功, 完整输出, 下载记录列表)，下载记录为
+    {"mirror": 名称, "file": 文件名, "bytes": 字节数, "seconds": 耗时}；
+    无法判断来自哪个镜像源的下载不记录。
+    pip 关闭进度条后，在开始下载时输出 Downloading 行，下载结束后才输出下一行，
+    因此用相邻两行的时间差作为该文件的下载耗时。
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace', bufsize=1)
+    output = []
+    downloads = []
+    pending = None
+    for line in process.stdout:
+        now = time.perf_counter()
+        if pending is not None:
+            pending["seconds"] = now - pending.pop("started")
+            if pending["mirror"] is not None:
+                downloads.append(pending)
+            pending = None
+        sys.stdout.write(line)
+        output.append(line)
+        match = DOWNLOAD_LINE.search(line)
+        if match:
+            target, size, unit = match.groups()
+            pending = {
+                "mirror": _attribute(target, mirrors),
+                "file": target.rsplit('/', 1)[-1],
+                "bytes": int(float(size) * SIZE_UNITS[unit]),
+                "started": now,
+            }
+    process.wait()
+    return process.returncode == 0, "".join(output), downloads
+
+
+def summarize_downloads(downloads):
+    """按镜像源汇总下载记录: {名称: (总字节数, 总耗时)}"""
+    summary = {}
+    for item in downloads:
+        if item["seconds"] <= 0:
+            continue
+        total_bytes, total_seconds = summary.get(item["mirror"], (0, 0.0))
+        summary[item["mirror"]] = (total_bytes + item["bytes"],
+                                   total_seconds + item["seconds"])
+    return summary
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+镜像源HTTP延迟探测引擎
+
+直接在进程内对镜像源的 simple 索引页（PEP 503 HTML / PEP 691 JSON）发起一次
+HTTP 请求，分别记录：
+1. TCP 连接耗时
+2. TLS 握手耗时（仅 https）
+3. 首字节耗时（发出请求到收到响应头）
+4. 响应体传输耗时与吞吐量
+
+不再为每个镜像源启动一个 `pip download` 子进程。
+可以直接用本地 `python -m http.server` 作为替身镜像进行测试：
+    python mirror_probe.py http://127.0.0.1:8000/simple/
+"""
+
+import sys
+import time
+import socket
+import ssl
+import asyncio
+import http.client
+from urllib.parse import urlsplit, urljoin
+
+import mirror_trace
+
+# 默认探测的包（与 pypi_mirror_manager.TEST_PACKAGE 保持一致）
+PROBE_PACKAGE = "pip"
+
+# 默认超时时间（秒），同时作用于连接和读取
+PROBE_TIMEOUT = 5.0
+
+# 优先请求 PEP 691 JSON，退回 PEP 503 HTML
+ACCEPT_HEADER = ("application/vnd.pypi.simple.v1+json, "
+                 "application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.1")
+
+# 读取响应体的块大小
+READ_CHUNK = 64 * 1024
+
+# 最多跟随的重定向次数（部分镜像会把 /simple/pip 重定向到 /simple/pip/）
+MAX_REDIRECTS = 3
+
+
+def project_url(mirror_url, package=PROBE_PACKAGE):
+    """拼出某个包在 simple 索引中的页面地址"""
+    base = mirror_url if mirror_url.endswith('/') else mirror_url + '/'
+    return urljoin(base, f"{package}/")
+
+
+def _empty_result(url):
+    return {
+        "url": url,
+        "status": None,
+        "connect": None,
+        "tls": None,
+        "ttfb": None,
+        "transfer": None,
+        "total": float('inf'),
+        "bytes": 0,
+        "throughput": 0.0,
+        "format": None,
+        "files": 0,
+        "success": False,
+        "error": None,
+    }
+
+
+def _count_files(body, content_type):
+    """统计索引页中列出的文件数，同时用于判断页面是否是合法的 simple 索引"""
+    if "json" in content_type:
+        import json
+        try:
+            data = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return "json", -1
+        files = data.get("files")
+        return "json", len(files) if isinstance(files, list) else -1
+    return "html", body.lower().count(b"<a ")
+
+
+def _request_once(url, timeout, context):
+    """对单个URL发起一次请求，返回 (计时字典, 重定向地址或None)"""
+    result = _empty_result(url)
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    host = parts.hostname
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    start = time.perf_counter()
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        t_connect = time.perf_counter()
+        result["connect"] = t_connect - start
+
+        if https:
+            sock = context.wrap_socket(sock, server_hostname=host)
+            t_tls = time.perf_counter()
+            result["tls"] = t_tls - t_connect
+        else:
+            t_tls = t_connect
+
+        # 复用已经建立好的socket，http.client 只负责请求/响应解析
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        conn.request("GET", path, headers={
+            "Host": parts.netloc,
+            "Accept": ACCEPT_HEADER,
+            "Accept-Encoding": "identity",
+            "User-Agent": "pypi-mirror-manager-probe",
+            "Connection": "close",
+        })
+        response = conn.getresponse()
+        t_first = time.perf_counter()
+        result["ttfb"] = t_first - t_tls
+        result["status"] = response.status
+
+        if 300 <= response.status < 400 and response.getheader("Location"):
+            response.read()
+            return result, urljoin(url, response.getheader("Location"))
+
+        chunks = []
+        while True:
+            chunk = response.read(READ_CHUNK)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        t_end = time.perf_counter()
+        body = b"".join(chunks)
+
+        result["transfer"] = t_end - t_first
+        result["total"] = t_end - start
+        result["bytes"] = len(body)
+        if result["transfer"] > 0:
+            result["throughput"] = len(body) / result["transfer"]
+
+        if response.status == 200:
+            fmt, files = _count_files(body, response.getheader("Content-Type", ""))
+            result["format"] = fmt
+            result["files"] = files
+            result["success"] = files > 0
+            if not result["success"]:
+                result["error"] = "索引页中没有找到任何文件"
+        else:
+            result["error"] = f"HTTP {response.status}"
+        return result, None
+    finally:
+        sock.close()
+
+
+# 探测结果中按时间顺序排列的阶段
+PROBE_STAGES = ("connect", "tls", "ttfb", "transfer")
+
+
+def configure_trace(spans_path=None, chrome_path=None):
+    """启用探测的分阶段追踪，记录格式与 FreeCadpys/stage_trace.py 相同"""
+    return mirror_trace.configure(spans_path, chrome_path)
+
+
+def print_trace_summary(title="镜像探测各阶段耗时"):
+    recorder = mirror_trace.get_recorder()
+    if recorder is not None:
+        recorder.print_summary(title)
+
+
+def _trace_probe(result, started):
+    """把一次探测记录为 probe 阶段，连接/TLS/首字节/传输作为它的子阶段
+
+    子阶段的起点按最后一次请求倒推。
+    """
+    recorder = mirror_trace.get_recorder()
+    if recorder is None:
+        return
+    ended = time.perf_counter()
+    url = result["url"]
+    recorder.record("probe", started, ended - started, url=url,
+                    status=result["status"], success=result["success"],
+                    bytes=result["bytes"], error=result["error"])
+    stages = [(name, result[name]) for name in PROBE_STAGES
+              if result[name] is not None]
+    cursor = ended - sum(seconds for _, seconds in stages)
+    for name, seconds in stages:
+        recorder.record(f"probe.{name}", cursor, seconds, parent="probe", url=url)
+        cursor += seconds
+
+
+def probe_mirror(mirror_url, package=PROBE_PACKAGE, timeout=PROBE_TIMEOUT,
+                 context=None):
+    """探测单个镜像源，返回包含各阶段耗时（秒）的字典
+
+    返回字段：connect/tls/ttfb/transfer/total 为各阶段耗时，bytes 为响应体大小，
+    throughput 为传输吞吐量（字节/秒），success 表示是否拿到了合法的索引页。
+    失败时 total 为 inf，error 为错误描述。启用追踪时各阶段同时记录到 mirror_trace。
+    """
+    started = time.perf_counter()
+    result = _probe_mirror(mirror_url, package, timeout, context)
+    _trace_probe(result, started)
+    return result
+
+
+def _probe_mirror(mirror_url, package, timeout, context):
+    if context is None:
+        context = ssl.create_default_context()
+
+    url = project_url(mirror_url, package)
+    spent = 0.0
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            result, location = _request_once(url, timeout, context)
+        except (OSError, http.client.HTTPException) as e:
+            result = _empty_result(url)
+            result["error"] = str(e) or e.__class__.__name__
+            return result
+        if location is None:
+            if result["success"]:
+                result["total"] += spent
+            return result
+        spent += result["ttfb"] + result["connect"] + (result["tls"] or 0.0)
+        url = location
+
+    result["error"] = "重定向次数过多"
+    result["success"] = False
+    result["total"] = float('inf')
+    return result
+
+
+def _decode_chunked(data):
+    """解码 Transfer-Encoding: chunked 的响应体"""
+    body = bytearray()
+    pos = 0
+    while True:
+        line_end = data.find(b"\r\n", pos)
+        if line_end < 0:
+            raise ValueError("chunked 响应体不完整")
+        size = int(data[pos:line_end].split(b";", 1)[0], 16)
+        if size == 0:
+            return bytes(body)
+        start = line_end + 2
+        body += data[start:start + size]
+        pos = start + size + 2
+
+
+async def _request_once_async(url, timeout, context):
+    """probe_mirror 的 asyncio 版本：单次请求，可被取消（用于全局截止时间）"""
+    result = _empty_result(url)
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    host = parts.hostname
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port),
+                                            timeout)
+    try:
+        t_connect = time.perf_counter()
+        result["connect"] = t_connect - start
+
+        if https:
+            await asyncio.wait_for(
+                writer.start_tls(context, server_hostname=host), timeout)
+            t_tls = time.perf_counter()
+            result["tls"] = t_tls - t_connect
+        else:
+            t_tls = t_connect
+
+        request = (f"GET {path} HTTP/1.1\r\n"
+                   f"Host: {parts.netloc}\r\n"
+                   f"Accept: {ACCEPT_HEADER}\r\n"
+                   "Accept-Encoding: identity\r\n"
+                   "User-Agent: pypi-mirror-manager-probe\r\n"
+                   "Connection: close\r\n\r\n")
+        writer.write(request.encode('latin-1'))
+        await writer.drain()
+
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        t_first = time.perf_counter()
+        result["ttfb"] = t_first - t_tls
+
+        lines = head.decode('latin-1').split("\r\n")
+        result["status"] = status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        if 300 <= status < 400 and headers.get("location"):
+            return result, urljoin(url, headers["location"])
+
+        chunks = []
+        while True:
+            chunk = await asyncio.wait_for(reader.read(READ_CHUNK), timeout)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        t_end = time.perf_counter()
+        body = b"".join(chunks)
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            body = _decode_chunked(body)
+
+        result["transfer"] = t_end - t_first
+        result["total"] = t_end - start
+        result["bytes"] = len(body)
+        if result["transfer"] > 0:
+            result["throughput"] = len(body) / result["transfer"]
+
+        if status == 200:
+            fmt, files = _count_files(body, headers.get("content-type", ""))
+            result["format"] = fmt
+            result["files"] = files
+            result["success"] = files > 0
+            if not result["success"]:
+                result["error"] = "索引页中没有找到任何文件"
+        else:
+            result["error"] = f"HTTP {status}"
+        return result, None
+    finally:
+        writer.close()
+
+
+async def probe_mirror_async(mirror_url, package=PROBE_PACKAGE, timeout=PROBE_TIMEOUT,
+                             context=None):
+    """probe_mirror 的 asyncio 版本，返回值格式相同"""
+    started = time.perf_counter()
+    try:
+        result = await _probe_mirror_async(mirror_url, package, timeout, context)
+    except asyncio.CancelledError:
+        # 全局截止时间到了被取消，也记录下已经花掉的时间
+        cancelled = _empty_result(project_url(mirror_url, package))
+        _trace_probe(dict(cancelled, error="已取消"), started)
+        raise
+    _trace_probe(result, started)
+    return result
+
+
+async def _probe_mirror_async(mirror_url, package, timeout, context):
+    if context is None:
+        context = ssl.create_default_context()
+
+    url = project_url(mirror_url, package)
+    spent = 0.0
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            result, location = await _request_once_async(url, timeout, context)
+        except asyncio.TimeoutError:
+            result = _empty_result(url)
+            result["error"] = f"超时({timeout:g}秒)"
+            return result
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+            result = _empty_result(url)
+            result["error"] = str(e) or e.__class__.__name__
+            return result
+        if location is None:
+            if result["success"]:
+                result["total"] += spent
+            return result
+        spent += result["ttfb"] + result["connect"] + (result["tls"] or 0.0)
+        url = location
+
+    result["error"] = "重定向次数过多"
+    result["success"] = False
+    result["total"] = float('inf')
+    return result
+
+
+def format_probe(result):
+    """把探测结果格式化为一行便于阅读的文本"""
+    if not result["success"]:
+        return f"失败: {result['error']}"
+
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}ms"
+
+    return (f"连接 {ms(result['connect'])}  TLS {ms(result['tls'])}  "
+            f"首字节 {ms(result['ttfb'])}  传输 {ms(result['transfer'])}  "
+            f"吞吐 {result['throughput'] / 1024:.1f}KB/s  "
+            f"({result['format']}, {result['files']} 个文件)")
+
+
+if __name__ == "__main__":
+    # --trace=阶段记录.jsonl 记录各阶段耗时
+    trace = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--trace=")]
+    if trace:
+        configure_trace(trace[-1])
+    targets = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    for target in targets or ["https://pypi.org/simple/"]:
+        print(f"{target}\n  {format_probe(probe_mirror(target))}")
+    if trace:
+        print_trace_summary()
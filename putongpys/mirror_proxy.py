@@ -0,0 +1,543 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+本地 PEP 503 simple 索引代理（带内容寻址的 wheel/sdist 缓存）
+
+1. /simple/<包名>/ 从最快的上游镜像源获取索引页，把文件链接改写为指向本代理
+2. /files/<令牌>/<文件名> 第一次请求时从上游下载，按 sha256 存入磁盘缓存，
+   之后直接从本地磁盘返回，支持 Range 断点续传和 If-None-Match/If-Modified-Since
+3. 缓存总大小超过上限时按最近访问时间（LRU）淘汰
+4. 运行时在 ~/.pypi_mirror_proxy.json 记录地址，install 命令检测到后自动使用本代理
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import html as html_lib
+import hashlib
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urljoin, urlsplit, unquote
+
+# 默认监听地址
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 3141
+
+# 默认缓存目录和大小上限（MB）
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".pypi_mirror_cache")
+DEFAULT_MAX_SIZE_MB = 2048
+
+# 代理运行状态文件，install 命令通过它发现本代理
+PROXY_STATE_FILE = os.path.join(os.path.expanduser("~"), ".pypi_mirror_proxy.json")
+
+# 索引页在内存中的缓存时间（秒），上游全部不可用时继续使用过期的索引页
+INDEX_TTL = 600
+
+# 访问上游的超时时间（秒）
+UPSTREAM_TIMEOUT = 30
+
+# 读写文件的块大小
+COPY_CHUNK = 256 * 1024
+
+ANCHOR_PATTERN = re.compile(r'<a\b[^>]*>', re.IGNORECASE)
+HREF_PATTERN = re.compile(r'href="([^"]+)"')
+# PEP 658 / PEP 714：有该属性时 pip 会单独请求 <文件URL>.metadata
+METADATA_PATTERN = re.compile(r'data-(?:core|dist-info)-metadata="([^"]*)"')
+
+
+def _encode_token(url):
+    return base64.urlsafe_b64encode(url.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    padding = '=' * (-len(token) % 4)
+    return base64.urlsafe_b64decode(token + padding).decode('utf-8')
+
+
+class BlobStore:
+    """按 sha256 寻址的磁盘缓存，带 LRU 大小淘汰
+
+    文件保存在 <cache_dir>/blobs/<前两位>/<sha256>，文件的 mtime 作为最近访问时间；
+    <cache_dir>/index.json 记录上游URL到sha256的映射，
+    <cache_dir>/added.json 记录每个文件首次缓存的时间（用作 Last-Modified）。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_size=DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.added_file = os.path.join(cache_dir, "added.json")
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.url_index = self._load_json(self.index_file)
+        self.added = self._load_json(self.added_file)
+
+    @staticmethod
+    def _load_json(path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"加载缓存索引失败: {e}")
+            return {}
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """返回某个上游URL对应的缓存文件路径，未缓存时返回 None"""
+        digest = self.url_index.get(url)
+        if digest and os.path.exists(self.blob_path(digest)):
+            return digest
+        return None
+
+    def remember(self, digests):
+        """记录上游URL对应的sha256（来自索引页的 #sha256= 片段），digests 为 {URL: sha256}"""
+        with self._lock:
+            changed = {url: digest for url, digest in digests.items()
+                       if self.url_index.get(url) != digest}
+            if changed:
+                self.url_index.update(changed)
+                self._save_index()
+
+    def _save_index(self):
+        self._save_json(self.index_file, self.url_index)
+
+    @staticmethod
+    def _save_json(path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def added_time(self, digest, default):
+        """文件首次缓存的时间；没有记录时（早期版本缓存的文件）记为 default"""
+        with self._lock:
+            if digest not in self.added:
+                self.added[digest] = default
+                self._save_json(self.added_file, self.added)
+            return self.added[digest]
+
+    def touch(self, digest):
+        """更新最近访问时间"""
+        try:
+            os.utime(self.blob_path(digest))
+        except OSError:
+            pass
+
+    def fetch_lock(self, url):
+        """同一个URL同时只允许一个线程下载"""
+        with self._lock:
+            return self._fetch_locks.setdefault(url, threading.Lock())
+
+    def store(self, url, response, expected=None):
+        """把上游响应流写入缓存，返回sha256；与 expected 不一致时抛出 ValueError"""
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = response.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+            if expected and digest != expected:
+                raise ValueError(f"sha256 校验失败: 期望 {expected}, 实际 {digest}")
+            path = self.blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.url_index[url] = digest
+            self._save_index()
+            self.added.setdefault(digest, time.time())
+            self._save_json(self.added_file, self.added)
+        self.evict(keep=path)
+        return digest
+
+    def entries(self):
+        """列出所有缓存文件 [(mtime, 大小, 路径), ...]"""
+        result = []
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((st.st_mtime, st.st_size, path))
+        return result
+
+    def evict(self, keep=None):
+        """总大小超过上限时，删除最久未访问的文件（keep 除外），返回删除的文件数"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            with self._lock:
+                self.added.pop(os.path.basename(path), None)
+        if removed:
+            with self._lock:
+                self._save_json(self.added_file, self.added)
+        return removed
+
+
+class MirrorProxy:
+    """代理的共享状态：上游列表、索引页缓存、文件缓存"""
+
+    def __init__(self, upstreams, store):
+        # upstreams 为按优先级排列的 [(名称, URL), ...]
+        self.upstreams = upstreams
+        self.store = store
+        self._pages = {}
+        self._lock = threading.Lock()
+        # 只代理索引页中出现过的文件链接，所在主机为上游镜像源或其索引页链接到的文件主机
+        self._emitted = set()
+        self._hosts = {urlsplit(base).hostname for _, base in upstreams}
+        self.stats = {"hits": 0, "misses": 0, "bytes_served": 0}
+
+    def fetch_page(self, project):
+        """获取某个包改写后的索引页，返回 (HTML字节串, 上游名称)"""
+        now = time.time()
+        with self._lock:
+            cached = self._pages.get(project)
+        if cached and now - cached[0] < INDEX_TTL:
+            return cached[1], cached[2]
+
+        last_error = None
+        for name, base in self.upstreams:
+            index_url = base if base.endswith('/') else base + '/'
+            page_url = urljoin(index_url, f"{project}/")
+            request = urllib.request.Request(page_url, headers={
+                "Accept": "text/html", "User-Agent": "pypi-mirror-manager-proxy"})
+            try:
+                with urllib.request.urlopen(request,
+                                            timeout=UPSTREAM_TIMEOUT) as response:
+                    html = response.read().decode('utf-8', errors='replace')
+                    page_url = response.geturl()
+            except urllib.error.HTTPError as e:
+                if e.code == 404:
+                    raise
+                last_error = e
+                continue
+            except (OSError, urllib.error.URLError) as e:
+                last_error = e
+                continue
+            body = self._rewrite(html, page_url).encode('utf-8')
+            with self._lock:
+                self._pages[project] = (now, body, name)
+            return body, name
+
+        # 上游全部失败时继续使用过期的索引页
+        if cached:
+            return cached[1], cached[2]
+        raise OSError(f"所有上游镜像源都不可用: {last_error}")
+
+    def _rewrite(self, html, page_url):
+        """把索引页中的文件链接改写为 /files/<令牌>/<文件名>#<原片段>
+
+        非 http(s) 链接保持不变；带 data-core-metadata 的文件，
+        /files/<令牌>/<文件名>.metadata 代理上游的 <文件URL>.metadata。
+        """
+        digests = {}
+        emitted = set()
+
+        def replace(match):
+            tag = match.group(0)
+            found = HREF_PATTERN.search(tag)
+            if not found:
+                return tag
+            href = html_lib.unescape(found.group(1))
+            target, _, fragment = href.partition('#')
+            absolute = urljoin(page_url, target)
+            parts = urlsplit(absolute)
+            if parts.scheme not in ("http", "https"):
+                return tag
+            filename = unquote(parts.path.rsplit('/', 1)[-1])
+            if fragment.startswith("sha256="):
+                digests[absolute] = fragment[len("sha256="):]
+            emitted.add(absolute)
+            metadata = METADATA_PATTERN.search(tag)
+            if metadata:
+                emitted.add(absolute + ".metadata")
+                value = html_lib.unescape(metadata.group(1))
+                if value.startswith("sha256="):
+                    digests[absolute + ".metadata"] = value[len("sha256="):]
+            new_href = f"/files/{_encode_token(absolute)}/{filename}"
+            if fragment:
+                new_href += "#" + fragment
+            new_attr = f'href="{html_lib.escape(new_href)}"'
+            return tag[:found.start()] + new_attr + tag[found.end():]
+
+        rewritten = ANCHOR_PATTERN.sub(replace, html)
+        with self._lock:
+            self._emitted.update(emitted)
+            self._hosts.update(urlsplit(url).hostname for url in emitted)
+        self.store.remember(digests)
+        return rewritten
+
+    def allowed(self, url):
+        """是否为索引页中出现过的 http(s) 文件链接（本次运行改写过的，或缓存索引中记录的）"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+        with self._lock:
+            if parts.hostname not in self._hosts:
+                return False
+            return url in self._emitted or url in self.store.url_index
+
+    def fetch_file(self, url):
+        """确保上游文件已在缓存中，返回sha256；不是索引页中出现过的链接时抛出 PermissionError"""
+        if not self.allowed(url):
+            raise PermissionError(f"不代理索引页以外的地址: {url}")
+        digest = self.store.lookup(url)
+        if digest:
+            self.stats["hits"] += 1
+            return digest
+        with self.store.fetch_lock(url):
+            digest = self.store.lookup(url)
+            if digest:
+                self.stats["hits"] += 1
+                return digest
+            self.stats["misses"] += 1
+            expected = self.store.url_index.get(url)
+            request = urllib.request.Request(
+                url, headers={"User-Agent": "pypi-mirror-manager-proxy"})
+            with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+                return self.store.store(url, response, expected)
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """处理 /simple/ 和 /files/ 请求"""
+
+    server_version = "PyPIMirrorProxy/1.0"
+    proxy = None  # 由 make_server 设置
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        path = urlsplit(self.path).path
+        try:
+            if path in ("/", "/simple", "/simple/"):
+                self._send_bytes(b'<html><body>PyPI mirror proxy</body></html>',
+                                 "text/html", head)
+            elif path.startswith("/simple/"):
+                project = path[len("/simple/"):].strip('/')
+                body, _ = self.proxy.fetch_page(self._normalize(project))
+                self._send_bytes(body, "text/html; charset=utf-8", head)
+            elif path.startswith("/files/"):
+                token, _, filename = path[len("/files/"):].partition('/')
+                try:
+                    url = _decode_token(token)
+                except ValueError:
+                    self.send_error(404)
+                    return
+                # PEP 658：<文件名>.metadata 是上游的另一个文件，不是文件本身
+                if filename.endswith(".metadata") and not url.endswith(".metadata"):
+                    url += ".metadata"
+                digest = self.proxy.fetch_file(url)
+                self._send_blob(digest, head)
+            elif path == "/stats":
+                body = json.dumps(self.proxy.stats).encode('utf-8')
+                self._send_bytes(body, "application/json", head)
+            else:
+                self.send_error(404)
+        except urllib.error.HTTPError as e:
+            self.send_error(e.code)
+        except PermissionError as e:
+            self.send_error(403, explain=str(e))
+        except ValueError as e:
+            self.send_error(502, explain=str(e))
+        except OSError as e:
+            self.send_error(502, explain=str(e))
+
+    @staticmethod
+    def _normalize(name):
+        # PEP 503 名称规范化
+        return re.sub(r"[-_.]+", "-", name).lower()
+
+    def _send_bytes(self, body, content_type, head):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return etag in tags or if_none_match == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+                return int(mtime) <= since
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _parse_range(self, size):
+        """解析单个 Range 请求，返回 (起始, 结束) 闭区间；无 Range 返回 None；无法满足抛 ValueError"""
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes=") or ',' in header:
+            return None
+        start_str, _, end_str = header[len("bytes="):].strip().partition('-')
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError("无效的 Range")
+            start = max(size - length, 0)
+            end = size - 1
+        end = min(end, size - 1)
+        if start > end or start >= size:
+            raise ValueError("无法满足的 Range")
+        return start, end
+
+    def _send_blob(self, digest, head):
+        store = self.proxy.store
+        path = store.blob_path(digest)
+        # 先取状态再更新访问时间：mtime 是 LRU 的最近访问时间，不能作为 Last-Modified
+        st = os.stat(path)
+        store.touch(digest)
+        etag = f'"{digest}"'
+        # 内容按sha256寻址，不会变化：使用首次缓存的时间作为 Last-Modified
+        added = store.added_time(digest, st.st_mtime)
+        last_modified = formatdate(added, usegmt=True)
+
+        if self._not_modified(etag, added):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return
+
+        try:
+            byte_range = self._parse_range(st.st_size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{st.st_size}")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, st.st_size - 1)
+        length = end - start + 1
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+        self.end_headers()
+        if head:
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        self.proxy.stats["bytes_served"] += length
+
+
+def make_server(upstreams, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+    """创建代理服务器（不启动），返回 ThreadingHTTPServer"""
+    store = BlobStore(cache_dir, max_size_mb * 1024 * 1024)
+    handler = type("BoundProxyHandler", (ProxyHandler,),
+                   {"proxy": MirrorProxy(upstreams, store)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def proxy_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/simple/"
+
+
+def write_proxy_state(url):
+    try:
+        with open(PROXY_STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"url": url, "pid": os.getpid()}, f)
+    except Exception as e:
+        print(f"保存代理状态失败: {e}")
+
+
+def clear_proxy_state():
+    try:
+        os.remove(PROXY_STATE_FILE)
+    except OSError:
+        pass
+
+
+def running_proxy_url(timeout=0.5):
+    """检测本地代理是否正在运行，返回其 simple 索引地址，否则返回 None"""
+    if not os.path.exists(PROXY_STATE_FILE):
+        return None
+    try:
+        with open(PROXY_STATE_FILE, 'r', encoding='utf-8') as f:
+            url = json.load(f)["url"]
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            if response.status == 200:
+                return url
+    except Exception:
+        pass
+    return None
+
+
+def serve_forever(upstreams, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                  cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+    """启动代理并阻塞运行，Ctrl+C 退出"""
+    server = make_server(upstreams, host, port, cache_dir, max_size_mb)
+    url = proxy_url(server)
+    write_proxy_state(url)
+    print(f"本地镜像代理已启动: {url}")
+    print(f"上游镜像源: {', '.join(name for name, _ in upstreams)}")
+    print(f"缓存目录: {cache_dir}（上限 {max_size_mb} MB）")
+    print("按 Ctrl+C 停止")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止本地镜像代理...")
+    finally:
+        server.server_close()
+        clear_proxy_state()
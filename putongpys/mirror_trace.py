@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+镜像探测的分阶段记录：把连接/TLS/首字节/传输等已测好的时间段写成 JSON-lines 和
+Chrome trace_event 文件，并在结束时按阶段打印耗时统计
+
+记录格式与 FreeCadpys/stage_trace.py 相同（name、parent、depth、start、seconds、pid、tid
+及其他属性），可以直接用 `python FreeCadpys/stage_trace.py probe.jsonl` 汇总。
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, q):
+    """线性插值百分位，sorted_values 已排序，q 为 0~100；没有数据时返回 None"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    low_value, high_value = sorted_values[low], sorted_values[high]
+    return low_value + (high_value - low_value) * (position - low)
+
+
+class SpanRecorder:
+    """记录时间段；spans_path / chrome_path 中的 {pid} 会替换为进程号"""
+
+    def __init__(self, spans_path=None, chrome_path=None):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.spans_file = self._open(spans_path)
+        self.chrome_file = self._open(chrome_path)
+        self._chrome_events = 0
+        if self.chrome_file:
+            self.chrome_file.write("[\n")
+
+    def _open(self, path):
+        if not path:
+            return None
+        path = path.replace("{pid}", str(self.pid))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return open(path, "w", encoding="utf-8")
+
+    def record(self, name, start, seconds, parent=None, **attrs):
+        """记录已测好的时间段；start 为 time.perf_counter() 的读数"""
+        if seconds is None:
+            return
+        tid = threading.get_ident()
+        with self.lock:
+            self.durations.setdefault(name, []).append(seconds)
+            if self.spans_file:
+                record = {"name": name, "parent": parent,
+                          "depth": 0 if parent is None else 1,
+                          "start": start - self.origin, "seconds": seconds,
+                          "pid": self.pid, "tid": tid, **attrs}
+                line = json.dumps(record, ensure_ascii=False, default=str)
+                self.spans_file.write(line + "\n")
+            if self.chrome_file:
+                event = {"name": name, "cat": parent or name, "ph": "X",
+                         "pid": self.pid, "tid": tid, "ts": start * 1e6,
+                         "dur": seconds * 1e6, "args": attrs}
+                prefix = ",\n" if self._chrome_events else ""
+                self.chrome_file.write(
+                    prefix + json.dumps(event, ensure_ascii=False, default=str))
+                self._chrome_events += 1
+
+    def format_summary(self, title="阶段耗时统计"):
+        with self.lock:
+            durations = {name: sorted(values)
+                         for name, values in self.durations.items()}
+        header = (f"{'阶段':<20} {'次数':>6} {'总计':>10} {'平均':>9} "
+                  + " ".join(f"{'p' + str(q):>9}" for q in PERCENTILES)
+                  + f" {'最大':>9}")
+        lines = [f"{title}（毫秒）:", "-" * 90, header, "-" * 90]
+        ordered = sorted(durations.items(), key=lambda item: -sum(item[1]))
+        for name, values in ordered:
+            total = sum(values)
+            cells = [f"{percentile(values, q) * 1000:>9.2f}" for q in PERCENTILES]
+            lines.append(f"{name:<20} {len(values):>6} {total * 1000:>10.2f} "
+                         f"{total / len(values) * 1000:>9.2f} " + " ".join(cells)
+                         + f" {values[-1] * 1000:>9.2f}")
+        lines.append("-" * 90)
+        return "\n".join(lines)
+
+    def print_summary(self, title="阶段耗时统计", file=None):
+        if self.durations:
+            print(self.format_summary(title), file=file or sys.stdout)
+
+    def close(self):
+        with self.lock:
+            if self.spans_file:
+                self.spans_file.close()
+                self.spans_file = None
+            if self.chrome_file:
+                self.chrome_file.write("\n]\n")
+                self.chrome_file.close()
+                self.chrome_file = None
+
+
+# 当前进程使用的记录器，默认不记录
+_recorder = None
+
+
+def get_recorder():
+    return _recorder
+
+
+def configure(spans_path=None, chrome_path=None):
+    """开始记录（替换当前记录器），进程退出时自动关闭输出文件"""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = SpanRecorder(spans_path, chrome_path)
+    atexit.register(_recorder.close)
+    return _recorder
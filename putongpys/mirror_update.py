@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并行批量更新引擎（update-all 使用）
+
+流程：
+1. 用 importlib.metadata 一次性读取已安装的包及其依赖
+2. 并发请求镜像源的 simple 索引（优先 PEP 691 JSON），在进程内算出可更新的包，
+   不再使用逐个查询索引的 `pip list --outdated`
+3. 按依赖关系把待更新的包分成若干"波次"：被依赖的包先更新
+4. 并行把新版本文件下载到临时目录（校验 sha256），再从本地目录安装
+5. 每个波次先整体安装，失败时逐个安装，单个包失败不影响其他包；最后输出逐包报告
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+from html.parser import HTMLParser
+from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit, unquote
+
+try:
+    from packaging.version import Version, InvalidVersion
+    from packaging.specifiers import SpecifierSet, InvalidSpecifier
+    from packaging.requirements import Requirement, InvalidRequirement
+    from packaging.tags import sys_tags
+    from packaging.utils import (canonicalize_name, parse_wheel_filename,
+                                 parse_sdist_filename, InvalidWheelFilename,
+                                 InvalidSdistFilename)
+except ImportError:
+    # 没有单独安装 packaging 时使用 pip 自带的版本
+    from pip._vendor.packaging.version import Version, InvalidVersion
+    from pip._vendor.packaging.specifiers import SpecifierSet, InvalidSpecifier
+    from pip._vendor.packaging.requirements import Requirement, InvalidRequirement
+    from pip._vendor.packaging.tags import sys_tags
+    from pip._vendor.packaging.utils import (canonicalize_name, parse_wheel_filename,
+                                             parse_sdist_filename, InvalidWheelFilename,
+                                             InvalidSdistFilename)
+
+# 默认并发数（查询索引和下载共用）
+DEFAULT_WORKERS = 8
+
+# 访问镜像源的超时时间（秒）
+INDEX_TIMEOUT = 20
+
+ACCEPT_HEADER = "application/vnd.pypi.simple.v1+json, text/html;q=0.1"
+
+# 下载时的块大小
+DOWNLOAD_CHUNK = 256 * 1024
+
+PYTHON_VERSION = ".".join(map(str, sys.version_info[:3]))
+
+
+class _LinkParser(HTMLParser):
+    """解析 PEP 503 HTML 索引页中的文件链接"""
+
+    def __init__(self):
+        super().__init__()
+        self.files = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        attrs = dict(attrs)
+        href = attrs.get("href")
+        if not href:
+            return
+        url, _, fragment = href.partition('#')
+        hashes = {}
+        if "=" in fragment:
+            algo, _, value = fragment.partition('=')
+            hashes[algo] = value
+        self.files.append({
+            "filename": unquote(urlsplit(url).path.rsplit('/', 1)[-1]),
+            "url": url,
+            "hashes": hashes,
+            "requires-python": attrs.get("data-requires-python"),
+            "yanked": "data-yanked" in attrs,
+        })
+
+
+def installed_distributions():
+    """读取当前环境中已安装的包: {规范化名称: {name, version, requires}}
+
+    可编辑安装和从本地目录安装的包不参与更新。
+    """
+    result = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+        direct_url = dist.read_text("direct_url.json")
+        if direct_url:
+            try:
+                info = json.loads(direct_url)
+            except ValueError:
+                info = {}
+            if (info.get("dir_info", {}).get("editable")
+                    or info.get("url", "").startswith("file:")):
+                continue
+        key = canonicalize_name(name)
+        if key in result:
+            continue
+        requires = set()
+        for line in dist.requires or []:
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                continue
+            # 只统计当前环境下生效、且不依赖 extras 的依赖
+            if req.marker is None or req.marker.evaluate({"extra": ""}):
+                requires.add(canonicalize_name(req.name))
+        result[key] = {"name": name, "version": dist.version, "requires": requires}
+    return result
+
+
+def fetch_project_files(mirror_url, project, timeout=INDEX_TIMEOUT):
+    """获取某个包在镜像源上的所有文件列表（PEP 691 JSON 或 PEP 503 HTML）"""
+    base = mirror_url if mirror_url.endswith('/') else mirror_url + '/'
+    page_url = urljoin(base, f"{project}/")
+    request = urllib.request.Request(page_url, headers={
+        "Accept": ACCEPT_HEADER, "User-Agent": "pypi-mirror-manager-update"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = response.read()
+        page_url = response.geturl()
+        content_type = response.headers.get("Content-Type", "")
+
+    if "json" in content_type:
+        files = json.loads(body.decode('utf-8')).get("files", [])
+        for item in files:
+            item["yanked"] = bool(item.get("yanked"))
+    else:
+        parser = _LinkParser()
+        parser.feed(body.decode('utf-8', errors='replace'))
+        files = parser.files
+    for item in files:
+        item["url"] = urljoin(page_url, item["url"])
+    return files
+
+
+def _file_version(filename, supported_tags):
+    """从文件名解析版本号；返回 (版本, 是否wheel)，当前环境不能安装时返回 None"""
+    try:
+        if filename.endswith(".whl"):
+            _, version, _, tags = parse_wheel_filename(filename)
+            if supported_tags.isdisjoint(tags):
+                return None
+            return version, True
+        _, version = parse_sdist_filename(filename)
+        return version, False
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        return None
+
+
+def latest_release(files, supported_tags):
+    """在文件列表中找到当前环境可安装的最新正式版本
+
+    返回 (版本, 选中的文件)，同一版本优先选择 wheel。
+    """
+    best = None
+    for item in files:
+        if item.get("yanked"):
+            continue
+        requires_python = item.get("requires-python")
+        if requires_python:
+            try:
+                if PYTHON_VERSION not in SpecifierSet(requires_python):
+                    continue
+            except InvalidSpecifier:
+                pass
+        parsed = _file_version(item["filename"], supported_tags)
+        if parsed is None:
+            continue
+        version, is_wheel = parsed
+        if version.is_prerelease or version.is_devrelease:
+            continue
+        key = (version, is_wheel)
+        if best is None or key > best[0]:
+            best = (key, item)
+    if best is None:
+        return None, None
+    return best[0][0], best[1]
+
+
+def find_outdated(installed, mirror_url, workers=DEFAULT_WORKERS):
+    """并发查询镜像源，返回 (可更新列表, 查询失败列表)
+
+    可更新列表元素为 {key, name, version, latest, file}。
+    """
+    supported_tags = set(sys_tags())
+    outdated = []
+    errors = []
+
+    def check(key):
+        files = fetch_project_files(mirror_url, key)
+        return latest_release(files, supported_tags)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(check, key): key for key in installed}
+        for future in as_completed(futures):
+            key = futures[future]
+            info = installed[key]
+            try:
+                latest, chosen = future.result()
+            except urllib.error.HTTPError as e:
+                # 404 说明包不在镜像源上（例如私有包），不算错误
+                if e.code != 404:
+                    errors.append({"name": info["name"], "error": f"HTTP {e.code}"})
+                continue
+            except Exception as e:
+                errors.append({"name": info["name"], "error": str(e)})
+                continue
+            try:
+                current = Version(info["version"])
+            except InvalidVersion:
+                continue
+            if latest is not None and latest > current:
+                outdated.append({"key": key, "name": info["name"],
+                                 "version": info["version"], "latest": str(latest),
+                                 "file": chosen})
+    outdated.sort(key=lambda item: item["key"])
+    return outdated, errors
+
+
+def plan_waves(outdated, installed):
+    """按依赖关系把待更新的包分成波次，被依赖的包排在前面的波次
+
+    只考虑待更新包之间的依赖；存在循环依赖的包放到最后一个波次一起安装。
+    """
+    pending = {item["key"] for item in outdated}
+    deps = {key: installed[key]["requires"] & pending - {key} for key in pending}
+    waves = []
+    while pending:
+        ready = sorted(key for key in pending if not deps[key] & pending)
+        if not ready:
+            waves.append(sorted(pending))
+            break
+        waves.append(ready)
+        pending -= set(ready)
+    by_key = {item["key"]: item for item in outdated}
+    return [[by_key[key] for key in wave] for wave in waves]
+
+
+def download_file(item, staging_dir, timeout=INDEX_TIMEOUT):
+    """下载待更新包的新版本文件到临时目录并校验 sha256，返回 (路径, 耗时)"""
+    file_info = item["file"]
+    target = os.path.join(staging_dir, file_info["filename"])
+    expected = (file_info.get("hashes") or {}).get("sha256")
+    start = time.perf_counter()
+    request = urllib.request.Request(file_info["url"], headers={
+        "User-Agent": "pypi-mirror-manager-update"})
+    hasher = hashlib.sha256()
+    with urllib.request.urlopen(request, timeout=timeout) as response, \
+            open(target, 'wb') as f:
+        while True:
+            chunk = response.read(DOWNLOAD_CHUNK)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            f.write(chunk)
+    if expected and hasher.hexdigest() != expected:
+        os.remove(target)
+        raise ValueError(f"sha256 校验失败: {file_info['filename']}")
+    return target, time.perf_counter() - start
+
+
+def _pip_install_local(specs, staging_dir, mirror_url):
+    """从临时目录安装，临时目录中没有的新依赖仍从镜像源获取；返回 (是否成功, 输出)"""
+    cmd = [sys.executable, '-m', 'pip', 'install', '--upgrade', '--progress-bar', 'off',
+           '--find-links', staging_dir,
+           '--index-url', mirror_url,
+           '--trusted-host', urlsplit(mirror_url).netloc]
+    cmd.extend(specs)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.returncode == 0, result.stdout + result.stderr
+
+
+def _last_error_line(output):
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    errors = [line for line in lines if line.startswith("ERROR")]
+    return (errors or lines or ["未知错误"])[-1]
+
+
+def update_packages(mirror_name, mirror_url, workers=DEFAULT_WORKERS, dry_run=False,
+                    exclude=()):
+    """更新所有可更新的包，返回逐包报告列表
+
+    报告元素为 {name, version, latest, wave, status, download, error}，
+    status 为 updated / failed / download-failed / planned。
+    """
+    print("读取已安装的包...")
+    installed = installed_distributions()
+    excluded = {canonicalize_name(name) for name in exclude}
+    installed = {key: info for key, info in installed.items() if key not in excluded}
+    print(f"共 {len(installed)} 个包，正在并发查询 {mirror_name} 的索引...")
+
+    start = time.perf_counter()
+    outdated, errors = find_outdated(installed, mirror_url, workers)
+    print(f"索引查询完成，用时 {time.perf_counter() - start:.2f} 秒")
+    for item in errors:
+        print(f"  查询失败: {item['name']} ({item['error']})")
+
+    if not outdated:
+        return []
+
+    waves = plan_waves(outdated, installed)
+    report = {item["key"]: {"name": item["name"], "version": item["version"],
+                            "latest": item["latest"], "wave": index,
+                            "status": "planned", "download": None, "error": None}
+              for index, wave in enumerate(waves, 1) for item in wave}
+
+    print(f"发现 {len(outdated)} 个可更新的包，分 {len(waves)} 个波次更新:")
+    for index, wave in enumerate(waves, 1):
+        names = ", ".join(f"{item['name']} ({item['version']} -> {item['latest']})"
+                          for item in wave)
+        print(f"  波次 {index}: {names}")
+    if dry_run:
+        return list(report.values())
+
+    staging_dir = tempfile.mkdtemp(prefix="pypi_update_")
+    try:
+        # 并行预下载所有新版本文件
+        print(f"\n并行下载 {len(outdated)} 个文件到 {staging_dir} ...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(download_file, item, staging_dir): item
+                       for item in outdated}
+            for future in as_completed(futures):
+                item = futures[future]
+                entry = report[item["key"]]
+                try:
+                    _, elapsed = future.result()
+                    entry["download"] = elapsed
+                    print(f"  ✓ {item['file']['filename']} ({elapsed:.2f} 秒)")
+                except Exception as e:
+                    entry["status"] = "download-failed"
+                    entry["error"] = str(e)
+                    print(f"  ✗ {item['file']['filename']}: {e}")
+
+        # 按波次安装
+        for index, wave in enumerate(waves, 1):
+            todo = [item for item in wave if report[item["key"]]["status"] == "planned"]
+            if not todo:
+                continue
+            specs = [f"{item['name']}=={item['latest']}" for item in todo]
+            print(f"\n安装波次 {index}: {' '.join(specs)}")
+            success, output = _pip_install_local(specs, staging_dir, mirror_url)
+            if success:
+                for item in todo:
+                    report[item["key"]]["status"] = "updated"
+                continue
+            if len(todo) == 1:
+                report[todo[0]["key"]].update(status="failed",
+                                              error=_last_error_line(output))
+                continue
+            # 整体安装失败时逐个安装，找出出问题的包
+            print("  整体安装失败，改为逐个安装...")
+            for item, spec in zip(todo, specs):
+                success, output = _pip_install_local([spec], staging_dir, mirror_url)
+                entry = report[item["key"]]
+                entry["status"] = "updated" if success else "failed"
+                if not success:
+                    entry["error"] = _last_error_line(output)
+                print(f"  {'✓' if success else '✗'} {spec}")
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return list(report.values())
+
+
+STATUS_TEXT = {
+    "updated": "已更新",
+    "failed": "安装失败",
+    "download-failed": "下载失败",
+    "planned": "待更新",
+}
+
+
+def print_report(report):
+    """输出逐包更新报告"""
+    print("\n更新报告:")
+    print("-" * 90)
+    print(f"{'包名':<25} {'当前版本':<12} {'新版本':<12} {'波次':<5} {'下载(秒)':<9} {'结果':<8}")
+    print("-" * 90)
+    for entry in sorted(report, key=lambda item: (item["wave"], item["name"].lower())):
+        download = f"{entry['download']:.2f}" if entry["download"] is not None else "-"
+        print(f"{entry['name']:<25} {entry['version']:<12} {entry['latest']:<12} "
+              f"{entry['wave']:<5} {download:<9} {STATUS_TEXT[entry['status']]:<8}")
+        if entry["error"]:
+            print(f"{'':<25} {entry['error']}")
+    print("-" * 90)
+    counts = {}
+    for entry in report:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print("，".join(f"{STATUS_TEXT[status]} {count} 个"
+                   for status, count in counts.items()))
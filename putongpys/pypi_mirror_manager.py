@@ -4,10 +4,11 @@
 Python包镜像源管理工具
 
 功能：
-1. 测试多个国内镜像源的连接速度
-2. 自动使用最快的镜像源安装/更新Python包
+1. 测试多个国内镜像源的连接速度（进程内HTTP探测，可选 pip download 方式）
+2. 自动使用最快的镜像源安装/更新Python包（测速排名缓存在 ~/.pypi_mirror_ranking.json）
 3. 一键设置/取消默认镜像源
-4. 列出所有可用镜像源
+4. 本地 simple 索引缓存代理（serve），重复安装的包直接从本地磁盘获取
+5. 列出所有可用镜像源
 
 支持的镜像源：
 - 清华大学
@@ -24,9 +25,24 @@ import subprocess
 import sys
 import json
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import tempfile
 
+from mirror_probe import (probe_mirror, format_probe, configure_trace,
+                          print_trace_summary)
+from mirror_bench import (run_benchmark, DEFAULT_SAMPLES, DEFAULT_CONCURRENCY,
+                          DEFAULT_DEADLINE)
+from mirror_cache import (load_ranking, save_ranking, clear_ranking, is_fresh,
+                          cache_age, ranked_mirrors, record_install_failure,
+                          refresh_in_background, release_refresh_lock, show_ranking,
+                          record_downloads, DEFAULT_MAX_AGE)
+from mirror_install import (build_install_command, run_pip_install, is_network_failure,
+                            summarize_downloads, FAILOVER_MODES, FAILOVER_OFF,
+                            FAILOVER_EXTRA_INDEX, FAILOVER_RETRY, DEFAULT_FALLBACKS)
+from mirror_update import update_packages, print_report, DEFAULT_WORKERS
+from mirror_proxy import (serve_forever, running_proxy_url, DEFAULT_HOST, DEFAULT_PORT,
+                          DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE_MB)
+
 # 国内主要Python镜像源列表
 MIRRORS = {
     "清华源": "https://pypi.tuna.tsinghua.edu.cn/simple",
@@ -43,6 +59,13 @@ CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".pypi_mirror_config.json")
 # 用于测试的小型包（通常很小，下载快）
 TEST_PACKAGE = "pip"
 
+# 本地缓存代理在镜像源列表中显示的名称
+PROXY_MIRROR_NAME = "本地缓存代理"
+
+# 测速方式：http 直接请求 simple 索引页（默认），pip 启动 pip download 子进程（旧方式）
+PROBE_MODES = ("http", "pip")
+DEFAULT_PROBE = "http"
+
 def load_config():
     """加载配置文件"""
     if os.path.exists(CONFIG_FILE):
@@ -61,8 +84,8 @@ def save_config(config):
     except Exception as e:
         print(f"保存配置文件失败: {e}")
 
-def test_mirror_speed(mirror_name, mirror_url):
-    """测试单个镜像源的下载速度"""
+def test_mirror_speed_pip(mirror_name, mirror_url, timeout=None):
+    """使用 pip download 子进程测试单个镜像源的下载速度（旧方式）"""
     start_time = time.time()
     try:
         # 创建临时目录用于下载
@@ -70,11 +93,13 @@ def test_mirror_speed(mirror_name, mirror_url):
             # 使用pip下载包信息，不安装
             result = subprocess.run(
                 [sys.executable, '-m', 'pip', 'download', '--no-deps', '-d', temp_dir, 
-                 f'--index-url={mirror_url}', '--trusted-host', mirror_url.split('//')[1].split('/')[0],
+                 f'--index-url={mirror_url}',
+                 '--trusted-host', mirror_url.split('//')[1].split('/')[0],
                  '--quiet', TEST_PACKAGE],
                 check=True,
                 capture_output=True,
-                text=True
+                text=True,
+                timeout=timeout
             )
             elapsed_time = time.time() - start_time
             return mirror_name, mirror_url, elapsed_time, True
@@ -83,91 +108,228 @@ def test_mirror_speed(mirror_name, mirror_url):
     except Exception as e:
         return mirror_name, mirror_url, float('inf'), False
 
-def test_all_mirrors():
-    """测试所有镜像源的速度"""
-    print("正在测试所有镜像源的连接速度...\n")
-    
-    results = []
-    # 使用线程池并行测试所有镜像源
-    with ThreadPoolExecutor(max_workers=len(MIRRORS)) as executor:
-        future_to_mirror = {executor.submit(test_mirror_speed, name, url): (name, url) 
-                           for name, url in MIRRORS.items()}
-        
-        for future in future_to_mirror:
-            result = future.result()
-            results.append(result)
+def test_mirror_speed(mirror_name, mirror_url, probe=DEFAULT_PROBE):
+    """测试单个镜像源的速度
+
+    probe 为 "http" 时在进程内请求 simple 索引页并计时，为 "pip" 时使用旧的
+    pip download 方式。返回 (名称, URL, 耗时秒数, 是否可用)。
+    """
+    if probe == "pip":
+        return test_mirror_speed_pip(mirror_name, mirror_url)
+    result = probe_mirror(mirror_url, TEST_PACKAGE)
+    return mirror_name, mirror_url, result["total"], result["success"]
+
+def test_all_mirrors(probe=DEFAULT_PROBE, samples=DEFAULT_SAMPLES,
+                     concurrency=DEFAULT_CONCURRENCY, deadline=DEFAULT_DEADLINE):
+    """测试所有镜像源的速度
+
+    每个镜像源采样 samples 次，边测边输出；到达 deadline 秒后不再等待未完成的采样。
+    返回按排名排序的 (名称, URL, p50耗时秒数, 是否可用) 列表。
+    """
+    print(f"正在测试所有镜像源的连接速度（每个镜像源 {samples} 次采样，"
+          f"并发 {concurrency}，截止 {deadline:g} 秒）...\n")
+
+    async def _pip_probe(url):
+        _, _, elapsed, success = await asyncio.to_thread(
+            test_mirror_speed_pip, None, url, deadline)
+        return {"total": elapsed, "throughput": 0.0, "success": success,
+                "error": None if success else "pip download 失败"}
+
+    pip_probe = _pip_probe if probe == "pip" else None
+
+    def on_result(name, result):
+        # 每完成一次采样立即输出
+        if result["success"]:
+            if probe != "pip":
+                detail = format_probe(result)
+            else:
+                detail = f"{result['total']:.2f}秒"
+            print(f"  [{name}] {detail}")
+        else:
+            print(f"  [{name}] 失败: {result['error']}")
+
+    stats = run_benchmark(MIRRORS, samples=samples, concurrency=concurrency,
+                          deadline=deadline, package=TEST_PACKAGE,
+                          probe=pip_probe, on_result=on_result)
     
-    # 按速度排序（最快的在前）
-    results.sort(key=lambda x: x[2])
+    # 显示结果（已按 p50/p95/吞吐量排名）
+    print("\n镜像源速度测试结果:")
+    print("-" * 90)
+    print(f"{'排名':<5} {'镜像源':<10} {'p50(秒)':<10} {'p95(秒)':<10} {'吞吐(KB/s)':<12} "
+          f"{'成功/失败':<10} {'状态':<10}")
+    print("-" * 90)
     
-    # 显示结果
-    print("镜像源速度测试结果:")
-    print("-" * 70)
-    print(f"{'排名':<5} {'镜像源':<10} {'URL':<50} {'速度(秒)':<10} {'状态':<10}")
-    print("-" * 70)
-    
-    rank = 1
+    results = []
     fastest_mirror = None
     
-    for name, url, elapsed_time, success in results:
+    for rank, item in enumerate(stats, 1):
+        success = item["success"]
         status = "可用" if success else "不可用"
-        speed_str = f"{elapsed_time:.2f}" if success else "N/A"
+        p50_str = f"{item['p50']:.3f}" if success else "N/A"
+        p95_str = f"{item['p95']:.3f}" if success else "N/A"
+        throughput = item["throughput"]
+        throughput_str = f"{throughput / 1024:.1f}" if throughput else "N/A"
+        counts = f"{item['samples']}/{item['failures']}"
         
         if success and fastest_mirror is None:
-            fastest_mirror = (name, url)
+            fastest_mirror = (item["name"], item["url"])
         
-        print(f"{rank:<5} {name:<10} {url:<50} {speed_str:<10} {status:<10}")
-        rank += 1
+        print(f"{rank:<5} {item['name']:<10} {p50_str:<10} {p95_str:<10} "
+              f"{throughput_str:<12} {counts:<10} {status:<10}")
+        if not success and item["last_error"]:
+            print(f"{'':<5} {item['last_error']}")
+        results.append((item["name"], item["url"], item["p50"], success))
     
-    print("-" * 70)
+    print("-" * 90)
+    
+    # 保存排名，供后续 install/update-all/set-default 复用
+    save_ranking(stats, probe)
     
     if fastest_mirror:
         print(f"\n最快的镜像源是: {fastest_mirror[0]} ({fastest_mirror[1]})")
     
     return results
 
-def install_with_mirror(packages, mirror_name=None, mirror_url=None, upgrade=False):
-    """使用指定镜像源安装包"""
+def _probe_args(probe_options):
+    """把测速参数转换回命令行参数，用于启动后台刷新进程"""
+    args = []
+    for key, value in (probe_options or {}).items():
+        args.extend([f'--{key}', str(value)])
+    return args
+
+def choose_ranked_mirrors(probe_options=None, max_age=DEFAULT_MAX_AGE, refresh=False):
+    """按排名返回可用镜像源列表 ([(名称, URL), ...], 是否来自缓存)
+
+    排名缓存未过期时直接使用；已过期时先使用缓存中的排名，同时在后台刷新缓存；
+    没有缓存、max_age 为 0 或 refresh 为 True 时重新测速。
+    """
+    cache = None if refresh or max_age <= 0 else load_ranking()
+    # 只使用仍在 MIRRORS 中且URL未变化的镜像源
+    cached = [(name, url) for name, url in ranked_mirrors(cache)
+              if MIRRORS.get(name) == url]
+    if cached:
+        age = cache_age(cache)
+        if is_fresh(cache, max_age):
+            print(f"使用 {age:.0f} 秒前的测速排名缓存")
+        else:
+            print(f"测速排名缓存已过期（{age:.0f} 秒前），先使用缓存结果，同时在后台刷新")
+            refresh_in_background(os.path.abspath(__file__), _probe_args(probe_options))
+        return cached, True
+    
+    results = test_all_mirrors(**(probe_options or {}))
+    # 只保留可用的镜像源
+    available_mirrors = [(name, url) for name, url, _, success in results if success]
+    return available_mirrors, False
+
+def choose_fastest_mirror(probe_options=None, max_age=DEFAULT_MAX_AGE, refresh=False):
+    """选择最快的可用镜像源，返回 (名称, URL, 是否来自缓存)，没有可用镜像源时返回 None"""
+    ranked, from_cache = choose_ranked_mirrors(probe_options, max_age, refresh)
+    if not ranked:
+        return None
+    mirror_name, mirror_url = ranked[0]
+    return mirror_name, mirror_url, from_cache
+
+def _pip_install(packages, mirrors, upgrade=False):
+    """用给定镜像源（第一个为主镜像源，其余为备用）执行一次 pip install
+
+    返回 (是否成功, 是否网络问题导致失败)，并把下载耗时记录到排名缓存。
+    """
+    cmd = build_install_command(packages, mirrors, upgrade)
+    print(f"执行命令: {' '.join(cmd)}")
+    success, output, downloads = run_pip_install(cmd, mirrors)
+    record_downloads(summarize_downloads(downloads))
+    if success:
+        if len(mirrors) > 1:
+            backups = ', '.join(name for name, _ in mirrors[1:])
+            print(f"成功使用 {mirrors[0][0]}（备用 {backups}）安装/更新包")
+        else:
+            print(f"成功使用 {mirrors[0][0]} 安装/更新包")
+        return True, False
+    network_failure = is_network_failure(output)
+    print(f"安装失败: {'网络问题' if network_failure else 'pip 返回错误'}")
+    return False, network_failure
+
+def install_with_mirror(packages, mirror_name=None, mirror_url=None, upgrade=False,
+                        probe_options=None, max_age=DEFAULT_MAX_AGE,
+                        failover=FAILOVER_OFF, fallbacks=DEFAULT_FALLBACKS):
+    """使用指定镜像源安装包
+
+    failover 为 extra-index 时，把排名靠前的 fallbacks 个其他镜像源作为 --extra-index-url
+    一起交给 pip；为 retry 时，遇到网络问题按排名依次换镜像源重试。
+    """
+    from_cache = False
+    ranked = []
     if mirror_name and mirror_url:
         print(f"使用 {mirror_name} 安装包...")
+        if failover != FAILOVER_OFF:
+            ranked, _ = choose_ranked_mirrors(probe_options, max_age)
     else:
         # 如果未指定镜像源，使用最快的
-        print("未指定镜像源，正在测试并选择最快的镜像源...")
-        results = test_all_mirrors()
-        # 找到第一个可用的镜像源
-        available_mirrors = [(name, url) for name, url, _, success in results if success]
-        if not available_mirrors:
+        print("未指定镜像源，正在选择最快的镜像源...")
+        ranked, from_cache = choose_ranked_mirrors(probe_options, max_age)
+        if not ranked:
             print("错误：没有可用的镜像源！")
             return False
         
-        mirror_name, mirror_url = available_mirrors[0]
+        mirror_name, mirror_url = ranked[0]
         print(f"使用最快的镜像源: {mirror_name}")
     
-    # 构建命令
-    cmd = [sys.executable, '-m', 'pip', 'install']
-    if upgrade:
-        cmd.append('--upgrade')
-    
-    # 添加镜像源参数
-    cmd.extend(['--index-url', mirror_url])
-    # 添加trusted-host参数（处理可能的SSL问题）
-    host = mirror_url.split('//')[1].split('/')[0]
-    cmd.extend(['--trusted-host', host])
+    candidates = [(mirror_name, mirror_url)]
+    if failover != FAILOVER_OFF:
+        backups = [mirror for mirror in ranked if mirror[0] != mirror_name]
+        candidates += backups[:fallbacks]
+        if len(candidates) > 1:
+            print(f"备用镜像源: {', '.join(name for name, _ in candidates[1:])}")
+    
+    if failover == FAILOVER_EXTRA_INDEX:
+        success, _ = _pip_install(packages, candidates, upgrade)
+        return success
+    
+    if failover == FAILOVER_RETRY:
+        for index, mirror in enumerate(candidates):
+            success, network_failure = _pip_install(packages, [mirror], upgrade)
+            if success:
+                return True
+            if not network_failure:
+                print("失败不是网络问题导致的，不再更换镜像源重试")
+                return False
+            # 只有网络问题才记入镜像源的失败次数，pip 的其他错误与镜像源无关
+            record_install_failure(mirror[0])
+            if index + 1 < len(candidates):
+                print(f"{mirror[0]} 出现网络问题，改用 {candidates[index + 1][0]} 重试...")
+        return False
     
-    # 添加包名
-    cmd.extend(packages)
+    success, network_failure = _pip_install(packages, candidates, upgrade)
+    if success or not from_cache:
+        return success
+    if not network_failure:
+        # 包名错误、版本冲突等与镜像源无关，不降级镜像源，也不重新测速
+        print("失败不是网络问题导致的，不更换镜像源重试")
+        return False
     
-    # 执行命令
-    print(f"执行命令: {' '.join(cmd)}")
-    try:
-        subprocess.run(cmd, check=True)
-        print(f"成功使用 {mirror_name} 安装/更新包")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"安装失败: {e}")
+    # 缓存中的最快镜像源出现网络问题：记录失败并重新测速，换一个镜像源再试一次
+    record_install_failure(mirror_name)
+    print("缓存中的最快镜像源安装失败，重新测速...")
+    chosen = choose_fastest_mirror(probe_options, max_age, refresh=True)
+    if not chosen or chosen[0] == mirror_name:
         return False
+    return install_with_mirror(packages, chosen[0], chosen[1], upgrade,
+                               probe_options=probe_options, max_age=max_age,
+                               failover=failover, fallbacks=fallbacks)
 
-def set_default_mirror(mirror_name=None, mirror_url=None):
+def serve_proxy(host=DEFAULT_HOST, port=DEFAULT_PORT, cache_dir=DEFAULT_CACHE_DIR,
+                max_size_mb=DEFAULT_MAX_SIZE_MB, probe_options=None,
+                max_age=DEFAULT_MAX_AGE):
+    """启动本地 simple 索引代理，按排名使用上游镜像源"""
+    ranked, _ = choose_ranked_mirrors(probe_options, max_age)
+    if not ranked:
+        print("错误：没有可用的镜像源！")
+        return False
+    serve_forever(ranked, host, port, cache_dir, max_size_mb)
+    return True
+
+def set_default_mirror(mirror_name=None, mirror_url=None, probe_options=None,
+                       max_age=DEFAULT_MAX_AGE):
     """设置默认镜像源"""
     config = load_config()
     
@@ -181,15 +343,14 @@ def set_default_mirror(mirror_name=None, mirror_url=None):
         print(f"已将 {mirror_name} 设置为默认镜像源")
     else:
         # 如果未指定，测试并设置最快的
-        print("正在测试并设置最快的镜像源作为默认...")
-        results = test_all_mirrors()
-        available_mirrors = [(name, url) for name, url, _, success in results if success]
+        print("正在选择最快的镜像源作为默认...")
+        chosen = choose_fastest_mirror(probe_options, max_age)
         
-        if not available_mirrors:
+        if not chosen:
             print("错误：没有可用的镜像源！")
             return False
         
-        mirror_name, mirror_url = available_mirrors[0]
+        mirror_name, mirror_url, _ = chosen
         config["default_mirror"] = {"name": mirror_name, "url": mirror_url}
         save_config(config)
         print(f"已将 {mirror_name} 设置为默认镜像源")
@@ -227,8 +388,13 @@ def list_mirrors():
     
     print("-" * 70)
 
-def update_all_packages():
-    """更新所有已安装的包"""
+def update_all_packages(probe_options=None, max_age=DEFAULT_MAX_AGE,
+                        workers=DEFAULT_WORKERS, dry_run=False, exclude=()):
+    """更新所有已安装的包
+
+    并发查询镜像源索引找出可更新的包，按依赖关系分波次，并行预下载后从本地安装，
+    最后输出逐包报告。dry_run 为 True 时只显示更新计划。
+    """
     config = load_config()
     
     # 获取默认镜像源
@@ -240,58 +406,29 @@ def update_all_packages():
         print(f"使用默认镜像源: {mirror_name}")
     else:
         # 如果没有默认镜像源，使用最快的
-        print("未设置默认镜像源，正在测试并选择最快的镜像源...")
-        results = test_all_mirrors()
-        available_mirrors = [(name, url) for name, url, _, success in results if success]
+        print("未设置默认镜像源，正在选择最快的镜像源...")
+        chosen = choose_fastest_mirror(probe_options, max_age)
         
-        if not available_mirrors:
+        if not chosen:
             print("错误：没有可用的镜像源！")
             return False
         
-        mirror_name, mirror_url = available_mirrors[0]
+        mirror_name, mirror_url, _ = chosen
         print(f"使用最快的镜像源: {mirror_name}")
     
-    # 获取已安装的包列表
-    print("获取已安装的包列表...")
+    # 并发查询索引，按依赖波次并行下载、安装
     try:
-        # 获取可更新的包
-        outdated_result = subprocess.run(
-            [sys.executable, '-m', 'pip', 'list', '--outdated', '--format=json'],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        
-        outdated_packages = json.loads(outdated_result.stdout)
-        
-        if not outdated_packages:
-            print("所有包都是最新的，无需更新")
-            return True
-        
-        print(f"发现 {len(outdated_packages)} 个可更新的包:")
-        for pkg in outdated_packages:
-            print(f"  - {pkg['name']} ({pkg['version']} -> {pkg['latest_version']})")
-        
-        # 更新所有包
-        print(f"\n开始使用 {mirror_name} 更新所有包...")
-        
-        # 构建更新命令
-        cmd = [sys.executable, '-m', 'pip', 'install', '--upgrade', 
-               '--index-url', mirror_url, 
-               '--trusted-host', mirror_url.split('//')[1].split('/')[0]]
-        
-        # 添加所有需要更新的包名
-        package_names = [pkg['name'] for pkg in outdated_packages]
-        cmd.extend(package_names)
-        
-        print(f"执行命令: {' '.join(cmd)}")
-        subprocess.run(cmd, check=True)
-        print("所有包已成功更新")
-        return True
-        
+        report = update_packages(mirror_name, mirror_url, workers, dry_run, exclude)
     except Exception as e:
         print(f"更新包时出错: {e}")
         return False
+    
+    if not report:
+        print("所有包都是最新的，无需更新")
+        return True
+    
+    print_report(report)
+    return all(entry["status"] in ("updated", "planned") for entry in report)
 
 def main():
     """主函数"""
@@ -300,18 +437,68 @@ def main():
     # 添加子命令
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
     
+    # 测速参数（test/install/set-default/update-all 共用）
+    def add_probe_arguments(sub_parser):
+        sub_parser.add_argument('--probe', choices=PROBE_MODES, default=DEFAULT_PROBE,
+                                help='测速方式: http 直接请求索引页(默认), pip 使用 pip download')
+        sub_parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                                help=f'每个镜像源的采样次数 (默认 {DEFAULT_SAMPLES})')
+        sub_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                                help=f'同时进行的探测数量 (默认 {DEFAULT_CONCURRENCY})')
+        sub_parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE,
+                                help=f'测速全局截止时间，单位秒 (默认 {DEFAULT_DEADLINE:g})')
+        sub_parser.add_argument('--trace', metavar='PATH',
+                                help='把每次探测的连接/TLS/首字节/传输耗时写入 JSON-lines 文件')
+        sub_parser.add_argument('--trace-chrome', metavar='PATH',
+                                help='把探测过程写成 Chrome trace_event 文件'
+                                     '（chrome://tracing 查看）')
+    
+    # 排名缓存有效期参数
+    def add_max_age_argument(sub_parser):
+        sub_parser.add_argument('--max-age', type=int, default=DEFAULT_MAX_AGE,
+                                help=f'测速排名缓存有效期，单位秒，0 表示重新测速 (默认 {DEFAULT_MAX_AGE})')
+    
     # 测试镜像源速度命令
     test_parser = subparsers.add_parser('test', help='测试所有镜像源速度')
     
+    add_probe_arguments(test_parser)
+    
     # 安装包命令
     install_parser = subparsers.add_parser('install', help='使用镜像源安装包')
     install_parser.add_argument('packages', nargs='+', help='要安装的包名')
     install_parser.add_argument('--mirror', '-m', choices=MIRRORS.keys(), help='指定镜像源')
     install_parser.add_argument('--upgrade', '-u', action='store_true', help='升级已安装的包')
+    add_probe_arguments(install_parser)
+    add_max_age_argument(install_parser)
+    install_parser.add_argument('--failover', choices=FAILOVER_MODES,
+                                default=FAILOVER_OFF,
+                                help='故障转移: off 只用一个镜像源(默认), '
+                                     'extra-index 附加备用镜像源 --extra-index-url, '
+                                     'retry 网络失败时按排名换镜像源重试')
+    install_parser.add_argument('--fallbacks', type=int, default=DEFAULT_FALLBACKS,
+                                help=f'故障转移时使用的备用镜像源数量 (默认 {DEFAULT_FALLBACKS})')
+    install_parser.add_argument('--no-proxy', action='store_true',
+                                help='即使本地缓存代理正在运行也不使用')
+    
+    # 本地缓存代理命令
+    serve_parser = subparsers.add_parser('serve', help='启动本地 simple 索引缓存代理')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST,
+                              help=f'监听地址 (默认 {DEFAULT_HOST})')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                              help=f'监听端口 (默认 {DEFAULT_PORT})')
+    serve_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                              help=f'缓存目录 (默认 {DEFAULT_CACHE_DIR})')
+    serve_parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE_MB,
+                              help=f'缓存大小上限，单位MB (默认 {DEFAULT_MAX_SIZE_MB})')
+    add_probe_arguments(serve_parser)
+    add_max_age_argument(serve_parser)
     
     # 设置默认镜像源命令
     set_default_parser = subparsers.add_parser('set-default', help='设置默认镜像源')
-    set_default_parser.add_argument('--mirror', '-m', choices=MIRRORS.keys(), help='指定镜像源')
+    set_default_parser.add_argument('--mirror', '-m', choices=MIRRORS.keys(),
+                                    help='指定镜像源')
+    add_probe_arguments(set_default_parser)
+    add_max_age_argument(set_default_parser)
     
     # 取消默认镜像源命令
     unset_default_parser = subparsers.add_parser('unset-default', help='取消默认镜像源设置')
@@ -324,21 +511,51 @@ def main():
     
     # 更新所有包命令
     update_parser = subparsers.add_parser('update-all', help='更新所有已安装的包')
+    add_probe_arguments(update_parser)
+    add_max_age_argument(update_parser)
+    update_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                               help=f'查询索引和下载的并发数 (默认 {DEFAULT_WORKERS})')
+    update_parser.add_argument('--dry-run', action='store_true', help='只显示更新计划，不安装')
+    update_parser.add_argument('--exclude', nargs='+', default=[], metavar='PKG',
+                               help='不更新的包')
+    
+    # 测速排名缓存命令
+    cache_parser = subparsers.add_parser('cache', help='查看/清除/刷新测速排名缓存')
+    cache_parser.add_argument('action', choices=['show', 'clear', 'refresh'],
+                              help='缓存操作')
+    add_probe_arguments(cache_parser)
+    add_max_age_argument(cache_parser)
     
     # 解析参数
     args = parser.parse_args()
     
+    # 测速参数
+    probe_options = None
+    if hasattr(args, 'probe'):
+        probe_options = {"probe": args.probe, "samples": args.samples,
+                         "concurrency": args.concurrency, "deadline": args.deadline}
+    
+    # 探测的分阶段追踪
+    tracing = bool(getattr(args, 'trace', None) or getattr(args, 'trace_chrome', None))
+    if tracing:
+        configure_trace(args.trace, args.trace_chrome)
+    
     # 处理不同的命令
     if args.command == 'test':
-        test_all_mirrors()
+        test_all_mirrors(**probe_options)
     
     elif args.command == 'install':
         mirror_name = None
         mirror_url = None
+        proxy = None if args.no_proxy or args.mirror else running_proxy_url()
         
         if args.mirror:
             mirror_name = args.mirror
             mirror_url = MIRRORS[mirror_name]
+        elif proxy:
+            # 本地缓存代理正在运行，直接使用
+            mirror_name = PROXY_MIRROR_NAME
+            mirror_url = proxy
         else:
             # 检查是否有默认镜像源
             config = load_config()
@@ -346,13 +563,29 @@ def main():
                 mirror_name = config["default_mirror"]["name"]
                 mirror_url = config["default_mirror"]["url"]
         
-        install_with_mirror(args.packages, mirror_name, mirror_url, args.upgrade)
+        install_with_mirror(args.packages, mirror_name, mirror_url, args.upgrade,
+                            probe_options, args.max_age, args.failover, args.fallbacks)
     
     elif args.command == 'set-default':
         if args.mirror:
             set_default_mirror(args.mirror, MIRRORS[args.mirror])
         else:
-            set_default_mirror()
+            set_default_mirror(probe_options=probe_options, max_age=args.max_age)
+    
+    elif args.command == 'serve':
+        serve_proxy(args.host, args.port, args.cache_dir, args.max_size, probe_options,
+                    args.max_age)
+    
+    elif args.command == 'cache':
+        if args.action == 'show':
+            show_ranking(load_ranking(), args.max_age)
+        elif args.action == 'clear':
+            print("已清除测速排名缓存" if clear_ranking() else "没有测速排名缓存")
+        else:
+            try:
+                test_all_mirrors(**probe_options)
+            finally:
+                release_refresh_lock()
     
     elif args.command == 'unset-default':
         unset_default_mirror()
@@ -364,7 +597,8 @@ def main():
         list_mirrors()
     
     elif args.command == 'update-all':
-        update_all_packages()
+        update_all_packages(probe_options, args.max_age, args.workers, args.dry_run,
+                            args.exclude)
     
     else:
         # 如果没有指定命令，显示帮助信息
@@ -372,14 +606,19 @@ def main():
         print("使用方法:")
         print("  python pypi_mirror_manager.py <command> [options]\n")
         print("可用命令:")
-        print("  test             测试所有镜像源的速度")
+        print("  test             测试所有镜像源的速度（--probe=pip 使用旧的 pip download 方式）")
         print("  list             列出所有支持的镜像源")
         print("  install <pkg>... 使用镜像源安装包")
         print("  update-all       更新所有已安装的包")
         print("  set-default      设置默认镜像源")
         print("  unset-default    取消默认镜像源设置")
         print("  show-default     显示当前默认镜像源")
+        print("  cache show|clear 查看/清除测速排名缓存")
+        print("  serve            启动本地缓存代理（install 会自动使用）")
         print("\n使用 'python pypi_mirror_manager.py <command> -h' 查看具体命令的帮助")
+    
+    if tracing:
+        print_trace_summary()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
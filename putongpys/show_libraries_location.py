@@ -2,12 +2,70 @@
 # -*- coding: utf-8 -*-
 """
 显示已安装Python库的位置信息
+
+通过 importlib.metadata 一次扫描所有已安装的发行包，建立
+名称 -> (版本, 安装位置, 顶层模块, 文件列表, 大小) 的索引，之后任意数量的查询都在内存中完成。
+
+--footprint 模式统计每个包的磁盘占用和导入开销（冷启动导入耗时、常驻内存增量），
+每次导入都在独立的子进程中进行，结果可按列排序并导出为 JSON。
 """
 
+import re
 import sys
 import site
-import subprocess
 import os
+import json
+import argparse
+import subprocess
+from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor
+
+# 测量导入开销时每个子进程的超时时间（秒）
+IMPORT_TIMEOUT = 60
+
+# 在子进程中执行：测量导入某个模块的耗时和常驻内存(RSS)增量
+IMPORT_PROBE_CODE = r"""
+import sys, time, json, importlib
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            import os
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        class PMC(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize',
+                    'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                    'PagefileUsage', 'PeakPagefileUsage')]
+        counters = PMC()
+        counters.cb = ctypes.sizeof(PMC)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                                 counters.cb)
+        return counters.WorkingSetSize
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+module = sys.argv[1]
+before = rss()
+start = time.perf_counter()
+try:
+    importlib.import_module(module)
+    error = None
+except BaseException as e:
+    error = f"{e.__class__.__name__}: {e}"
+elapsed = time.perf_counter() - start
+print(json.dumps({"module": module, "seconds": elapsed, "rss_delta": rss() - before,
+                  "modules_loaded": len(sys.modules), "error": error}))
+"""
 
 # 获取site-packages目录
 def get_site_packages():
@@ -21,69 +79,302 @@ def get_site_packages():
     print(f"用户site-packages目录: {site.USER_SITE}")
     print("=" * 70)
 
+# PEP 503 名称规范化（scikit_learn、Scikit-Learn 都对应 scikit-learn）
+def normalize_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+# 从 RECORD 推断顶层模块（没有 top_level.txt 时使用）
+def _top_level_from_files(files):
+    names = set()
+    for path in files:
+        parts = path.split('/')
+        first = parts[0]
+        if first in ('..', '__pycache__') or first.endswith(
+                ('.dist-info', '.egg-info', '.data')):
+            continue
+        if len(parts) > 1:
+            names.add(first)
+        elif first.endswith(('.py', '.pyd', '.so')):
+            names.add(first.split('.', 1)[0])
+    return sorted(names)
+
+# 顶层模块在磁盘上的真实路径（包目录、单文件模块或扩展模块）
+def _module_paths(location, top_level, files):
+    paths = []
+    for module in top_level:
+        package_dir = os.path.join(location, module)
+        if os.path.isdir(package_dir):
+            paths.append(package_dir)
+            continue
+        for path in files:
+            if ('/' not in path and path.split('.', 1)[0] == module
+                    and not path.endswith('.pyc')):
+                full_path = os.path.join(location, path)
+                if os.path.exists(full_path):
+                    paths.append(full_path)
+    return paths
+
+# 一次扫描所有已安装的发行包，建立名称索引
+def build_distribution_index():
+    index = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+        key = normalize_name(name)
+        # sys.path 中靠前的优先，与 import 的行为一致
+        if key in index:
+            continue
+
+        location = str(dist.locate_file(''))
+        records = dist.files or []
+        files = [str(path).replace('\\', '/') for path in records]
+        size = sum(path.size or 0 for path in records)
+
+        top_level_text = dist.read_text('top_level.txt')
+        if top_level_text:
+            top_level = [line.strip() for line in top_level_text.splitlines()
+                         if line.strip()]
+        else:
+            top_level = _top_level_from_files(files)
+
+        index[key] = {
+            "name": name,
+            "version": dist.version,
+            "location": location,
+            "top_level": top_level,
+            "module_paths": _module_paths(location, top_level, files),
+            "files": files,
+            "size": size,
+        }
+    return index
+
+# 字节数转为便于阅读的字符串
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{size}B"
+        size /= 1024
+
 # 获取已安装的主要库的位置
-def get_installed_packages_locations(packages):
+def get_installed_packages_locations(packages, index=None):
+    if index is None:
+        index = build_distribution_index()
+
     print("\n已安装库的具体位置:")
     print("=" * 70)
     print(f"{'库名':<20} {'版本':<15} {'安装位置':<40}")
     print("=" * 70)
-    
+
     for package in packages:
-        try:
-            # 使用pip show命令获取包信息
-            result = subprocess.run(
-                [sys.executable, '-m', 'pip', 'show', package],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # 解析输出信息
-            info = {}
-            for line in result.stdout.strip().split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    info[key.strip()] = value.strip()
-            
-            # 显示包名、版本和位置
-            name = info.get('Name', package)
-            version = info.get('Version', '未知')
-            location = info.get('Location', '未知')
-            
-            print(f"{name:<20} {version:<15} {location:<40}")
-            
-            # 显示实际代码所在目录
-            package_dir = os.path.join(location, name)
-            if os.path.exists(package_dir):
-                print(f"{'':<36} 代码目录: {package_dir}")
-            
-        except subprocess.CalledProcessError:
+        info = index.get(normalize_name(package))
+        if info is None:
             print(f"{package:<20} {'未安装':<15} {'N/A':<40}")
-        except Exception as e:
-            print(f"{package:<20} {'错误':<15} {str(e):<40}")
-    
+            continue
+
+        print(f"{info['name']:<20} {info['version']:<15} {info['location']:<40}")
+
+        # 显示实际代码所在目录（来自 top_level.txt / RECORD）
+        for path in info["module_paths"]:
+            print(f"{'':<36} 代码目录: {path}")
+        if info["files"]:
+            print(f"{'':<36} 文件数: {len(info['files'])}, "
+                  f"大小: {format_size(info['size'])}")
+
     print("=" * 70)
 
 # 获取所有已安装的包列表
-def list_all_installed_packages():
+def list_all_installed_packages(index=None):
+    if index is None:
+        index = build_distribution_index()
+
+    print("\n所有已安装的Python包列表:")
+    print("=" * 100)
+    print(f"{'库名':<30} {'版本':<15} {'大小':<10} {'顶层模块':<20} {'安装位置'}")
+    print("=" * 100)
+    for info in sorted(index.values(), key=lambda item: item["name"].lower()):
+        top_level = ",".join(info["top_level"])
+        print(f"{info['name']:<30} {info['version']:<15} "
+              f"{format_size(info['size']):<10} {top_level:<20} {info['location']}")
+    print("=" * 100)
+    print(f"共 {len(index)} 个包")
+
+# 遍历目录统计大小（没有 RECORD 或 RECORD 中没有大小信息时使用）
+def _scandir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    return total
+
+# 计算每个包的磁盘占用：优先使用 RECORD 中的大小，缺失时并行遍历代码目录
+def compute_disk_sizes(index, names, workers=8):
+    sizes = {}
+    to_walk = []
+    for key in names:
+        info = index[key]
+        if info["size"]:
+            sizes[key] = (info["size"], "RECORD")
+        else:
+            to_walk.append(key)
+
+    def walk(key):
+        return sum(_scandir_size(path) for path in index[key]["module_paths"])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for key, size in zip(to_walk, executor.map(walk, to_walk)):
+            sizes[key] = (size, "scandir")
+    return sizes
+
+# 在独立子进程中导入单个模块，返回耗时与内存增量
+def measure_import(module, python=sys.executable, timeout=IMPORT_TIMEOUT):
     try:
-        print("\n所有已安装的Python包列表:")
-        print("=" * 70)
-        subprocess.run(
-            [sys.executable, '-m', 'pip', 'list', '--format=columns'],
-            check=True
+        result = subprocess.run(
+            [python, '-c', IMPORT_PROBE_CODE, module],
+            capture_output=True,
+            text=True,
+            timeout=timeout
         )
+        lines = result.stdout.strip().splitlines()
+        if not lines:
+            stderr = result.stderr.strip()
+            raise ValueError(stderr.splitlines()[-1] if stderr else "无输出")
+        return json.loads(lines[-1])
     except Exception as e:
-        print(f"获取所有包列表时出错: {e}")
+        return {"module": module, "seconds": None, "rss_delta": None,
+                "modules_loaded": None, "error": str(e)}
+
+# 用进程池并行测量所有顶层模块的导入开销
+def measure_import_costs(modules, workers=4, timeout=IMPORT_TIMEOUT):
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(
+            lambda module: measure_import(module, timeout=timeout), modules)
+        return dict(zip(modules, results))
+
+# 汇总每个包的磁盘占用和导入开销
+def analyze_footprint(index, packages=None, workers=8, measure_imports=True):
+    if packages:
+        names = [normalize_name(name) for name in packages
+                 if normalize_name(name) in index]
+    else:
+        names = list(index)
+
+    sizes = compute_disk_sizes(index, names, workers)
+    costs = {}
+    if measure_imports:
+        modules = sorted({module for key in names for module in index[key]["top_level"]
+                          if module.isidentifier()})
+        costs = measure_import_costs(modules, workers)
+
+    rows = []
+    for key in names:
+        info = index[key]
+        size, size_source = sizes[key]
+        module_costs = [costs[module] for module in info["top_level"]
+                        if module in costs]
+        measured = [cost for cost in module_costs
+                    if cost["seconds"] is not None and not cost["error"]]
+        rows.append({
+            "name": info["name"],
+            "version": info["version"],
+            "size": size,
+            "size_source": size_source,
+            "files": len(info["files"]),
+            "import_seconds": (sum(cost["seconds"] for cost in measured)
+                               if measured else None),
+            "rss_delta": (sum(cost["rss_delta"] for cost in measured)
+                          if measured else None),
+            "modules": module_costs,
+        })
+    return rows
+
+FOOTPRINT_SORT_KEYS = {
+    "size": lambda row: row["size"],
+    "import": lambda row: row["import_seconds"] or 0.0,
+    "memory": lambda row: row["rss_delta"] or 0,
+    "name": lambda row: row["name"].lower(),
+}
+
+# 以表格形式输出磁盘占用和导入开销
+def print_footprint(rows, sort="size", top=None):
+    rows = sorted(rows, key=FOOTPRINT_SORT_KEYS[sort], reverse=(sort != "name"))
+    if top:
+        rows = rows[:top]
+    print("\n磁盘占用与导入开销:")
+    print("=" * 96)
+    print(f"{'库名':<30} {'版本':<12} {'磁盘占用':<10} {'来源':<8} {'文件数':<7} "
+          f"{'导入耗时(ms)':<13} {'内存增量':<10}")
+    print("=" * 96)
+    for row in rows:
+        import_ms = ("N/A" if row["import_seconds"] is None
+                     else f"{row['import_seconds'] * 1000:.1f}")
+        memory = "N/A" if row["rss_delta"] is None else format_size(row["rss_delta"])
+        print(f"{row['name']:<30} {row['version']:<12} {format_size(row['size']):<10} "
+              f"{row['size_source']:<8} {row['files']:<7} {import_ms:<13} {memory:<10}")
+        for cost in row["modules"]:
+            if cost["error"]:
+                print(f"{'':<30} 导入 {cost['module']} 失败: {cost['error']}")
+    print("=" * 96)
+    total = sum(row["size"] for row in rows)
+    print(f"共 {len(rows)} 个包，磁盘占用合计 {format_size(total)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='显示已安装Python库的位置信息')
+    parser.add_argument('packages', nargs='*', help='要查询的包名（默认查询常用库）')
+    parser.add_argument('--all', action='store_true', help='列出所有已安装的包')
+    parser.add_argument('--footprint', action='store_true',
+                        help='统计磁盘占用和导入开销（不指定包名时统计所有包）')
+    parser.add_argument('--no-import', action='store_true', help='--footprint 时只统计磁盘占用')
+    parser.add_argument('--sort', choices=sorted(FOOTPRINT_SORT_KEYS), default='size',
+                        help='--footprint 表格的排序方式 (默认 size)')
+    parser.add_argument('--top', type=int, default=None, help='--footprint 只显示前 N 个包')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='并行遍历目录/导入子进程的数量')
+    parser.add_argument('--json', metavar='PATH',
+                        help='--footprint 结果保存为 JSON（- 表示输出到屏幕）')
+    args = parser.parse_args()
+
+    if args.footprint:
+        index = build_distribution_index()
+        rows = analyze_footprint(index, args.packages, args.workers, not args.no_import)
+        if args.json == '-':
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            print_footprint(rows, args.sort, args.top)
+            if args.json:
+                with open(args.json, 'w', encoding='utf-8') as f:
+                    json.dump(rows, f, ensure_ascii=False, indent=2)
+                print(f"结果已保存到 {args.json}")
+        sys.exit(0)
+
     # 获取site-packages位置
     get_site_packages()
-    
-    # 检查我们刚才安装的主要库
-    main_packages = ['numpy', 'pandas', 'matplotlib', 'scikit-learn', 'requests']
-    get_installed_packages_locations(main_packages)
-    
-    # 提示用户是否要查看所有已安装的包
-    print("\n注意: 要查看所有已安装的包，请运行 'pip list'")
-    print("要获取某个特定包的详细信息，请运行 'pip show 包名'")
\ No newline at end of file
+
+    # 一次扫描建立索引，后续查询都在内存中完成
+    index = build_distribution_index()
+
+    if args.all:
+        list_all_installed_packages(index)
+    else:
+        # 检查我们刚才安装的主要库
+        main_packages = args.packages or ['numpy', 'pandas', 'matplotlib',
+                                          'scikit-learn', 'requests']
+        get_installed_packages_locations(main_packages, index)
+
+        # 提示用户是否要查看所有已安装的包
+        print("\n注意: 要查看所有已安装的包，请运行 'python show_libraries_location.py --all'")
+        print("要获取某个特定包的详细信息，请运行 'pip show 包名'")
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+测试环境：FreeCAD 部分使用 fcstub 替身（FC_STUB=1），不使用零件缓存
+
+putongpys 和 FreeCadpys 都是直接运行的脚本目录，没有安装为包，这里把两个目录加入 sys.path。
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["FC_STUB"] = "1"
+os.environ["FC_NO_CACHE"] = "1"
+for directory in ("putongpys", "FreeCadpys"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""解析网格的封闭性与体积"""
+
+import pytest
+
+import analytic_mesh
+import create_cube
+
+
+def _params(**overrides):
+    return create_cube.normalize_params(dict(create_cube.DEFAULT_PARAMS, **overrides),
+                                        strict=True)
+
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {"holeRadius": 3.0, "holeAxis": "X"},
+    {"holeRadius": 3.0, "holeAxis": "Y"},
+    {"holeRadius": 3.0, "holeAxis": "Z", "length": 20.0, "rot": "30,15,5",
+     "pos": "1,2,3"},
+    {"holeRadius": 0.5, "holeAxis": "Z", "tolerance": 0.2},
+])
+def test_mesh_is_watertight_with_exact_volume(overrides):
+    params = _params(**overrides)
+    vertices, faces = analytic_mesh.cube_mesh(params)
+    assert analytic_mesh.is_watertight(faces)
+    segments = None
+    if params["holeRadius"] > 0:
+        segments = analytic_mesh.segments_for_tolerance(
+            params["holeRadius"], analytic_mesh.DEFAULT_TOLERANCE)
+    expected = analytic_mesh.expected_volume(params, segments)
+    volume = analytic_mesh.mesh_volume(vertices, faces)
+    assert volume == pytest.approx(expected, rel=1e-9)
+
+
+def test_open_mesh_is_not_watertight():
+    _, faces = analytic_mesh.cube_mesh(_params(holeRadius=3.0))
+    assert not analytic_mesh.is_watertight(faces[:-1])
+
+
+def test_validate_passes_on_stub_backend():
+    assert analytic_mesh.validate(_params(holeRadius=3.0, holeAxis="Y"))["ok"]
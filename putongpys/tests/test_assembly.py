@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""装配模式：网格与货架式排布、清单读取、一个文档一次重算"""
+
+import json
+import itertools
+
+import pytest
+
+import assembly
+import create_cube
+
+GAP = 2.0
+
+
+def _cube(row, length, width, height=3.0, **params):
+    values = {"length": length, "width": width, "height": height, **params}
+    return assembly.Item(row, "cube", create_cube.normalize_params(values, strict=True))
+
+
+def _line(row, start, end):
+    params = dict(zip(("x1", "y1", "z1"), start), **dict(zip(("x2", "y2", "z2"), end)))
+    return assembly.Item(row, "line", assembly.line_params(params))
+
+
+def _footprints(items):
+    return [(item.bounds()[0], item.bounds()[1]) for item in items]
+
+
+def _assert_apart(items, gap):
+    """XY 占地矩形两两之间至少相隔 gap，所有包围盒的最低点在 Z=0"""
+    boxes = _footprints(items)
+    for (low, _), item in zip(boxes, items):
+        assert low[2] == pytest.approx(0.0, abs=1e-9), item.row
+    for (low_a, high_a), (low_b, high_b) in itertools.combinations(boxes, 2):
+        apart_x = (low_b[0] - high_a[0] >= gap - 1e-9
+                   or low_a[0] - high_b[0] >= gap - 1e-9)
+        apart_y = (low_b[1] - high_a[1] >= gap - 1e-9
+                   or low_a[1] - high_b[1] >= gap - 1e-9)
+        assert apart_x or apart_y
+
+
+def _items():
+    return [_cube(1, 10, 4, pos="5,5,5"), _cube(2, 3, 8, rot="0,0,45"),
+            _cube(3, 6, 6, rot="30,0,0"), _line(4, (0, 0, 2), (12, 5, 7)),
+            _cube(5, 2, 2)]
+
+
+def test_grid_uses_uniform_cells():
+    items = _items()
+    assembly.layout_grid(items, GAP, columns=2)
+    _assert_apart(items, GAP)
+    lows = [low for low, _ in _footprints(items)]
+    assert lows[0][:2] == pytest.approx((0.0, 0.0))
+    # 第二列从最宽对象的宽度加间距开始，第三个对象换到第二行
+    widest = max(high[0] - low[0] for low, high in _footprints(_items()))
+    assert lows[1][0] == pytest.approx(widest + GAP)
+    assert lows[2][0] == pytest.approx(0.0) and lows[2][1] > 0
+
+
+def test_packed_rows_fit_width_and_beat_grid():
+    items = _items()
+    assembly.layout_packed(items, GAP, max_width=20)
+    _assert_apart(items, GAP)
+    boxes = _footprints(items)
+    assert max(high[0] for _, high in boxes) <= 20
+
+    grid = _items()
+    assembly.layout_grid(grid, GAP)
+
+    def area(boxes):
+        width = max(high[0] for _, high in boxes)
+        depth = max(high[1] for _, high in boxes)
+        return width * depth
+
+    assert area(boxes) < area(_footprints(grid))
+
+
+def test_empty_layouts():
+    assembly.layout_grid([], GAP)
+    assembly.layout_packed([], GAP)
+
+
+def test_load_items_reports_bad_rows(tmp_path):
+    manifest = tmp_path / "parts.jsonl"
+    rows = [{"length": 4},
+            {"kind": "line", "params": {"x2": 3, "name": "L"}},
+            {"kind": "sphere"},
+            {"kind": "line", "params": {"radius": 1}},
+            {"length": -1}]
+    manifest.write_text("\n".join(map(json.dumps, rows)) + "\n{oops\n",
+                        encoding="utf-8")
+    items, errors = assembly.load_items(str(manifest))
+    assert [(item.row, item.kind) for item in items] == [(1, "cube"), (2, "line")]
+    assert items[1].params["x2"] == 3.0
+    assert [row for row, _ in errors] == [3, 4, 5, 6]
+
+
+def test_assembly_builds_one_document(tmp_path):
+    items = [_cube(1, 4, 4), _cube(2, 5, 3, holeRadius=1),
+             _line(3, (0, 0, 0), (4, 0, 0))]
+    assembly.layout_packed(items, GAP)
+    result = assembly.build_assembly(items, str(tmp_path / "a.FCStd"),
+                                     stl_dir=str(tmp_path / "stl"), close_document=True)
+    assert result["objects"] >= 3
+    assert set(result["timings"]) == {"build", "recompute", "save", "stl"}
+    assert len(list((tmp_path / "stl").iterdir())) == len(result["meshes"]) == 2
+    assert (tmp_path / "a.FCStd").exists()
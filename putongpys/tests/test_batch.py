@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""批量模式：格式错误或参数无效的行记录为失败并跳过，其余任务照常生成"""
+
+import os
+import json
+
+import create_cube
+
+
+def _results(manifest):
+    with open(os.path.splitext(manifest)[0] + ".results.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_malformed_jsonl_rows_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = str(tmp_path / "m.jsonl")
+    lines = ['{"id": "a", "length": 5}',
+             '# 注释行和空行不算任务',
+             '',
+             '{"id": "broken", "length": ',
+             '[1, 2, 3]',
+             '{"id": "unknown", "lenght": 5}',
+             '{"id": "negative", "length": -1}',
+             '{"id": "axis", "holeAxis": "W"}',
+             '{"id": "b", "width": "7"}']
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    assert create_cube.run_batch(manifest) == (2, 5)
+    records = _results(manifest)
+    assert [(record["row"], record["status"]) for record in records] == [
+        (1, "success"), (4, "error"), (5, "error"), (6, "error"), (7, "error"),
+        (8, "error"), (9, "success")]
+    errors = {record["row"]: record["error"] for record in records
+              if record["status"] == "error"}
+    assert errors[4].startswith("无法解析")
+    assert "lenght" in errors[6]
+    assert "length" in errors[7]
+    assert all(os.path.exists(record["fcstd"]) for record in records
+               if record["status"] == "success")
+
+
+def test_csv_rows_and_template_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = str(tmp_path / "m.csv")
+    with open(manifest, "w", encoding="utf-8", newline="") as f:
+        f.write("id,length,pos\n"
+                "a,5,\"1,2,3\"\n"
+                "b,6,0,0,0\n"
+                "c,,\n")
+
+    assert create_cube.run_batch(manifest, fcstd_template="out/{id}.FCStd") == (2, 1)
+    records = _results(manifest)
+    assert [record["status"] for record in records] == ["success", "error", "success"]
+    assert "列数多于表头" in records[1]["error"]
+    assert sorted(os.listdir("out")) == ["a.FCStd", "c.FCStd"]
+
+    template = "out/{missing}.FCStd"
+    assert create_cube.run_batch(manifest, fcstd_template=template) == (0, 3)
+    assert [record["error"].split(":")[0] for record in _results(manifest)] == [
+        "模板字段不存在", "无法解析", "模板字段不存在"]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""基准线比较"""
+
+import bench
+
+
+def _stats(size, repeat, parts_per_sec, p50, p90, best=0.001):
+    return {"size": size, "repeat": repeat, "samples": size * repeat,
+            "parts_per_sec": parts_per_sec, "best": best, "p50": p50, "p90": p90}
+
+
+def _report(**results):
+    return {"results": {key.replace("_at_", "@"): stats
+                        for key, stats in results.items()}}
+
+
+def test_small_batches_are_not_compared():
+    baseline = _report(case_at_1=_stats(1, 1, 400.0, 0.002, 0.002),
+                       case_at_5=_stats(5, 1, 400.0, 0.002, 0.003))
+    current = _report(case_at_1=_stats(1, 1, 150.0, 0.006, 0.006),
+                      case_at_5=_stats(5, 1, 150.0, 0.006, 0.009))
+    regressions, skipped = bench.compare(current, baseline)
+    assert regressions == []
+    assert skipped == ["case@1", "case@5"]
+
+
+def test_p90_spike_alone_is_not_a_regression():
+    baseline = _report(case_at_10=_stats(10, 3, 400.0, 0.002, 0.003))
+    current = _report(case_at_10=_stats(10, 3, 390.0, 0.002, 0.009))
+    assert bench.compare(current, baseline) == ([], [])
+
+
+def test_best_latency_spike_alone_is_not_a_regression():
+    # 重复运行中最快单件耗时 +73.7%，吞吐量和 p50 没变
+    baseline = _report(case_at_10=_stats(10, 2, 60.0, 0.016, 0.020, best=0.01375))
+    current = _report(case_at_10=_stats(10, 2, 58.0, 0.017, 0.022, best=0.02388))
+    assert bench.compare(current, baseline) == ([], [])
+
+
+def test_one_metric_alone_is_not_a_regression():
+    baseline = _report(case_at_10=_stats(10, 3, 400.0, 0.002, 0.003))
+    slower_run = _report(case_at_10=_stats(10, 3, 200.0, 0.0021, 0.003))
+    slower_median = _report(case_at_10=_stats(10, 3, 390.0, 0.004, 0.005))
+    assert bench.compare(slower_run, baseline) == ([], [])
+    assert bench.compare(slower_median, baseline) == ([], [])
+
+
+def test_slower_throughput_and_p50_latency_are_regressions():
+    baseline = _report(case_at_10=_stats(10, 3, 400.0, 0.002, 0.003))
+    current = _report(case_at_10=_stats(10, 3, 200.0, 0.004, 0.005))
+    regressions, _ = bench.compare(current, baseline)
+    assert [(key, metric) for key, metric, *_ in regressions] == [
+        ("case@10", "parts_per_sec"), ("case@10", "p50")]
+
+
+def test_old_baseline_without_samples():
+    baseline = {"results": {"case@10": {"size": 10, "repeat": 3, "parts_per_sec": 400.0,
+                                        "p50": 0.002, "p90": 0.003}}}
+    current = _report(case_at_10=_stats(10, 3, 200.0, 0.004, 0.009))
+    regressions, skipped = bench.compare(current, baseline)
+    assert len(regressions) == 2 and skipped == []
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""增量构建：状态记录、路径变化时的链接与清理"""
+
+import os
+import json
+
+import build_state
+import create_cube
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_current_modified_and_relocated(tmp_path):
+    state = build_state.BuildState(str(tmp_path / "m.state.json"), tool="t1")
+    old = str(tmp_path / "out" / "00002.FCStd")
+    _write(old, "part b")
+    state.record({old: "key-b"}, row=2)
+    assert state.is_current({old: "key-b"})
+    assert not state.is_current({old: "key-other"})
+
+    new = str(tmp_path / "out" / "00001.FCStd")
+    assert state.relocate({new: "key-missing"}) is None
+    assert not os.path.exists(new)
+    assert state.relocate({new: "key-b"}, row=1) == [(old, new)]
+    with open(new, encoding="utf-8") as f:
+        assert f.read() == "part b"
+
+    # 新一轮运行只产生新路径时，旧路径是孤立输出
+    state.save()
+    state = build_state.BuildState.load(state.path, tool="t1")
+    assert state.is_current({new: "key-b"})
+    assert state.orphans() == [os.path.join("out", "00002.FCStd")]
+    assert state.collect() == [old]
+    assert os.path.exists(new) and not os.path.exists(old)
+
+
+def test_other_tool_version_is_not_reused(tmp_path):
+    path = str(tmp_path / "a.stl")
+    _write(path, "solid")
+    state = build_state.BuildState(str(tmp_path / "s.json"), tool="t1")
+    state.record({path: "k"})
+    state.tool = "t2"
+    assert not state.is_current({path: "k"})
+    assert state.relocate({str(tmp_path / "b.stl"): "k"}) is None
+
+
+def test_modified_output_is_kept_by_gc(tmp_path):
+    state = build_state.BuildState(str(tmp_path / "s.json"), tool="t1")
+    path = str(tmp_path / "a.FCStd")
+    _write(path, "part")
+    state.record({path: "k"})
+    _write(path, "edited by hand")
+    state.touched.clear()
+    assert state.collect() == []
+    assert os.path.exists(path)
+
+
+ROWS = [{"id": "a", "length": 5}, {"id": "b", "length": 6}, {"id": "c", "length": 7}]
+
+
+def _run(manifest, rows, **kwargs):
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+    state = build_state.BuildState.load(build_state.default_state_path(manifest))
+    create_cube.run_batch(manifest, state=state, **kwargs)
+    results = os.path.splitext(manifest)[0] + ".results.jsonl"
+    with open(results, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_delete_row_keeps_other_parts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = str(tmp_path / "m.jsonl")
+    rows = ROWS
+    first = _run(manifest, rows)
+    assert [record["status"] for record in first] == ["success"] * 3
+    paths = {record["id"]: record["fcstd"] for record in first}
+
+    second = _run(manifest, rows[1:], gc=True)
+    assert [record["status"] for record in second] == ["up_to_date"] * 2
+    assert [record["fcstd"] for record in second] == [paths["b"], paths["c"]]
+    assert not os.path.exists(paths["a"])
+
+
+def test_batch_index_template_relocates_and_collects_backups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = str(tmp_path / "m.jsonl")
+    template = "out/{index}.FCStd"
+    rows = ROWS
+    _run(manifest, rows, fcstd_template=template)
+
+    second = _run(manifest, rows[1:], fcstd_template=template, gc=True)
+    assert [record["status"] for record in second] == ["relocated"] * 2
+    assert sorted(os.listdir("out")) == ["1.FCStd", "2.FCStd"]
+
+    # 参数变了时在原路径重新生成，覆盖时留下的 .FCBak 由 --gc 删除
+    changed = [{"id": "b", "length": 9}, rows[2]]
+    third = _run(manifest, changed, fcstd_template=template)
+    assert [record["status"] for record in third] == ["success", "up_to_date"]
+    assert any(name.endswith(".FCBak") for name in os.listdir("out"))
+    _run(manifest, changed, fcstd_template=template, gc=True)
+    assert sorted(os.listdir("out")) == ["1.FCStd", "2.FCStd"]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""结构化日志：写出、轮转与无法写入时的降级"""
+
+import json
+
+import pytest
+
+import fc_log
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_and_rotated(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    logger = fc_log.Logger(path, level="debug", component="test", max_bytes=400,
+                           buffer_records=1)
+    for index in range(10):
+        logger.info("step", index=index)
+    logger.debug("details")
+    logger.close()
+    records = _read(path + ".1") + _read(path)
+    assert [record.get("index") for record in records][-3:] == [8, 9, None]
+    assert records[-1]["component"] == "test"
+    assert logger.dropped == 0
+
+
+def test_level_filter(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    logger = fc_log.Logger(path, level="warning")
+    logger.info("hidden")
+    logger.error("shown")
+    logger.close()
+    assert [record["event"] for record in _read(path)] == ["shown"]
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_unwritable_path_never_raises(tmp_path, capsys, background):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_text("")
+    logger = fc_log.Logger(str(blocker / "log.jsonl"), buffer_records=1,
+                           background=background)
+    logger.error("task_failed", row=2)
+    logger.error("task_failed", row=3)
+    logger.info("later")
+    logger.flush()
+    logger.close()
+    assert logger.failed
+    assert logger.dropped >= 1
+    assert logger.written == 0
+    assert capsys.readouterr().err.count("警告: 写入日志") == 1
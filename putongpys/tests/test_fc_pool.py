@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""工作进程池：使用 fcstub 替身模块的 fc_worker.py 子进程"""
+
+import os
+import sys
+import json
+
+import pytest
+
+import fc_pool
+
+# 第一次启动时让替身在保存文档时崩溃（FC_STUB_CRASH_RATE=1），之后的工作进程正常运行
+CRASH_ONCE = """
+import os, sys, runpy
+marker = sys.argv.pop(1)
+if not os.path.exists(marker):
+    open(marker, "w").close()
+    os.environ["FC_STUB_CRASH_RATE"] = "1"
+sys.argv = [{worker!r}, "serve", "--stdin", "--stub"]
+runpy.run_path({worker!r}, run_name="__main__")
+"""
+
+
+def _write_manifest(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+
+
+def _env():
+    return dict(os.environ, FC_NO_CACHE="1", PYTHONIOENCODING="utf-8")
+
+
+def test_load_tasks_fills_output_templates(tmp_path):
+    manifest = str(tmp_path / "parts.jsonl")
+    _write_manifest(manifest, [
+        {"id": "a", "length": 5},
+        "# 注释行",
+        "",
+        {"kind": "line", "params": {"x2": 5}},
+        {"id": "c", "fcstd": "given.FCStd", "holeRadius": 2, "stl": "given.stl"},
+        "not json",
+        {"length": 3, "name": "Named"},
+    ])
+    tasks, errors = fc_pool.load_tasks(manifest,
+                                       stl_template="stls/{manifest}/{id}.stl")
+    assert [(task["index"], task["row"]) for task in tasks] == [
+        (1, 1), (2, 4), (3, 5), (5, 7)]
+    params = [task["job"]["params"] for task in tasks]
+    assert params[0]["fcstd"] == os.path.join("FCStds", "parts", "00001_MyCube.FCStd")
+    assert params[0]["stl"] == "stls/parts/a.stl"
+    # line 任务不导出 STL，默认名称按任务类型
+    assert params[1]["fcstd"] == os.path.join("FCStds", "parts",
+                                              "00002_DraftLine.FCStd")
+    assert "stl" not in params[1]
+    assert (params[2]["fcstd"], params[2]["stl"]) == ("given.FCStd", "given.stl")
+    assert params[3]["fcstd"].endswith("00005_Named.FCStd")
+    # 带孔并导出 STL 的任务估算耗时最大
+    assert max(tasks, key=lambda task: task["cost"])["id"] == "c"
+    assert [(error["index"], error["row"], error["status"]) for error in errors] == [
+        (4, 6, "error")]
+
+
+def test_load_tasks_unknown_template_field(tmp_path):
+    manifest = str(tmp_path / "parts.jsonl")
+    _write_manifest(manifest, [{"length": 5}])
+    tasks, errors = fc_pool.load_tasks(manifest, fcstd_template="{missing}.FCStd")
+    assert tasks == [] and "missing" in errors[0]["error"]
+
+
+def _tasks(tmp_path, rows):
+    manifest = str(tmp_path / "jobs.jsonl")
+    _write_manifest(manifest, rows)
+    template = str(tmp_path / "out" / "{index:03d}.FCStd")
+    tasks, errors = fc_pool.load_tasks(manifest, fcstd_template=template)
+    assert errors == []
+    return tasks
+
+
+def test_pool_success_and_invalid_params(tmp_path):
+    tasks = _tasks(tmp_path, [{"id": "ok", "length": 5, "holeRadius": 1},
+                              {"id": "bad", "length": "not a number"},
+                              {"id": "line", "kind": "line"}])
+    pool = fc_pool.ProcessPool(fc_pool.worker_command(stub=True), workers=2, env=_env())
+    seen = []
+    records = {record["id"]: record for record in pool.run(tasks, seen.append)}
+    assert len(seen) == 3
+    assert records["ok"]["status"] == "success"
+    assert os.path.exists(str(tmp_path / "out" / "001.FCStd"))
+    assert records["line"]["status"] == "success"
+    assert records["bad"]["status"] == "error"
+    assert "length" in records["bad"]["error"]
+    assert all(record["attempts"] == 1 for record in records.values())
+    assert sum(worker.crashes for worker in pool.workers) == 0
+
+
+@pytest.mark.parametrize("retries, expected", [(1, "success"), (0, "error")])
+def test_pool_requeues_after_crash(tmp_path, retries, expected):
+    tasks = _tasks(tmp_path, [{"id": "part", "length": 5}])
+    marker = str(tmp_path / "crashed")
+    script = CRASH_ONCE.format(worker=fc_pool.WORKER_SCRIPT)
+    command = [sys.executable, "-c", script, marker]
+    pool = fc_pool.ProcessPool(command, workers=1, retries=retries, env=_env())
+    (record,) = pool.run(tasks)
+    assert record["status"] == expected
+    assert record["attempts"] == retries + 1
+    worker = pool.workers[0]
+    assert worker.crashes == 1
+    assert len(worker.pids) == retries + 1
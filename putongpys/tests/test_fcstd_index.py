@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""不依赖 FreeCAD 的 .FCStd 索引：对象元数据、孔轴推断、损坏文件与增量刷新"""
+
+import os
+import zipfile
+
+import pytest
+
+import create_cube
+import fcstd_index
+import fcstd_repack
+
+
+def _part(path, **params):
+    params = create_cube.normalize_params(
+        dict(create_cube.DEFAULT_PARAMS, fcstd=str(path), **params), strict=True)
+    create_cube.create_cube(params, close_document=True, cache=None)
+    return str(path)
+
+
+def _bump(path):
+    """保证重新生成后 mtime 一定不同（有的文件系统时间精度较粗）"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def parts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parts = tmp_path / "parts"
+    parts.mkdir()
+    _part(parts / "plain.FCStd", length=4, width=5, height=6)
+    _part(parts / "hole.FCStd", length=8, width=8, height=20,
+          holeRadius=2, holeAxis="Z")
+    (parts / "garbage.FCStd").write_bytes(b"not a zip archive")
+    with zipfile.ZipFile(parts / "empty.FCStd", "w") as archive:
+        archive.writestr("GuiDocument.xml", "<Document/>")
+    return parts
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = fcstd_index.Catalog(str(tmp_path / "index.sqlite"))
+    yield catalog
+    catalog.close()
+
+
+def test_scan_reads_objects_without_freecad(parts, catalog):
+    stats = catalog.scan([str(parts)], jobs=1)
+    assert (stats["files"], stats["indexed"], stats["errors"]) == (4, 4, 2)
+
+    rows = catalog.query("path = ?", (os.path.join("parts", "plain.FCStd"),))
+    assert [(row["type"], row["label"]) for row in rows] == [
+        ("Part::Feature", "MyCube")]
+    assert (rows[0]["dx"], rows[0]["dy"], rows[0]["dz"]) == pytest.approx((4, 5, 6))
+
+    # 孔轴由刀具（圆柱）的包围盒推断
+    holes = catalog.query("hole_axis = 'Z'")
+    assert [row["path"] for row in holes] == [os.path.join("parts", "hole.FCStd")]
+    assert (holes[0]["dx"], holes[0]["dz"]) == pytest.approx((8, 20))
+
+    errors = dict(catalog.stats()["errors"])
+    assert errors[os.path.join("parts", "garbage.FCStd")].startswith("BadZipFile")
+    assert "Document.xml" in errors[os.path.join("parts", "empty.FCStd")]
+
+
+def test_parallel_scan_matches_serial(parts, tmp_path, catalog, monkeypatch):
+    catalog.scan([str(parts)], jobs=1)
+    monkeypatch.setattr(fcstd_index, "MIN_PARALLEL_FILES", 1)
+    monkeypatch.setattr(fcstd_index, "CHUNK_SIZE", 1)
+    parallel = fcstd_index.Catalog(str(tmp_path / "parallel.sqlite"))
+    try:
+        assert parallel.scan([str(parts)], jobs=2)["errors"] == 2
+
+        def rows(catalog):
+            return [(row["path"], row["name"], row["dx"], row["hole_axis"])
+                    for row in catalog.query()]
+
+        assert rows(parallel) == rows(catalog)
+    finally:
+        parallel.close()
+
+
+def test_incremental_refresh(parts, tmp_path, catalog):
+    other = tmp_path / "other"
+    other.mkdir()
+    _part(other / "kept.FCStd")
+    catalog.scan([str(parts), str(other)], jobs=1)
+
+    stats = catalog.scan([str(parts)], jobs=1)
+    assert (stats["indexed"], stats["unchanged"], stats["removed"]) == (0, 4, 0)
+
+    path = _part(parts / "plain.FCStd", length=9, width=5, height=6)
+    _bump(path)
+    os.remove(parts / "garbage.FCStd")
+    stats = catalog.scan([str(parts)], jobs=1)
+    assert (stats["indexed"], stats["unchanged"], stats["removed"]) == (1, 2, 1)
+    assert catalog.query("label = 'MyCube' AND dx = 9")
+    # 其他目录中的文件不受本次扫描影响
+    assert catalog.query("path = ?", (os.path.join("other", "kept.FCStd"),))
+    assert dict(catalog.stats()["files"]) == {"ok": 3, "error": 1}
+
+    # --no-brep 索引过的文件在需要形状尺寸时重新读取
+    catalog.scan([str(parts)], jobs=1, brep=False, full=True)
+    assert catalog.query("dx IS NOT NULL AND path LIKE 'parts%'") == []
+    assert catalog.scan([str(parts)], jobs=1)["indexed"] == 3
+
+
+def test_shapes_moved_to_store_are_still_measured(parts, tmp_path):
+    path = str(parts / "plain.FCStd")
+    fcstd_repack.repack(path, "fast", store=str(tmp_path / "store"))
+    record = fcstd_index.index_file(path)
+    assert record["status"] == "ok"
+    cube = next(obj for obj in record["objects"] if obj["name"] == "MyCube")
+    assert (cube["dx"], cube["dy"], cube["dz"]) == pytest.approx((4, 5, 6))
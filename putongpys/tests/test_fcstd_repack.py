@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""保存后处理：重写压缩、共享形状存储与放回"""
+
+import os
+import json
+import zipfile
+
+import pytest
+
+import create_cube
+import fcstd_repack
+
+
+@pytest.fixture
+def fcstd(tmp_path, monkeypatch):
+    """用替身后端生成一个带孔零件的 .FCStd，返回 (路径, {成员: 内容})"""
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "part.FCStd")
+    params = create_cube.normalize_params(
+        dict(create_cube.DEFAULT_PARAMS, holeRadius=3.0, fcstd=path), strict=True)
+    create_cube.create_cube(params, close_document=True, cache=None)
+    with zipfile.ZipFile(path) as archive:
+        members = {info.filename: archive.read(info) for info in archive.infolist()}
+    assert any(name.endswith(".brp") for name in members)
+    return path, members
+
+
+def _read(path):
+    with zipfile.ZipFile(path) as archive:
+        return {info.filename: (archive.read(info), info.compress_type)
+                for info in archive.infolist()}
+
+
+@pytest.mark.parametrize("mode", list(fcstd_repack.MODES))
+def test_repack_keeps_members(fcstd, mode):
+    path, members = fcstd
+    report = fcstd_repack.repack(path, mode)
+    repacked = _read(path)
+    assert {name: data for name, (data, _) in repacked.items()} == members
+    assert {kind for _, kind in repacked.values()} == {fcstd_repack.MODES[mode][0]}
+    assert report["bytes_out"] == os.path.getsize(path)
+
+
+def test_store_and_hydrate_round_trip(fcstd, tmp_path):
+    path, members = fcstd
+    store = str(tmp_path / "store")
+    repacker = fcstd_repack.Repacker(store=store)
+    report = repacker.process(path)
+    shapes = [name for name in members if name.endswith(".brp")]
+    assert report["mode"] == "fast"
+    assert report["payloads"] == len(shapes)
+    assert repacker.totals["fast"]["files"] == 1
+
+    slim = _read(path)
+    assert fcstd_repack.STORE_MANIFEST in slim
+    assert not any(name.endswith(".brp") for name in slim)
+
+    # 放回后再处理一次：形状已在存储中，不重复写入
+    assert fcstd_repack.hydrate(path, store=store) == len(shapes)
+    assert repacker.process(path)["new_payloads"] == 0
+
+    assert fcstd_repack.hydrate(path) == len(shapes)
+    assert {name: data for name, (data, _) in _read(path).items()} == members
+    assert fcstd_repack.hydrate(path) == 0
+
+
+def test_hydrate_rejects_corrupted_payload(fcstd, tmp_path):
+    path, _ = fcstd
+    store = str(tmp_path / "store")
+    fcstd_repack.repack(path, "stored", store)
+    manifest = json.loads(_read(path)[fcstd_repack.STORE_MANIFEST][0])
+    digest = next(iter(manifest["members"].values()))["sha256"]
+    with open(fcstd_repack.payload_path(store, digest), "wb") as f:
+        f.write(b"broken")
+    with pytest.raises(ValueError):
+        fcstd_repack.hydrate(path)
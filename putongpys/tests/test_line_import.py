@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""批量导入直线 / 折线：CSV 与 NPY 解析、长度为 0 的线段和重复点跳过"""
+
+import numpy as np
+import pytest
+
+import create_cube
+import line_import
+
+
+def _read(path, chunk_rows=line_import.CHUNK_ROWS):
+    return list(line_import.read_lines(str(path), chunk_rows))
+
+
+def test_csv_segments_with_header_in_chunks(tmp_path):
+    path = tmp_path / "segments.csv"
+    path.write_text("# 测量数据\nid,x2,y2,z2,x1,y1,z1\n"
+                    "a,1,0,0,0,0,0\n\nb,2,2,2,1,1,1\nc,5,5,5,5,5,5\n",
+                    encoding="utf-8")
+    chunks = _read(path, chunk_rows=2)
+    assert chunks == [("segments", [(0, 0, 0, 1, 0, 0), (1, 1, 1, 2, 2, 2)]),
+                      ("segments", [(5, 5, 5, 5, 5, 5)])]
+
+
+def test_csv_without_header(tmp_path):
+    segments = tmp_path / "segments.csv"
+    segments.write_text("0,0,0,1,1,1\n1,1,1,2,2,2\n", encoding="utf-8")
+    assert _read(segments) == [("segments", [(0, 0, 0, 1, 1, 1), (1, 1, 1, 2, 2, 2)])]
+
+    points = tmp_path / "points.csv"
+    points.write_text("0,0,0\n1,0,0\n1,1,0\n", encoding="utf-8")
+    assert _read(points) == [("polyline", [(0, 0, 0), (1, 0, 0), (1, 1, 0)])]
+
+    paths = tmp_path / "paths.csv"
+    paths.write_text("p1,0,0,0\np1,1,0,0\np2,5,5,5\np2,6,5,5\n", encoding="utf-8")
+    assert _read(paths) == [("polyline", [(0, 0, 0), (1, 0, 0)]),
+                            ("polyline", [(5, 5, 5), (6, 5, 5)])]
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("1,2\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        _read(bad)
+    empty = tmp_path / "empty.csv"
+    empty.write_text("# 只有注释\n", encoding="utf-8")
+    assert _read(empty) == []
+
+
+def test_csv_polylines_split_on_path_column(tmp_path):
+    path = tmp_path / "paths.csv"
+    path.write_text("x,y,z,path\n0,0,0,a\n1,0,0,a\n9,9,9,b\n0,0,0,a\n",
+                    encoding="utf-8")
+    assert [len(points) for _, points in _read(path)] == [2, 1, 1]
+
+
+@pytest.mark.parametrize("shape", [(3, 6), (3, 2, 3)])
+def test_npy_segments(tmp_path, shape):
+    path = tmp_path / "segments.npy"
+    np.save(path, np.arange(18, dtype=np.float32).reshape(shape))
+    chunks = _read(path, chunk_rows=2)
+    assert [kind for kind, _ in chunks] == ["segments", "segments"]
+    expected = [tuple(map(float, range(start, start + 6))) for start in (0, 6, 12)]
+    assert [segment for _, data in chunks for segment in data] == expected
+
+
+def test_npy_polyline_and_bad_shape(tmp_path):
+    path = tmp_path / "points.npy"
+    np.save(path, np.zeros((4, 3)))
+    assert _read(path) == [("polyline", [(0.0, 0.0, 0.0)] * 4)]
+    bad = tmp_path / "bad.npy"
+    np.save(bad, np.zeros((4, 4)))
+    with pytest.raises(ValueError):
+        _read(bad)
+
+
+@pytest.mark.parametrize("use_draft", [False, True])
+def test_import_skips_degenerate_rows(tmp_path, use_draft):
+    segments = tmp_path / "segments.csv"
+    segments.write_text("x1,y1,z1,x2,y2,z2\n0,0,0,1,0,0\n2,2,2,2,2,2\n0,0,0,0,3,0\n",
+                        encoding="utf-8")
+    polylines = tmp_path / "polylines.csv"
+    polylines.write_text("path,x,y,z\n"
+                         "a,0,0,0\na,0,0,0\na,1,0,0\na,1,1,0\n"  # 连续重复的点
+                         "b,5,5,5\nb,5,5,5\n",                  # 只剩一个点的折线
+                         encoding="utf-8")
+    FreeCAD = create_cube.load_freecad()
+    doc = FreeCAD.newDocument("LineImport")
+    try:
+        objects, report = line_import.import_lines(doc, str(segments), name="Seg",
+                                                   use_draft=use_draft)
+        assert (report["segments"], report["skipped"]) == (2, 1)
+        assert len(objects) == (2 if use_draft else 1)
+
+        objects, report = line_import.import_lines(doc, str(polylines), name="Poly",
+                                                   use_draft=use_draft)
+        assert (report["polylines"], report["segments"], report["skipped"]) == (1, 2, 3)
+        assert len(objects) == 1
+        assert "跳过 3 个" in line_import.format_report(report)
+    finally:
+        FreeCAD.closeDocument(doc.Name)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""镜像源排名缓存：有效期、按下载耗时排序、安装失败降级"""
+
+import time
+
+import pytest
+
+import mirror_cache
+
+
+@pytest.fixture(autouse=True)
+def ranking_file(tmp_path, monkeypatch):
+    path = tmp_path / "ranking.json"
+    monkeypatch.setattr(mirror_cache, "RANKING_FILE", str(path))
+    monkeypatch.setattr(mirror_cache, "REFRESH_LOCK_FILE", str(path) + ".lock")
+    return path
+
+
+def _mirror(name, p50, success=True):
+    return {"name": name, "url": f"https://{name}/simple", "p50": p50,
+            "p95": p50 * 2, "success": success}
+
+
+def test_save_and_load_keep_infinite_latency():
+    mirror_cache.save_ranking([_mirror("fast", 0.1),
+                               _mirror("down", float("inf"), success=False)])
+    cache = mirror_cache.load_ranking()
+    assert cache["probe"] == "http"
+    assert [item["name"] for item in cache["mirrors"]] == ["fast", "down"]
+    assert cache["mirrors"][1]["p50"] == float("inf")
+    assert cache["mirrors"][0]["install_failures"] == 0
+
+
+def test_cache_expires_after_max_age():
+    mirror_cache.save_ranking([_mirror("fast", 0.1)])
+    cache = mirror_cache.load_ranking()
+    assert mirror_cache.is_fresh(cache, max_age=60)
+    cache["timestamp"] = time.time() - 120
+    assert not mirror_cache.is_fresh(cache, max_age=60)
+    assert not mirror_cache.is_fresh(None)
+
+
+def test_ranking_uses_learned_download_throughput():
+    mirror_cache.save_ranking([_mirror("a", 0.10), _mirror("b", 0.20),
+                               _mirror("c", 0.30), _mirror("down", 0.05, False)])
+    # a 的真实下载很慢，b 很快，c 没有记录时按其他镜像源的中位数估算
+    mirror_cache.record_downloads({"a": (1024 * 1024, 4.0), "b": (1024 * 1024, 0.5)})
+    cache = mirror_cache.load_ranking()
+    assert [name for name, _ in mirror_cache.ranked_mirrors(cache)] == ["b", "c", "a"]
+
+
+def test_learned_fields_survive_rebenchmark():
+    mirror_cache.save_ranking([_mirror("a", 0.1)])
+    mirror_cache.record_downloads({"a": (2000, 1.0)})
+    mirror_cache.record_downloads({"a": (1000, 1.0)})
+    item = mirror_cache.load_ranking()["mirrors"][0]
+    assert item["payload_throughput"] == pytest.approx(2000 + 0.3 * (1000 - 2000))
+    assert item["payload_samples"] == 2
+
+    mirror_cache.save_ranking([_mirror("a", 0.2)])
+    item = mirror_cache.load_ranking()["mirrors"][0]
+    assert item["p50"] == 0.2
+    assert item["payload_bytes"] == 3000
+
+
+def test_install_failure_demotes_mirror():
+    mirror_cache.save_ranking([_mirror("a", 0.1), _mirror("b", 0.2)])
+    mirror_cache.record_install_failure("a")
+    cache = mirror_cache.load_ranking()
+    assert [item["name"] for item in cache["mirrors"]] == ["b", "a"]
+    assert cache["mirrors"][1]["install_failures"] == 1
+    assert mirror_cache.ranked_mirrors(cache) == [("b", "https://b/simple")]
+
+    mirror_cache.save_ranking([_mirror("a", 0.1), _mirror("b", 0.2)])
+    assert mirror_cache.load_ranking()["mirrors"][0]["install_failures"] == 1
+
+
+def test_background_refresh_starts_once(monkeypatch):
+    started = []
+    monkeypatch.setattr(mirror_cache.subprocess, "Popen",
+                        lambda args, **kwargs: started.append(args))
+    assert mirror_cache.refresh_in_background("manager.py")
+    assert not mirror_cache.refresh_in_background("manager.py")
+    assert started[0][-2:] == ["cache", "refresh"] and len(started) == 1
+    mirror_cache.release_refresh_lock()
+    assert mirror_cache.refresh_in_background("manager.py")
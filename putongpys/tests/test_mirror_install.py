@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""pip 输出解析：下载记录归属与网络失败判断"""
+
+import sys
+
+import pytest
+
+import mirror_install
+
+A = ("a", "https://a.example/simple")
+B = ("b", "https://b.example/simple")
+
+PIP_OUTPUT = ("Collecting numpy",
+              "  Downloading numpy-2.3.4-cp313-cp313-win_amd64.whl (12.8 MB)",
+              "Installing collected packages: numpy")
+
+
+def _fake_pip(lines):
+    script = "".join(f"print({line!r}, flush=True)\n" for line in lines)
+    return [sys.executable, "-c", script]
+
+
+def test_single_index_downloads_are_recorded(capsys):
+    cmd = _fake_pip(PIP_OUTPUT)
+    success, output, downloads = mirror_install.run_pip_install(cmd, [A])
+    assert success and "Installing" in output
+    assert [(item["mirror"], item["file"], item["bytes"]) for item in downloads] == [
+        ("a", "numpy-2.3.4-cp313-cp313-win_amd64.whl", 12800000)]
+    summary = mirror_install.summarize_downloads(downloads)
+    assert list(summary) == ["a"] and summary["a"][0] == 12800000
+
+
+def test_extra_index_downloads_without_url_are_dropped(capsys):
+    _, _, downloads = mirror_install.run_pip_install(_fake_pip(PIP_OUTPUT), [A, B])
+    assert downloads == []
+
+
+@pytest.mark.parametrize("target, mirrors, expected", [
+    ("https://b.example/packages/x.whl", [A, B], "b"),
+    ("https://elsewhere.example/x.whl", [A, B], None),
+    ("x.whl", [A], "a"),
+    ("x.whl", [A, B], None),
+])
+def test_attribute(target, mirrors, expected):
+    assert mirror_install._attribute(target, mirrors) == expected
+
+
+def test_build_install_command():
+    cmd = mirror_install.build_install_command(["numpy"], [A, B], upgrade=True)
+    assert cmd[cmd.index("--index-url") + 1] == A[1]
+    assert cmd[cmd.index("--extra-index-url") + 1] == B[1]
+    assert "--upgrade" in cmd and cmd[-1] == "numpy"
+
+
+def test_network_failure_detection():
+    assert mirror_install.is_network_failure("ReadTimeoutError: HTTPSConnectionPool")
+    assert not mirror_install.is_network_failure(
+        "ERROR: No matching distribution found for nosuchpackage")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""HTTP 探测：以本地 http.server 作为替身镜像源"""
+
+import math
+import socket
+import asyncio
+import functools
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+from mirror_probe import probe_mirror, probe_mirror_async
+
+INDEX = ('<!DOCTYPE html><html><body>\n'
+         '<a href="../../packages/pip-24.0-py3-none-any.whl#sha256=00">'
+         'pip-24.0-py3-none-any.whl</a>\n'
+         '<a href="../../packages/pip-24.0.tar.gz#sha256=11">pip-24.0.tar.gz</a>\n'
+         '</body></html>\n')
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """在 127.0.0.1 的随机端口上提供 /simple/pip/，返回 simple 索引地址"""
+    project = tmp_path / "simple" / "pip"
+    project.mkdir(parents=True)
+    (project / "index.html").write_text(INDEX, encoding="utf-8")
+    handler = functools.partial(QuietHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/simple/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _refused_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/simple/"
+
+
+def _check_success(result):
+    assert result["success"], result["error"]
+    assert result["status"] == 200
+    assert result["tls"] is None
+    assert result["connect"] is not None and result["ttfb"] is not None
+    assert result["bytes"] > 0
+    assert result["total"] < math.inf
+
+
+def test_probe_mirror(mirror):
+    _check_success(probe_mirror(mirror, timeout=5))
+
+
+def test_probe_mirror_async(mirror):
+    _check_success(asyncio.run(probe_mirror_async(mirror, timeout=5)))
+
+
+def test_missing_project_is_a_failure(mirror):
+    result = probe_mirror(mirror, package="no-such-project", timeout=5)
+    assert not result["success"]
+    assert result["status"] == 404
+
+
+def test_refused_port():
+    url = _refused_url()
+    for result in (probe_mirror(url, timeout=5),
+                   asyncio.run(probe_mirror_async(url, timeout=5))):
+        assert not result["success"]
+        assert result["total"] == math.inf
+        assert result["error"]
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""本地索引代理：文件链接白名单、内容寻址缓存与 LRU 淘汰"""
+
+import io
+import os
+import re
+import hashlib
+import functools
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+import mirror_proxy
+from mirror_proxy import BlobStore, MirrorProxy
+
+WHEEL = b"demo wheel contents"
+METADATA = b"Metadata-Version: 2.1\nName: demo\n"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """在随机端口上提供 /simple/demo/ 和 /packages/ 下的文件，返回 simple 索引地址"""
+    root = tmp_path / "upstream"
+    (root / "simple" / "demo").mkdir(parents=True)
+    (root / "packages").mkdir()
+    (root / "packages" / "demo-1.0-py3-none-any.whl").write_bytes(WHEEL)
+    (root / "packages" / "demo-1.0-py3-none-any.whl.metadata").write_bytes(METADATA)
+    (root / "simple" / "demo" / "index.html").write_text(
+        '<a href="../../packages/demo-1.0-py3-none-any.whl'
+        f'#sha256={_sha256(WHEEL)}" data-core-metadata="sha256={_sha256(METADATA)}">'
+        'demo-1.0-py3-none-any.whl</a>\n', encoding="utf-8")
+    server = _serve(functools.partial(QuietHandler, directory=str(root)))
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/simple/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_only_links_from_index_pages_are_proxied(tmp_path):
+    proxy = MirrorProxy([("up", "https://mirror.example/simple/")],
+                        BlobStore(str(tmp_path)))
+    html = ('<a href="https://files.example/p/demo-1.0.tar.gz#sha256=ab">x</a>'
+            '<a href="../../p/demo-1.0.whl">y</a><a href="mailto:a@b">z</a>')
+    rewritten = proxy._rewrite(html, "https://mirror.example/simple/demo/")
+    assert rewritten.count('href="/files/') == 2 and 'href="mailto:a@b"' in rewritten
+    assert proxy.store.url_index == {"https://files.example/p/demo-1.0.tar.gz": "ab"}
+
+    assert proxy.allowed("https://files.example/p/demo-1.0.tar.gz")
+    assert proxy.allowed("https://mirror.example/p/demo-1.0.whl")
+    assert not proxy.allowed("https://mirror.example/p/other-1.0.whl")
+    assert not proxy.allowed("http://169.254.169.254/latest/meta-data")
+    assert not proxy.allowed("file:///etc/passwd")
+    with pytest.raises(PermissionError):
+        proxy.fetch_file("https://evil.example/demo-1.0.whl")
+
+
+def test_store_verifies_sha256(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.store("https://m/demo.whl", io.BytesIO(WHEEL), _sha256(WHEEL))
+    assert store.lookup("https://m/demo.whl") == digest == _sha256(WHEEL)
+    with open(store.blob_path(digest), "rb") as f:
+        assert f.read() == WHEEL
+    with pytest.raises(ValueError):
+        store.store("https://m/bad.whl", io.BytesIO(b"tampered"), _sha256(WHEEL))
+    assert store.lookup("https://m/bad.whl") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_evict_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path), max_size=25)
+    old = store.store("https://m/a", io.BytesIO(b"a" * 10))
+    new = store.store("https://m/b", io.BytesIO(b"b" * 10))
+    os.utime(store.blob_path(old), (1, 1))
+    os.utime(store.blob_path(new), (2, 2))
+    store.touch(old)
+    store.store("https://m/c", io.BytesIO(b"c" * 10))
+    assert store.lookup("https://m/a") == old
+    assert store.lookup("https://m/b") is None
+    assert new not in store.added
+
+
+def test_first_cached_time_survives_reload_and_access(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.store("https://m/a", io.BytesIO(b"data"))
+    added = store.added_time(digest, 0)
+    os.utime(store.blob_path(digest), (added + 100, added + 100))
+    assert BlobStore(str(tmp_path)).added_time(digest, 0) == added
+
+
+def test_proxy_serves_cached_files_and_metadata(tmp_path, upstream):
+    server = mirror_proxy.make_server([("up", upstream)], port=0,
+                                      cache_dir=str(tmp_path / "cache"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(base + "/simple/Demo/") as response:
+            page = response.read().decode("utf-8")
+        href = re.search(r'href="(/files/[^"#]+)', page).group(1)
+        for _ in range(2):
+            with urllib.request.urlopen(base + href) as response:
+                assert response.read() == WHEEL
+        with urllib.request.urlopen(base + href + ".metadata") as response:
+            assert response.read() == METADATA
+        request = urllib.request.Request(base + href, headers={"Range": "bytes=5-9"})
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 206 and response.read() == WHEEL[5:10]
+        assert server.RequestHandlerClass.proxy.stats["hits"] >= 2
+
+        token = mirror_proxy._encode_token("http://127.0.0.1:1/secret")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}/files/{token}/secret")
+        assert error.value.code == 403
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""批量更新：选择最新版本、按依赖分波次、波次失败时逐个安装"""
+
+import mirror_update
+
+
+def _installed(**requires):
+    return {key: {"name": key, "version": "1.0", "requires": set(deps)}
+            for key, deps in requires.items()}
+
+
+def _outdated(*keys):
+    return [{"key": key, "name": key, "version": "1.0", "latest": "2.0",
+             "file": {"filename": f"{key}-2.0-py3-none-any.whl",
+                      "url": f"https://m/{key}-2.0-py3-none-any.whl"}}
+            for key in keys]
+
+
+def _wave_keys(waves):
+    return [[item["key"] for item in wave] for wave in waves]
+
+
+def test_dependencies_are_updated_first():
+    # app -> lib -> base；tool 没有依赖；app 也依赖未过期的 six
+    installed = _installed(app=["lib", "six"], lib=["base"], base=[], tool=[], six=[])
+    waves = mirror_update.plan_waves(_outdated("app", "base", "lib", "tool"),
+                                     installed)
+    assert _wave_keys(waves) == [["base", "tool"], ["lib"], ["app"]]
+
+
+def test_dependency_cycle_goes_into_last_wave():
+    installed = _installed(a=["b"], b=["a"], c=[], d=["c", "a"])
+    waves = mirror_update.plan_waves(_outdated("a", "b", "c", "d"), installed)
+    assert _wave_keys(waves) == [["c"], ["a", "b", "d"]]
+
+
+def test_latest_release_skips_yanked_prerelease_and_incompatible_files():
+    files = [
+        {"filename": "demo-3.0-py3-none-any.whl", "yanked": True},
+        {"filename": "demo-2.5b1-py3-none-any.whl"},
+        {"filename": "demo-2.4-py3-none-any.whl", "requires-python": ">=99"},
+        {"filename": "demo-2.3-cp27-cp27m-win32.whl"},
+        {"filename": "demo-2.2.tar.gz"},
+        {"filename": "demo-2.2-py3-none-any.whl"},
+        {"filename": "demo-2.1.tar.gz"},
+        {"filename": "not-a-distribution.txt"},
+    ]
+    supported_tags = set(mirror_update.sys_tags())
+    version, chosen = mirror_update.latest_release(files, supported_tags)
+    assert str(version) == "2.2"
+    assert chosen["filename"] == "demo-2.2-py3-none-any.whl"
+    assert mirror_update.latest_release(files[:2], supported_tags) == (None, None)
+
+
+def test_failed_wave_is_retried_package_by_package(monkeypatch):
+    installed = _installed(base=[], good=["base"], bad=["base"], late=["bad"])
+    monkeypatch.setattr(mirror_update, "installed_distributions", lambda: installed)
+    monkeypatch.setattr(mirror_update, "find_outdated", lambda installed, url, workers:
+                        (_outdated("bad", "base", "good", "late"), []))
+    monkeypatch.setattr(mirror_update, "download_file",
+                        lambda item, staging_dir: (staging_dir, 0.1))
+    calls = []
+
+    def pip_install(specs, staging_dir, mirror_url):
+        calls.append(specs)
+        if any(spec.startswith("bad") for spec in specs):
+            return False, "Collecting bad\nERROR: No matching distribution\n"
+        return True, ""
+
+    monkeypatch.setattr(mirror_update, "_pip_install_local", pip_install)
+    report = mirror_update.update_packages("m", "https://m/simple")
+    assert calls == [["base==2.0"], ["bad==2.0", "good==2.0"], ["bad==2.0"],
+                     ["good==2.0"], ["late==2.0"]]
+    status = {entry["name"]: (entry["wave"], entry["status"]) for entry in report}
+    assert status == {"base": (1, "updated"), "bad": (2, "failed"),
+                      "good": (2, "updated"), "late": (3, "updated")}
+    failed = next(entry for entry in report if entry["name"] == "bad")
+    assert failed["error"] == "ERROR: No matching distribution"
+
+
+def test_dry_run_only_plans(monkeypatch):
+    installed = _installed(a=[], b=["a"])
+    monkeypatch.setattr(mirror_update, "installed_distributions", lambda: installed)
+    monkeypatch.setattr(mirror_update, "find_outdated", lambda installed, url, workers:
+                        (_outdated(*sorted(installed)), []))
+    monkeypatch.setattr(mirror_update, "download_file", None)
+    report = mirror_update.update_packages("m", "https://m/simple", dry_run=True,
+                                           exclude=["B"])
+    assert [(entry["name"], entry["status"]) for entry in report] == [("a", "planned")]
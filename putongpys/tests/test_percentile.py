@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""百分位计算与镜像源排名"""
+
+import math
+
+import pytest
+
+import stage_trace
+import mirror_trace
+from mirror_bench import percentile, rank_key, summarize
+
+
+@pytest.mark.parametrize("function", [stage_trace.percentile, mirror_trace.percentile])
+def test_sorted_percentile_interpolates(function):
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert function(values, 0) == 1.0
+    assert function(values, 50) == 3.0
+    assert function(values, 100) == 5.0
+    assert function(values, 90) == pytest.approx(4.6)
+    assert function([7.0], 99) == 7.0
+
+
+@pytest.mark.parametrize("function", [stage_trace.percentile, mirror_trace.percentile])
+def test_sorted_percentile_empty(function):
+    assert function([], 50) is None
+
+
+def test_bench_percentile_sorts_and_handles_empty():
+    assert percentile([5.0, 1.0, 3.0], 50) == 3.0
+    assert math.isinf(percentile([], 95))
+
+
+def _stats(name, latencies, failures=0):
+    samples = [{"total": value, "throughput": 1000.0 / value} for value in latencies]
+    return summarize(name, f"https://{name}/simple", samples, failures,
+                     ["超时"] * failures)
+
+
+def test_rank_prefers_available_then_stable_then_fast():
+    fast = _stats("fast", [0.10, 0.12, 0.11])
+    slow = _stats("slow", [0.30, 0.32, 0.31])
+    flaky = _stats("flaky", [0.05], failures=2)
+    down = _stats("down", [], failures=3)
+    ranked = sorted([down, flaky, slow, fast], key=rank_key)
+    assert [stats["name"] for stats in ranked] == ["fast", "slow", "flaky", "down"]
+    assert flaky["failure_rate"] == pytest.approx(2 / 3)
+    assert not down["success"]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""STL 写出与读回"""
+
+import numpy as np
+import pytest
+
+import stl_io
+
+VERTICES = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+FACES = np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+
+
+@pytest.mark.parametrize("binary", [True, False])
+def test_write_and_read_round_trip(tmp_path, binary):
+    path = str(tmp_path / "tetra.stl")
+    count = stl_io.write_stl(path, VERTICES, FACES, binary=binary, name="tetra part")
+    assert count == 4
+    assert stl_io.is_binary_stl(path) == binary
+    np.testing.assert_allclose(stl_io.read_stl(path), VERTICES[FACES])
+    if not binary:
+        with open(path, encoding="ascii") as f:
+            assert f.readline().strip() == "solid tetra_part"
+
+
+def test_binary_layout_and_normals(tmp_path):
+    path = str(tmp_path / "tetra.stl")
+    # chunk 小于三角形数量时分块写出，文件头中的数量仍是总数
+    stl_io.write_stl(path, VERTICES, FACES, chunk=3)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) == stl_io.HEADER_SIZE + 4 + 4 * stl_io.STL_DTYPE.itemsize
+    assert int(np.frombuffer(data[80:84], dtype="<u4")[0]) == 4
+    records = np.frombuffer(data, dtype=stl_io.STL_DTYPE, offset=stl_io.HEADER_SIZE + 4)
+    # 第一个面在 z=0 平面上，朝外法向为 -Z
+    np.testing.assert_allclose(records["normal"][0], [0, 0, -1])
+    np.testing.assert_allclose(np.linalg.norm(records["normal"], axis=1), 1, rtol=1e-6)
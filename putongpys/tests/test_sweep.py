@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""参数扫描：无效组合与重复几何跳过，--run 写出清单后按批量模式生成"""
+
+import sys
+import json
+
+import sweep
+
+
+def _points(**axes):
+    return sweep.grid_points([sweep.parse_axis(name, spec)
+                              for name, spec in axes.items()])
+
+
+def test_invalid_and_duplicate_points_are_skipped():
+    stats = sweep.SweepStats()
+    # 孔径 12 不小于 10x10 截面；没有孔时 X/Z 孔轴是同一个形状
+    points = _points(length="20", width="10", height="10",
+                     holeRadius="0,3,6", holeAxis="X,Z")
+    jobs = list(sweep.sweep_jobs(points, stats=stats))
+    assert (stats.points, stats.invalid, stats.duplicate) == (6, 2, 1)
+    assert [(params["holeRadius"], params["holeAxis"]) for _, params in jobs] == [
+        (0.0, "X"), (3.0, "X"), (3.0, "Z")]
+
+
+def test_run_writes_manifest_and_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    argv = ["sweep.py", "--length=10:20:5", "--holeRadius=0,6", "--width=10",
+            "--height=10", "--fcstd-template=none",
+            "--stl-template=stls/{key}.stl", "--run", "--no-cache"]
+    monkeypatch.setattr(sys, "argv", argv)
+    assert sweep.main() == 0
+    with open("sweep.jsonl", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    with open("sweep.results.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(rows) == 3
+    assert [record["id"] for record in records] == [row["id"] for row in rows]
+    assert all(record["status"] == "success" and record["fcstd"] is None
+               for record in records)
+    assert all((tmp_path / row["stl"]).exists() for row in rows)
+
+    # 输出都已存在，再次运行不生成任务
+    assert sweep.main() == 0
+    assert (tmp_path / "sweep.results.jsonl").read_text(encoding="utf-8") == ""